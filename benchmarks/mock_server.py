@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Mock Perplexity server for benchmarks.
+
+This script serves a local stand-in for the ``/chat/completions`` endpoint
+with configurable latency, jitter, error rate, capacity and streaming cadence, so the
+client's own overhead can be measured without network noise or API cost.
+Point the CLI at it with ``PERPLEXITY_BASE_URL``.
+
+Usage:
+    python benchmarks/mock_server.py [--port 8808] [--latency 0.05] [--jitter 0.01]
+        [--error-rate 0.01] [--capacity 8] [--chunks 20] [--chunk-interval 0.005]
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+
+# Constants
+DEFAULT_PORT = 8808
+DEFAULT_LATENCY = 0.05
+DEFAULT_JITTER = 0.01
+DEFAULT_CHUNKS = 20
+DEFAULT_CHUNK_INTERVAL = 0.005
+ANSWER_WORD = "token "
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    Answer chat completion requests like the Perplexity API.
+    """
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes; without this, delayed ACKs add ~40ms
+    disable_nagle_algorithm = True
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send_json(self, status: int, body: Dict[str, Any],
+                   headers: Optional[Dict[str, str]] = None) -> None:
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def do_POST(self) -> None:
+        server = self.server
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        server.record_request()
+        if not server.enter():
+            self._send_json(429, {"error": {"message": "Too many concurrent requests"}},
+                            {"Retry-After": "0"})
+            return
+        try:
+            self._answer(request)
+        finally:
+            server.leave()
+
+    def _answer(self, request: Dict[str, Any]) -> None:
+        server = self.server
+        time.sleep(max(0.0, server.latency + random.uniform(-server.jitter, server.jitter)))
+        if random.random() < server.error_rate:
+            if random.random() < 0.5:
+                self._send_json(429, {"error": {"message": "Rate limited"}}, {"Retry-After": "0"})
+            else:
+                self._send_json(500, {"error": {"message": "Internal error"}})
+            return
+
+        model = request.get("model", "sonar")
+        prompt = " ".join(m.get("content", "") for m in request.get("messages", []))
+        usage = {"prompt_tokens": max(1, len(prompt) // 4),
+                 "completion_tokens": server.chunks,
+                 "total_tokens": max(1, len(prompt) // 4) + server.chunks}
+
+        if not request.get("stream"):
+            self._send_json(200, {
+                "id": "mock", "model": model, "object": "chat.completion",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant",
+                                         "content": ANSWER_WORD * server.chunks}}],
+                "usage": usage,
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i in range(server.chunks):
+            chunk = {"id": "mock", "model": model, "object": "chat.completion.chunk",
+                     "choices": [{"index": 0, "delta": {"content": ANSWER_WORD}}]}
+            if i == server.chunks - 1:
+                chunk["usage"] = usage
+            self._write_chunk(b"data: " + json.dumps(chunk).encode("utf-8") + b"\n\n")
+            if server.chunk_interval:
+                time.sleep(server.chunk_interval)
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+
+class MockPerplexityServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server imitating the chat completions endpoint.
+
+    Args:
+        address (Tuple[str, int]): Host and port to listen on; port 0 picks a free one
+        latency (float): Seconds before each response starts
+        jitter (float): Maximum random deviation from the latency, in seconds
+        error_rate (float): Fraction of requests answered with a 429 or 500
+        chunks (int): Streamed chunks (and completion tokens) per answer
+        chunk_interval (float): Seconds between streamed chunks
+        capacity (Optional[int]): Requests served at once; more are answered
+            with a 429 at once, like an account's concurrency limit
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int] = ("127.0.0.1", 0),
+                 latency: float = DEFAULT_LATENCY, jitter: float = DEFAULT_JITTER,
+                 error_rate: float = 0.0, chunks: int = DEFAULT_CHUNKS,
+                 chunk_interval: float = DEFAULT_CHUNK_INTERVAL,
+                 capacity: Optional[int] = None) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.chunks = max(1, chunks)
+        self.chunk_interval = chunk_interval
+        self.capacity = capacity
+        self.requests = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        super().__init__(address, _Handler)
+
+    @property
+    def url(self) -> str:
+        """
+        str: The chat completions URL to point clients at.
+        """
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/chat/completions"
+
+    def handle_error(self, request: Any, client_address: Any) -> None:
+        # Clients dropping keep-alive connections are expected, not errors
+        pass
+
+    def record_request(self) -> None:
+        """
+        Count a received request.
+        """
+        with self._lock:
+            self.requests += 1
+
+    def enter(self) -> bool:
+        """
+        Admit a request if the server has capacity for it.
+
+        Returns:
+            bool: Whether the request may be served
+        """
+        with self._lock:
+            if self.capacity is not None and self.in_flight >= self.capacity:
+                self.rejected += 1
+                return False
+            self.in_flight += 1
+            return True
+
+    def leave(self) -> None:
+        """
+        Release the capacity taken by ``enter``.
+        """
+        with self._lock:
+            self.in_flight -= 1
+
+    def settings(self) -> Dict[str, Any]:
+        """
+        Describe the server's behaviour, for benchmark reports.
+
+        Returns:
+            Dict[str, Any]: Latency, jitter, error rate and streaming settings
+        """
+        return {"latency": self.latency, "jitter": self.jitter, "error_rate": self.error_rate,
+                "capacity": self.capacity, "chunks": self.chunks,
+                "chunk_interval": self.chunk_interval}
+
+    def start(self) -> "MockPerplexityServer":
+        """
+        Serve in a background thread.
+
+        Returns:
+            MockPerplexityServer: The server, for chaining
+        """
+        threading.Thread(target=self.serve_forever, kwargs={"poll_interval": 0.05},
+                         daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        """
+        Stop serving and close the socket.
+        """
+        self.shutdown()
+        self.server_close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a mock Perplexity API")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT,
+                        help=f"Port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument("--latency", type=float, default=DEFAULT_LATENCY,
+                        help=f"Seconds before each response (default: {DEFAULT_LATENCY})")
+    parser.add_argument("--jitter", type=float, default=DEFAULT_JITTER,
+                        help=f"Random latency deviation in seconds (default: {DEFAULT_JITTER})")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Fraction of requests answered with 429 or 500 (default: 0)")
+    parser.add_argument("--capacity", type=int,
+                        help="Requests served at once; more get a 429 (default: unlimited)")
+    parser.add_argument("--chunks", type=int, default=DEFAULT_CHUNKS,
+                        help=f"Chunks per streamed answer (default: {DEFAULT_CHUNKS})")
+    parser.add_argument("--chunk-interval", type=float, default=DEFAULT_CHUNK_INTERVAL,
+                        help=f"Seconds between chunks (default: {DEFAULT_CHUNK_INTERVAL})")
+    args = parser.parse_args()
+
+    server = MockPerplexityServer((args.host, args.port), args.latency, args.jitter,
+                                  args.error_rate, args.chunks, args.chunk_interval,
+                                  args.capacity)
+    print(f"Serving mock Perplexity API at {server.url}")
+    print(f"Use it with: PERPLEXITY_BASE_URL={server.url} perplexity-cli -q ...")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Benchmark runner for Perplexity CLI.
+
+This script starts the mock server from ``mock_server.py`` and drives the
+real client code paths against it: ``call_api``, ``stream_api``, the batch
+runner and the CLI itself. For each scenario it reports p50/p95/p99
+latency, time to first token, requests per second and client CPU time and
+peak RSS, and writes the results as JSON so releases can be compared.
+
+Usage:
+    python benchmarks/run.py [--requests 200] [--scenarios call_api,stream,batch,cli]
+        [--latency 0.02] [--error-rate 0.0] [--output results.json]
+        [--compare baseline.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mock_server import MockPerplexityServer  # noqa: E402
+
+import perplexity_cli  # noqa: E402
+from perplexity_cli import config  # noqa: E402
+
+# Constants
+DEFAULT_REQUESTS = 200
+DEFAULT_CLI_REQUESTS = 20
+DEFAULT_CONCURRENCY = 8
+DEFAULT_LATENCY = 0.02
+SCENARIOS = ["call_api", "stream", "batch", "cli"]
+MODEL = "sonar"
+MAX_TOKENS = 100
+QUERY = "What is the distance between the Sun and Earth?"
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """
+    Summarize samples with nearest-rank percentiles.
+
+    Args:
+        samples (List[float]): Durations in seconds
+
+    Returns:
+        Dict[str, float]: p50, p95, p99, mean and max in milliseconds
+    """
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def rank(p: float) -> float:
+        return ordered[min(len(ordered) - 1, max(0, int(round(p * len(ordered))) - 1))]
+
+    return {
+        "p50": round(rank(0.50) * 1000, 2),
+        "p95": round(rank(0.95) * 1000, 2),
+        "p99": round(rank(0.99) * 1000, 2),
+        "mean": round(sum(ordered) / len(ordered) * 1000, 2),
+        "max": round(ordered[-1] * 1000, 2),
+    }
+
+
+def _usage(who: int) -> Dict[str, float]:
+    """
+    Read CPU time and peak RSS for this process or its children.
+
+    Args:
+        who (int): ``resource.RUSAGE_SELF`` or ``resource.RUSAGE_CHILDREN``
+
+    Returns:
+        Dict[str, float]: CPU seconds and peak RSS in kilobytes
+    """
+    if resource is None:
+        return {"cpu": 0.0, "rss_kb": 0.0}
+    usage = resource.getrusage(who)
+    rss = usage.ru_maxrss / 1024 if sys.platform == "darwin" else usage.ru_maxrss
+    return {"cpu": usage.ru_utime + usage.ru_stime, "rss_kb": rss}
+
+
+def measure(run: Callable[[], Dict[str, Any]], children: bool = False) -> Dict[str, Any]:
+    """
+    Run a scenario and add throughput and resource figures to its result.
+
+    Args:
+        run (Callable[[], Dict[str, Any]]): Runs the scenario and returns its
+            ``latencies`` (and optionally ``ttfts`` and ``errors``)
+        children (bool): Whether the work happens in child processes
+
+    Returns:
+        Dict[str, Any]: The scenario report
+    """
+    who = (resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF) if resource else 0
+    before = _usage(who)
+    start = time.perf_counter()
+    result = run()
+    elapsed = time.perf_counter() - start
+    after = _usage(who)
+
+    latencies = result["latencies"]
+    count = len(latencies) + result.get("errors", 0)
+    report = {
+        "requests": count,
+        "errors": result.get("errors", 0),
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_s": round(count / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": percentiles(latencies),
+        "cpu_ms_per_request": round((after["cpu"] - before["cpu"]) / max(1, count) * 1000, 3),
+        "peak_rss_kb": after["rss_kb"],
+    }
+    if result.get("ttfts"):
+        report["ttft_ms"] = percentiles(result["ttfts"])
+    return report
+
+
+def run_call_api(requests: int) -> Dict[str, Any]:
+    """
+    Send sequential requests through ``call_api``.
+
+    Args:
+        requests (int): Number of requests
+
+    Returns:
+        Dict[str, Any]: Latencies and error count
+    """
+    from perplexity_cli.api import call_api
+
+    latencies, errors = [], 0
+    for _ in range(requests):
+        start = time.perf_counter()
+        try:
+            call_api(MODEL, MAX_TOKENS, QUERY)
+        except Exception:
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - start)
+    return {"latencies": latencies, "errors": errors}
+
+
+def run_stream(requests: int) -> Dict[str, Any]:
+    """
+    Send sequential streaming requests through ``stream_api``.
+
+    Args:
+        requests (int): Number of requests
+
+    Returns:
+        Dict[str, Any]: Latencies, times to first token and error count
+    """
+    from perplexity_cli.api import stream_api
+
+    latencies, ttfts, errors = [], [], 0
+    for _ in range(requests):
+        start = time.perf_counter()
+        first = None
+        try:
+            for chunk in stream_api(MODEL, MAX_TOKENS, QUERY):
+                if first is None and chunk.get("choices"):
+                    first = time.perf_counter() - start
+        except Exception:
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - start)
+        ttfts.append(first if first is not None else latencies[-1])
+    return {"latencies": latencies, "ttfts": ttfts, "errors": errors}
+
+
+def run_batch_scenario(requests: int, concurrency: int) -> Dict[str, Any]:
+    """
+    Run a batch of requests through the batch runner.
+
+    Args:
+        requests (int): Number of requests
+        concurrency (int): Requests in flight
+
+    Returns:
+        Dict[str, Any]: Per-item latencies and error count
+    """
+    from perplexity_cli.batch import read_batch, run_batch
+    from perplexity_cli.client import PerplexityClient
+
+    items = read_batch([QUERY] * requests, MODEL, MAX_TOKENS)
+    latencies, errors = [], 0
+    with PerplexityClient(pool_maxsize=concurrency) as client:
+        for result in run_batch(client, items, concurrency):
+            if "error" in result:
+                errors += 1
+            else:
+                latencies.append(result["elapsed"])
+    return {"latencies": latencies, "errors": errors}
+
+
+def run_cli(requests: int, env: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Run the CLI once per request, as a user would.
+
+    Args:
+        requests (int): Number of invocations
+        env (Dict[str, str]): Environment pointing the CLI at the mock server
+
+    Returns:
+        Dict[str, Any]: Wall-clock latencies and error count
+    """
+    latencies, errors = [], 0
+    command = [sys.executable, "-m", "perplexity_cli", "--no-daemon", "-m", MODEL,
+               "-t", str(MAX_TOKENS), "-q", QUERY]
+    for _ in range(requests):
+        start = time.perf_counter()
+        result = subprocess.run(command, env=env, stdout=subprocess.DEVNULL,
+                                stderr=subprocess.DEVNULL, check=False)
+        if result.returncode:
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - start)
+    return {"latencies": latencies, "errors": errors}
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """
+    Describe how a report differs from a baseline report.
+
+    Args:
+        report (Dict[str, Any]): The new results
+        baseline (Dict[str, Any]): Results of an earlier run
+
+    Returns:
+        List[str]: One line per scenario present in both
+    """
+    lines = []
+    for name, result in report["scenarios"].items():
+        old = baseline.get("scenarios", {}).get(name)
+        if not old:
+            continue
+        changes = []
+        for label, new_value, old_value in (
+                ("p50", result["latency_ms"].get("p50"), old["latency_ms"].get("p50")),
+                ("p95", result["latency_ms"].get("p95"), old["latency_ms"].get("p95")),
+                ("req/s", result["requests_per_s"], old["requests_per_s"])):
+            if new_value and old_value:
+                changes.append(f"{label} {(new_value - old_value) / old_value * 100:+.1f}%")
+        lines.append(f"{name}: {', '.join(changes)}")
+    return lines
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark Perplexity CLI against a mock server")
+    parser.add_argument("--requests", type=int, default=DEFAULT_REQUESTS,
+                        help=f"Requests per in-process scenario (default: {DEFAULT_REQUESTS})")
+    parser.add_argument("--cli-requests", type=int, default=DEFAULT_CLI_REQUESTS,
+                        help=f"CLI invocations for the cli scenario (default: {DEFAULT_CLI_REQUESTS})")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"Requests in flight for the batch scenario (default: {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"Comma-separated scenarios to run (default: {','.join(SCENARIOS)})")
+    parser.add_argument("--latency", type=float, default=DEFAULT_LATENCY,
+                        help=f"Mock server latency in seconds (default: {DEFAULT_LATENCY})")
+    parser.add_argument("--jitter", type=float, default=0.0,
+                        help="Mock server latency jitter in seconds (default: 0)")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Fraction of requests the mock server fails (default: 0)")
+    parser.add_argument("--chunks", type=int, default=20,
+                        help="Chunks per streamed answer (default: 20)")
+    parser.add_argument("--chunk-interval", type=float, default=0.001,
+                        help="Seconds between streamed chunks (default: 0.001)")
+    parser.add_argument("--output", metavar="FILE", help="Write the JSON report to FILE")
+    parser.add_argument("--compare", metavar="FILE", help="Compare with an earlier JSON report")
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    server = MockPerplexityServer(latency=args.latency, jitter=args.jitter,
+                                  error_rate=args.error_rate, chunks=args.chunks,
+                                  chunk_interval=args.chunk_interval).start()
+    state_dir = tempfile.TemporaryDirectory()
+    os.environ.setdefault("PERPLEXITY_API_KEY", "benchmark")
+    os.environ["PERPLEXITY_BASE_URL"] = server.url
+    # Keep the benchmark's fake usage out of the real cache and calibration
+    config.DATA_DIR = os.path.join(state_dir.name, ".perplexity_cli")
+    cli_env = dict(os.environ, HOME=state_dir.name,
+                   PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+
+    runners = {
+        "call_api": lambda: measure(lambda: run_call_api(args.requests)),
+        "stream": lambda: measure(lambda: run_stream(args.requests)),
+        "batch": lambda: measure(lambda: run_batch_scenario(args.requests, args.concurrency)),
+        "cli": lambda: measure(lambda: run_cli(args.cli_requests, cli_env), children=True),
+    }
+    report: Dict[str, Any] = {
+        "version": perplexity_cli.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "server": server.settings(),
+        "scenarios": {},
+    }
+    try:
+        for name in scenarios:
+            report["scenarios"][name] = runners[name]()
+            result = report["scenarios"][name]
+            print(f"{name}: {result['requests_per_s']} req/s, latency {result['latency_ms']}, "
+                  f"{result['errors']} errors", file=sys.stderr)
+    finally:
+        server.stop()
+        state_dir.cleanup()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline: Optional[Dict[str, Any]] = json.load(f)
+        for line in compare(report, baseline or {}):
+            print(line, file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
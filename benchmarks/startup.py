@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for Perplexity CLI.
+
+This script measures the cold-start cost of the CLI: the cumulative import
+time of ``perplexity_cli.cli`` as reported by ``python -X importtime``, and
+the wall-clock time of commands that never touch the network. With
+``--check`` it exits non-zero if a budget is exceeded or a heavy module is
+imported at startup, so it can guard against regressions in CI.
+
+Usage:
+    python benchmarks/startup.py [--runs N] [--check] [--json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, Any, List
+
+# Constants
+DEFAULT_RUNS = 5
+DEFAULT_IMPORT_BUDGET_MS = 100.0
+DEFAULT_COMMAND_BUDGET_MS = 400.0
+IMPORT_MODULE = "perplexity_cli.cli"
+COMMANDS = {
+    "--version": ["--version"],
+    "-l": ["-l"],
+}
+FORBIDDEN_MODULES = [
+    "requests",
+    "urllib3",
+    "sqlite3",
+    "socket",
+    "asyncio",
+    "aiohttp",
+    "perplexity_cli.api",
+    "perplexity_cli.client",
+    "perplexity_cli.cache",
+    "perplexity_cli.daemon",
+]
+
+
+def import_time_ms() -> float:
+    """
+    Measure the cumulative import time of the CLI module in a fresh interpreter.
+
+    Returns:
+        float: Cumulative import time in milliseconds
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {IMPORT_MODULE}"],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, check=True
+    )
+    for line in result.stderr.splitlines():
+        parts = [part.strip() for part in line.split("|")]
+        if len(parts) == 3 and parts[2] == IMPORT_MODULE:
+            return int(parts[1]) / 1000.0
+    raise RuntimeError(f"{IMPORT_MODULE} not found in -X importtime output")
+
+
+def command_time_ms(args: List[str]) -> float:
+    """
+    Measure the wall-clock time of one CLI invocation.
+
+    Args:
+        args (List[str]): Command line arguments for the CLI
+
+    Returns:
+        float: Elapsed time in milliseconds
+    """
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-m", "perplexity_cli"] + args,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+    return (time.perf_counter() - start) * 1000.0
+
+
+def loaded_forbidden_modules() -> List[str]:
+    """
+    List the heavy modules that importing the CLI pulls in.
+
+    Returns:
+        List[str]: Forbidden modules present in ``sys.modules`` after the import
+    """
+    code = (
+        f"import sys, json, {IMPORT_MODULE}\n"
+        f"print(json.dumps([m for m in {FORBIDDEN_MODULES!r} if m in sys.modules]))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], stdout=subprocess.PIPE,
+                            universal_newlines=True, check=True)
+    return json.loads(result.stdout)
+
+
+def run(runs: int) -> Dict[str, Any]:
+    """
+    Run the benchmark.
+
+    Args:
+        runs (int): Number of samples per measurement; the median is reported
+
+    Returns:
+        Dict[str, Any]: Median timings in milliseconds and the forbidden modules loaded
+    """
+    report: Dict[str, Any] = {
+        "import_ms": round(statistics.median(import_time_ms() for _ in range(runs)), 1),
+        "commands_ms": {},
+        "forbidden_modules": loaded_forbidden_modules(),
+    }
+    for name, args in COMMANDS.items():
+        samples = [command_time_ms(args) for _ in range(runs)]
+        report["commands_ms"][name] = round(statistics.median(samples), 1)
+    return report
+
+
+def check(report: Dict[str, Any], import_budget: float, command_budget: float) -> List[str]:
+    """
+    Compare a report against the budgets.
+
+    Args:
+        report (Dict[str, Any]): Output of ``run``
+        import_budget (float): Maximum import time in milliseconds
+        command_budget (float): Maximum time per command in milliseconds
+
+    Returns:
+        List[str]: One message per violated budget
+    """
+    problems = []
+    if report["forbidden_modules"]:
+        problems.append(f"heavy modules imported at startup: {', '.join(report['forbidden_modules'])}")
+    if report["import_ms"] > import_budget:
+        problems.append(f"import {IMPORT_MODULE} took {report['import_ms']}ms "
+                        f"(budget {import_budget}ms)")
+    for name, elapsed in report["commands_ms"].items():
+        if elapsed > command_budget:
+            problems.append(f"perplexity-cli {name} took {elapsed}ms (budget {command_budget}ms)")
+    return problems
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure Perplexity CLI startup time")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS,
+                        help=f"Samples per measurement (default: {DEFAULT_RUNS})")
+    parser.add_argument("--import-budget", type=float, default=DEFAULT_IMPORT_BUDGET_MS,
+                        help=f"Import time budget in ms (default: {DEFAULT_IMPORT_BUDGET_MS})")
+    parser.add_argument("--command-budget", type=float, default=DEFAULT_COMMAND_BUDGET_MS,
+                        help=f"Per-command budget in ms (default: {DEFAULT_COMMAND_BUDGET_MS})")
+    parser.add_argument("--check", action="store_true",
+                        help="Exit with status 1 if a budget is exceeded")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    # Run against the source tree, not an installed copy
+    os.environ["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                      os.environ.get("PYTHONPATH")])
+    )
+
+    report = run(max(1, args.runs))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"import {IMPORT_MODULE}: {report['import_ms']}ms")
+        for name, elapsed in report["commands_ms"].items():
+            print(f"perplexity-cli {name}: {elapsed}ms")
+        print(f"heavy modules at startup: {', '.join(report['forbidden_modules']) or 'none'}")
+
+    if args.check:
+        problems = check(report, args.import_budget, args.command_budget)
+        for problem in problems:
+            print(f"FAIL: {problem}", file=sys.stderr)
+        return 1 if problems else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
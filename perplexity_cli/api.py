@@ -1,24 +1,102 @@
 """
 API module for Perplexity CLI.
 
-This module handles API calls to the Perplexity AI API.
+This module handles API calls to the Perplexity AI API and printing of the
+responses. The calls are thin wrappers around ``PerplexityClient``.
 """
 
+import io
 import json
 import logging
-import requests
-from typing import Dict, Any
+import sys
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Hashable, Iterable, Iterator, List, Optional, TextIO, Tuple
 
 from perplexity_cli.config import get_api_key
+from perplexity_cli.client import BASE_URL, PerplexityClient, iter_sse_events
+from perplexity_cli.output import (
+    OUTPUT_TEXT, OUTPUT_JSON, OUTPUT_JSONL, OUTPUT_CONTENT, write_json, write_chunks
+)
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
 # Constants
-BASE_URL = "https://api.perplexity.ai/chat/completions"
+MAX_SHARED_CLIENTS = 8
 
+# Shared clients, one per API key and option set, so repeated calls reuse
+# pooled connections; the least recently used are closed beyond MAX_SHARED_CLIENTS
+_clients: "OrderedDict[Tuple[str, Tuple[Tuple[str, Hashable], ...]], PerplexityClient]" = \
+    OrderedDict()
+_clients_lock = threading.Lock()
 
-def call_api(model: str, max_tokens: int, query: str) -> Dict[str, Any]:
+
+def _option_key(value: Any) -> Hashable:
+    """
+    Get the part of a shared client's key that stands for one option.
+    
+    Plain values are compared by value. Objects such as a cache or rate
+    limiter are compared by identity: the cached client holds on to them,
+    so their identity cannot be reused while it is cached.
+    
+    Args:
+        value (Any): The option value
+        
+    Returns:
+        Hashable: The value itself, or its type and identity
+    """
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return (type(value).__name__, id(value))
+
+
+def get_client(api_key: str, **options: Any) -> PerplexityClient:
+    """
+    Return the shared client for an API key, creating it on first use.
+    
+    Callers that build new option objects for every call get a new client
+    each time, so at most ``MAX_SHARED_CLIENTS`` are kept and the least
+    recently used one is closed when another is created.
+    
+    Args:
+        api_key (str): The API key the client authenticates with
+        **options (Any): Extra ``PerplexityClient`` arguments, such as ``cache``
+        
+    Returns:
+        PerplexityClient: The pooled client for this key and options
+    """
+    key = (api_key, tuple(sorted((name, _option_key(value)) for name, value in options.items())))
+    evicted = []
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is not None:
+            _clients.move_to_end(key)
+            return client
+        client = _clients[key] = PerplexityClient(api_key=api_key, **options)
+        while len(_clients) > MAX_SHARED_CLIENTS:
+            evicted.append(_clients.popitem(last=False)[1])
+    for old in evicted:
+        old.close()
+    return client
+
+
+def _api_key(options: Dict[str, Any]) -> str:
+    """
+    Get the API key a shared client is looked up by.
+    
+    Args:
+        options (Dict[str, Any]): Extra ``PerplexityClient`` arguments
+        
+    Returns:
+        str: The first key of the key pool if one is given, else ``get_api_key()``
+    """
+    key_pool = options.get("key_pool")
+    return key_pool.keys[0] if key_pool is not None else get_api_key()
+
+
+def call_api(model: str, max_tokens: int, query: str,
+             messages: Optional[List[Dict[str, str]]] = None, **options: Any) -> Dict[str, Any]:
     """
     Submit an API call to the Perplexity.ai API endpoint.
     
@@ -26,6 +104,10 @@ def call_api(model: str, max_tokens: int, query: str) -> Dict[str, Any]:
         model (str): The model to use for the query
         max_tokens (int): Maximum number of tokens for the response
         query (str): The query to send to the API
+        messages (Optional[List[Dict[str, str]]]): Full message list, e.g. a
+            conversation history ending with the query; replaces the default
+            system prompt and query
+        **options (Any): Extra ``PerplexityClient`` arguments, such as ``cache``
         
     Returns:
         Dict[str, Any]: The API response as a dictionary
@@ -33,77 +115,165 @@ def call_api(model: str, max_tokens: int, query: str) -> Dict[str, Any]:
     Raises:
         Exception: If the API call fails
     """
-    api_key = get_api_key()
-    
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Accept": "application/json",
-        "Content-Type": "application/json"
-    }
-    
-    data = {
-        "model": model,
-        "messages": [
-            {"role": "system", "content": "You are an AI assistant."},
-            {"role": "user", "content": query}
-        ],
-        "max_tokens": max_tokens
-    }
-
-    try:
-        logger.debug("Sending request to Perplexity AI API")
-        response = requests.post(BASE_URL, headers=headers, json=data, timeout=30)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        if hasattr(e, 'response') and e.response:
-            status_code = e.response.status_code
-            error_text = e.response.text
-            try:
-                error_json = e.response.json()
-                error_message = error_json.get('error', {}).get('message', error_text)
-            except:
-                error_message = error_text
-                
-            raise Exception(f"API call failed with status code {status_code}: {error_message}")
-        else:
-            raise Exception(f"API call failed: {str(e)}")
-
-
-def parse_response(response: Dict[str, Any], verbose: bool = False) -> None:
+    return get_client(_api_key(options), **options).complete(model, max_tokens, query, messages)
+
+
+def call_api_raw(model: str, max_tokens: int, query: str,
+                 messages: Optional[List[Dict[str, str]]] = None, **options: Any) -> bytes:
+    """
+    Submit an API call and return the response body as the API sent it.
+    
+    Args:
+        model (str): The model to use for the query
+        max_tokens (int): Maximum number of tokens for the response
+        query (str): The query to send to the API
+        messages (Optional[List[Dict[str, str]]]): Full message list to send instead
+        **options (Any): Extra ``PerplexityClient`` arguments, such as ``cache``
+        
+    Returns:
+        bytes: The JSON response body
+        
+    Raises:
+        Exception: If the API call fails
+    """
+    return get_client(_api_key(options), **options).complete_raw(model, max_tokens, query, messages)
+
+
+def stream_api(model: str, max_tokens: int, query: str,
+               messages: Optional[List[Dict[str, str]]] = None,
+               **options: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Submit a streaming API call and yield response chunks as they arrive.
+    
+    Args:
+        model (str): The model to use for the query
+        max_tokens (int): Maximum number of tokens for the response
+        query (str): The query to send to the API
+        messages (Optional[List[Dict[str, str]]]): Full message list to send instead
+        **options (Any): Extra ``PerplexityClient`` arguments
+        
+    Yields:
+        Dict[str, Any]: Each ``chat.completion.chunk`` sent by the API
+        
+    Raises:
+        Exception: If the API call fails
+    """
+    return get_client(_api_key(options), **options).stream(model, max_tokens, query, messages)
+
+
+def parse_response(response: Dict[str, Any], verbose: bool = False,
+                   out: Optional[TextIO] = None) -> None:
     """
     Parse the API response into variables and print them.
     
+    The output is assembled in memory and written with a single write.
+    
     Args:
         response (Dict[str, Any]): The API response dictionary
         verbose (bool): Whether to print additional details
+        out (Optional[TextIO]): Where to write; defaults to stdout
     """
     # Extract key parts of the response
     model_used = response.get("model", "N/A")
     choices = response.get("choices", [])
     usage = response.get("usage", {})
+    buffer = io.StringIO()
 
     # Print results with headers
-    print("\n--- Model Used ---")
-    print(model_used)
+    print("\n--- Model Used ---", file=buffer)
+    print(model_used, file=buffer)
 
-    print("\n--- Choices ---")
+    print("\n--- Choices ---", file=buffer)
     for choice in choices:
         message = choice.get('message', {})
         content = message.get('content', 'N/A')
-        print(f"{content}")
+        print(f"{content}", file=buffer)
         
         # Print additional message details if verbose
         if verbose and 'tool_calls' in message:
-            print("\n--- Tool Calls ---")
+            print("\n--- Tool Calls ---", file=buffer)
             for tool_call in message['tool_calls']:
-                print(f"Tool: {tool_call.get('function', {}).get('name', 'N/A')}")
-                print(f"Arguments: {tool_call.get('function', {}).get('arguments', 'N/A')}")
+                print(f"Tool: {tool_call.get('function', {}).get('name', 'N/A')}", file=buffer)
+                print(f"Arguments: {tool_call.get('function', {}).get('arguments', 'N/A')}",
+                      file=buffer)
 
-    print("\n--- Usage ---")
+    print("\n--- Usage ---", file=buffer)
     for key, value in usage.items():
-        print(f"{key}: {value}")
+        print(f"{key}: {value}", file=buffer)
     
     if verbose:
-        print("\n--- Full Response ---")
-        print(json.dumps(response, indent=2))
+        print("\n--- Full Response ---", file=buffer)
+        print(json.dumps(response, indent=2), file=buffer)
+    
+    out = out or sys.stdout
+    out.write(buffer.getvalue())
+    out.flush()
+
+
+def print_stream(chunks: Iterable[Dict[str, Any]], verbose: bool = False,
+                 output: str = OUTPUT_TEXT) -> Dict[str, Any]:
+    """
+    Print streamed content as it arrives, then print the usage totals.
+    
+    With ``output="content-only"`` only the content is printed; ``"jsonl"``
+    writes each chunk as a JSON line as it arrives, and ``"json"`` writes the
+    assembled response once the stream ends.
+    
+    Args:
+        chunks (Iterable[Dict[str, Any]]): Chunks yielded by ``stream_api``
+        verbose (bool): Whether to print additional details
+        output (str): The output format
+        
+    Returns:
+        Dict[str, Any]: The last chunk received, with the full content assembled
+    """
+    last: Dict[str, Any] = {}
+    content: List[str] = []
+    usage: Dict[str, Any] = {}
+    text = output == OUTPUT_TEXT
+    echo = output in (OUTPUT_TEXT, OUTPUT_CONTENT)
+    
+    def collect(chunk: Dict[str, Any]) -> Dict[str, Any]:
+        nonlocal last, usage
+        last = chunk
+        if chunk.get("usage"):
+            usage = chunk["usage"]
+        for choice in chunk.get("choices", []):
+            delta = choice.get("delta", {}).get("content")
+            if delta:
+                content.append(delta)
+                if echo:
+                    sys.stdout.write(delta)
+                    sys.stdout.flush()
+        return chunk
+
+    if output == OUTPUT_JSONL:
+        write_chunks(collect(chunk) for chunk in chunks)
+    else:
+        for chunk in chunks:
+            if text and not last:
+                sys.stdout.write(f"\n--- Model Used ---\n{chunk.get('model', 'N/A')}\n"
+                                 "\n--- Choices ---\n")
+            collect(chunk)
+
+    response = dict(last)
+    response["choices"] = [{"message": {"role": "assistant", "content": "".join(content)}}]
+    response["usage"] = usage
+    
+    if output == OUTPUT_JSON:
+        write_json(response)
+    elif output == OUTPUT_CONTENT:
+        sys.stdout.write("\n")
+        sys.stdout.flush()
+    elif text:
+        buffer = io.StringIO()
+        print(file=buffer)
+        print("\n--- Usage ---", file=buffer)
+        for key, value in usage.items():
+            print(f"{key}: {value}", file=buffer)
+        if verbose:
+            print("\n--- Full Response ---", file=buffer)
+            print(json.dumps(response, indent=2), file=buffer)
+        sys.stdout.write(buffer.getvalue())
+        sys.stdout.flush()
+    return response
@@ -0,0 +1,603 @@
+"""
+Async client module for Perplexity CLI.
+
+This module provides an asyncio-native client for the Perplexity AI API. It
+requires the optional ``aiohttp`` dependency:
+
+    pip install "perplexity-cli[async]"
+"""
+
+import asyncio
+import json
+import logging
+import time
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, Callable, Dict, Any, AsyncIterator, List, Optional, Tuple
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover - exercised only without the extra
+    aiohttp = None
+
+from perplexity_cli.client import (
+    SSEDecoder, get_base_url, build_headers, build_messages, build_payload, error_from_status,
+    record_route_outcome
+)
+from perplexity_cli.concurrency import AdaptiveLimit
+from perplexity_cli.config import get_api_key
+from perplexity_cli.exceptions import PerplexityError, APIConnectionError, APITimeoutError
+from perplexity_cli.hedging import HedgePolicy
+from perplexity_cli.keypool import KeyPool
+from perplexity_cli.metrics import RequestMetrics
+from perplexity_cli.ratelimit import RateLimiter
+from perplexity_cli.retry import RetryPolicy, Timeouts
+from perplexity_cli.router import ModelRouter, get_router
+from perplexity_cli.singleflight import AsyncSingleFlight, request_key
+from perplexity_cli.tokens import TokenCalibrator, get_calibrator
+
+if TYPE_CHECKING:
+    from perplexity_cli.cache import ResponseCache
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_MAX_CONCURRENCY = 100
+DEFAULT_LIMIT_PER_HOST = 100
+
+
+class AsyncPerplexityClient:
+    """
+    Asyncio client for the Perplexity AI chat completions API.
+
+    All requests share one ``aiohttp`` connection pool, and a semaphore bounds
+    how many are in flight, so a single event loop can drive hundreds of
+    concurrent queries without a thread per request. Request bodies and error
+    messages are built exactly as in ``PerplexityClient``, and failed requests
+    are retried with the same ``RetryPolicy``.
+
+    Args:
+        api_key (Optional[str]): API key; looked up with ``get_api_key`` if omitted
+        base_url (Optional[str]): Chat completions endpoint; defaults to ``get_base_url()``
+        retry_policy (Optional[RetryPolicy]): Timeouts and retry behaviour
+        max_concurrency (int): Maximum number of requests in flight
+        limit_per_host (int): Maximum open connections to the API host
+        rate_limiter (Optional[RateLimiter]): Limiter every request attempt waits on
+        calibrator (Optional[TokenCalibrator]): Token estimator used to size
+            requests; defaults to the shared ``get_calibrator()``
+        on_metrics (Optional[Callable[[RequestMetrics], None]]): Called with the
+            measurements of every finished call; measuring is skipped without it.
+            aiohttp does not separate the TLS handshake, so it is part of ``connect_ms``.
+        coalesce (bool): Let identical concurrent requests share one API call
+        router (Optional[ModelRouter]): Router that learns each model's latency
+            and error rate from the completions sent; defaults to the shared ``get_router()``
+        hedge (Optional[HedgePolicy]): Send a duplicate of completions whose
+            answer is slow, use whichever arrives first and cancel the other.
+            Streams are not hedged.
+        key_pool (Optional[KeyPool]): Spread requests over several API keys
+            instead of sending them all with ``api_key``
+        concurrency_limit (Optional[AdaptiveLimit]): Adaptive limit every
+            completion attempt waits on, within ``max_concurrency``
+        cache (Optional[ResponseCache]): Response cache consulted by ``complete``;
+            it is read and written on a worker thread, off the event loop
+        refresh_cache (bool): Skip cache lookups but still store new responses
+    """
+
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 limit_per_host: int = DEFAULT_LIMIT_PER_HOST,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 calibrator: Optional[TokenCalibrator] = None,
+                 on_metrics: Optional[Callable[[RequestMetrics], None]] = None,
+                 coalesce: bool = True, router: Optional[ModelRouter] = None,
+                 hedge: Optional[HedgePolicy] = None,
+                 key_pool: Optional[KeyPool] = None,
+                 concurrency_limit: Optional[AdaptiveLimit] = None,
+                 cache: Optional["ResponseCache"] = None, refresh_cache: bool = False) -> None:
+        if aiohttp is None:
+            raise ImportError(
+                "AsyncPerplexityClient requires aiohttp. "
+                "Install it with: pip install \"perplexity-cli[async]\""
+            )
+        self.api_key = api_key or (key_pool.keys[0] if key_pool is not None else get_api_key())
+        self.base_url = base_url or get_base_url()
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.max_concurrency = max_concurrency
+        self.limit_per_host = limit_per_host
+        self.rate_limiter = rate_limiter
+        self.calibrator = calibrator if calibrator is not None else get_calibrator()
+        self.on_metrics = on_metrics
+        self.singleflight = AsyncSingleFlight() if coalesce else None
+        self.router = router if router is not None else get_router()
+        self.hedge = hedge
+        self.key_pool = key_pool
+        self.concurrency_limit = concurrency_limit
+        self.cache = cache
+        self.refresh_cache = refresh_cache
+        self.headers = build_headers(self.api_key)
+
+        # Created on first use so they bind to the running event loop
+        self._session: Optional["aiohttp.ClientSession"] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self) -> "AsyncPerplexityClient":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """
+        Close the shared session and its pooled connections, and save the
+        router's measurements, the token calibration and the hedging state.
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        await _in_thread(self.router.flush)
+        await _in_thread(self.calibrator.flush)
+        if self.hedge is not None:
+            await _in_thread(self.hedge.flush)
+
+    def _get_session(self) -> "aiohttp.ClientSession":
+        """
+        Return the shared session, creating it on first use.
+
+        Returns:
+            aiohttp.ClientSession: The pooled session
+        """
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency,
+                                             limit_per_host=self.limit_per_host)
+            trace_configs = [_trace_config()] if self.on_metrics is not None else None
+            self._session = aiohttp.ClientSession(connector=connector, headers=self.headers,
+                                                  trace_configs=trace_configs)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._session
+
+    async def _raise_for_status(self, response: "aiohttp.ClientResponse") -> None:
+        """
+        Raise the client error for a non-successful response.
+
+        Args:
+            response (aiohttp.ClientResponse): The response to check
+
+        Raises:
+            APIError: If the response status is 400 or above
+        """
+        if response.status < 400:
+            return
+        error_text = await response.text()
+        try:
+            error_json = json.loads(error_text)
+        except ValueError:
+            error_json = None
+        raise error_from_status(response.status, error_text, error_json,
+                                response.headers.get("Retry-After"))
+
+    def _report(self, metrics: Optional[RequestMetrics], error: Optional[BaseException]) -> None:
+        """
+        Finish the measurements of a call and hand them to ``on_metrics``.
+
+        Args:
+            metrics (Optional[RequestMetrics]): The measurements, if any are kept
+            error (Optional[BaseException]): The error the call failed with, if any
+        """
+        if metrics is None:
+            return
+        metrics.finish(error)
+        if self.concurrency_limit is not None:
+            metrics.concurrency_limit = self.concurrency_limit.limit
+        try:
+            self.on_metrics(metrics)
+        except Exception as e:
+            logger.debug("Metrics callback failed: %s", e)
+
+    async def complete(self, model: str, max_tokens: int, query: Optional[str] = None,
+                       messages: Optional[List[Dict[str, str]]] = None) -> Dict[str, Any]:
+        """
+        Send a chat completion request and return the decoded response.
+
+        If the client has a cache, a fresh cached response for the same
+        request, or for a near-duplicate one if the cache has a fuzzy tier,
+        is returned without contacting the API.
+
+        Args:
+            model (str): The model to use for the query
+            max_tokens (int): Maximum number of tokens for the response
+            query (Optional[str]): A single-turn query; ignored if messages is given
+            messages (Optional[List[Dict[str, str]]]): Full message list to send
+
+        Returns:
+            Dict[str, Any]: The API response as a dictionary
+
+        Raises:
+            PromptTooLargeError: If the prompt does not fit in the context window
+            PerplexityError: If the API call fails
+        """
+        messages = messages or build_messages(query)
+        if self.singleflight is None:
+            return await self._complete(model, max_tokens, messages)
+        key = request_key("json", model, max_tokens, messages)
+        return await self.singleflight.do(key, lambda: self._complete(model, max_tokens, messages))
+
+    async def _complete(self, model: str, max_tokens: int,
+                        messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        """
+        Send a chat completion request, consulting the cache first.
+
+        Args:
+            model (str): The model to use for the query
+            max_tokens (int): Maximum number of tokens for the response
+            messages (List[Dict[str, str]]): The chat messages to send
+
+        Returns:
+            Dict[str, Any]: The API response as a dictionary
+        """
+        # The first request loads the calibration from disk
+        size = await _in_thread(self.calibrator.size_request, model, messages, max_tokens)
+        max_tokens = size.max_tokens
+        metrics = RequestMetrics(model) if self.on_metrics is not None else None
+        key = None
+        if self.cache is not None:
+            from perplexity_cli.cache import cache_key
+
+            key = cache_key(model, max_tokens, messages)
+            if not self.refresh_cache:
+                cached = await _in_thread(self._cached, key, model, max_tokens, messages)
+                if cached is not None:
+                    if metrics is not None:
+                        metrics.cached = True
+                    self._report(metrics, None)
+                    return cached
+
+        session = self._get_session()
+        data = build_payload(model, max_tokens, messages)
+        estimated = size.total
+
+        async def send(timeout: Timeouts, hedged: bool,
+                       api_key: Optional[str]) -> Dict[str, Any]:
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire_async(estimated)
+            # Only the primary request is measured
+            measured = None if hedged else metrics
+            if measured is not None:
+                measured.start_attempt()
+            try:
+                logger.debug("Sending %srequest to Perplexity AI API", "hedged " if hedged else "")
+                async with session.post(self.base_url, json=data, headers=_key_headers(api_key),
+                                        timeout=_client_timeout(timeout),
+                                        trace_request_ctx=measured) as response:
+                    if measured is not None:
+                        measured.status = response.status
+                    await self._raise_for_status(response)
+                    result = await response.json(content_type=None)
+                    if measured is not None:
+                        measured.bytes_received += len(await response.read())
+                    if api_key is not None:
+                        await _in_thread(self.key_pool.record_usage, api_key, estimated,
+                                         result.get("usage", {}).get("total_tokens"))
+                    return result
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                timeout.check()
+                raise _api_error(e) from e
+
+        async def attempt(timeout: Timeouts) -> Dict[str, Any]:
+            async def keyed(hedged: bool) -> Dict[str, Any]:
+                if self.key_pool is None:
+                    return await send(timeout, hedged, None)
+                return await self.key_pool.call_async(
+                    lambda api_key: send(timeout, hedged, api_key), estimated)
+
+            async def run() -> Dict[str, Any]:
+                if self.hedge is None:
+                    return await keyed(False)
+                return await self.hedge.run_async(model, keyed)
+
+            if self.concurrency_limit is None:
+                return await run()
+            return await self.concurrency_limit.call_async(run)
+
+        error: Optional[BaseException] = None
+        try:
+            async with self._semaphore:
+                started = time.perf_counter()
+                try:
+                    result = await self.retry_policy.call_async(attempt)
+                except PerplexityError as e:
+                    await _in_thread(record_route_outcome, self.router, model, started, e)
+                    raise
+                await _in_thread(record_route_outcome, self.router, model, started)
+            usage = result.get("usage", {})
+            if metrics is not None:
+                metrics.set_usage(usage)
+            await _in_thread(self.calibrator.record, model, size.raw_prompt_tokens,
+                             usage.get("prompt_tokens"))
+            if self.rate_limiter is not None:
+                await _in_thread(self.rate_limiter.record_usage, estimated,
+                                 usage.get("total_tokens"))
+            if key is not None:
+                await _in_thread(self._store, key, result, model, max_tokens, messages)
+            return result
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._report(metrics, error)
+
+    def _cached(self, key: str, model: str, max_tokens: int,
+                messages: List[Dict[str, str]]) -> Optional[Dict[str, Any]]:
+        """
+        Look up a response in the cache, exactly and then by similarity.
+
+        Args:
+            key (str): The cache key of the request
+            model (str): The model to use for the query
+            max_tokens (int): Maximum number of tokens for the response
+            messages (List[Dict[str, str]]): The chat messages to send
+
+        Returns:
+            Optional[Dict[str, Any]]: The cached response, or None on a miss
+        """
+        cached = self.cache.get(key)
+        if cached is None:
+            similar = self.cache.get_similar(model, max_tokens, messages)
+            if similar is not None:
+                cached = json.loads(similar)
+        return cached
+
+    def _store(self, key: str, result: Dict[str, Any], model: str, max_tokens: int,
+               messages: List[Dict[str, str]]) -> None:
+        """
+        Store a response in the cache and index it for similar queries.
+
+        Args:
+            key (str): The cache key of the request
+            result (Dict[str, Any]): The API response
+            model (str): The model to use for the query
+            max_tokens (int): Maximum number of tokens for the response
+            messages (List[Dict[str, str]]): The chat messages to send
+        """
+        self.cache.set(key, result)
+        self.cache.index_similar(key, model, max_tokens, messages)
+
+    def stream(self, model: str, max_tokens: int, query: Optional[str] = None,
+               messages: Optional[List[Dict[str, str]]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Send a streaming chat completion request and yield chunks as they arrive.
+
+        Identical streams in flight at the same time share one API call; a
+        consumer that joins late first gets the chunks it missed.
+
+        Args:
+            model (str): The model to use for the query
+            max_tokens (int): Maximum number of tokens for the response
+            query (Optional[str]): A single-turn query; ignored if messages is given
+            messages (Optional[List[Dict[str, str]]]): Full message list to send
+
+        Returns:
+            AsyncIterator[Dict[str, Any]]: Each ``chat.completion.chunk`` sent by the API
+
+        Raises:
+            PromptTooLargeError: If the prompt does not fit in the context window
+            PerplexityError: If the API call fails
+        """
+        messages = messages or build_messages(query)
+        if self.singleflight is None:
+            return self._stream(model, max_tokens, messages)
+        key = request_key("stream", model, max_tokens, messages)
+        return self.singleflight.stream(key, lambda: self._stream(model, max_tokens, messages))
+
+    async def _stream(self, model: str, max_tokens: int,
+                      messages: List[Dict[str, str]]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Send a streaming chat completion request and yield chunks as they arrive.
+
+        Args:
+            model (str): The model to use for the query
+            max_tokens (int): Maximum number of tokens for the response
+            messages (List[Dict[str, str]]): The chat messages to send
+
+        Yields:
+            Dict[str, Any]: Each ``chat.completion.chunk`` sent by the API
+        """
+        session = self._get_session()
+        size = await _in_thread(self.calibrator.size_request, model, messages, max_tokens)
+        data = build_payload(model, size.max_tokens, messages, stream=True)
+        estimated = size.total
+        metrics = RequestMetrics(model, stream=True) if self.on_metrics is not None else None
+
+        async def send(timeout: Timeouts, api_key: Optional[str]
+                       ) -> Tuple["aiohttp.ClientResponse", Optional[str], Timeouts]:
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire_async(estimated)
+            if metrics is not None:
+                metrics.start_attempt()
+            try:
+                logger.debug("Sending streaming request to Perplexity AI API")
+                response = await session.post(self.base_url, json=data,
+                                              headers=dict(_key_headers(api_key) or {},
+                                                           Accept="text/event-stream"),
+                                              timeout=_client_timeout(timeout),
+                                              trace_request_ctx=metrics)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                timeout.check()
+                raise _api_error(e) from e
+            if metrics is not None:
+                metrics.status = response.status
+            try:
+                await self._raise_for_status(response)
+            except PerplexityError:
+                response.release()
+                raise
+            return response, api_key, timeout
+
+        async def attempt(timeout: Timeouts
+                          ) -> Tuple["aiohttp.ClientResponse", Optional[str], Timeouts]:
+            if self.key_pool is None:
+                return await send(timeout, None)
+            return await self.key_pool.call_async(lambda api_key: send(timeout, api_key),
+                                                  estimated)
+
+        error: Optional[BaseException] = None
+        usage: Dict[str, Any] = {}
+        try:
+            async with self._semaphore:
+                # Only establishing the stream is retried; once chunks have been
+                # yielded, a failure is reported to the caller.
+                response, api_key, timeout = await self.retry_policy.call_async(attempt)
+                try:
+                    decoder = SSEDecoder()
+                    async for line in response.content:
+                        if metrics is not None:
+                            metrics.bytes_received += len(line)
+                        event = decoder.feed(line)
+                        if decoder.done:
+                            return
+                        if event is not None:
+                            usage = event.get("usage") or usage
+                            if metrics is not None:
+                                metrics.first_token()
+                            yield event
+                    event = decoder.flush()
+                    if event is not None:
+                        usage = event.get("usage") or usage
+                        yield event
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    timeout.check()
+                    raise _api_error(e) from e
+                finally:
+                    response.release()
+                    await _in_thread(self.calibrator.record, model, size.raw_prompt_tokens,
+                                     usage.get("prompt_tokens"))
+                    if self.rate_limiter is not None:
+                        await _in_thread(self.rate_limiter.record_usage, estimated,
+                                         usage.get("total_tokens"))
+                    if api_key is not None:
+                        await _in_thread(self.key_pool.record_usage, api_key, estimated,
+                                         usage.get("total_tokens"))
+        except GeneratorExit:
+            # The caller stopped reading early, which is not a failure
+            raise
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            if metrics is not None:
+                metrics.set_usage(usage)
+            self._report(metrics, error)
+
+
+async def _in_thread(fn: Callable[..., Any], *args: Any) -> Any:
+    """
+    Run a blocking call, such as one that locks the rate limit state file,
+    on a worker thread.
+
+    Args:
+        fn (Callable[..., Any]): The function to call
+        *args (Any): Its arguments
+
+    Returns:
+        Any: The function's result
+    """
+    return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+
+def _trace_config() -> "aiohttp.TraceConfig":
+    """
+    Build the tracing hooks that fill in the ``RequestMetrics`` passed as
+    ``trace_request_ctx``.
+
+    Returns:
+        aiohttp.TraceConfig: The tracing configuration for the session
+    """
+    def metrics_of(context: SimpleNamespace) -> Optional[RequestMetrics]:
+        return context.trace_request_ctx if isinstance(context.trace_request_ctx,
+                                                       RequestMetrics) else None
+
+    async def on_dns_start(session: Any, context: SimpleNamespace, params: Any) -> None:
+        context.dns_start = time.perf_counter()
+
+    async def on_dns_end(session: Any, context: SimpleNamespace, params: Any) -> None:
+        metrics = metrics_of(context)
+        if metrics is not None:
+            metrics.dns_ms = (time.perf_counter() - context.dns_start) * 1000
+
+    async def on_connection_start(session: Any, context: SimpleNamespace, params: Any) -> None:
+        context.connection_start = time.perf_counter()
+
+    async def on_connection_end(session: Any, context: SimpleNamespace, params: Any) -> None:
+        metrics = metrics_of(context)
+        if metrics is not None:
+            elapsed_ms = (time.perf_counter() - context.connection_start) * 1000
+            metrics.connect_ms = max(0.0, elapsed_ms - metrics.dns_ms)
+            metrics.connection_reused = False
+
+    async def on_chunk_sent(session: Any, context: SimpleNamespace, params: Any) -> None:
+        metrics = metrics_of(context)
+        if metrics is not None:
+            metrics.bytes_sent += len(params.chunk)
+
+    async def on_request_end(session: Any, context: SimpleNamespace, params: Any) -> None:
+        metrics = metrics_of(context)
+        if metrics is not None:
+            metrics.headers_received()
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_dns_resolvehost_start.append(on_dns_start)
+    trace_config.on_dns_resolvehost_end.append(on_dns_end)
+    trace_config.on_connection_create_start.append(on_connection_start)
+    trace_config.on_connection_create_end.append(on_connection_end)
+    trace_config.on_request_chunk_sent.append(on_chunk_sent)
+    trace_config.on_request_end.append(on_request_end)
+    return trace_config
+
+
+def _key_headers(api_key: Optional[str]) -> Optional[Dict[str, str]]:
+    """
+    Build the headers that send a request with a key from the key pool.
+
+    Args:
+        api_key (Optional[str]): The key, or None to keep the session's key
+
+    Returns:
+        Optional[Dict[str, str]]: The ``Authorization`` header, or None
+    """
+    if api_key is None:
+        return None
+    return {"Authorization": f"Bearer {api_key}"}
+
+
+def _client_timeout(timeout: Timeouts) -> "aiohttp.ClientTimeout":
+    """
+    Convert the timeouts of an attempt into an aiohttp timeout.
+
+    The time left before the call's deadline becomes the total, which
+    aiohttp also enforces while the body is read.
+
+    Args:
+        timeout (Timeouts): Connect and read timeouts in seconds, and the deadline
+
+    Returns:
+        aiohttp.ClientTimeout: The equivalent aiohttp timeout
+    """
+    return aiohttp.ClientTimeout(total=timeout.remaining(), sock_connect=timeout[0],
+                                 sock_read=timeout[1])
+
+
+def _api_error(e: BaseException) -> PerplexityError:
+    """
+    Convert an aiohttp or timeout exception into the error raised to callers.
+
+    Args:
+        e (BaseException): The original exception
+
+    Returns:
+        PerplexityError: The typed exception to raise
+    """
+    if isinstance(e, asyncio.TimeoutError):
+        return APITimeoutError(f"API call failed: {str(e) or 'timed out'}")
+    if isinstance(e, (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError)):
+        return APIConnectionError(f"API call failed: {str(e)}")
+    return PerplexityError(f"API call failed: {str(e)}")
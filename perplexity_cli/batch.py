@@ -0,0 +1,214 @@
+"""
+Batch module for Perplexity CLI.
+
+This module handles running many queries through a bounded worker pool,
+reading them as plain lines or JSONL and writing the results as JSONL.
+"""
+
+import json
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import TYPE_CHECKING, Deque, Dict, Any, Iterable, Iterator, IO, Set, Tuple
+
+from perplexity_cli.config import DEFAULT_CONCURRENCY
+from perplexity_cli.models import AVAILABLE_MODELS
+
+if TYPE_CHECKING:
+    from perplexity_cli.client import PerplexityClient
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Constants
+ORDER_INPUT = "input"
+ORDER_COMPLETION = "completion"
+
+
+def read_batch(lines: Iterable[str], default_model: str,
+               default_max_tokens: int) -> Iterator[Dict[str, Any]]:
+    """
+    Read batch items from plain-text or JSONL lines.
+
+    A line starting with ``{`` is parsed as JSON and must contain ``query``;
+    it may also set ``id``, ``model`` and ``max_tokens``. Any other non-blank
+    line is used as the query itself.
+
+    Args:
+        lines (Iterable[str]): Input lines
+        default_model (str): Model used when an item does not name one
+        default_max_tokens (int): Max tokens used when an item does not set it
+
+    Yields:
+        Dict[str, Any]: One item per query, numbered by input position
+    """
+    index = 0
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        yield parse_item(line, index, line_number, default_model, default_max_tokens)
+        index += 1
+
+
+def parse_item(line: str, index: int, line_number: int, default_model: str,
+               default_max_tokens: int) -> Dict[str, Any]:
+    """
+    Parse one non-blank input line into a batch item.
+
+    Args:
+        line (str): The input line
+        index (int): Position of the item among the input's items
+        line_number (int): Line number, for error messages
+        default_model (str): Model used when the item does not name one
+        default_max_tokens (int): Max tokens used when the item does not set it
+
+    Returns:
+        Dict[str, Any]: The item, with an ``error`` if the line is invalid
+    """
+    line = line.strip()
+    item: Dict[str, Any] = {"index": index}
+    if line.startswith("{"):
+        item.update(id=index, query=None, model=default_model,
+                    max_tokens=default_max_tokens)
+        try:
+            entry = json.loads(line)
+            item["id"] = entry.get("id", index)
+            item["query"] = entry.get("query")
+            item["model"] = entry.get("model", default_model)
+            item["max_tokens"] = int(entry.get("max_tokens", default_max_tokens))
+        except (ValueError, TypeError, AttributeError) as e:
+            item["error"] = f"Invalid item on line {line_number}: {e}"
+        if "error" not in item and not item["query"]:
+            item["error"] = f"Missing 'query' on line {line_number}"
+    else:
+        item.update(id=index, query=line, model=default_model,
+                    max_tokens=default_max_tokens)
+    return item
+
+
+def run_item(client: "PerplexityClient", item: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run a single batch item and capture its response or error.
+
+    Args:
+        client (PerplexityClient): The client to send the query with
+        item (Dict[str, Any]): The batch item
+
+    Returns:
+        Dict[str, Any]: The result record written to the output
+    """
+    result = {
+        "index": item["index"],
+        "id": item["id"],
+        "model": item["model"],
+        "query": item["query"],
+    }
+    if item.get("error"):
+        result["error"] = item["error"]
+        return result
+    if item["model"] not in AVAILABLE_MODELS:
+        result["error"] = f"Invalid model '{item['model']}'"
+        return result
+
+    start = time.perf_counter()
+    try:
+        result["response"] = client.complete(item["model"], item["max_tokens"], item["query"])
+    except Exception as e:
+        logger.debug("Batch item %s failed: %s", item["id"], e)
+        result["error"] = str(e)
+        result["error_type"] = type(e).__name__
+    result["elapsed"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def run_batch(client: "PerplexityClient", items: Iterable[Dict[str, Any]],
+              concurrency: int = DEFAULT_CONCURRENCY,
+              order: str = ORDER_INPUT) -> Iterator[Dict[str, Any]]:
+    """
+    Run batch items concurrently and yield their results.
+
+    Up to ``concurrency`` requests are kept in flight, and input is read
+    only as fast as workers free up. In input order, results that finish
+    early are held back until every earlier item has been yielded.
+
+    Args:
+        client (PerplexityClient): The client to send the queries with
+        items (Iterable[Dict[str, Any]]): Items from ``read_batch``
+        concurrency (int): Maximum number of requests in flight
+        order (str): ``"input"`` to yield results in input order, or
+            ``"completion"`` to yield each result as soon as it finishes
+
+    Yields:
+        Dict[str, Any]: One result record per item
+    """
+    if order not in (ORDER_INPUT, ORDER_COMPLETION):
+        raise ValueError(f"Invalid batch order '{order}'")
+
+    if order == ORDER_COMPLETION:
+        yield from _run_unordered(client, items, max(1, concurrency))
+        return
+
+    # Items may skip indices (e.g. when a job resumes), so results are
+    # released in the order the items were read rather than by counting
+    submitted: Deque[int] = deque()
+
+    def track(items: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        for item in items:
+            submitted.append(item["index"])
+            yield item
+
+    held: Dict[int, Dict[str, Any]] = {}
+    for result in _run_unordered(client, track(items), max(1, concurrency)):
+        held[result["index"]] = result
+        while submitted and submitted[0] in held:
+            yield held.pop(submitted.popleft())
+
+
+def _run_unordered(client: "PerplexityClient", items: Iterable[Dict[str, Any]],
+                   concurrency: int) -> Iterator[Dict[str, Any]]:
+    """
+    Run items on a worker pool and yield results in completion order.
+
+    Args:
+        client (PerplexityClient): The client to send the queries with
+        items (Iterable[Dict[str, Any]]): The items to run
+        concurrency (int): Maximum number of requests in flight
+
+    Yields:
+        Dict[str, Any]: Each result as soon as it finishes
+    """
+    running: Set[Future] = set()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for item in items:
+            running.add(executor.submit(run_item, client, item))
+            if len(running) >= concurrency:
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        while running:
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def write_results(results: Iterable[Dict[str, Any]], out: IO[str]) -> Tuple[int, int]:
+    """
+    Write results as JSONL, one line per result.
+
+    Args:
+        results (Iterable[Dict[str, Any]]): Results from ``run_batch``
+        out (IO[str]): The stream to write to
+
+    Returns:
+        Tuple[int, int]: Number of succeeded and failed items
+    """
+    succeeded = failed = 0
+    for result in results:
+        out.write(json.dumps(result) + "\n")
+        out.flush()
+        if "error" in result:
+            failed += 1
+        else:
+            succeeded += 1
+    return succeeded, failed
@@ -0,0 +1,411 @@
+"""
+Cache module for Perplexity CLI.
+
+This module provides a persistent response cache stored in a local SQLite
+database, with per-entry TTLs, LRU eviction and compressed payloads, and an
+optional fuzzy tier that answers near-duplicate queries.
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple, Union
+
+from perplexity_cli.config import get_data_dir, DEFAULT_CACHE_TTL
+from perplexity_cli.similarity import (
+    compatible, content_terms, jaccard, lsh_buckets, minhash, query_words
+)
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Constants
+CACHE_FILENAME = "cache.sqlite3"
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+_SCHEMA = """
+BEGIN IMMEDIATE;
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    payload BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    expires REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+CREATE INDEX IF NOT EXISTS entries_expires ON entries (expires);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS similar (
+    key TEXT PRIMARY KEY,
+    scope TEXT NOT NULL,
+    terms TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS similar_buckets (
+    bucket INTEGER NOT NULL,
+    key TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS similar_buckets_bucket ON similar_buckets (bucket);
+CREATE INDEX IF NOT EXISTS similar_buckets_key ON similar_buckets (key);
+CREATE TRIGGER IF NOT EXISTS entries_similar_delete AFTER DELETE ON entries BEGIN
+    DELETE FROM similar WHERE key = old.key;
+    DELETE FROM similar_buckets WHERE key = old.key;
+END;
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS entries_size_insert AFTER INSERT ON entries BEGIN
+    UPDATE meta SET value = value + new.size WHERE name = 'bytes';
+END;
+CREATE TRIGGER IF NOT EXISTS entries_size_update AFTER UPDATE OF size ON entries BEGIN
+    UPDATE meta SET value = value + new.size - old.size WHERE name = 'bytes';
+END;
+CREATE TRIGGER IF NOT EXISTS entries_size_delete AFTER DELETE ON entries BEGIN
+    UPDATE meta SET value = value - old.size WHERE name = 'bytes';
+END;
+INSERT OR IGNORE INTO meta (name, value) SELECT 'bytes', COALESCE(SUM(size), 0) FROM entries;
+COMMIT;
+"""
+
+
+def cache_key(model: str, max_tokens: int, messages: List[Dict[str, str]]) -> str:
+    """
+    Compute the cache key for a request.
+
+    Args:
+        model (str): The model used for the query
+        max_tokens (int): Maximum number of tokens for the response
+        messages (List[Dict[str, str]]): The chat messages sent
+
+    Returns:
+        str: Hex SHA-256 digest of the request parameters
+    """
+    raw = json.dumps([model, max_tokens, messages], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def similarity_scope(model: str, max_tokens: int,
+                     messages: List[Dict[str, str]]) -> Optional[Tuple[str, List[str]]]:
+    """
+    Split a request into the part that must match exactly and the query words.
+
+    Only the last user message is compared loosely; the model, max tokens
+    and every earlier message (system prompt, conversation history) must be
+    identical for a cached answer to be reused.
+
+    Args:
+        model (str): The model used for the query
+        max_tokens (int): Maximum number of tokens for the response
+        messages (List[Dict[str, str]]): The chat messages sent
+
+    Returns:
+        Optional[Tuple[str, List[str]]]: The scope hash and the normalized
+        query words in order, or None if the request does not end with a user message
+    """
+    if not messages or messages[-1].get("role") != "user":
+        return None
+    scope = cache_key(model, max_tokens, messages[:-1])
+    return scope, query_words(messages[-1].get("content") or "")
+
+
+class ResponseCache:
+    """
+    Persistent cache of API responses.
+
+    Entries are zlib-compressed JSON in a SQLite database opened in WAL mode,
+    so several processes can read and write the same cache concurrently.
+    When the total payload size exceeds ``max_bytes``, the least recently
+    used entries are evicted. The total is kept in a one-row ``meta`` table
+    by triggers, in the same transaction as each write, so checking it
+    never scans the entries.
+
+    With a similarity threshold, responses are also indexed by the MinHash
+    signature of their query, and ``get_similar`` answers a query whose words
+    overlap a cached one's by at least the threshold, unless the two ask
+    different question words or compare things in a different order
+    ("Is Python faster than Rust?"). Candidates are found
+    through an LSH bucket index, so a lookup costs a few indexed reads
+    however large the cache is.
+
+    Args:
+        path (Optional[Union[str, Path]]): Database file; defaults to the data directory
+        ttl (float): Default lifetime of new entries in seconds
+        max_bytes (int): Maximum total size of the compressed payloads
+        similarity (Optional[float]): Jaccard similarity, between 0 and 1, at
+            which a near-duplicate query is answered from the cache; None
+            disables the fuzzy tier
+    """
+
+    def __init__(self, path: Optional[Union[str, Path]] = None, ttl: float = DEFAULT_CACHE_TTL,
+                 max_bytes: int = DEFAULT_MAX_BYTES, similarity: Optional[float] = None) -> None:
+        self.path = Path(path) if path else get_data_dir() / CACHE_FILENAME
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.similarity = similarity
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None,
+                                     check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        """
+        Close the database connection.
+        """
+        with self._lock:
+            self._conn.close()
+
+    def _count(self, name: str) -> None:
+        """
+        Increment a persistent counter.
+
+        Args:
+            name (str): The counter name
+        """
+        self._conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1", (name,)
+        )
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached response.
+
+        Args:
+            key (str): The cache key from ``cache_key``
+
+        Returns:
+            Optional[Dict[str, Any]]: The cached response, or None on a miss
+        """
+        payload = self.get_raw(key)
+        return None if payload is None else json.loads(payload.decode("utf-8"))
+
+    def get_raw(self, key: str) -> Optional[bytes]:
+        """
+        Look up a cached response without decoding it.
+
+        Args:
+            key (str): The cache key from ``cache_key``
+
+        Returns:
+            Optional[bytes]: The cached response as JSON, or None on a miss
+        """
+        with self._lock:
+            payload = self._fetch(key, time.time())
+            self._count("misses" if payload is None else "hits")
+
+        if payload is not None:
+            logger.debug("Cache hit for %s", key)
+        return payload
+
+    def _fetch(self, key: str, now: float) -> Optional[bytes]:
+        """
+        Read a fresh entry and mark it as used; the caller holds the lock.
+
+        Args:
+            key (str): The cache key
+            now (float): The current time
+
+        Returns:
+            Optional[bytes]: The decompressed payload, or None if missing or expired
+        """
+        row = self._conn.execute(
+            "SELECT payload, expires FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[1] <= now:
+            if row is not None:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            return None
+        self._conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+        return zlib.decompress(row[0])
+
+    def get_similar(self, model: str, max_tokens: int,
+                    messages: List[Dict[str, str]]) -> Optional[bytes]:
+        """
+        Look up the cached response of the most similar earlier query.
+
+        Args:
+            model (str): The model used for the query
+            max_tokens (int): Maximum number of tokens for the response
+            messages (List[Dict[str, str]]): The chat messages to send
+
+        Returns:
+            Optional[bytes]: The cached response as JSON, or None if no cached
+            query is similar enough (or the fuzzy tier is disabled)
+        """
+        if self.similarity is None:
+            return None
+        scoped = similarity_scope(model, max_tokens, messages)
+        if scoped is None:
+            return None
+        scope, words = scoped
+        terms = content_terms(words)
+        buckets = lsh_buckets(minhash(terms), scope)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT s.key, s.terms FROM similar_buckets b "
+                "JOIN similar s ON s.key = b.key "
+                f"WHERE b.bucket IN ({','.join('?' * len(buckets))}) AND s.scope = ?",
+                (*buckets, scope)
+            ).fetchall()
+            # A candidate must share enough words and ask the same question
+            scored = sorted(((jaccard(terms, content_terms(cached.split())), key)
+                             for key, cached in rows if compatible(words, cached.split())),
+                            reverse=True)
+            payload = None
+            for score, key in scored:
+                if score < self.similarity:
+                    break
+                payload = self._fetch(key, time.time())
+                if payload is not None:
+                    logger.debug("Similar cache hit for %s (similarity %.2f)", key, score)
+                    break
+            self._count("similar_misses" if payload is None else "similar_hits")
+        return payload
+
+    def index_similar(self, key: str, model: str, max_tokens: int,
+                      messages: List[Dict[str, str]]) -> None:
+        """
+        Make a stored response findable by ``get_similar``.
+
+        Does nothing if the fuzzy tier is disabled.
+
+        Args:
+            key (str): The cache key the response is stored under
+            model (str): The model used for the query
+            max_tokens (int): Maximum number of tokens for the response
+            messages (List[Dict[str, str]]): The chat messages sent
+        """
+        if self.similarity is None:
+            return
+        scoped = similarity_scope(model, max_tokens, messages)
+        if scoped is None:
+            return
+        scope, words = scoped
+        buckets = lsh_buckets(minhash(content_terms(words)), scope)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM similar_buckets WHERE key = ?", (key,))
+                self._conn.execute("INSERT OR REPLACE INTO similar (key, scope, terms) "
+                                   "VALUES (?, ?, ?)", (key, scope, " ".join(words)))
+                self._conn.executemany("INSERT INTO similar_buckets (bucket, key) VALUES (?, ?)",
+                                       [(bucket, key) for bucket in buckets])
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def set(self, key: str, response: Dict[str, Any], ttl: Optional[float] = None,
+            payload: Optional[bytes] = None) -> None:
+        """
+        Store a response and evict old entries if the cache is too large.
+
+        Args:
+            key (str): The cache key from ``cache_key``
+            response (Dict[str, Any]): The API response to store
+            ttl (Optional[float]): Lifetime in seconds; defaults to the cache TTL
+            payload (Optional[bytes]): The response's JSON body, if the caller
+                has it; stored as is instead of re-encoding the response
+        """
+        if payload is None:
+            payload = json.dumps(response, separators=(",", ":")).encode("utf-8")
+        payload = zlib.compress(payload)
+        now = time.time()
+        expires = now + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT INTO entries (key, payload, size, created, expires, accessed) "
+                    "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(key) DO UPDATE SET "
+                    "payload = excluded.payload, size = excluded.size, "
+                    "created = excluded.created, expires = excluded.expires, "
+                    "accessed = excluded.accessed",
+                    (key, payload, len(payload), now, expires, now)
+                )
+                self._evict(now)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _evict(self, now: float) -> None:
+        """
+        Drop expired entries, then least recently used ones until under the size limit.
+
+        Args:
+            now (float): The current time
+        """
+        self._conn.execute("DELETE FROM entries WHERE expires <= ?", (now,))
+        total = self._total()
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in self._conn.execute(
+                "SELECT key, size FROM entries ORDER BY accessed").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        logger.debug("Evicted %d cache entries", evicted)
+
+    def _total(self) -> int:
+        """
+        Read the running total of payload sizes; the caller holds the lock.
+
+        Returns:
+            int: Total size of the compressed payloads in bytes
+        """
+        return self._conn.execute("SELECT value FROM meta WHERE name = 'bytes'").fetchone()[0]
+
+    def clear(self) -> None:
+        """
+        Remove every entry and reset the counters.
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.execute("DELETE FROM counters")
+            self._conn.execute("DELETE FROM similar")
+            self._conn.execute("DELETE FROM similar_buckets")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report the cache size and hit statistics.
+
+        Returns:
+            Dict[str, Any]: Entry count, payload bytes, hits, misses and hit rate
+        """
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            size = self._total()
+            counters = dict(self._conn.execute("SELECT name, value FROM counters").fetchall())
+            similar = self._conn.execute("SELECT COUNT(*) FROM similar").fetchone()[0]
+        hits = counters.get("hits", 0)
+        misses = counters.get("misses", 0)
+        lookups = hits + misses
+        similar_hits = counters.get("similar_hits", 0)
+        similar_lookups = similar_hits + counters.get("similar_misses", 0)
+        return {
+            "path": str(self.path),
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "similar_entries": similar,
+            "similar_hits": similar_hits,
+            "similar_hit_rate": round(similar_hits / similar_lookups, 4) if similar_lookups else 0.0,
+        }
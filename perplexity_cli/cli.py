@@ -7,16 +7,42 @@ This module handles command-line argument parsing and execution.
 import sys
 import logging
 import argparse
-from typing import List, Optional
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Union
 
 from perplexity_cli import __version__
-from perplexity_cli.config import load_config, save_config, DEFAULT_MODEL, DEFAULT_MAX_TOKENS
-from perplexity_cli.models import list_models, AVAILABLE_MODELS
-from perplexity_cli.api import call_api, parse_response
+from perplexity_cli.config import (
+    load_config, save_config, get_api_keys, DEFAULT_MODEL, DEFAULT_MAX_TOKENS, DEFAULT_CACHE_TTL,
+    DEFAULT_CACHE_SIMILARITY, DEFAULT_CONCURRENCY, DEFAULT_HISTORY_TOKENS,
+    DEFAULT_HEDGE_PERCENTILE, DEFAULT_HEDGE_MAX_RATIO, DEFAULT_CHUNK_TOKENS, DEFAULT_CHUNK_OVERLAP,
+    DEFAULT_GATEWAY_HOST, DEFAULT_GATEWAY_PORT, AUTO_CONCURRENCY
+)
+from perplexity_cli.models import list_models, AVAILABLE_MODELS, AUTO_MODEL, TIERS
+from perplexity_cli.batch import ORDER_INPUT, ORDER_COMPLETION
+from perplexity_cli.output import OUTPUT_FORMATS, OUTPUT_TEXT, OUTPUT_CONTENT, RAW_OUTPUTS
+from perplexity_cli.ratelimit import RateLimiter
+from perplexity_cli.retry import (
+    RetryPolicy, DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT, DEFAULT_MAX_ATTEMPTS
+)
+
+if TYPE_CHECKING:
+    from perplexity_cli.keypool import KeyPool
+    from perplexity_cli.metrics import MetricsReporter
+
+# The api, client, cache, daemon and gateway modules (and with them ``requests``,
+# ``sqlite3``, ``socket`` and ``aiohttp``) are imported by the code paths that use them, so
+# commands such as -l, --version and --set-* start as fast as possible.
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Constants
+# Options that configure the client. A running daemon answers with a client of
+# its own, so a query that sets any of them is not forwarded to it.
+CLIENT_OPTIONS = (
+    "cache", "refresh_cache", "cache_ttl", "fuzzy_cache", "connect_timeout", "read_timeout",
+    "retries", "deadline", "rpm", "tpm", "hedge", "hedge_max_ratio",
+)
+
 
 def parse_args(args: Optional[List[str]] = None) -> argparse.Namespace:
     """
@@ -32,6 +58,9 @@ def parse_args(args: Optional[List[str]] = None) -> argparse.Namespace:
     config = load_config()
     default_model = config.get("default_model", DEFAULT_MODEL)
     default_max_tokens = int(config.get("max_tokens", DEFAULT_MAX_TOKENS))
+    default_cache = config.get("cache", "").lower() in ("1", "true", "yes", "on")
+    default_rpm = float(config["requests_per_minute"]) if "requests_per_minute" in config else None
+    default_tpm = float(config["tokens_per_minute"]) if "tokens_per_minute" in config else None
     
     # Parse command line arguments
     parser = argparse.ArgumentParser(
@@ -48,6 +77,43 @@ Examples:
   Query using specific model:
     %(prog)s -m sonar-pro -q "What is the distance between the Sun and Earth?"
   
+  Compare the answers, latency and token usage of several models:
+    %(prog)s -m sonar,sonar-pro,sonar-reasoning --compare -q "How far away is Mars?"
+  
+  Take whichever model answers first:
+    %(prog)s -m sonar,sonar-pro --first-wins -q "How far away is Mars?"
+  
+  Stream the answer as it is generated:
+    %(prog)s --stream -q "What is the distance between the Sun and Earth?"
+  
+  Ask follow-up questions in an interactive session:
+    %(prog)s --interactive
+  
+  Continue a named conversation across invocations:
+    %(prog)s --session research -q "And how far is Mars?"
+  
+  Run queries from a file (one per line, or JSONL) with 8 requests in flight:
+    %(prog)s --batch queries.jsonl --concurrency 8 > results.jsonl
+  
+  Let the number of requests in flight adapt to what the API sustains:
+    %(prog)s --batch queries.jsonl --concurrency auto > results.jsonl
+  
+  Run a batch as a named job, and resume it after an interruption:
+    %(prog)s --batch queries.jsonl --job nightly > results.jsonl
+    %(prog)s --resume nightly >> results.jsonl
+  
+  Ask a question about a document larger than the context window:
+    %(prog)s --input server.log -q "Which errors occur most often, and when?"
+  
+  Answer repeated questions from the local response cache:
+    %(prog)s --cache -q "What is the distance between the Sun and Earth?"
+  
+  Keep a warm daemon running; later invocations forward to it automatically:
+    %(prog)s daemon --cache &
+  
+  Serve an OpenAI-compatible endpoint that local apps share, with one cache and rate limit:
+    %(prog)s serve --port 8000 --cache --rpm 50
+  
   Set API key in config file:
     %(prog)s --set-api-key YOUR_API_KEY
   
@@ -59,11 +125,125 @@ Examples:
     parser.add_argument("-t", "--tokens", type=int, default=default_max_tokens,
                         help=f"Maximum number of tokens (default: {default_max_tokens})")
     parser.add_argument("-m", "--model", type=str, default=default_model,
-                        help=f"Model to use (default: {default_model})")
+                        help=f"Model to use, or several separated by commas to ask them "
+                             f"all at once (default: {default_model})")
+    fanout_mode = parser.add_mutually_exclusive_group()
+    fanout_mode.add_argument("--first-wins", action="store_true",
+                             help="With several models: print the earliest complete answer "
+                                  "and stop the others")
+    fanout_mode.add_argument("--compare", action="store_true",
+                             help="With several models: print every answer side by side with "
+                                  "its latency, time to first token and token usage (default)")
+    parser.add_argument("--latency-slo", type=float, metavar="SECONDS",
+                        help=f"With -m {AUTO_MODEL}: seconds an answer (or, when streaming, "
+                             "its first chunk) should take at most")
+    parser.add_argument("--tier", choices=list(TIERS), default="standard",
+                        help=f"With -m {AUTO_MODEL}: minimum quality tier (default: standard)")
+    parser.add_argument("--prefer", choices=["cost", "latency"], default="cost",
+                        help=f"With -m {AUTO_MODEL}: pick the cheapest or the fastest model "
+                             "that meets the SLO (default: cost)")
+    parser.add_argument("--model-stats", action="store_true",
+                        help="Show the measured latency and error rate of each model")
     parser.add_argument("-l", "--list-models", action="store_true",
                         help="List available models")
     parser.add_argument("-q", "--query", type=str,
                         help="Query to send to the API")
+    parser.add_argument("-s", "--stream", action="store_true",
+                        help="Stream the response as it is generated")
+    parser.add_argument("-o", "--output", choices=OUTPUT_FORMATS, default=OUTPUT_TEXT,
+                        help="Output format: text with section headers, the API's JSON "
+                             "response, one JSON line per response or chunk, or only "
+                             f"the answer (default: {OUTPUT_TEXT})")
+    parser.add_argument("--estimate", action="store_true",
+                        help="Print the estimated token usage of the query without sending it")
+    parser.add_argument("-i", "--interactive", action="store_true",
+                        help="Start an interactive multi-turn session")
+    parser.add_argument("--history-tokens", type=int, default=DEFAULT_HISTORY_TOKENS,
+                        help="Token budget for the conversation history in interactive mode "
+                             f"(default: {DEFAULT_HISTORY_TOKENS})")
+    parser.add_argument("--session", type=str, metavar="NAME",
+                        help="Continue the named conversation and save the new turns to it")
+    parser.add_argument("--list-sessions", action="store_true",
+                        help="List saved conversation sessions")
+    parser.add_argument("--delete-session", type=str, metavar="NAME",
+                        help="Delete a saved conversation session")
+    parser.add_argument("--batch", type=str, metavar="FILE",
+                        help="Run queries from FILE ('-' for stdin) and write JSONL results")
+    parser.add_argument("--batch-output", type=str, metavar="FILE",
+                        help="Write batch results to FILE instead of stdout")
+    parser.add_argument("--concurrency", type=concurrency, default=DEFAULT_CONCURRENCY,
+                        help=f"Maximum batch requests in flight, or '{AUTO_CONCURRENCY}' to "
+                             "raise it while the API keeps up and cut it on 429s, server "
+                             f"errors and latency spikes (default: {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--order", choices=[ORDER_INPUT, ORDER_COMPLETION], default=ORDER_INPUT,
+                        help="Order of batch results (default: input)")
+    parser.add_argument("--input", type=str, metavar="FILE",
+                        help="Answer the query about FILE ('-' for stdin), asking each chunk "
+                             "concurrently and combining the partial answers")
+    parser.add_argument("--chunk-tokens", type=int, default=DEFAULT_CHUNK_TOKENS,
+                        help=f"With --input: estimated tokens per chunk (default: {DEFAULT_CHUNK_TOKENS})")
+    parser.add_argument("--chunk-overlap", type=int, default=DEFAULT_CHUNK_OVERLAP,
+                        help="With --input: estimated tokens each chunk repeats from the "
+                             f"previous one (default: {DEFAULT_CHUNK_OVERLAP})")
+    parser.add_argument("--job", type=str, metavar="NAME",
+                        help="With --batch: checkpoint progress as job NAME so it can be resumed")
+    parser.add_argument("--resume", type=str, metavar="NAME",
+                        help="Resume batch job NAME, running only its pending and failed items")
+    parser.add_argument("--list-jobs", action="store_true",
+                        help="List batch jobs and their progress")
+    parser.add_argument("--job-results", type=str, metavar="NAME",
+                        help="Write the latest result of every finished item of job NAME")
+    parser.add_argument("--cache", action="store_true", default=default_cache,
+                        help="Use the local response cache")
+    parser.add_argument("--no-cache", dest="cache", action="store_false",
+                        help="Bypass the local response cache")
+    parser.add_argument("--refresh-cache", action="store_true",
+                        help="Skip cache lookups but store the new responses")
+    parser.add_argument("--cache-ttl", type=float, default=DEFAULT_CACHE_TTL,
+                        help=f"Lifetime of new cache entries in seconds (default: {DEFAULT_CACHE_TTL})")
+    parser.add_argument("--fuzzy-cache", nargs="?", type=similarity, const=DEFAULT_CACHE_SIMILARITY,
+                        metavar="THRESHOLD",
+                        help="Also answer near-duplicate queries from the cache when their "
+                             "words overlap by at least THRESHOLD (0-1, default: "
+                             f"{DEFAULT_CACHE_SIMILARITY}); implies --cache")
+    parser.add_argument("--cache-stats", action="store_true",
+                        help="Show response cache statistics")
+    parser.add_argument("--clear-cache", action="store_true",
+                        help="Remove every entry from the response cache")
+    parser.add_argument("--connect-timeout", type=float,
+                        help=f"Seconds to wait for a connection (default: {DEFAULT_CONNECT_TIMEOUT})")
+    parser.add_argument("--read-timeout", type=float,
+                        help=f"Seconds to wait for response data (default: {DEFAULT_READ_TIMEOUT})")
+    parser.add_argument("--retries", type=int,
+                        help=f"Retries after a transient error (default: {DEFAULT_MAX_ATTEMPTS - 1})")
+    parser.add_argument("--deadline", type=float,
+                        help="Seconds all attempts of a request may take in total")
+    parser.add_argument("--rpm", type=float, default=default_rpm,
+                        help="Requests per minute allowed across all processes on this host")
+    parser.add_argument("--tpm", type=float, default=default_tpm,
+                        help="Estimated tokens per minute allowed across all processes on this host")
+    parser.add_argument("--rate-limit-status", action="store_true",
+                        help="Show the remaining rate limit headroom")
+    parser.add_argument("--hedge", nargs="?", type=float, const=DEFAULT_HEDGE_PERCENTILE,
+                        metavar="PERCENTILE",
+                        help="Send a duplicate request when no answer (or first streamed "
+                             "chunk) has arrived by this percentile of recent latencies "
+                             f"(default: {DEFAULT_HEDGE_PERCENTILE})")
+    parser.add_argument("--hedge-max-ratio", type=float, default=DEFAULT_HEDGE_MAX_RATIO,
+                        metavar="RATIO",
+                        help="Maximum share of requests that may be hedged "
+                             f"(default: {DEFAULT_HEDGE_MAX_RATIO})")
+    parser.add_argument("--timings", nargs="?", const="text", choices=["text", "json"],
+                        help="Print each request's latency breakdown to stderr, "
+                             "as text or as a JSON line")
+    parser.add_argument("--metrics-file", type=str, metavar="FILE",
+                        help="Aggregate request metrics into a Prometheus textfile")
+    parser.add_argument("--no-daemon", action="store_true",
+                        help="Call the API directly even if a daemon is running")
+    parser.add_argument("--host", type=str, default=DEFAULT_GATEWAY_HOST,
+                        help=f"With serve: address to listen on (default: {DEFAULT_GATEWAY_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_GATEWAY_PORT,
+                        help=f"With serve: port to listen on (default: {DEFAULT_GATEWAY_PORT})")
     parser.add_argument("-v", "--verbose", action="store_true",
                         help="Enable verbose output")
     parser.add_argument("-d", "--debug", action="store_true",
@@ -76,7 +256,44 @@ Examples:
                         help="Set default max tokens in config file")
     parser.add_argument("--version", action="version", version=f"%(prog)s {__version__}")
     
-    return parser.parse_args(args)
+    parser.set_defaults(concurrency_limit=None)
+    parsed_args = parser.parse_args(args)
+    # Defaults from the config file apply to the daemon too, so only count changes
+    parsed_args.client_overrides = [name for name in CLIENT_OPTIONS
+                                    if getattr(parsed_args, name) != parser.get_default(name)]
+    return parsed_args
+
+
+def concurrency(value: str) -> Union[int, str]:
+    """
+    Parse the ``--concurrency`` argument.
+    
+    Args:
+        value (str): A number of requests, or "auto"
+        
+    Returns:
+        Union[int, str]: The number, or "auto"
+    """
+    return value if value == AUTO_CONCURRENCY else int(value)
+
+
+def similarity(value: str) -> float:
+    """
+    Parse the ``--fuzzy-cache`` threshold.
+    
+    Args:
+        value (str): A Jaccard similarity between 0 and 1
+        
+    Returns:
+        float: The threshold
+        
+    Raises:
+        argparse.ArgumentTypeError: If the value is not a number between 0 and 1
+    """
+    threshold = float(value)
+    if not 0 <= threshold <= 1:
+        raise argparse.ArgumentTypeError(f"must be between 0 and 1, not {value}")
+    return threshold
 
 
 def main(args: Optional[List[str]] = None) -> int:
@@ -96,8 +313,13 @@ def main(args: Optional[List[str]] = None) -> int:
         datefmt="%Y-%m-%d %H:%M:%S"
     )
     
-    # Parse arguments
-    parsed_args = parse_args(args)
+    # Parse arguments; "daemon" or "serve" as the first argument starts the
+    # daemon or the gateway
+    if args is None:
+        args = sys.argv[1:]
+    daemon_mode = bool(args) and args[0] == "daemon"
+    serve_mode = bool(args) and args[0] == "serve"
+    parsed_args = parse_args(args[1:] if daemon_mode or serve_mode else args)
     
     # Set debug logging if requested
     if parsed_args.debug:
@@ -114,28 +336,677 @@ def main(args: Optional[List[str]] = None) -> int:
         list_models()
         return 0
     
+    # Report on or clear the cache if requested
+    if parsed_args.cache_stats or parsed_args.clear_cache:
+        from perplexity_cli.cache import ResponseCache
+        
+        cache = ResponseCache()
+        if parsed_args.clear_cache:
+            cache.clear()
+            print(f"Cleared response cache at {cache.path}")
+        if parsed_args.cache_stats:
+            for key, value in cache.stats().items():
+                print(f"{key}: {value}")
+        cache.close()
+        return 0
+    
+    # Report on the shared rate limit if requested
+    if parsed_args.rate_limit_status:
+        key_pool = build_key_pool(parsed_args)
+        if key_pool is not None:
+            for label, stats in key_pool.stats().items():
+                print(f"{label}: {stats['available']:.0%} of the per-key budget available")
+            return 0
+        limiter = RateLimiter(parsed_args.rpm, parsed_args.tpm)
+        for key, value in limiter.headroom().items():
+            print(f"{key}: {value}")
+        return 0
+    
+    # Report on the measured model latencies if requested
+    if parsed_args.model_stats:
+        from perplexity_cli.router import get_router
+        
+        for model, stats in get_router().stats().items():
+            print(f"{model}: latency {stats['latency']}s, first chunk {stats['ttft']}s, "
+                  f"error rate {stats['error']}, {stats['samples']} samples")
+        return 0
+    
+    # List or delete sessions if requested
+    if parsed_args.list_sessions or parsed_args.delete_session:
+        from perplexity_cli.sessions import SessionStore
+        
+        store = SessionStore()
+        try:
+            if parsed_args.delete_session:
+                store.open(parsed_args.delete_session).delete()
+                print(f"Deleted session '{parsed_args.delete_session}'")
+            if parsed_args.list_sessions:
+                for name, info in store.info().items():
+                    print(f"{name}: {info['turns']} turns, {info['bytes']} bytes")
+        except ValueError as e:
+            logger.error(str(e))
+            return 1
+        return 0
+    
+    # List jobs or export their results if requested
+    if parsed_args.list_jobs or parsed_args.job_results:
+        from perplexity_cli.jobs import JobStore
+        
+        store = JobStore()
+        try:
+            if parsed_args.list_jobs:
+                for name in store.names():
+                    counts = store.open(name).counts()
+                    print(f"{name}: {counts['done']} done, {counts['failed']} failed")
+            if parsed_args.job_results:
+                from perplexity_cli.batch import write_results
+                
+                job = store.open(parsed_args.job_results)
+                if parsed_args.batch_output:
+                    with open(parsed_args.batch_output, "w", encoding="utf-8") as out_file:
+                        write_results(job.results(), out_file)
+                else:
+                    write_results(job.results(), sys.stdout)
+        except (OSError, ValueError) as e:
+            logger.error(str(e))
+            return 1
+        return 0
+    
+    # Run the daemon if requested
+    if daemon_mode:
+        from perplexity_cli.client import PerplexityClient
+        from perplexity_cli.daemon import run_daemon
+        
+        try:
+            with PerplexityClient(**client_options(parsed_args)) as client:
+                run_daemon(client)
+            return 0
+        except Exception as e:
+            logger.error(str(e))
+            return 1
+    
+    # Pick a model if asked to choose automatically
+    if parsed_args.model == AUTO_MODEL:
+        try:
+            route_model(parsed_args)
+        except ValueError as e:
+            logger.error(str(e))
+            return 1
+    
+    # Let the number of requests in flight adapt if requested
+    if parsed_args.concurrency == AUTO_CONCURRENCY:
+        from perplexity_cli.concurrency import AdaptiveLimit
+        
+        parsed_args.concurrency_limit = AdaptiveLimit()
+        parsed_args.concurrency = parsed_args.concurrency_limit.max_limit
+    
+    # Run the gateway if requested
+    if serve_mode:
+        return run_gateway_command(parsed_args)
+    
+    # Run a batch if requested
+    if parsed_args.batch or parsed_args.resume:
+        return run_batch_command(parsed_args)
+    if parsed_args.job:
+        logger.error("--job needs a batch to run (--batch FILE)")
+        return 1
+    
     # Validate query parameter
-    if not parsed_args.query:
+    if not parsed_args.query and not parsed_args.interactive:
         parser = argparse.ArgumentParser()
         parser.print_help()
-        print("\nError: A query must be provided unless listing models (-l) or setting configuration.")
+        print("\nError: A query must be provided unless listing models (-l), running a batch (--batch), "
+              "starting interactive mode (-i) or setting configuration.")
         return 1
     
+    # Ask several models at once if requested
+    if "," in parsed_args.model:
+        return run_fanout_command(parsed_args)
+    
     # Validate model parameter
     if parsed_args.model not in AVAILABLE_MODELS:
         print(f"Error: Invalid model '{parsed_args.model}'.")
         list_models()
         return 1
     
+    # Estimate the request size if requested
+    if parsed_args.estimate:
+        return print_estimate(parsed_args)
+    
+    # Start interactive mode if requested
+    if parsed_args.interactive:
+        return run_interactive(parsed_args)
+    
+    # Continue a saved conversation if requested
+    if parsed_args.session:
+        return run_session_query(parsed_args)
+    
+    # Answer the query about a document if requested
+    if parsed_args.input:
+        return run_map_reduce_command(parsed_args)
+    
     try:
+        # Timings are measured in this process, and client options given here
+        # would be ignored by the daemon's client, so both bypass the daemon
+        measured = parsed_args.timings or parsed_args.metrics_file
+        if parsed_args.client_overrides:
+            logger.debug("Not forwarding to the daemon because of --%s",
+                         parsed_args.client_overrides[0].replace("_", "-"))
+        elif not parsed_args.no_daemon and not measured and forward_to_daemon(parsed_args):
+            return 0
+        
+        from perplexity_cli.api import call_api, call_api_raw, stream_api
+        
+        if parsed_args.stream:
+            # Print tokens as they arrive
+            print_stream_output(stream_api(parsed_args.model, parsed_args.tokens,
+                                           parsed_args.query, **client_options(parsed_args)),
+                                parsed_args)
+            return 0
+        
+        if parsed_args.output in RAW_OUTPUTS:
+            # Pass the API's JSON through without decoding and re-encoding it
+            from perplexity_cli.output import write_raw
+            
+            write_raw(call_api_raw(parsed_args.model, parsed_args.tokens, parsed_args.query,
+                                   **client_options(parsed_args)),
+                      parsed_args.output)
+            return 0
+        
         # Call API and parse response
-        response = call_api(parsed_args.model, parsed_args.tokens, parsed_args.query)
+        response = call_api(parsed_args.model, parsed_args.tokens, parsed_args.query,
+                            **client_options(parsed_args))
+        print_output(response, parsed_args)
+        return 0
+    except Exception as e:
+        logger.error(str(e))
+        return 1
+
+
+def route_model(parsed_args: argparse.Namespace) -> None:
+    """
+    Replace ``-m auto`` with the model the router picks for this request.
+    
+    Args:
+        parsed_args (argparse.Namespace): Parsed command line arguments
+        
+    Raises:
+        ValueError: If no model offers the requested tier
+    """
+    from perplexity_cli.router import get_router
+    from perplexity_cli.tokens import estimate_text_tokens
+    
+    stream = parsed_args.stream or parsed_args.interactive
+    parsed_args.model = get_router().choose(
+        latency_slo=parsed_args.latency_slo, tier=TIERS[parsed_args.tier],
+        prefer=parsed_args.prefer, stream=stream,
+        prompt_tokens=int(estimate_text_tokens(parsed_args.query or "")) + parsed_args.tokens)
+    logger.info("Using model %s", parsed_args.model)
+
+
+def print_estimate(parsed_args: argparse.Namespace) -> int:
+    """
+    Print the estimated size of the query and the calibration behind it.
+    
+    Args:
+        parsed_args (argparse.Namespace): Parsed command line arguments
+        
+    Returns:
+        int: Exit code, 1 if the prompt does not fit in the context window
+    """
+    from perplexity_cli.client import build_messages
+    from perplexity_cli.exceptions import PromptTooLargeError
+    from perplexity_cli.models import context_window
+    from perplexity_cli.tokens import get_calibrator
+    
+    calibrator = get_calibrator()
+    try:
+        size = calibrator.size_request(parsed_args.model, build_messages(parsed_args.query),
+                                       parsed_args.tokens)
+    except PromptTooLargeError as e:
+        logger.error(str(e))
+        return 1
+    
+    calibration = calibrator.stats().get(parsed_args.model, {"ratio": 1.0, "error": None, "samples": 0})
+    print(f"model: {parsed_args.model}")
+    print(f"context_window: {context_window(parsed_args.model)}")
+    print(f"prompt_tokens: {size.prompt_tokens}")
+    print(f"max_tokens: {size.max_tokens}")
+    print(f"calibration_ratio: {calibration['ratio']}")
+    print(f"calibration_error: {calibration['error']}")
+    print(f"calibration_samples: {calibration['samples']}")
+    return 0
+
+
+def print_output(response: Dict[str, Any], parsed_args: argparse.Namespace) -> None:
+    """
+    Print a decoded response in the selected output format.
+    
+    Args:
+        response (Dict[str, Any]): The API response dictionary
+        parsed_args (argparse.Namespace): Parsed command line arguments
+    """
+    from perplexity_cli.api import parse_response
+    from perplexity_cli.output import print_content, write_json
+    
+    if parsed_args.output in RAW_OUTPUTS:
+        write_json(response, parsed_args.output)
+    elif parsed_args.output == OUTPUT_CONTENT:
+        print_content(response)
+    else:
         parse_response(response, parsed_args.verbose)
+
+
+def print_stream_output(chunks: Iterable[Dict[str, Any]],
+                        parsed_args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Print a streamed response in the selected output format.
+    
+    Args:
+        chunks (Iterable[Dict[str, Any]]): The streamed chunks
+        parsed_args (argparse.Namespace): Parsed command line arguments
+        
+    Returns:
+        Dict[str, Any]: The assembled response
+    """
+    from perplexity_cli.api import print_stream
+    
+    if parsed_args.output == OUTPUT_TEXT:
+        return print_stream(chunks, parsed_args.verbose)
+    return print_stream(chunks, parsed_args.verbose, parsed_args.output)
+
+
+def run_gateway_command(parsed_args: argparse.Namespace) -> int:
+    """
+    Serve the OpenAI-compatible gateway with one shared async client.
+    
+    Args:
+        parsed_args (argparse.Namespace): Parsed command line arguments
+        
+    Returns:
+        int: Exit code
+    """
+    try:
+        from perplexity_cli.async_client import AsyncPerplexityClient
+        from perplexity_cli.gateway import run_gateway
+        
+        client = AsyncPerplexityClient(**client_options(parsed_args))
+        run_gateway(client, parsed_args.model, parsed_args.tokens, parsed_args.host,
+                    parsed_args.port)
         return 0
     except Exception as e:
         logger.error(str(e))
         return 1
 
 
+def forward_to_daemon(parsed_args: argparse.Namespace) -> bool:
+    """
+    Answer the query through the daemon if one is running.
+    
+    The daemon's own cache, retry and rate limit settings apply, so callers
+    only forward queries that set none of ``CLIENT_OPTIONS``.
+    
+    Args:
+        parsed_args (argparse.Namespace): Parsed command line arguments
+        
+    Returns:
+        bool: Whether the daemon handled the query
+    """
+    from perplexity_cli.daemon import complete_via_daemon, stream_via_daemon
+    
+    if parsed_args.stream:
+        chunks = stream_via_daemon(parsed_args.model, parsed_args.tokens, parsed_args.query)
+        if chunks is None:
+            return False
+        print_stream_output(chunks, parsed_args)
+        return True
+    
+    response = complete_via_daemon(parsed_args.model, parsed_args.tokens, parsed_args.query)
+    if response is None:
+        return False
+    print_output(response, parsed_args)
+    return True
+
+
+def metrics_reporter(parsed_args: argparse.Namespace) -> Optional["MetricsReporter"]:
+    """
+    Get the reporter for ``--timings`` and ``--metrics-file``, if either is set.
+    
+    The reporter is created once per invocation, and its textfile is written
+    when the process exits.
+    
+    Args:
+        parsed_args (argparse.Namespace): Parsed command line arguments
+        
+    Returns:
+        Optional[MetricsReporter]: The reporter, or None if no metrics were requested
+    """
+    if not (parsed_args.timings or parsed_args.metrics_file):
+        return None
+    reporter = getattr(parsed_args, "_metrics_reporter", None)
+    if reporter is None:
+        import atexit
+        from perplexity_cli.metrics import MetricsRegistry, MetricsReporter
+        
+        registry = MetricsRegistry(parsed_args.metrics_file) if parsed_args.metrics_file else None
+        reporter = MetricsReporter(parsed_args.timings, registry)
+        atexit.register(reporter.flush)
+        parsed_args._metrics_reporter = reporter
+    return reporter
+
+
+def build_key_pool(parsed_args: argparse.Namespace) -> Optional["KeyPool"]:
+    """
+    Build a key pool if several API keys are configured.
+    
+    The request and token limits then apply to each key.
+    
+    Args:
+        parsed_args (argparse.Namespace): Parsed command line arguments
+        
+    Returns:
+        Optional[KeyPool]: The pool, or None with fewer than two keys
+    """
+    try:
+        api_keys = get_api_keys()
+    except EnvironmentError:
+        return None
+    if len(api_keys) < 2:
+        return None
+    
+    from perplexity_cli.keypool import KeyPool
+    
+    return KeyPool(api_keys, parsed_args.rpm, parsed_args.tpm)
+
+
+def client_options(parsed_args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Build the ``PerplexityClient`` options selected on the command line.
+    
+    Only options that differ from the client defaults are included.
+    
+    Args:
+        parsed_args (argparse.Namespace): Parsed command line arguments
+        
+    Returns:
+        Dict[str, Any]: Keyword arguments for ``PerplexityClient``
+    """
+    options: Dict[str, Any] = {}
+    retry_args = {
+        "connect_timeout": parsed_args.connect_timeout,
+        "read_timeout": parsed_args.read_timeout,
+        "max_attempts": None if parsed_args.retries is None else parsed_args.retries + 1,
+        "deadline": parsed_args.deadline,
+    }
+    retry_args = {key: value for key, value in retry_args.items() if value is not None}
+    if retry_args:
+        options["retry_policy"] = RetryPolicy(**retry_args)
+    key_pool = build_key_pool(parsed_args)
+    if key_pool is not None:
+        options["key_pool"] = key_pool
+    elif parsed_args.rpm or parsed_args.tpm:
+        options["rate_limiter"] = RateLimiter(parsed_args.rpm, parsed_args.tpm)
+    if parsed_args.cache or parsed_args.refresh_cache or parsed_args.fuzzy_cache is not None:
+        from perplexity_cli.cache import ResponseCache
+
+        cache_args: Dict[str, Any] = {"ttl": parsed_args.cache_ttl}
+        if parsed_args.fuzzy_cache is not None:
+            cache_args["similarity"] = parsed_args.fuzzy_cache
+        options["cache"] = ResponseCache(**cache_args)
+        if parsed_args.refresh_cache:
+            options["refresh_cache"] = True
+    reporter = metrics_reporter(parsed_args)
+    if reporter is not None:
+        options["on_metrics"] = reporter
+    if parsed_args.hedge:
+        from perplexity_cli.hedging import HedgePolicy
+        
+        options["hedge"] = HedgePolicy(parsed_args.hedge, parsed_args.hedge_max_ratio)
+    if parsed_args.concurrency_limit is not None:
+        options["concurrency_limit"] = parsed_args.concurrency_limit
+    return options
+
+
+def run_interactive(parsed_args: argparse.Namespace) -> int:
+    """
+    Run an interactive multi-turn session with one warm client.
+    
+    Args:
+        parsed_args (argparse.Namespace): Parsed command line arguments
+        
+    Returns:
+        int: Exit code
+    """
+    from perplexity_cli.client import PerplexityClient
+    from perplexity_cli.conversation import Conversation
+    from perplexity_cli.repl import run_repl
+    
+    try:
+        # Line editing and history for input(), where available
+        import readline  # noqa: F401
+    except ImportError:
+        pass
+    
+    try:
+        conversation = Conversation(max_history_tokens=parsed_args.history_tokens)
+        on_answer = None
+        if parsed_args.session:
+            from perplexity_cli.sessions import SessionStore
+            
+            store = SessionStore()
+            session = store.open(parsed_args.session)
+            session.load(conversation)
+            store.compact_in_background()
+            
+            def on_answer(question: str, answer: str) -> None:
+                session.append([("user", question), ("assistant", answer)])
+        
+        with PerplexityClient(**client_options(parsed_args)) as client:
+            return run_repl(client, parsed_args.model, parsed_args.tokens, conversation,
+                            parsed_args.verbose, on_answer=on_answer)
+    except Exception as e:
+        logger.error(str(e))
+        return 1
+
+
+def run_session_query(parsed_args: argparse.Namespace) -> int:
+    """
+    Answer the query as the next turn of a saved session.
+    
+    Only the most recent turns that fit in the history budget are read from
+    the session, and sessions that have grown large are compacted in the
+    background while the query runs.
+    
+    Args:
+        parsed_args (argparse.Namespace): Parsed command line arguments
+        
+    Returns:
+        int: Exit code
+    """
+    from perplexity_cli.api import call_api, call_api_raw, stream_api
+    from perplexity_cli.conversation import Conversation
+    from perplexity_cli.sessions import SessionStore
+    
+    try:
+        store = SessionStore()
+        session = store.open(parsed_args.session)
+        conversation = session.load(Conversation(max_history_tokens=parsed_args.history_tokens))
+        store.compact_in_background()
+        
+        conversation.add("user", parsed_args.query)
+        messages = conversation.request_messages(parsed_args.model, parsed_args.tokens)
+        if parsed_args.stream:
+            response = print_stream_output(stream_api(parsed_args.model, parsed_args.tokens,
+                                                      parsed_args.query, messages,
+                                                      **client_options(parsed_args)),
+                                           parsed_args)
+        elif parsed_args.output in RAW_OUTPUTS:
+            import json
+            from perplexity_cli.output import write_raw
+            
+            body = call_api_raw(parsed_args.model, parsed_args.tokens, parsed_args.query,
+                                messages, **client_options(parsed_args))
+            write_raw(body, parsed_args.output)
+            response = json.loads(body)
+        else:
+            response = call_api(parsed_args.model, parsed_args.tokens, parsed_args.query,
+                                messages, **client_options(parsed_args))
+            print_output(response, parsed_args)
+        
+        choices = response.get("choices") or [{}]
+        answer = choices[0].get("message", {}).get("content", "")
+        session.append([("user", parsed_args.query), ("assistant", answer)])
+        return 0
+    except Exception as e:
+        logger.error(str(e))
+        return 1
+
+
+def run_fanout_command(parsed_args: argparse.Namespace) -> int:
+    """
+    Send the query to every model listed in ``-m`` at once.
+    
+    Args:
+        parsed_args (argparse.Namespace): Parsed command line arguments
+        
+    Returns:
+        int: Exit code, 1 if no model answered
+    """
+    from perplexity_cli.client import PerplexityClient
+    from perplexity_cli.fanout import compare, first_wins, format_comparison, parse_models
+    from perplexity_cli.output import write_json
+    
+    models = parse_models(parsed_args.model)
+    if not models:
+        print(f"Error: Invalid model '{parsed_args.model}'.")
+        list_models()
+        return 1
+    for model in models:
+        if model not in AVAILABLE_MODELS:
+            print(f"Error: Invalid model '{model}'.")
+            list_models()
+            return 1
+    
+    try:
+        with PerplexityClient(pool_maxsize=len(models), **client_options(parsed_args)) as client:
+            if parsed_args.first_wins:
+                result = first_wins(client, models, parsed_args.tokens, parsed_args.query)
+                print_output(result.response, parsed_args)
+                return 0
+            results = compare(client, models, parsed_args.tokens, parsed_args.query)
+    except Exception as e:
+        logger.error(str(e))
+        return 1
+    
+    if parsed_args.output in RAW_OUTPUTS:
+        for result in results:
+            write_json(result.to_dict(), parsed_args.output)
+    else:
+        sys.stdout.write(format_comparison(results))
+        sys.stdout.flush()
+    return 0 if any(result.error is None for result in results) else 1
+
+
+def run_map_reduce_command(parsed_args: argparse.Namespace) -> int:
+    """
+    Answer the query about the input document, one chunk at a time.
+    
+    Args:
+        parsed_args (argparse.Namespace): Parsed command line arguments
+        
+    Returns:
+        int: Exit code
+    """
+    from perplexity_cli.client import PerplexityClient
+    from perplexity_cli.mapreduce import chunk_text, map_reduce, read_lines
+    
+    try:
+        chunks = chunk_text(read_lines(parsed_args.input), parsed_args.chunk_tokens,
+                            parsed_args.chunk_overlap)
+        with PerplexityClient(pool_maxsize=max(1, parsed_args.concurrency),
+                              **client_options(parsed_args)) as client:
+            response = map_reduce(client, parsed_args.model, parsed_args.tokens,
+                                  parsed_args.query, chunks, parsed_args.concurrency,
+                                  parsed_args.chunk_tokens)
+        print_output(response, parsed_args)
+    except Exception as e:
+        logger.error(str(e))
+        return 1
+    return 0
+
+
+def run_batch_command(parsed_args: argparse.Namespace) -> int:
+    """
+    Run the queries listed in the batch file and write JSONL results.
+    
+    With ``--job`` or ``--resume``, every result is also checkpointed in the
+    job, and a resumed job runs only the items that are not done yet.
+    
+    Args:
+        parsed_args (argparse.Namespace): Parsed command line arguments
+        
+    Returns:
+        int: Exit code, 1 if any item failed
+    """
+    from perplexity_cli.batch import read_batch, run_batch, write_results
+    from perplexity_cli.client import PerplexityClient
+    
+    in_file = out_file = job = None
+    try:
+        if parsed_args.job or parsed_args.resume:
+            from perplexity_cli.jobs import JobStore
+            
+            store = JobStore()
+            if parsed_args.resume:
+                job = store.open(parsed_args.resume)
+                counts = job.counts()
+                logger.info("Resuming job '%s': %d items done, %d failed items to retry",
+                            job.name, counts["done"], counts["failed"])
+            else:
+                job = store.create(parsed_args.job, parsed_args.batch, parsed_args.model,
+                                   parsed_args.tokens)
+            items = job.items()
+        else:
+            in_file = (sys.stdin if parsed_args.batch == "-"
+                       else open(parsed_args.batch, encoding="utf-8"))
+            items = read_batch(in_file, parsed_args.model, parsed_args.tokens)
+        out_file = (open(parsed_args.batch_output, "w", encoding="utf-8")
+                    if parsed_args.batch_output else sys.stdout)
+        with PerplexityClient(pool_maxsize=max(1, parsed_args.concurrency),
+                              **client_options(parsed_args)) as client:
+            results = run_batch(client, items, parsed_args.concurrency, parsed_args.order)
+            if job is not None:
+                results = job.checkpoint(results)
+            succeeded, failed = write_results(results, out_file)
+            coalesced = client.singleflight.stats()["coalesced"] if client.singleflight else 0
+            if client.key_pool is not None:
+                for label, stats in client.key_pool.stats().items():
+                    logger.info("API key %s: %d requests (%.0f%%), %d tokens, %d rejected, "
+                                "%d rate limited", label, stats["requests"], stats["share"] * 100,
+                                stats["tokens"], stats["rejected"], stats["rate_limited"])
+            if client.concurrency_limit is not None:
+                limits = client.concurrency_limit.stats()
+                logger.info("Adaptive concurrency ended at %d in flight (%d raises, %d cuts)",
+                            limits["limit"], limits["increases"], limits["decreases"])
+            if client.hedge is not None:
+                hedges = client.hedge.stats()
+                logger.info("Hedged %d of %d requests; the hedge won %d times",
+                            hedges["hedged"], hedges["requests"], hedges["hedge_won"])
+    except Exception as e:
+        logger.error(str(e))
+        return 1
+    finally:
+        if job is not None:
+            job.close()
+        if in_file not in (None, sys.stdin):
+            in_file.close()
+        if out_file not in (None, sys.stdout):
+            out_file.close()
+    
+    logger.info("Batch finished: %d succeeded, %d failed, %s duplicate requests coalesced",
+                succeeded, failed, coalesced)
+    return 1 if failed else 0
+
+
 if __name__ == "__main__":
     sys.exit(main())
@@ -0,0 +1,795 @@
+"""
+Client module for Perplexity CLI.
+
+This module provides a reusable client for the Perplexity AI API that keeps
+a pooled, keep-alive HTTP session between requests.
+"""
+
+import itertools
+import json
+import logging
+import os
+import time
+from typing import (
+    TYPE_CHECKING, Callable, Dict, Any, Iterable, Iterator, List, Optional, Tuple, TypeVar, Union
+)
+
+from perplexity_cli.concurrency import AdaptiveLimit
+from perplexity_cli.config import get_api_key
+from perplexity_cli.exceptions import (
+    PerplexityError, APIError, AuthenticationError, RateLimitError, ServerError,
+    APIConnectionError, APITimeoutError
+)
+from perplexity_cli.hedging import HedgePolicy
+from perplexity_cli.keypool import KeyPool
+from perplexity_cli.metrics import RequestMetrics, recording
+from perplexity_cli.ratelimit import RateLimiter
+from perplexity_cli.retry import RetryPolicy, Timeouts, parse_retry_after
+from perplexity_cli.router import ModelRouter, get_router
+from perplexity_cli.singleflight import SingleFlight, request_key
+from perplexity_cli.tokens import TokenCalibrator, get_calibrator
+
+if TYPE_CHECKING:
+    import requests
+
+    from perplexity_cli.cache import ResponseCache
+
+# ``requests`` is imported when it is first needed, so that importing this
+# module (and the CLI) stays cheap for commands that never call the API.
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Constants
+BASE_URL = "https://api.perplexity.ai/chat/completions"
+BASE_URL_ENV = "PERPLEXITY_BASE_URL"
+DEFAULT_SYSTEM_PROMPT = "You are an AI assistant."
+DEFAULT_POOL_CONNECTIONS = 4
+DEFAULT_POOL_MAXSIZE = 10
+BODY_CHUNK_SIZE = 1024
+
+T = TypeVar("T")
+
+
+def get_base_url() -> str:
+    """
+    Get the chat completions endpoint.
+
+    The ``PERPLEXITY_BASE_URL`` environment variable overrides the default,
+    e.g. to point the CLI at a proxy or a local mock server.
+
+    Returns:
+        str: The endpoint URL
+    """
+    return os.getenv(BASE_URL_ENV) or BASE_URL
+
+
+def build_headers(api_key: str) -> Dict[str, str]:
+    """
+    Build the HTTP headers for a Perplexity AI API request.
+
+    Args:
+        api_key (str): The API key to authenticate with
+
+    Returns:
+        Dict[str, str]: The request headers
+    """
+    return {
+        "Authorization": f"Bearer {api_key}",
+        "Accept": "application/json",
+        "Content-Type": "application/json"
+    }
+
+
+def build_messages(query: str, system_prompt: str = DEFAULT_SYSTEM_PROMPT) -> List[Dict[str, str]]:
+    """
+    Build the message list for a single-turn query.
+
+    Args:
+        query (str): The query to send to the API
+        system_prompt (str): The system prompt to prepend
+
+    Returns:
+        List[Dict[str, str]]: The chat messages
+    """
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": query}
+    ]
+
+
+def build_payload(model: str, max_tokens: int, messages: List[Dict[str, str]],
+                  stream: bool = False) -> Dict[str, Any]:
+    """
+    Build the JSON body for a chat completions request.
+
+    Args:
+        model (str): The model to use for the query
+        max_tokens (int): Maximum number of tokens for the response
+        messages (List[Dict[str, str]]): The chat messages to send
+        stream (bool): Whether to ask the API for server-sent events
+
+    Returns:
+        Dict[str, Any]: The request body
+    """
+    data = {
+        "model": model,
+        "messages": messages,
+        "max_tokens": max_tokens
+    }
+    if stream:
+        data["stream"] = True
+    return data
+
+
+def error_from_status(status_code: int, error_text: str, error_json: Any = None,
+                      retry_after: Optional[str] = None) -> APIError:
+    """
+    Build the error raised for a non-successful HTTP status.
+
+    Args:
+        status_code (int): The HTTP status code
+        error_text (str): The raw response body
+        error_json (Any): The decoded response body, if it was JSON
+        retry_after (Optional[str]): The ``Retry-After`` header, if any
+
+    Returns:
+        APIError: The typed exception to raise
+    """
+    try:
+        error_message = error_json.get('error', {}).get('message', error_text)
+    except AttributeError:
+        error_message = error_text
+
+    if status_code == 429:
+        return RateLimitError(status_code, error_message, parse_retry_after(retry_after))
+    if status_code in (401, 403):
+        return AuthenticationError(status_code, error_message)
+    if status_code >= 500:
+        return ServerError(status_code, error_message)
+    return APIError(status_code, error_message)
+
+
+def _api_error(e: "requests.exceptions.RequestException") -> PerplexityError:
+    """
+    Convert a requests exception into the error raised to callers.
+
+    Args:
+        e (requests.exceptions.RequestException): The original exception
+
+    Returns:
+        PerplexityError: The typed exception to raise
+    """
+    import requests
+
+    if getattr(e, 'response', None) is not None:
+        try:
+            error_json = e.response.json()
+        except:
+            error_json = None
+        retry_after = e.response.headers.get("Retry-After") if e.response.status_code == 429 else None
+        return error_from_status(e.response.status_code, e.response.text, error_json, retry_after)
+    if isinstance(e, requests.exceptions.Timeout):
+        return APITimeoutError(f"API call failed: {str(e)}")
+    if isinstance(e, (requests.exceptions.ConnectionError,
+                      requests.exceptions.ChunkedEncodingError)):
+        return APIConnectionError(f"API call failed: {str(e)}")
+    return PerplexityError(f"API call failed: {str(e)}")
+
+
+class SSEDecoder:
+    """
+    Incremental decoder for server-sent event lines.
+
+    Feed it one line at a time; it returns a decoded chunk whenever an event
+    is complete. Events are separated by blank lines and may span several
+    ``data:`` lines. The ``[DONE]`` sentinel sets ``done``.
+    """
+
+    def __init__(self) -> None:
+        self.done = False
+        self._data: List[str] = []
+
+    def feed(self, raw: Union[bytes, str]) -> Optional[Dict[str, Any]]:
+        """
+        Process one line of the response body.
+
+        Args:
+            raw (Union[bytes, str]): The line, with or without its line ending
+
+        Returns:
+            Optional[Dict[str, Any]]: The decoded chunk if an event ended here
+        """
+        line = raw.decode("utf-8") if isinstance(raw, bytes) else raw
+        line = line.rstrip("\r\n")
+        if not line:
+            return self.flush()
+        if line.startswith("data:"):
+            self._data.append(line[5:].lstrip(" "))
+        # Anything else is a comment / keep-alive or an unused field
+        return None
+
+    def flush(self) -> Optional[Dict[str, Any]]:
+        """
+        Finish the pending event, if any.
+
+        Returns:
+            Optional[Dict[str, Any]]: The decoded chunk, or None
+        """
+        if not self._data:
+            return None
+        payload = "\n".join(self._data)
+        self._data = []
+        if payload.strip() == "[DONE]":
+            self.done = True
+            return None
+        return json.loads(payload)
+
+
+def _observe_response(metrics: Optional[RequestMetrics], response: "requests.Response") -> None:
+    """
+    Record the status, timing and sizes of a response in the measurements.
+
+    Args:
+        metrics (Optional[RequestMetrics]): The measurements, if any are kept
+        response (requests.Response): The response, after its headers arrived
+    """
+    if metrics is None:
+        return
+    metrics.status = response.status_code
+    metrics.headers_received(response.elapsed.total_seconds())
+    body = response.request.body
+    metrics.bytes_sent += len(body) if body else 0
+
+
+def _body_bytes(response: "requests.Response") -> int:
+    """
+    Count the body bytes read from the wire so far.
+
+    Args:
+        response (requests.Response): The response
+
+    Returns:
+        int: Bytes read, before any content decoding
+    """
+    try:
+        return int(response.raw.tell())
+    except (AttributeError, TypeError, ValueError):
+        return len(response.content or b"")
+
+
+def record_route_outcome(router: ModelRouter, model: str, started: float,
+                         error: Optional[BaseException] = None, stream: bool = False) -> None:
+    """
+    Tell the router how a request to a model went.
+
+    Only failures that say something about the model (server errors and
+    timeouts) count against it.
+
+    Args:
+        router (ModelRouter): The router to update
+        model (str): The model the request was for
+        started (float): ``time.perf_counter()`` when the request started
+        error (Optional[BaseException]): The error the request failed with, if any
+        stream (bool): Whether the latency is a time to first chunk
+    """
+    if error is None:
+        router.record(model, time.perf_counter() - started, True, stream)
+    elif isinstance(error, (ServerError, APITimeoutError)):
+        router.record(model, None, False, stream)
+
+
+def _count_lines(lines: Iterable[bytes], metrics: RequestMetrics) -> Iterator[bytes]:
+    """
+    Pass lines through while adding their size to the bytes received.
+
+    Chunked responses do not report how much of the body was read, so
+    streamed bodies are measured line by line, newline included.
+
+    Args:
+        lines (Iterable[bytes]): Raw lines of the response body
+        metrics (RequestMetrics): The measurements to update
+
+    Yields:
+        bytes: The unchanged lines
+    """
+    for line in lines:
+        metrics.bytes_received += len(line) + 1
+        yield line
+
+
+def _until_deadline(chunks: Iterable[bytes], timeout: Timeouts) -> Iterator[bytes]:
+    """
+    Pass chunks of a response body through until the call's deadline passes.
+
+    Args:
+        chunks (Iterable[bytes]): Chunks or lines of the response body
+        timeout (Timeouts): The timeouts of the attempt reading them
+
+    Yields:
+        bytes: The unchanged chunks
+
+    Raises:
+        DeadlineExceededError: If the deadline passes while reading
+    """
+    for chunk in chunks:
+        timeout.check()
+        yield chunk
+
+
+def iter_sse_events(lines: Iterable[bytes]) -> Iterator[Dict[str, Any]]:
+    """
+    Decode server-sent event lines into JSON chunks.
+
+    Args:
+        lines (Iterable[bytes]): Raw lines of the response body
+
+    Yields:
+        Dict[str, Any]: One decoded chunk per event
+    """
+    decoder = SSEDecoder()
+    for raw in lines:
+        event = decoder.feed(raw)
+        if decoder.done:
+            return
+        if event is not None:
+            yield event
+    event = decoder.flush()
+    if event is not None:
+        yield event
+
+
+class PerplexityClient:
+    """
+    Client for the Perplexity AI chat completions API.
+
+    The client owns a ``requests.Session`` with a connection pool, so
+    consecutive requests reuse TCP/TLS connections instead of paying a new
+    handshake each time. The API key and headers are resolved once. Failed
+    requests are retried according to the retry policy. Identical requests
+    made concurrently share a single API call. The client is safe to share
+    between threads.
+
+    Args:
+        api_key (Optional[str]): API key; looked up with ``get_api_key`` if omitted
+        base_url (Optional[str]): Chat completions endpoint; defaults to ``get_base_url()``
+        retry_policy (Optional[RetryPolicy]): Timeouts and retry behaviour
+        pool_connections (int): Number of per-host connection pools to cache
+        pool_maxsize (int): Maximum connections kept alive per host
+        pool_block (bool): Block when a host's pool is exhausted instead of
+            opening extra, non-pooled connections
+        keep_alive (bool): Whether to keep connections open between requests
+        cache (Optional[ResponseCache]): Response cache consulted by ``complete``
+        refresh_cache (bool): Skip cache lookups but still store new responses
+        rate_limiter (Optional[RateLimiter]): Limiter every request attempt waits on
+        calibrator (Optional[TokenCalibrator]): Token estimator used to size
+            requests; defaults to the shared ``get_calibrator()``
+        on_metrics (Optional[Callable[[RequestMetrics], None]]): Called with the
+            measurements of every finished call; measuring is skipped without it
+        coalesce (bool): Let identical concurrent requests share one API call
+        router (Optional[ModelRouter]): Router that learns each model's latency
+            and error rate from the requests sent; defaults to the shared ``get_router()``
+        hedge (Optional[HedgePolicy]): Send a duplicate of requests whose answer
+            (or first streamed chunk) is slow, and use whichever arrives first
+        key_pool (Optional[KeyPool]): Spread requests over several API keys
+            instead of sending them all with ``api_key``
+        concurrency_limit (Optional[AdaptiveLimit]): Adaptive limit every
+            completion attempt waits on, and reports its outcome to
+    """
+
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+                 pool_block: bool = False, keep_alive: bool = True,
+                 cache: Optional["ResponseCache"] = None, refresh_cache: bool = False,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 calibrator: Optional[TokenCalibrator] = None,
+                 on_metrics: Optional[Callable[[RequestMetrics], None]] = None,
+                 coalesce: bool = True, router: Optional[ModelRouter] = None,
+                 hedge: Optional[HedgePolicy] = None,
+                 key_pool: Optional[KeyPool] = None,
+                 concurrency_limit: Optional[AdaptiveLimit] = None) -> None:
+        self.api_key = api_key or (key_pool.keys[0] if key_pool is not None else get_api_key())
+        self.base_url = base_url or get_base_url()
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.headers = build_headers(self.api_key)
+        if not keep_alive:
+            self.headers["Connection"] = "close"
+        self.cache = cache
+        self.refresh_cache = refresh_cache
+        self.rate_limiter = rate_limiter
+        self.calibrator = calibrator if calibrator is not None else get_calibrator()
+        self.on_metrics = on_metrics
+        self.singleflight = SingleFlight() if coalesce else None
+        self.router = router if router is not None else get_router()
+        self.hedge = hedge
+        self.key_pool = key_pool
+        self.concurrency_limit = concurrency_limit
+
+        import requests
+
+        from perplexity_cli.transport import TimedHTTPAdapter
+
+        self.session = requests.Session()
+        adapter = TimedHTTPAdapter(pool_connections=pool_connections,
+                                   pool_maxsize=pool_maxsize, pool_block=pool_block)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def __enter__(self) -> "PerplexityClient":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Close the underlying session and its pooled connections, and save
+        the router's measurements, the token calibration and the hedging state.
+        """
+        self.session.close()
+        self.router.flush()
+        self.calibrator.flush()
+        if self.hedge is not None:
+            self.hedge.flush()
+
+    def _report(self, metrics: Optional[RequestMetrics], error: Optional[BaseException]) -> None:
+        """
+        Finish the measurements of a call and hand them to ``on_metrics``.
+
+        Args:
+            metrics (Optional[RequestMetrics]): The measurements, if any are kept
+            error (Optional[BaseException]): The error the call failed with, if any
+        """
+        if metrics is None:
+            return
+        metrics.finish(error)
+        if self.concurrency_limit is not None:
+            metrics.concurrency_limit = self.concurrency_limit.limit
+        try:
+            self.on_metrics(metrics)
+        except Exception as e:
+            logger.debug("Metrics callback failed: %s", e)
+
+    def _with_key(self, send: Callable[[Optional[str]], T], estimated: int) -> T:
+        """
+        Send a request with a key from the key pool, or with the client's key.
+
+        Args:
+            send (Callable[[Optional[str]], T]): Sends the request with the
+                given key; None means the client's own headers
+            estimated (int): Estimated tokens for the request
+
+        Returns:
+            T: The result of ``send``
+        """
+        if self.key_pool is None:
+            return send(None)
+        return self.key_pool.call(send, estimated)
+
+    def complete(self, model: str, max_tokens: int, query: Optional[str] = None,
+                 messages: Optional[List[Dict[str, str]]] = None) -> Dict[str, Any]:
+        """
+        Send a chat completion request and return the decoded response.
+
+        If the client has a cache, a fresh cached response for the same model,
+        max tokens and messages is returned without contacting the API, or,
+        if the cache has a fuzzy tier, one for a near-duplicate final query.
+        ``max_tokens`` is reduced if prompt and completion would not fit in the
+        model's context window.
+
+        Args:
+            model (str): The model to use for the query
+            max_tokens (int): Maximum number of tokens for the response
+            query (Optional[str]): A single-turn query; ignored if messages is given
+            messages (Optional[List[Dict[str, str]]]): Full message list to send
+
+        Returns:
+            Dict[str, Any]: The API response as a dictionary
+
+        Raises:
+            PromptTooLargeError: If the prompt does not fit in the context window
+            PerplexityError: If the API call fails
+        """
+        return self._coalesced(model, max_tokens, messages or build_messages(query), raw=False)
+
+    def complete_raw(self, model: str, max_tokens: int, query: Optional[str] = None,
+                     messages: Optional[List[Dict[str, str]]] = None) -> bytes:
+        """
+        Send a chat completion request and return the response body undecoded.
+
+        Behaves like ``complete``, but returns the JSON bytes the API (or the
+        cache) holds, for callers that pass the response on as JSON.
+
+        Args:
+            model (str): The model to use for the query
+            max_tokens (int): Maximum number of tokens for the response
+            query (Optional[str]): A single-turn query; ignored if messages is given
+            messages (Optional[List[Dict[str, str]]]): Full message list to send
+
+        Returns:
+            bytes: The JSON response body
+
+        Raises:
+            PromptTooLargeError: If the prompt does not fit in the context window
+            PerplexityError: If the API call fails
+        """
+        return self._coalesced(model, max_tokens, messages or build_messages(query), raw=True)
+
+    def _coalesced(self, model: str, max_tokens: int, messages: List[Dict[str, str]],
+                   raw: bool) -> Union[Dict[str, Any], bytes]:
+        """
+        Send a chat completion request, or join the identical one in flight.
+
+        Args:
+            model (str): The model to use for the query
+            max_tokens (int): Maximum number of tokens for the response
+            messages (List[Dict[str, str]]): The chat messages to send
+            raw (bool): Return the JSON body instead of the decoded response
+
+        Returns:
+            Union[Dict[str, Any], bytes]: The response, decoded unless ``raw``
+        """
+        if self.singleflight is None:
+            return self._complete(model, max_tokens, messages, raw)
+        key = request_key("raw" if raw else "json", model, max_tokens, messages)
+        return self.singleflight.do(key, lambda: self._complete(model, max_tokens, messages, raw))
+
+    def _complete(self, model: str, max_tokens: int, messages: List[Dict[str, str]],
+                  raw: bool) -> Union[Dict[str, Any], bytes]:
+        """
+        Send a chat completion request, consulting the cache first.
+
+        Args:
+            model (str): The model to use for the query
+            max_tokens (int): Maximum number of tokens for the response
+            messages (List[Dict[str, str]]): The chat messages to send
+            raw (bool): Return the JSON body instead of the decoded response
+
+        Returns:
+            Union[Dict[str, Any], bytes]: The response, decoded unless ``raw``
+        """
+        import requests
+
+        size = self.calibrator.size_request(model, messages, max_tokens)
+        max_tokens = size.max_tokens
+        metrics = RequestMetrics(model) if self.on_metrics is not None else None
+        error: Optional[BaseException] = None
+        try:
+            key = None
+            if self.cache is not None:
+                from perplexity_cli.cache import cache_key
+
+                key = cache_key(model, max_tokens, messages)
+                if not self.refresh_cache:
+                    cached = self.cache.get_raw(key) if raw else self.cache.get(key)
+                    if cached is None:
+                        cached = self.cache.get_similar(model, max_tokens, messages)
+                        if cached is not None and not raw:
+                            cached = json.loads(cached)
+                    if cached is not None:
+                        if metrics is not None:
+                            metrics.cached = True
+                        return cached
+
+            data = build_payload(model, max_tokens, messages)
+            estimated = size.total
+
+            def send(timeout: Timeouts, hedged: bool,
+                     api_key: Optional[str]) -> Tuple[Dict[str, Any], Optional[bytes]]:
+                if self.rate_limiter is not None:
+                    self.rate_limiter.acquire(estimated)
+                headers = self.headers
+                if api_key is not None:
+                    headers = dict(headers, Authorization=f"Bearer {api_key}")
+                # Only the primary request is measured
+                measured = None if hedged else metrics
+                if measured is not None:
+                    measured.start_attempt()
+                # With a deadline the body is read in chunks, so that it is
+                # enforced even while the response trickles in
+                streamed = timeout.deadline_at is not None
+                response = None
+                try:
+                    logger.debug("Sending %srequest to Perplexity AI API", "hedged " if hedged else "")
+                    with recording(measured):
+                        response = self.session.post(self.base_url, headers=headers,
+                                                     json=data, timeout=timeout, stream=streamed)
+                    _observe_response(measured, response)
+                    response.raise_for_status()
+                    if streamed:
+                        body = b"".join(_until_deadline(
+                            response.iter_content(BODY_CHUNK_SIZE), timeout))
+                        result = json.loads(body)
+                        if not raw:
+                            body = None
+                    elif raw:
+                        body = response.content
+                        result = json.loads(body)
+                    else:
+                        body, result = None, response.json()
+                    if measured is not None:
+                        measured.bytes_received += _body_bytes(response)
+                    if api_key is not None:
+                        self.key_pool.record_usage(api_key, estimated,
+                                                   result.get("usage", {}).get("total_tokens"))
+                    return result, body
+                except requests.exceptions.RequestException as e:
+                    raise _api_error(e) from e
+                except ValueError as e:
+                    raise PerplexityError(f"API call failed: invalid JSON response: {e}") from e
+                finally:
+                    if streamed and response is not None:
+                        response.close()
+
+            def attempt(timeout: Timeouts) -> Tuple[Dict[str, Any], Optional[bytes]]:
+                def keyed(hedged: bool) -> Tuple[Dict[str, Any], Optional[bytes]]:
+                    return self._with_key(lambda api_key: send(timeout, hedged, api_key), estimated)
+
+                def run() -> Tuple[Dict[str, Any], Optional[bytes]]:
+                    if self.hedge is None:
+                        return keyed(False)
+                    return self.hedge.run(model, keyed)
+
+                if self.concurrency_limit is None:
+                    return run()
+                return self.concurrency_limit.call(run)
+
+            started = time.perf_counter()
+            try:
+                result, body = self.retry_policy.call(attempt)
+            except PerplexityError as e:
+                record_route_outcome(self.router, model, started, e)
+                raise
+            record_route_outcome(self.router, model, started)
+            usage = result.get("usage", {})
+            if metrics is not None:
+                metrics.set_usage(usage)
+            self.calibrator.record(model, size.raw_prompt_tokens, usage.get("prompt_tokens"))
+            if self.rate_limiter is not None:
+                self.rate_limiter.record_usage(estimated, usage.get("total_tokens"))
+            if key is not None:
+                self.cache.set(key, result, payload=body)
+                self.cache.index_similar(key, model, max_tokens, messages)
+            return body if raw else result
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._report(metrics, error)
+
+    def stream(self, model: str, max_tokens: int, query: Optional[str] = None,
+               messages: Optional[List[Dict[str, str]]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Send a streaming chat completion request and yield chunks as they arrive.
+
+        Args:
+            model (str): The model to use for the query
+            max_tokens (int): Maximum number of tokens for the response
+            query (Optional[str]): A single-turn query; ignored if messages is given
+            messages (Optional[List[Dict[str, str]]]): Full message list to send
+
+        Yields:
+            Dict[str, Any]: Each ``chat.completion.chunk`` sent by the API
+
+        Raises:
+            PromptTooLargeError: If the prompt does not fit in the context window
+            PerplexityError: If the API call fails
+        """
+        messages = messages or build_messages(query)
+        if self.singleflight is None:
+            yield from self._stream(model, max_tokens, messages)
+            return
+        key = request_key("stream", model, max_tokens, messages)
+        yield from self.singleflight.stream(key, lambda: self._stream(model, max_tokens, messages))
+
+    def _stream(self, model: str, max_tokens: int,
+                messages: List[Dict[str, str]]) -> Iterator[Dict[str, Any]]:
+        """
+        Send a streaming chat completion request and yield chunks as they arrive.
+
+        Args:
+            model (str): The model to use for the query
+            max_tokens (int): Maximum number of tokens for the response
+            messages (List[Dict[str, str]]): The chat messages to send
+
+        Yields:
+            Dict[str, Any]: Each ``chat.completion.chunk`` sent by the API
+        """
+        import requests
+
+        headers = dict(self.headers, Accept="text/event-stream")
+        size = self.calibrator.size_request(model, messages, max_tokens)
+        data = build_payload(model, size.max_tokens, messages, stream=True)
+        estimated = size.total
+        metrics = RequestMetrics(model, stream=True) if self.on_metrics is not None else None
+        error: Optional[BaseException] = None
+
+        def send(timeout: Timeouts, hedged: bool, api_key: Optional[str]
+                 ) -> Tuple["requests.Response", Iterator[Dict[str, Any]], Optional[str]]:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(estimated)
+            key_headers = headers
+            if api_key is not None:
+                key_headers = dict(headers, Authorization=f"Bearer {api_key}")
+            # Only the primary request is measured
+            measured = None if hedged else metrics
+            if measured is not None:
+                measured.start_attempt()
+            response = None
+            try:
+                logger.debug("Sending %sstreaming request to Perplexity AI API",
+                             "hedged " if hedged else "")
+                with recording(measured):
+                    response = self.session.post(self.base_url, headers=key_headers, json=data,
+                                                 timeout=timeout, stream=True)
+                _observe_response(measured, response)
+                response.raise_for_status()
+                lines = response.iter_lines()
+                if timeout.deadline_at is not None:
+                    lines = _until_deadline(lines, timeout)
+                if measured is not None:
+                    lines = _count_lines(lines, measured)
+                events = iter_sse_events(lines)
+                if self.hedge is not None:
+                    # A hedged stream is won by the first chunk, not the headers
+                    events = itertools.chain(list(itertools.islice(events, 1)), events)
+                return response, events, api_key
+            except requests.exceptions.RequestException as e:
+                if response is not None:
+                    response.close()
+                raise _api_error(e) from e
+            except BaseException:
+                if response is not None:
+                    response.close()
+                raise
+
+        def attempt(timeout: Timeouts
+                    ) -> Tuple["requests.Response", Iterator[Dict[str, Any]], Optional[str]]:
+            def keyed(hedged: bool
+                      ) -> Tuple["requests.Response", Iterator[Dict[str, Any]], Optional[str]]:
+                return self._with_key(lambda api_key: send(timeout, hedged, api_key), estimated)
+
+            if self.hedge is None:
+                return keyed(False)
+            return self.hedge.run(model, keyed, stream=True,
+                                  discard=lambda result: result[0].close())
+
+        # Only establishing the stream is retried; once chunks have been
+        # yielded, a failure is reported to the caller.
+        response = api_key = None
+        usage: Dict[str, Any] = {}
+        started: Optional[float] = time.perf_counter()
+        try:
+            response, events, api_key = self.retry_policy.call(attempt)
+            for chunk in events:
+                usage = chunk.get("usage") or usage
+                if metrics is not None:
+                    metrics.first_token()
+                if started is not None:
+                    record_route_outcome(self.router, model, started, stream=True)
+                    started = None
+                yield chunk
+        except requests.exceptions.RequestException as e:
+            error = _api_error(e)
+            raise error from e
+        except GeneratorExit:
+            # The caller stopped reading early, which is not a failure
+            raise
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            if started is not None and error is not None:
+                record_route_outcome(self.router, model, started, error, stream=True)
+            if response is not None:
+                response.close()
+                self.calibrator.record(model, size.raw_prompt_tokens, usage.get("prompt_tokens"))
+                if self.rate_limiter is not None:
+                    self.rate_limiter.record_usage(estimated, usage.get("total_tokens"))
+                if api_key is not None:
+                    self.key_pool.record_usage(api_key, estimated, usage.get("total_tokens"))
+            if metrics is not None:
+                metrics.set_usage(usage)
+            self._report(metrics, error)
@@ -0,0 +1,300 @@
+"""
+Concurrency module for Perplexity CLI.
+
+This module adapts how many requests are in flight to what the API will
+sustain, in the style of TCP congestion control: the limit grows by about
+one request per round trip while requests succeed at a steady latency, and
+is cut multiplicatively on 429s, server errors, timeouts or a latency spike.
+Callers waiting on an event loop are queued and handed freed slots in
+arrival order.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple, TypeVar
+
+from perplexity_cli.config import DEFAULT_CONCURRENCY
+from perplexity_cli.exceptions import APITimeoutError, RateLimitError, ServerError
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_MIN_LIMIT = 1
+DEFAULT_MAX_LIMIT = 64
+DEFAULT_BACKOFF = 0.5
+DEFAULT_LATENCY_TOLERANCE = 2.0
+LATENCY_BACKOFF = 0.9
+SHORT_ALPHA = 0.2
+LONG_ALPHA = 0.02
+MIN_LATENCY_SAMPLES = 10
+OVERLOAD_ERRORS = (RateLimitError, ServerError, APITimeoutError)
+
+T = TypeVar("T")
+
+
+def _grant(waiter: Any) -> None:
+    """
+    Wake an async caller that was handed a slot, unless it gave up waiting.
+
+    Args:
+        waiter (asyncio.Future): The caller's future
+    """
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class AdaptiveLimit:
+    """
+    Additive-increase, multiplicative-decrease limit on requests in flight.
+
+    Each success adds ``1 / limit``, so the limit grows by about one per
+    round of requests, but only while at least half of it is in use. A 429, server
+    error or timeout multiplies it by ``backoff``; latency that drifts above
+    ``latency_tolerance`` times its long-term average multiplies it by
+    ``LATENCY_BACKOFF``. Only requests started after the last cut can cut
+    it again, so one burst of errors counts once.
+
+    Async callers that find the limit reached wait in a FIFO queue; each
+    released slot is handed to the oldest of them through its event loop's
+    ``call_soon_threadsafe``, so they neither poll nor overtake each other.
+
+    Args:
+        initial (int): Limit to start from
+        min_limit (int): Lowest the limit may go
+        max_limit (int): Highest the limit may go
+        backoff (float): Factor the limit is cut by on overload errors
+        latency_tolerance (float): Ratio of recent to long-term latency that
+            counts as a spike
+
+    Raises:
+        ValueError: If the bounds or factors are out of range
+    """
+
+    def __init__(self, initial: int = DEFAULT_CONCURRENCY, min_limit: int = DEFAULT_MIN_LIMIT,
+                 max_limit: int = DEFAULT_MAX_LIMIT, backoff: float = DEFAULT_BACKOFF,
+                 latency_tolerance: float = DEFAULT_LATENCY_TOLERANCE) -> None:
+        if not 1 <= min_limit <= max_limit:
+            raise ValueError("The concurrency limits must satisfy 1 <= min_limit <= max_limit")
+        if not 0 < backoff < 1 or latency_tolerance <= 1:
+            raise ValueError("backoff must be between 0 and 1 and latency_tolerance above 1")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self._limit = float(min(max(initial, min_limit), max_limit))
+        self._in_flight = 0
+        self._short_latency: Optional[float] = None
+        self._long_latency: Optional[float] = None
+        self._samples = 0
+        self._last_cut = 0.0
+        self._increases = 0
+        self._decreases = 0
+        self._waiters: Deque[Tuple[Any, Any]] = deque()
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        """
+        int: Requests currently allowed in flight.
+        """
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        """
+        int: Requests currently in flight.
+        """
+        return self._in_flight
+
+    def try_acquire(self) -> Optional[float]:
+        """
+        Take a slot if one is free.
+
+        Returns:
+            Optional[float]: The start time to pass to ``release``, or None if
+            the limit is reached
+        """
+        with self._condition:
+            if self._waiters or self._in_flight >= int(self._limit):
+                return None
+            self._in_flight += 1
+            return time.monotonic()
+
+    def acquire(self) -> float:
+        """
+        Wait for a free slot and take it.
+
+        Returns:
+            float: The start time to pass to ``release``
+        """
+        with self._condition:
+            while self._waiters or self._in_flight >= int(self._limit):
+                self._condition.wait()
+            self._in_flight += 1
+            return time.monotonic()
+
+    async def acquire_async(self) -> float:
+        """
+        Wait without blocking the event loop for a free slot, then take it.
+
+        Waiters are served in the order they arrived. A waiter cancelled
+        after being handed a slot gives it back.
+
+        Returns:
+            float: The start time to pass to ``release``
+        """
+        import asyncio
+
+        loop = asyncio.get_event_loop()
+        with self._condition:
+            if not self._waiters and self._in_flight < int(self._limit):
+                self._in_flight += 1
+                return time.monotonic()
+            waiter = loop.create_future()
+            self._waiters.append((loop, waiter))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            with self._condition:
+                if (loop, waiter) in self._waiters:
+                    self._waiters.remove((loop, waiter))
+                else:
+                    self._in_flight -= 1
+                self._wake()
+                self._condition.notify_all()
+            raise
+        return time.monotonic()
+
+    def _wake(self) -> None:
+        """
+        Hand free slots to the oldest waiting async callers.
+
+        Must be called with the condition held. The slot is taken on the
+        waiter's behalf here, then its future is resolved on its own loop.
+        """
+        while self._waiters and self._in_flight < int(self._limit):
+            loop, waiter = self._waiters.popleft()
+            self._in_flight += 1
+            try:
+                loop.call_soon_threadsafe(_grant, waiter)
+            except RuntimeError:
+                # The waiter's loop is closed; nobody will take the slot
+                self._in_flight -= 1
+
+    def release(self, started: float, error: Optional[BaseException] = None) -> None:
+        """
+        Free a slot and adjust the limit to the outcome of its request.
+
+        Errors that say nothing about load, such as a rejected key or an
+        invalid request, leave the limit alone.
+
+        Args:
+            started (float): The value returned by ``acquire``
+            error (Optional[BaseException]): The error the request failed with, if any
+        """
+        now = time.monotonic()
+        with self._condition:
+            used = self._in_flight * 2 >= self._limit
+            self._in_flight -= 1
+            if isinstance(error, OVERLOAD_ERRORS):
+                self._cut(started, self.backoff, type(error).__name__)
+            elif error is None:
+                latency = now - started
+                if self._samples:
+                    self._short_latency += SHORT_ALPHA * (latency - self._short_latency)
+                    self._long_latency += LONG_ALPHA * (latency - self._long_latency)
+                else:
+                    self._short_latency = self._long_latency = latency
+                self._samples += 1
+                if (self._samples >= MIN_LATENCY_SAMPLES and
+                        self._short_latency > self.latency_tolerance * self._long_latency):
+                    if self._cut(started, LATENCY_BACKOFF, "latency spike"):
+                        self._short_latency = self._long_latency
+                elif used and self._limit < self.max_limit:
+                    previous = int(self._limit)
+                    self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+                    if int(self._limit) > previous:
+                        self._increases += 1
+                        logger.debug("Raised the concurrency limit to %d", int(self._limit))
+            self._wake()
+            self._condition.notify_all()
+
+    def _cut(self, started: float, factor: float, reason: str) -> bool:
+        """
+        Cut the limit, unless the request started before the previous cut.
+
+        Args:
+            started (float): When the request that saw the problem started
+            factor (float): Factor to multiply the limit by
+            reason (str): What triggered the cut, for the log
+
+        Returns:
+            bool: Whether the limit was cut
+        """
+        if started < self._last_cut:
+            return False
+        self._last_cut = time.monotonic()
+        self._limit = max(float(self.min_limit), self._limit * factor)
+        self._decreases += 1
+        logger.debug("Cut the concurrency limit to %d after a %s", int(self._limit), reason)
+        return True
+
+    def call(self, fn: Callable[[], T]) -> T:
+        """
+        Run a request within the limit.
+
+        Args:
+            fn (Callable[[], T]): Sends the request
+
+        Returns:
+            T: The result of ``fn``
+        """
+        started = self.acquire()
+        try:
+            result = fn()
+        except BaseException as e:
+            self.release(started, e)
+            raise
+        self.release(started)
+        return result
+
+    async def call_async(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run a request on the event loop within the limit.
+
+        Args:
+            fn (Callable[[], Awaitable[T]]): Sends the request
+
+        Returns:
+            T: The result of ``fn``
+        """
+        started = await self.acquire_async()
+        try:
+            result = await fn()
+        except BaseException as e:
+            self.release(started, e)
+            raise
+        self.release(started)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report the limit and how it has moved.
+
+        Returns:
+            Dict[str, Any]: Current limit, requests in flight, raises and cuts,
+            and the recent and long-term latency in seconds
+        """
+        with self._condition:
+            return {
+                "limit": int(self._limit),
+                "in_flight": self._in_flight,
+                "increases": self._increases,
+                "decreases": self._decreases,
+                "latency": None if self._short_latency is None else round(self._short_latency, 3),
+                "baseline_latency": (None if self._long_latency is None
+                                     else round(self._long_latency, 3)),
+            }
@@ -8,42 +8,78 @@ import os
 import logging
 import configparser
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
 # Constants
 CONFIG_FILE = Path.home() / ".perplexity_cli_config"
+DATA_DIR = Path.home() / ".perplexity_cli"
 DEFAULT_MAX_TOKENS = 4000
 DEFAULT_MODEL = "sonar-pro"
+DEFAULT_CONCURRENCY = 4
+AUTO_CONCURRENCY = "auto"
+DEFAULT_CACHE_TTL = 24 * 60 * 60
+DEFAULT_CACHE_SIMILARITY = 0.8
+DEFAULT_HISTORY_TOKENS = 8000
+DEFAULT_HEDGE_PERCENTILE = 0.95
+DEFAULT_HEDGE_MAX_RATIO = 0.1
+DEFAULT_CHUNK_TOKENS = 3000
+DEFAULT_CHUNK_OVERLAP = 200
+DEFAULT_GATEWAY_HOST = "127.0.0.1"
+DEFAULT_GATEWAY_PORT = 8000
+
+# Parsed config keyed by (path, mtime, size), so repeated loads skip the parser
+_config_memo: Dict[Tuple[str, int, int], Dict[str, str]] = {}
+
 
 def load_config() -> Dict[str, str]:
     """
     Load configuration from config file if it exists.
     
+    The parsed file is memoized until its modification time or size changes.
+    
     Returns:
         Dict[str, str]: Configuration dictionary
     """
     config = {}
     config_file = Path(CONFIG_FILE)
     
-    if config_file.exists():
-        try:
-            parser = configparser.ConfigParser()
-            parser.read(config_file)
-            
-            if "perplexity" in parser:
-                if "api_key" in parser["perplexity"]:
-                    config["api_key"] = parser["perplexity"]["api_key"]
-                if "default_model" in parser["perplexity"]:
-                    config["default_model"] = parser["perplexity"]["default_model"]
-                if "max_tokens" in parser["perplexity"]:
-                    config["max_tokens"] = parser["perplexity"]["max_tokens"]
-            
-            logger.debug("Loaded configuration from %s", config_file)
-        except Exception as e:
-            logger.warning("Failed to load config file: %s", e)
+    try:
+        stat = config_file.stat()
+    except OSError:
+        return config
+    
+    memo_key = (str(config_file), stat.st_mtime_ns, stat.st_size)
+    if memo_key in _config_memo:
+        return dict(_config_memo[memo_key])
+    
+    try:
+        parser = configparser.ConfigParser()
+        parser.read(config_file)
+        
+        if "perplexity" in parser:
+            if "api_key" in parser["perplexity"]:
+                config["api_key"] = parser["perplexity"]["api_key"]
+            if "api_keys" in parser["perplexity"]:
+                config["api_keys"] = parser["perplexity"]["api_keys"]
+            if "default_model" in parser["perplexity"]:
+                config["default_model"] = parser["perplexity"]["default_model"]
+            if "max_tokens" in parser["perplexity"]:
+                config["max_tokens"] = parser["perplexity"]["max_tokens"]
+            if "cache" in parser["perplexity"]:
+                config["cache"] = parser["perplexity"]["cache"]
+            if "requests_per_minute" in parser["perplexity"]:
+                config["requests_per_minute"] = parser["perplexity"]["requests_per_minute"]
+            if "tokens_per_minute" in parser["perplexity"]:
+                config["tokens_per_minute"] = parser["perplexity"]["tokens_per_minute"]
+        
+        logger.debug("Loaded configuration from %s", config_file)
+        _config_memo.clear()
+        _config_memo[memo_key] = dict(config)
+    except Exception as e:
+        logger.warning("Failed to load config file: %s", e)
     
     return config
 
@@ -76,6 +112,41 @@ def get_api_key() -> str:
     return api_key
 
 
+def get_api_keys() -> List[str]:
+    """
+    Get every configured Perplexity API key, for spreading requests over them.
+    
+    Keys are read from the ``PERPLEXITY_API_KEYS`` environment variable or the
+    ``api_keys`` config entry, separated by commas or whitespace. Without
+    either, the single key from ``get_api_key`` is used.
+    
+    Returns:
+        List[str]: The API keys
+        
+    Raises:
+        EnvironmentError: If no API key is found
+    """
+    keys = os.getenv("PERPLEXITY_API_KEYS") or load_config().get("api_keys", "")
+    keys = [key for key in keys.replace(",", " ").split() if key]
+    return keys or [get_api_key()]
+
+
+def get_data_dir() -> Path:
+    """
+    Get the directory that holds the CLI's local state (cache, etc.).
+    
+    The directory is created with user-only permissions if it is missing.
+    
+    Returns:
+        Path: The data directory
+    """
+    data_dir = Path(DATA_DIR)
+    if not data_dir.exists():
+        data_dir.mkdir(parents=True, exist_ok=True)
+        os.chmod(data_dir, 0o700)
+    return data_dir
+
+
 def save_config(api_key: Optional[str] = None, default_model: Optional[str] = None, 
                max_tokens: Optional[int] = None) -> None:
     """
@@ -105,6 +176,7 @@ def save_config(api_key: Optional[str] = None, default_model: Optional[str] = No
         config["perplexity"]["max_tokens"] = str(max_tokens)
     
     # Write config file
+    _config_memo.clear()
     try:
         with open(CONFIG_FILE, 'w') as f:
             config.write(f)
@@ -0,0 +1,178 @@
+"""
+Conversation module for Perplexity CLI.
+
+This module holds the history of a multi-turn conversation in memory and
+keeps the message list sent to the API within a token budget by folding
+the oldest turns into a short summary.
+"""
+
+import logging
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from perplexity_cli.client import DEFAULT_SYSTEM_PROMPT
+from perplexity_cli.config import DEFAULT_HISTORY_TOKENS
+from perplexity_cli.models import context_window
+from perplexity_cli.tokens import estimate_message_tokens
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Constants
+SUMMARY_PREFIX = "Earlier in this conversation the user asked: "
+SUMMARY_MAX_CHARS = 600
+EXCERPT_CHARS = 80
+
+
+class Conversation:
+    """
+    In-memory history of a multi-turn conversation.
+
+    Turns are kept in a deque together with their estimated token counts, so
+    checking the size of the history never re-scans it. When the history
+    outgrows the budget, the oldest user/assistant pairs are dropped and
+    their questions are kept as short excerpts in the system prompt.
+
+    Args:
+        system_prompt (str): The system prompt sent before the history
+        max_history_tokens (int): Token budget for the messages of one request
+    """
+
+    def __init__(self, system_prompt: str = DEFAULT_SYSTEM_PROMPT,
+                 max_history_tokens: int = DEFAULT_HISTORY_TOKENS) -> None:
+        self.system_prompt = system_prompt
+        self.max_history_tokens = max_history_tokens
+        self.trimmed = 0
+        self._turns: Deque[Tuple[str, str, int]] = deque()
+        self._tokens = 0
+        self._excerpts: Deque[str] = deque()
+
+    def __len__(self) -> int:
+        return len(self._turns)
+
+    @property
+    def tokens(self) -> int:
+        """
+        int: Estimated tokens of the messages ``messages`` would return.
+        """
+        return self._tokens + estimate_message_tokens(self._system_content())
+
+    def add(self, role: str, content: str) -> None:
+        """
+        Append a turn to the history.
+
+        Args:
+            role (str): "user" or "assistant"
+            content (str): The message content
+        """
+        tokens = estimate_message_tokens(content)
+        self._turns.append((role, content, tokens))
+        self._tokens += tokens
+
+    def pop(self) -> Optional[Tuple[str, str]]:
+        """
+        Remove the most recent turn, e.g. a question whose answer failed.
+
+        Returns:
+            Optional[Tuple[str, str]]: The removed role and content, if any
+        """
+        if not self._turns:
+            return None
+        role, content, tokens = self._turns.pop()
+        self._tokens -= tokens
+        return role, content
+
+    def reset(self) -> None:
+        """
+        Forget the whole history, including the summary.
+        """
+        self._turns.clear()
+        self._excerpts.clear()
+        self._tokens = 0
+        self.trimmed = 0
+
+    def _system_content(self) -> str:
+        """
+        Build the system message, including the summary of trimmed turns.
+
+        Returns:
+            str: The system message content
+        """
+        if not self._excerpts:
+            return self.system_prompt
+        return f"{self.system_prompt}\n\n{SUMMARY_PREFIX}{'; '.join(self._excerpts)}"
+
+    def _summarize(self, content: str) -> None:
+        """
+        Keep a short excerpt of a trimmed question, dropping the oldest excerpts
+        once the summary is full.
+
+        Args:
+            content (str): The trimmed user message
+        """
+        excerpt = " ".join(content.split())
+        if len(excerpt) > EXCERPT_CHARS:
+            excerpt = excerpt[:EXCERPT_CHARS - 3] + "..."
+        self._excerpts.append(excerpt)
+        while sum(len(e) + 2 for e in self._excerpts) > SUMMARY_MAX_CHARS:
+            self._excerpts.popleft()
+
+    def trim(self, budget: Optional[int] = None) -> int:
+        """
+        Drop the oldest turns until the messages fit in the budget.
+
+        Turns are dropped in user/assistant pairs, and the most recent
+        question is always kept.
+
+        Args:
+            budget (Optional[int]): Token budget; defaults to ``max_history_tokens``
+
+        Returns:
+            int: Number of turns dropped
+        """
+        budget = self.max_history_tokens if budget is None else budget
+        dropped = 0
+        while self.tokens > budget and len(self._turns) > 1:
+            role, content, tokens = self._turns.popleft()
+            self._tokens -= tokens
+            dropped += 1
+            if role == "user":
+                self._summarize(content)
+            if self._turns and self._turns[0][0] == "assistant":
+                self._tokens -= self._turns.popleft()[2]
+                dropped += 1
+        # The summary must not crowd out the latest question either
+        while self.tokens > budget and self._excerpts:
+            self._excerpts.popleft()
+        if dropped:
+            self.trimmed += dropped
+            logger.debug("Trimmed %d turns from the conversation history", dropped)
+        return dropped
+
+    def messages(self) -> List[Dict[str, str]]:
+        """
+        Build the message list to send to the API.
+
+        Returns:
+            List[Dict[str, str]]: System message followed by the history
+        """
+        messages = [{"role": "system", "content": self._system_content()}]
+        messages.extend({"role": role, "content": content} for role, content, _ in self._turns)
+        return messages
+
+    def request_messages(self, model: str, max_tokens: int) -> List[Dict[str, str]]:
+        """
+        Trim the history to fit the request, then build the message list.
+
+        The budget is the smaller of ``max_history_tokens`` and the room the
+        model's context window leaves after ``max_tokens``.
+
+        Args:
+            model (str): The model the request is for
+            max_tokens (int): Maximum number of tokens for the response
+
+        Returns:
+            List[Dict[str, str]]: The message list to send
+        """
+        self.trim(min(self.max_history_tokens, context_window(model) - max_tokens))
+        return self.messages()
@@ -0,0 +1,281 @@
+"""
+Daemon module for Perplexity CLI.
+
+This module implements an optional resident daemon that keeps a warm client
+(pooled connections, API key, cache and rate limit state) and answers
+requests forwarded by the CLI over a Unix domain socket.
+
+The protocol is newline-delimited JSON. The CLI sends one request line:
+
+    {"model": ..., "max_tokens": ..., "query": ..., "stream": false}
+
+and the daemon answers with ``{"response": ...}``, or with one
+``{"chunk": ...}`` line per streamed chunk followed by ``{"done": true}``.
+Failures are sent as ``{"error": ..., "error_type": ...}``, plus the
+``status_code``, ``message`` and ``retry_after`` of API errors, and are
+raised again in the CLI as the same exception class.
+"""
+
+import json
+import logging
+import os
+import socket
+import socketserver
+from pathlib import Path
+from typing import Dict, Any, Iterator, Optional, Union
+
+from perplexity_cli.config import get_data_dir
+from perplexity_cli.exceptions import (
+    APIConnectionError, APIError, APITimeoutError, AuthenticationError, DeadlineExceededError,
+    PerplexityError, PromptTooLargeError, RateLimitError, ServerError
+)
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Constants
+SOCKET_FILENAME = "daemon.sock"
+ERROR_TYPES = {error.__name__: error for error in (
+    APIError, AuthenticationError, RateLimitError, ServerError, APIConnectionError,
+    APITimeoutError, DeadlineExceededError, PromptTooLargeError
+)}
+
+
+def socket_path() -> Path:
+    """
+    Get the path of the daemon's Unix domain socket.
+
+    Returns:
+        Path: The socket path
+    """
+    return get_data_dir() / SOCKET_FILENAME
+
+
+def forward(request: Dict[str, Any],
+            path: Optional[Union[str, Path]] = None) -> Optional[Iterator[Dict[str, Any]]]:
+    """
+    Send a request to the daemon, if one is running.
+
+    The connection is made before returning, so None reliably means the
+    caller should fall back to calling the API directly.
+
+    Args:
+        request (Dict[str, Any]): The request to forward
+        path (Optional[Union[str, Path]]): Socket path; defaults to ``socket_path()``
+
+    Returns:
+        Optional[Iterator[Dict[str, Any]]]: The daemon's reply messages, or None
+            if no daemon is listening
+    """
+    path = Path(path) if path else socket_path()
+    if not hasattr(socket, "AF_UNIX") or not path.exists():
+        return None
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(str(path))
+        sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+    except OSError as e:
+        logger.debug("Daemon not reachable at %s: %s", path, e)
+        sock.close()
+        return None
+
+    logger.debug("Forwarded request to daemon at %s", path)
+    return _read_messages(sock)
+
+
+def _read_messages(sock: socket.socket) -> Iterator[Dict[str, Any]]:
+    """
+    Read the daemon's reply messages until it is done.
+
+    Args:
+        sock (socket.socket): The connected socket
+
+    Yields:
+        Dict[str, Any]: Each reply message
+
+    Raises:
+        PerplexityError: If the daemon reports an error, as the class it was raised with
+    """
+    with sock, sock.makefile("rb") as reader:
+        for line in reader:
+            message = json.loads(line)
+            if "error" in message:
+                raise error_from_message(message)
+            if message.get("done"):
+                return
+            yield message
+            if "response" in message:
+                return
+    raise PerplexityError("Daemon closed the connection unexpectedly")
+
+
+def error_to_message(error: BaseException) -> Dict[str, Any]:
+    """
+    Describe an error so that the CLI can raise it again.
+
+    Args:
+        error (BaseException): The error a forwarded request failed with
+
+    Returns:
+        Dict[str, Any]: The error message to send
+    """
+    message: Dict[str, Any] = {"error": str(error), "error_type": type(error).__name__}
+    if isinstance(error, APIError):
+        message.update(status_code=error.status_code, message=error.message)
+    if isinstance(error, RateLimitError):
+        message["retry_after"] = error.retry_after
+    return message
+
+
+def error_from_message(message: Dict[str, Any]) -> PerplexityError:
+    """
+    Rebuild the error a forwarded request failed with in the daemon.
+
+    Unknown error types become a plain ``PerplexityError``.
+
+    Args:
+        message (Dict[str, Any]): The error message sent by the daemon
+
+    Returns:
+        PerplexityError: The error to raise
+    """
+    error_type = ERROR_TYPES.get(message.get("error_type"))
+    if error_type is None:
+        return PerplexityError(message["error"])
+    if issubclass(error_type, APIError):
+        if "status_code" not in message:
+            return PerplexityError(message["error"])
+        if error_type is RateLimitError:
+            return RateLimitError(message["status_code"], message.get("message", ""),
+                                  retry_after=message.get("retry_after"))
+        return error_type(message["status_code"], message.get("message", ""))
+    return error_type(message["error"])
+
+
+def complete_via_daemon(model: str, max_tokens: int, query: str,
+                        path: Optional[Union[str, Path]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Ask the daemon for a completion.
+
+    Args:
+        model (str): The model to use for the query
+        max_tokens (int): Maximum number of tokens for the response
+        query (str): The query to send to the API
+        path (Optional[Union[str, Path]]): Socket path; defaults to ``socket_path()``
+
+    Returns:
+        Optional[Dict[str, Any]]: The API response, or None if no daemon is running
+    """
+    messages = forward({"model": model, "max_tokens": max_tokens, "query": query,
+                        "stream": False}, path)
+    if messages is None:
+        return None
+    for message in messages:
+        return message["response"]
+    raise PerplexityError("Daemon sent no response")
+
+
+def stream_via_daemon(model: str, max_tokens: int, query: str,
+                      path: Optional[Union[str, Path]] = None) -> Optional[Iterator[Dict[str, Any]]]:
+    """
+    Ask the daemon for a streamed completion.
+
+    Args:
+        model (str): The model to use for the query
+        max_tokens (int): Maximum number of tokens for the response
+        query (str): The query to send to the API
+        path (Optional[Union[str, Path]]): Socket path; defaults to ``socket_path()``
+
+    Returns:
+        Optional[Iterator[Dict[str, Any]]]: The streamed chunks, or None if no
+            daemon is running
+    """
+    messages = forward({"model": model, "max_tokens": max_tokens, "query": query,
+                        "stream": True}, path)
+    if messages is None:
+        return None
+    return (message["chunk"] for message in messages)
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """
+    Serve one forwarded request with the daemon's shared client.
+    """
+
+    def _send(self, message: Dict[str, Any]) -> None:
+        self.wfile.write(json.dumps(message).encode("utf-8") + b"\n")
+        self.wfile.flush()
+
+    def handle(self) -> None:
+        client = self.server.client
+        try:
+            request = json.loads(self.rfile.readline())
+            args = (request["model"], int(request["max_tokens"]), request["query"])
+            if request.get("stream"):
+                for chunk in client.stream(*args):
+                    self._send({"chunk": chunk})
+                self._send({"done": True})
+            else:
+                self._send({"response": client.complete(*args)})
+        except BrokenPipeError:
+            logger.debug("CLI disconnected before the reply was sent")
+        except Exception as e:
+            logger.debug("Daemon request failed: %s", e)
+            try:
+                self._send(error_to_message(e))
+            except OSError:
+                pass
+
+
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Threaded Unix socket server that shares one client between requests.
+
+    Args:
+        path (str): Socket path to listen on
+        client (Any): The warm ``PerplexityClient`` used for every request
+    """
+
+    daemon_threads = True
+
+    def __init__(self, path: str, client: Any) -> None:
+        self.client = client
+        super().__init__(path, _RequestHandler)
+
+
+def run_daemon(client: Any, path: Optional[Union[str, Path]] = None) -> None:
+    """
+    Serve forwarded requests until interrupted.
+
+    Args:
+        client (Any): The ``PerplexityClient`` to answer requests with
+        path (Optional[Union[str, Path]]): Socket path; defaults to ``socket_path()``
+
+    Raises:
+        RuntimeError: If another daemon is already listening on the socket
+    """
+    path = Path(path) if path else socket_path()
+
+    if path.exists():
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(str(path))
+            raise RuntimeError(f"A daemon is already running on {path}")
+        except OSError:
+            # Stale socket left by a daemon that did not shut down cleanly
+            path.unlink()
+        finally:
+            probe.close()
+
+    server = DaemonServer(str(path), client)
+    os.chmod(path, 0o600)
+    logger.info("Daemon listening on %s", path)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Daemon shutting down")
+    finally:
+        server.server_close()
+        if path.exists():
+            path.unlink()
@@ -0,0 +1,90 @@
+"""
+Exceptions module for Perplexity CLI.
+
+This module defines the errors raised by the API clients. Each error says
+whether retrying the request might succeed, so callers can tell transient
+failures from fatal ones.
+"""
+
+from typing import Optional
+
+
+class PerplexityError(Exception):
+    """
+    Base class for errors raised by the Perplexity clients.
+    """
+
+    retryable = False
+
+
+class APIError(PerplexityError):
+    """
+    The API answered with an error status.
+
+    Args:
+        status_code (int): The HTTP status code
+        message (str): The error message returned by the API
+    """
+
+    def __init__(self, status_code: int, message: str) -> None:
+        super().__init__(f"API call failed with status code {status_code}: {message}")
+        self.status_code = status_code
+        self.message = message
+
+
+class AuthenticationError(APIError):
+    """
+    The API key was missing, invalid or not allowed to make the request (401/403).
+    """
+
+
+class RateLimitError(APIError):
+    """
+    The request was rejected by the API's rate limits (429).
+
+    Args:
+        status_code (int): The HTTP status code
+        message (str): The error message returned by the API
+        retry_after (Optional[float]): Seconds the API asked us to wait
+    """
+
+    retryable = True
+
+    def __init__(self, status_code: int, message: str,
+                 retry_after: Optional[float] = None) -> None:
+        super().__init__(status_code, message)
+        self.retry_after = retry_after
+
+
+class ServerError(APIError):
+    """
+    The API failed to handle the request (5xx).
+    """
+
+    retryable = True
+
+
+class APIConnectionError(PerplexityError):
+    """
+    The API could not be reached or the connection dropped.
+    """
+
+    retryable = True
+
+
+class APITimeoutError(APIConnectionError):
+    """
+    Connecting to the API or reading its response timed out.
+    """
+
+
+class DeadlineExceededError(PerplexityError):
+    """
+    The overall deadline for a call ran out before it succeeded.
+    """
+
+
+class PromptTooLargeError(PerplexityError):
+    """
+    The prompt does not fit in the model's context window, so it was not sent.
+    """
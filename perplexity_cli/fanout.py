@@ -0,0 +1,283 @@
+"""
+Fan-out module for Perplexity CLI.
+
+This module sends one query to several models at once. In first-wins mode
+the earliest complete answer is returned and the other streams are
+abandoned; in compare mode every answer is collected with its latency,
+time to first token and token usage, and laid out side by side.
+"""
+
+import itertools
+import logging
+import queue
+import shutil
+import textwrap
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, NamedTuple, Optional
+
+from perplexity_cli.client import build_messages
+from perplexity_cli.output import response_content
+
+if TYPE_CHECKING:
+    from perplexity_cli.client import PerplexityClient
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Constants
+LABEL_WIDTH = 13
+MIN_COLUMN_WIDTH = 24
+COLUMN_GAP = "  "
+
+
+class FanoutResult(NamedTuple):
+    """
+    The outcome of a query to one model.
+
+    Args:
+        model (str): The model
+        response (Optional[Dict[str, Any]]): The assembled response, if it completed
+        error (Optional[BaseException]): The error the request failed with, if any
+        latency (Optional[float]): Seconds until the answer was complete
+        ttft (Optional[float]): Seconds until the first chunk arrived
+    """
+
+    model: str
+    response: Optional[Dict[str, Any]]
+    error: Optional[BaseException]
+    latency: Optional[float]
+    ttft: Optional[float]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Describe the result as a JSON-serializable dictionary.
+
+        Returns:
+            Dict[str, Any]: Model, timings, usage and answer or error
+        """
+        result: Dict[str, Any] = {"model": self.model, "latency": _round(self.latency),
+                                  "ttft": _round(self.ttft)}
+        if self.response is not None:
+            result["usage"] = self.response.get("usage", {})
+            result["content"] = response_content(self.response)
+        if self.error is not None:
+            result["error"] = str(self.error)
+            result["error_type"] = type(self.error).__name__
+        return result
+
+
+def _round(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(seconds, 3)
+
+
+def parse_models(value: str) -> List[str]:
+    """
+    Split a comma-separated list of models.
+
+    Args:
+        value (str): The ``-m`` argument, e.g. ``"sonar,sonar-pro"``
+
+    Returns:
+        List[str]: The models, without blanks or duplicates
+    """
+    return list(dict.fromkeys(model.strip() for model in value.split(",") if model.strip()))
+
+
+def _ask(client: "PerplexityClient", model: str, max_tokens: int,
+         messages: List[Dict[str, str]], cancel: threading.Event) -> FanoutResult:
+    """
+    Stream one model's answer, stopping early once ``cancel`` is set.
+
+    Args:
+        client (PerplexityClient): The client to send the request with
+        model (str): The model
+        max_tokens (int): Maximum number of tokens for the response
+        messages (List[Dict[str, str]]): The chat messages to send
+        cancel (threading.Event): Set when the answer is no longer needed
+
+    Returns:
+        FanoutResult: The answer, or the error, with its timings
+    """
+    started = time.perf_counter()
+    ttft = None
+    last: Dict[str, Any] = {}
+    content: List[str] = []
+    usage: Dict[str, Any] = {}
+    chunks = client.stream(model, max_tokens, messages=messages)
+    try:
+        for chunk in chunks:
+            if ttft is None:
+                ttft = time.perf_counter() - started
+            if cancel.is_set():
+                return FanoutResult(model, None, None, None, ttft)
+            last = chunk
+            usage = chunk.get("usage") or usage
+            for choice in chunk.get("choices", []):
+                content.append(choice.get("delta", {}).get("content") or "")
+    except Exception as e:
+        logger.debug("Request to %s failed: %s", model, e)
+        return FanoutResult(model, None, e, None, ttft)
+    finally:
+        chunks.close()
+
+    response = dict(last, model=last.get("model", model), usage=usage)
+    response["choices"] = [{"message": {"role": "assistant", "content": "".join(content)}}]
+    return FanoutResult(model, response, None, time.perf_counter() - started, ttft)
+
+
+def _launch(client: "PerplexityClient", models: List[str], max_tokens: int, query: str,
+            cancel: threading.Event) -> "queue.Queue[FanoutResult]":
+    """
+    Start one request per model, each on its own thread.
+
+    The threads are daemon threads, so an abandoned request that is still
+    waiting for its first byte does not keep the process alive.
+
+    Args:
+        client (PerplexityClient): The client to send the requests with
+        models (List[str]): The models to ask
+        max_tokens (int): Maximum number of tokens for each response
+        query (str): The query
+        cancel (threading.Event): Set when the answers are no longer needed
+
+    Returns:
+        queue.Queue[FanoutResult]: Receives each result as it finishes
+    """
+    results: "queue.Queue[FanoutResult]" = queue.Queue()
+    messages = build_messages(query)
+    for model in models:
+        threading.Thread(target=lambda model=model: results.put(
+                             _ask(client, model, max_tokens, messages, cancel)),
+                         name=f"fanout-{model}", daemon=True).start()
+    return results
+
+
+def first_wins(client: "PerplexityClient", models: List[str], max_tokens: int,
+               query: str) -> FanoutResult:
+    """
+    Ask several models and return the earliest complete answer.
+
+    The other requests stop reading, and close their connections, at their
+    next chunk.
+
+    Args:
+        client (PerplexityClient): The client to send the requests with
+        models (List[str]): The models to ask
+        max_tokens (int): Maximum number of tokens for each response
+        query (str): The query
+
+    Returns:
+        FanoutResult: The first successful result
+
+    Raises:
+        PerplexityError: The last error, if every model failed
+    """
+    cancel = threading.Event()
+    results = _launch(client, models, max_tokens, query, cancel)
+    error: Optional[BaseException] = None
+    for _ in models:
+        result = results.get()
+        if result.error is None:
+            cancel.set()
+            logger.info("First answer from %s in %.2fs", result.model, result.latency)
+            return result
+        error = result.error
+    raise error
+
+
+def compare(client: "PerplexityClient", models: List[str], max_tokens: int,
+            query: str) -> List[FanoutResult]:
+    """
+    Ask several models concurrently and collect every answer.
+
+    Args:
+        client (PerplexityClient): The client to send the requests with
+        models (List[str]): The models to ask
+        max_tokens (int): Maximum number of tokens for each response
+        query (str): The query
+
+    Returns:
+        List[FanoutResult]: One result per model, in the order given
+    """
+    results = _launch(client, models, max_tokens, query, threading.Event())
+    collected = {}
+    for _ in models:
+        result = results.get()
+        collected[result.model] = result
+    return [collected[model] for model in models]
+
+
+def format_comparison(results: List[FanoutResult], width: Optional[int] = None) -> str:
+    """
+    Lay out answers side by side, under their timings and token usage.
+
+    If the columns would be narrower than ``MIN_COLUMN_WIDTH``, the answers
+    are stacked instead.
+
+    Args:
+        results (List[FanoutResult]): The results from ``compare``
+        width (Optional[int]): Width of the output; defaults to the terminal width
+
+    Returns:
+        str: The formatted comparison
+    """
+    width = width or shutil.get_terminal_size().columns
+    column = (width - LABEL_WIDTH) // len(results) - len(COLUMN_GAP)
+    side_by_side = column >= MIN_COLUMN_WIDTH
+    column = column if side_by_side else max(MIN_COLUMN_WIDTH, width - LABEL_WIDTH)
+
+    def seconds(value: Optional[float]) -> str:
+        return "-" if value is None else f"{value:.2f}s"
+
+    def usage(result: FanoutResult, key: str) -> str:
+        value = (result.response or {}).get("usage", {}).get(key)
+        return "-" if value is None else str(value)
+
+    rows = [
+        ("model", [result.model for result in results]),
+        ("latency", [seconds(result.latency) for result in results]),
+        ("first token", [seconds(result.ttft) for result in results]),
+        ("prompt", [usage(result, "prompt_tokens") for result in results]),
+        ("completion", [usage(result, "completion_tokens") for result in results]),
+        ("total tokens", [usage(result, "total_tokens") for result in results]),
+    ]
+    answers = [f"Error: {result.error}" if result.error is not None
+               else response_content(result.response or {}) for result in results]
+
+    lines = []
+    if side_by_side:
+        for label, values in rows:
+            lines.append(label.ljust(LABEL_WIDTH) + COLUMN_GAP.join(
+                value[:column].ljust(column) for value in values).rstrip())
+        lines.append("-" * min(width, LABEL_WIDTH + len(results) * (column + len(COLUMN_GAP))))
+        wrapped = [_wrap(answer, column) for answer in answers]
+        for parts in itertools.zip_longest(*wrapped, fillvalue=""):
+            lines.append(" " * LABEL_WIDTH + COLUMN_GAP.join(
+                part.ljust(column) for part in parts).rstrip())
+    else:
+        for i, result in enumerate(results):
+            lines.append(f"--- {result.model} ---")
+            for label, values in rows[1:]:
+                lines.append(label.ljust(LABEL_WIDTH) + values[i])
+            lines.append("")
+            lines.extend(_wrap(answers[i], column))
+            lines.append("")
+    return "\n".join(lines).rstrip() + "\n"
+
+
+def _wrap(text: str, width: int) -> List[str]:
+    """
+    Wrap text to a width, keeping its paragraphs and blank lines.
+
+    Args:
+        text (str): The text to wrap
+        width (int): Maximum line width
+
+    Returns:
+        List[str]: The wrapped lines
+    """
+    lines: List[str] = []
+    for paragraph in text.splitlines() or [""]:
+        lines.extend(textwrap.wrap(paragraph, width) or [""])
+    return lines
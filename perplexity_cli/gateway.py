@@ -0,0 +1,252 @@
+"""
+Gateway module for Perplexity CLI.
+
+This module serves a local, OpenAI-compatible ``/v1/chat/completions``
+endpoint. Every application that points at it shares one pooled upstream
+``AsyncPerplexityClient``, and with it one response cache, request
+coalescing and rate limit, instead of each calling the API on its own.
+All connections are handled on a single asyncio event loop. It requires
+the optional ``aiohttp`` dependency:
+
+    pip install "perplexity-cli[async]"
+"""
+
+import json
+import logging
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+try:
+    from aiohttp import web
+except ImportError:  # pragma: no cover - exercised only without the extra
+    web = None
+
+from perplexity_cli.config import DEFAULT_GATEWAY_HOST, DEFAULT_GATEWAY_PORT
+from perplexity_cli.exceptions import (
+    APIConnectionError, APIError, APITimeoutError, PerplexityError, PromptTooLargeError
+)
+from perplexity_cli.models import AVAILABLE_MODELS
+
+if TYPE_CHECKING:
+    from perplexity_cli.async_client import AsyncPerplexityClient
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Constants
+COMPLETIONS_PATH = "/v1/chat/completions"
+MODELS_PATH = "/v1/models"
+HEALTH_PATH = "/health"
+MESSAGE_ROLES = ("system", "user", "assistant")
+
+
+def parse_request(body: Any, default_model: str,
+                  default_max_tokens: int) -> Tuple[str, int, List[Dict[str, str]], bool]:
+    """
+    Validate an OpenAI-style chat completions request body.
+
+    Args:
+        body (Any): The decoded JSON body
+        default_model (str): Model used when the request names none
+        default_max_tokens (int): Token limit used when the request sets none
+
+    Returns:
+        Tuple[str, int, List[Dict[str, str]], bool]: Model, max tokens,
+        messages and whether to stream
+
+    Raises:
+        ValueError: If the body is not a valid request
+    """
+    if not isinstance(body, dict):
+        raise ValueError("The request body must be a JSON object")
+    model = body.get("model") or default_model
+    if not isinstance(model, str):
+        raise ValueError("'model' must be a string")
+    max_tokens = body.get("max_tokens")
+    if max_tokens is None:
+        max_tokens = default_max_tokens
+    if isinstance(max_tokens, bool) or not isinstance(max_tokens, int) or max_tokens < 1:
+        raise ValueError("'max_tokens' must be a positive integer")
+    messages = body.get("messages")
+    if not isinstance(messages, list) or not messages:
+        raise ValueError("'messages' must be a non-empty list")
+    for message in messages:
+        if (not isinstance(message, dict) or message.get("role") not in MESSAGE_ROLES or
+                not isinstance(message.get("content"), str)):
+            raise ValueError("Each message needs a 'role' (system, user or assistant) "
+                             "and a string 'content'")
+    stream = body.get("stream", False)
+    if not isinstance(stream, bool):
+        raise ValueError("'stream' must be true or false")
+    messages = [{"role": message["role"], "content": message["content"]} for message in messages]
+    return model, max_tokens, messages, stream
+
+
+def error_status(error: BaseException) -> int:
+    """
+    Choose the HTTP status a failed upstream call is reported with.
+
+    Errors the API answered with keep their status; failures to reach it
+    are reported as a bad gateway, or a gateway timeout.
+
+    Args:
+        error (BaseException): The error the call failed with
+
+    Returns:
+        int: The HTTP status code
+    """
+    if isinstance(error, APIError):
+        return error.status_code
+    if isinstance(error, PromptTooLargeError):
+        return 400
+    if isinstance(error, APITimeoutError):
+        return 504
+    return 502
+
+
+def error_body(message: str, error_type: str) -> Dict[str, Any]:
+    """
+    Build an error in the shape OpenAI clients expect.
+
+    Args:
+        message (str): What went wrong
+        error_type (str): The kind of error
+
+    Returns:
+        Dict[str, Any]: The JSON error body
+    """
+    return {"error": {"message": message, "type": error_type, "code": None}}
+
+
+def _error_response(status: int, message: str, error_type: str) -> "web.Response":
+    return web.json_response(error_body(message, error_type), status=status)
+
+
+def _sse(data: str) -> bytes:
+    return f"data: {data}\n\n".encode("utf-8")
+
+
+def create_app(client: "AsyncPerplexityClient", default_model: str,
+               default_max_tokens: int) -> "web.Application":
+    """
+    Build the gateway application around a shared client.
+
+    Args:
+        client (AsyncPerplexityClient): The upstream client every request is sent with
+        default_model (str): Model used when a request names none
+        default_max_tokens (int): Token limit used when a request sets none
+
+    Returns:
+        web.Application: The application, which closes the client on shutdown
+
+    Raises:
+        ImportError: If aiohttp is not installed
+    """
+    if web is None:
+        raise ImportError(
+            "The gateway requires aiohttp. "
+            "Install it with: pip install \"perplexity-cli[async]\""
+        )
+
+    async def completions(request: "web.Request") -> "web.StreamResponse":
+        try:
+            body = await request.json()
+        except ValueError:
+            return _error_response(400, "The request body is not valid JSON",
+                                   "invalid_request_error")
+        try:
+            model, max_tokens, messages, stream = parse_request(body, default_model,
+                                                                default_max_tokens)
+        except ValueError as e:
+            return _error_response(400, str(e), "invalid_request_error")
+
+        if not stream:
+            try:
+                result = await client.complete(model, max_tokens, messages=messages)
+            except PerplexityError as e:
+                logger.debug("Upstream request failed: %s", e)
+                return _error_response(error_status(e), str(e), type(e).__name__)
+            return web.json_response(result)
+        return await _stream(request, client.stream(model, max_tokens, messages=messages))
+
+    async def models(request: "web.Request") -> "web.Response":
+        return web.json_response({
+            "object": "list",
+            "data": [{"id": model, "object": "model", "owned_by": "perplexity"}
+                     for model in AVAILABLE_MODELS],
+        })
+
+    async def health(request: "web.Request") -> "web.Response":
+        return web.json_response({"status": "ok"})
+
+    async def close_client(app: "web.Application") -> None:
+        await client.close()
+
+    app = web.Application()
+    app.router.add_post(COMPLETIONS_PATH, completions)
+    app.router.add_get(MODELS_PATH, models)
+    app.router.add_get(HEALTH_PATH, health)
+    app.on_cleanup.append(close_client)
+    return app
+
+
+async def _stream(request: "web.Request", chunks: Any) -> "web.StreamResponse":
+    """
+    Relay upstream chunks to the caller as server-sent events.
+
+    The first chunk is awaited before the response starts, so a request that
+    fails to reach the API still gets a proper error status. A failure after
+    that is sent as a final ``error`` event.
+
+    Args:
+        request (web.Request): The caller's request
+        chunks (Any): The async iterator returned by ``AsyncPerplexityClient.stream``
+
+    Returns:
+        web.StreamResponse: The finished event stream, or an error response
+    """
+    try:
+        try:
+            first: Optional[Dict[str, Any]] = await chunks.__anext__()
+        except StopAsyncIteration:
+            first = None
+        except PerplexityError as e:
+            logger.debug("Upstream stream failed: %s", e)
+            return _error_response(error_status(e), str(e), type(e).__name__)
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream",
+                                               "Cache-Control": "no-cache"})
+        await response.prepare(request)
+        try:
+            if first is not None:
+                await response.write(_sse(json.dumps(first)))
+                async for chunk in chunks:
+                    await response.write(_sse(json.dumps(chunk)))
+        except PerplexityError as e:
+            logger.debug("Upstream stream failed: %s", e)
+            await response.write(_sse(json.dumps(error_body(str(e), type(e).__name__))))
+        except ConnectionResetError:
+            logger.debug("Caller disconnected during the stream")
+            return response
+        await response.write(_sse("[DONE]"))
+        await response.write_eof()
+        return response
+    finally:
+        await chunks.aclose()
+
+
+def run_gateway(client: "AsyncPerplexityClient", default_model: str, default_max_tokens: int,
+                host: str = DEFAULT_GATEWAY_HOST, port: int = DEFAULT_GATEWAY_PORT) -> None:
+    """
+    Serve the gateway until interrupted.
+
+    Args:
+        client (AsyncPerplexityClient): The upstream client every request is sent with
+        default_model (str): Model used when a request names none
+        default_max_tokens (int): Token limit used when a request sets none
+        host (str): Address to listen on
+        port (int): Port to listen on
+    """
+    app = create_app(client, default_model, default_max_tokens)
+    logger.info("Gateway listening on http://%s:%d%s", host, port, COMPLETIONS_PATH)
+    web.run_app(app, host=host, port=port, print=None, access_log=None)
+    logger.info("Gateway shut down")
@@ -0,0 +1,498 @@
+"""
+Hedging module for Perplexity CLI.
+
+This module cuts tail latency by hedging requests: when a response (or, for
+a stream, its first chunk) takes longer than a percentile of recently
+observed latencies, a duplicate request is sent and whichever answers first
+is used. The share of hedged requests is capped, so spend stays bounded,
+and the cap is kept in a file-locked state file so it holds across CLI
+invocations and concurrent processes.
+"""
+
+import atexit
+import json
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, TypeVar, Union
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+from perplexity_cli.config import get_data_dir, DEFAULT_HEDGE_PERCENTILE, DEFAULT_HEDGE_MAX_RATIO
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Constants
+HEDGE_FILENAME = "hedge.json"
+DEFAULT_MIN_SAMPLES = 10
+DEFAULT_MIN_DELAY = 0.05
+WINDOW_SIZE = 200
+BUDGET_WINDOW = 1000
+SAVE_INTERVAL = 5.0
+
+T = TypeVar("T")
+
+
+def _spawn(fn: Callable[[], T]) -> "Future[T]":
+    """
+    Run a function on a new daemon thread.
+
+    Daemon threads are used rather than an executor so that an abandoned
+    request never keeps the process from exiting.
+
+    Args:
+        fn (Callable[[], T]): The function to run
+
+    Returns:
+        Future[T]: Completes with the function's result or exception
+    """
+    future: "Future[T]" = Future()
+
+    def run() -> None:
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name="perplexity-hedge", daemon=True).start()
+    return future
+
+
+class HedgePolicy:
+    """
+    When to send a duplicate request, and how often that may happen.
+
+    Recent latencies of the primary requests are kept per model, separately
+    for full answers and for the first chunk of streams. They are persisted
+    in the data directory with the number of requests and hedges, so that
+    one-shot CLI invocations hedge too, within the same ratio cap. The counts
+    are halved whenever they pass ``BUDGET_WINDOW`` requests, so the cap
+    follows recent traffic.
+
+    The state file is locked, read and merged with this process's new
+    latencies and requests before it is written, so concurrent processes
+    never lose each other's counts. That happens at most every
+    ``SAVE_INTERVAL`` seconds, on ``flush`` (and at exit), and whenever a
+    hedge is about to be sent, so the cap is checked against every
+    process's hedges.
+
+    Args:
+        percentile (float): Hedge when a request is slower than this share of
+            recent requests, e.g. 0.95
+        max_ratio (float): Maximum share of requests that may be hedged
+        min_samples (int): Latencies needed before hedging starts
+        min_delay (float): Never hedge sooner than this many seconds
+        path (Optional[Union[str, Path]]): State file; defaults to the data directory
+        persist (bool): Whether to load and save the state file
+    """
+
+    def __init__(self, percentile: float = DEFAULT_HEDGE_PERCENTILE,
+                 max_ratio: float = DEFAULT_HEDGE_MAX_RATIO,
+                 min_samples: int = DEFAULT_MIN_SAMPLES,
+                 min_delay: float = DEFAULT_MIN_DELAY,
+                 path: Optional[Union[str, Path]] = None, persist: bool = True) -> None:
+        if not 0 < percentile < 1:
+            raise ValueError("The hedging percentile must be between 0 and 1")
+        self.percentile = percentile
+        self.max_ratio = max_ratio
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self._path = Path(path) if path else None
+        self.persist = persist
+        self._windows: Optional[Dict[str, Deque[float]]] = None
+        self._budget = {"requests": 0, "hedged": 0}
+        self._new_requests = 0
+        self._new_samples: Dict[str, List[float]] = {}
+        self._counts = {"requests": 0, "hedged": 0, "hedge_won": 0, "primary_won": 0,
+                        "capped": 0}
+        self._dirty = False
+        self._saved_at = float("-inf")
+        self._lock = threading.Lock()
+        if persist:
+            atexit.register(self.flush)
+
+    @property
+    def path(self) -> Path:
+        """
+        Path: The state file.
+        """
+        if self._path is None:
+            self._path = get_data_dir() / HEDGE_FILENAME
+        return self._path
+
+    def _state(self) -> Dict[str, Deque[float]]:
+        """
+        Return the latency windows, loading them and the hedge budget on first
+        use; the caller holds the lock.
+
+        Returns:
+            Dict[str, Deque[float]]: Recent latencies per model and request kind
+        """
+        if self._windows is None:
+            self._windows = {}
+            if self.persist:
+                self._sync()
+        return self._windows
+
+    def _sync(self, take_hedge: bool = False) -> bool:
+        """
+        Merge this process's state into the state file under an exclusive lock.
+
+        The file's counts and latencies are read, this process's new requests
+        and latencies are added, and the result is written back and kept. The
+        caller holds the lock.
+
+        Args:
+            take_hedge (bool): Also take a hedge from the merged budget, if
+                the ratio cap allows one
+
+        Returns:
+            bool: Whether a hedge was taken
+        """
+        allowed = False
+        try:
+            with open(self.path, "a+", encoding="utf-8") as f:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    f.seek(0)
+                    try:
+                        state = json.loads(f.read() or "{}")
+                    except ValueError:
+                        state = {}
+                    self._merge(state)
+                    if take_hedge:
+                        allowed = self._take_hedge()
+                    if self._dirty:
+                        f.seek(0)
+                        f.truncate()
+                        f.write(json.dumps(dict(self._budget, latencies={
+                            key: [round(s, 4) for s in window]
+                            for key, window in self._windows.items()
+                        })))
+                        f.flush()
+                        self._dirty = False
+                        self._saved_at = time.monotonic()
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(f, fcntl.LOCK_UN)
+        except OSError as e:
+            logger.debug("Failed to save hedging state: %s", e)
+            if take_hedge:
+                allowed = self._take_hedge()
+        return allowed
+
+    def _merge(self, state: Dict[str, Any]) -> None:
+        """
+        Replace the kept state with the file's, plus what is not saved yet.
+
+        Args:
+            state (Dict[str, Any]): The decoded state file
+        """
+        windows: Dict[str, Deque[float]] = {}
+        budget = {"requests": 0, "hedged": 0}
+        try:
+            for key, samples in state.get("latencies", {}).items():
+                windows[key] = deque(samples, maxlen=WINDOW_SIZE)
+            budget = {"requests": int(state.get("requests", 0)),
+                      "hedged": int(state.get("hedged", 0))}
+        except (ValueError, TypeError, AttributeError):
+            pass
+        for key, samples in self._new_samples.items():
+            windows.setdefault(key, deque(maxlen=WINDOW_SIZE)).extend(samples)
+        budget["requests"] += self._new_requests
+        if budget["requests"] > BUDGET_WINDOW:
+            budget = {name: count // 2 for name, count in budget.items()}
+        self._windows = windows
+        self._budget = budget
+        self._new_samples = {}
+        self._new_requests = 0
+
+    def _take_hedge(self) -> bool:
+        """
+        Take a hedge from the budget, if the ratio cap allows one; the caller
+        holds the lock.
+
+        Returns:
+            bool: Whether a duplicate may be sent
+        """
+        requests = self._budget["requests"] + self._new_requests
+        if self._budget["hedged"] < self.max_ratio * requests:
+            self._budget["hedged"] += 1
+            self._counts["hedged"] += 1
+            self._dirty = True
+            return True
+        self._counts["capped"] += 1
+        return False
+
+    def _save_due(self) -> bool:
+        """
+        Check whether the throttled save is due; the caller holds the lock.
+
+        Returns:
+            bool: Whether to save now
+        """
+        return self.persist and time.monotonic() - self._saved_at >= SAVE_INTERVAL
+
+    def flush(self) -> None:
+        """
+        Merge any latencies and counts not yet saved into the state file.
+        """
+        with self._lock:
+            if self.persist and self._dirty:
+                self._sync()
+
+    @staticmethod
+    def _key(model: str, stream: bool) -> str:
+        return f"{model}:stream" if stream else model
+
+    def observe(self, model: str, latency: float, stream: bool = False) -> None:
+        """
+        Add a latency to a model's window.
+
+        Args:
+            model (str): The model the request was for
+            latency (float): Seconds to the response, or to the first chunk
+            stream (bool): Whether ``latency`` is a time to first chunk
+        """
+        with self._lock:
+            key = self._key(model, stream)
+            window = self._state().setdefault(key, deque(maxlen=WINDOW_SIZE))
+            window.append(latency)
+            if self.persist:
+                self._new_samples.setdefault(key, []).append(latency)
+                self._dirty = True
+                if self._save_due():
+                    self._sync()
+
+    def delay(self, model: str, stream: bool = False) -> Optional[float]:
+        """
+        Get how long to wait before hedging a request.
+
+        Args:
+            model (str): The model the request is for
+            stream (bool): Whether the request is streamed
+
+        Returns:
+            Optional[float]: Seconds to wait, or None if too few latencies are known
+        """
+        with self._lock:
+            window = self._state().get(self._key(model, stream))
+            if not window or len(window) < self.min_samples:
+                return None
+            ordered = sorted(window)
+        index = min(len(ordered) - 1, int(self.percentile * len(ordered)))
+        return max(self.min_delay, ordered[index])
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counts[name] += 1
+
+    def _start(self) -> None:
+        """
+        Count a request, in this process's stats and in the hedge budget.
+        """
+        with self._lock:
+            self._counts["requests"] += 1
+            self._state()
+            if not self.persist:
+                self._budget["requests"] += 1
+                if self._budget["requests"] > BUDGET_WINDOW:
+                    self._budget = {name: count // 2 for name, count in self._budget.items()}
+                return
+            self._new_requests += 1
+            self._dirty = True
+            if self._save_due():
+                self._sync()
+
+    def _allow_hedge(self) -> bool:
+        """
+        Take a hedge from the budget, if the ratio cap allows one.
+
+        The budget counts the requests and hedges of earlier invocations and
+        of concurrent processes too, so that the first slow request of every
+        one-shot call is not hedged.
+
+        Returns:
+            bool: Whether a duplicate may be sent
+        """
+        with self._lock:
+            self._state()
+            if self.persist:
+                return self._sync(take_hedge=True)
+            return self._take_hedge()
+
+    def _observe_abandoned(self, future: "Future[Any]", model: str, start: float,
+                           stream: bool) -> None:
+        """
+        Record the latency of a primary request that lost to its hedge.
+
+        Leaving it out would skew the window towards fast requests, and with
+        it the delay, so that ever more requests would be hedged.
+
+        Args:
+            future (Future[Any]): The primary request, once it finished
+            model (str): The model the request was for
+            start (float): When the request was sent
+            stream (bool): Whether the request is streamed
+        """
+        if future.exception() is None:
+            self.observe(model, time.perf_counter() - start, stream)
+
+    def run(self, model: str, call: Callable[[bool], T], stream: bool = False,
+            discard: Optional[Callable[[T], None]] = None) -> T:
+        """
+        Make a request, hedging it if it is slow.
+
+        The losing request cannot be interrupted while it waits for the
+        server, so it is abandoned: ``discard`` is called on its result as soon
+        as it arrives, e.g. to close a streamed response.
+
+        Args:
+            model (str): The model the request is for
+            call (Callable[[bool], T]): Sends the request; called with True for the hedge
+            stream (bool): Whether ``call`` returns once the first chunk arrived
+            discard (Optional[Callable[[T], None]]): Releases a result that lost
+
+        Returns:
+            T: The result of whichever request succeeded first
+
+        Raises:
+            Exception: The primary request's error if every request failed
+        """
+        self._start()
+        delay = self.delay(model, stream)
+        start = time.perf_counter()
+        if delay is None:
+            result = call(False)
+            self.observe(model, time.perf_counter() - start, stream)
+            return result
+
+        primary = _spawn(lambda: call(False))
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._allow_hedge():
+            result = primary.result()
+            self.observe(model, time.perf_counter() - start, stream)
+            return result
+
+        logger.debug("No response from %s after %.2fs, sending a hedged request", model, delay)
+        hedge = _spawn(lambda: call(True))
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    continue
+                self._count("hedge_won" if future is hedge else "primary_won")
+                for loser in pending:
+                    loser.add_done_callback(lambda f: _discard(f, discard))
+                if future is primary:
+                    self.observe(model, time.perf_counter() - start, stream)
+                else:
+                    primary.add_done_callback(
+                        lambda f: self._observe_abandoned(f, model, start, stream))
+                return future.result()
+        return primary.result()
+
+    async def run_async(self, model: str, call: Callable[[bool], Awaitable[T]],
+                        stream: bool = False) -> T:
+        """
+        Make a request on the event loop, hedging it if it is slow.
+
+        The losing request is cancelled. A primary request cancelled that way
+        is recorded with the time it had taken so far, a lower bound on its
+        latency. Reading and saving the state file happen in the default
+        executor, off the event loop.
+
+        Args:
+            model (str): The model the request is for
+            call (Callable[[bool], Awaitable[T]]): Sends the request; called
+                with True for the hedge
+            stream (bool): Whether ``call`` returns once the first chunk arrived
+
+        Returns:
+            T: The result of whichever request succeeded first
+
+        Raises:
+            Exception: The primary request's error if every request failed
+        """
+        import asyncio
+
+        loop = asyncio.get_event_loop()
+
+        def observe() -> Awaitable[None]:
+            # The throttled save does file IO, so it runs off the event loop
+            return loop.run_in_executor(None, self.observe, model,
+                                        time.perf_counter() - start, stream)
+
+        await loop.run_in_executor(None, self._start)
+        delay = self.delay(model, stream)
+        start = time.perf_counter()
+        if delay is None:
+            result = await call(False)
+            await observe()
+            return result
+
+        primary = asyncio.ensure_future(call(False))
+        try:
+            done, _ = await asyncio.wait([primary], timeout=delay)
+            if done or not await loop.run_in_executor(None, self._allow_hedge):
+                result = await primary
+                await observe()
+                return result
+
+            logger.debug("No response from %s after %.2fs, sending a hedged request", model, delay)
+            hedge = asyncio.ensure_future(call(True))
+            pending = {primary, hedge}
+            try:
+                while pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        if task.exception() is not None:
+                            continue
+                        self._count("hedge_won" if task is hedge else "primary_won")
+                        if task is primary or not primary.done():
+                            await observe()
+                        return task.result()
+                return await primary
+            finally:
+                hedge.cancel()
+        finally:
+            primary.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report how often requests were hedged and which request won.
+
+        Returns:
+            Dict[str, Any]: Request, hedge and win counts and the hedge ratio
+        """
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._counts)
+        stats["ratio"] = round(stats["hedged"] / stats["requests"], 3) if stats["requests"] else 0.0
+        return stats
+
+
+def _discard(future: "Future[Any]", discard: Optional[Callable[[Any], None]]) -> None:
+    """
+    Release the result of a request that lost the race.
+
+    Args:
+        future (Future[Any]): The losing request
+        discard (Optional[Callable[[Any], None]]): Releases its result
+    """
+    if discard is None or future.exception() is not None:
+        return
+    try:
+        discard(future.result())
+    except Exception as e:
+        logger.debug("Failed to release a hedged request: %s", e)
@@ -0,0 +1,351 @@
+"""
+Jobs module for Perplexity CLI.
+
+This module makes batch runs resumable. A job keeps a compact binary
+manifest with one fixed-size record per finished item (input offset, item
+hash, status and where its result is stored) next to an append-only log of
+results, so a job that dies halfway can be resumed without paying for the
+answers it already has.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, IO, Iterable, Iterator, List, Optional, Tuple, Union
+
+from perplexity_cli.batch import parse_item
+from perplexity_cli.config import get_data_dir
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Constants
+JOBS_DIRNAME = "jobs"
+JOB_FILENAME = "job.json"
+MANIFEST_FILENAME = "manifest"
+RESULTS_FILENAME = "results.jsonl"
+INPUT_FILENAME = "input.jsonl"
+# index, status, item hash, line number, input offset, input length, result offset, result length
+MANIFEST_RECORD = struct.Struct("<IB8sIQIQI")
+STATUS_DONE = 1
+STATUS_FAILED = 2
+FSYNC_EVERY = 64
+FSYNC_INTERVAL = 1.0
+_NAME_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,127}$")
+
+
+def item_hash(line: bytes) -> bytes:
+    """
+    Fingerprint an input line, to notice when a resumed job's input changed.
+
+    Args:
+        line (bytes): The raw input line
+
+    Returns:
+        bytes: An 8-byte hash of the stripped line
+    """
+    return hashlib.blake2b(line.strip(), digest_size=8).digest()
+
+
+class BatchJob:
+    """
+    A resumable batch run.
+
+    ``job.json`` describes the run, ``results.jsonl`` holds one result per
+    line and ``manifest`` one ``MANIFEST_RECORD`` per finished item; a
+    retried item gets a new record, and the last one counts. Records are
+    buffered and made durable in groups of ``FSYNC_EVERY`` (or every
+    ``FSYNC_INTERVAL`` seconds), results before records, so the manifest
+    never points at a result that was lost. A crash loses at most the last
+    group, whose items are run again on resume.
+
+    Jobs are written from one thread: the one consuming the batch results.
+
+    Args:
+        directory (Union[str, Path]): Directory holding the job files
+    """
+
+    def __init__(self, directory: Union[str, Path]) -> None:
+        self.directory = Path(directory)
+        self.name = self.directory.name
+        self.job_path = self.directory / JOB_FILENAME
+        self.manifest_path = self.directory / MANIFEST_FILENAME
+        self.results_path = self.directory / RESULTS_FILENAME
+        with open(self.job_path, encoding="utf-8") as f:
+            self.settings: Dict[str, Any] = json.load(f)
+        self._finished: Dict[int, Tuple[int, bytes]] = {}
+        self._inputs: Dict[int, Tuple[bytes, int, int, int]] = {}
+        self._resume_at = (0, 0, 1)
+        self._records: List[bytes] = []
+        self._results: List[bytes] = []
+        self._results_end = 0
+        self._last_sync = time.monotonic()
+        self._manifest: Optional[IO[bytes]] = None
+        self._results_file: Optional[IO[bytes]] = None
+        self._load()
+
+    @property
+    def input_path(self) -> Path:
+        """
+        Path: The file the job reads its items from.
+        """
+        return Path(self.settings["input"])
+
+    def _load(self) -> None:
+        """
+        Read the manifest into an index of finished items.
+
+        A partially written last record, left by a crash, is dropped.
+        """
+        try:
+            with open(self.manifest_path, "rb") as f:
+                data = f.read()
+        except OSError:
+            data = b""
+        size = len(data) - len(data) % MANIFEST_RECORD.size
+        if size != len(data):
+            logger.warning("Dropping a partial record from the manifest of job '%s'", self.name)
+            with open(self.manifest_path, "r+b") as f:
+                f.truncate(size)
+
+        ends = {}
+        for index, status, digest, line_number, offset, length, _, _ in \
+                MANIFEST_RECORD.iter_unpack(data[:size]):
+            self._finished[index] = (status, digest)
+            ends[index] = (offset + length, line_number + 1)
+
+        # Items before the first unfinished one need not even be read again
+        first = 0
+        while self._finished.get(first, (None,))[0] == STATUS_DONE:
+            first += 1
+        if first:
+            self._resume_at = (first,) + ends[first - 1]
+
+    def counts(self) -> Dict[str, int]:
+        """
+        Count the job's finished items.
+
+        Returns:
+            Dict[str, int]: Items done and items that failed on their last attempt
+        """
+        statuses = [status for status, _ in self._finished.values()]
+        return {"done": statuses.count(STATUS_DONE), "failed": statuses.count(STATUS_FAILED)}
+
+    def items(self) -> Iterator[Dict[str, Any]]:
+        """
+        Read the items that still need to run: pending ones and failed ones.
+
+        Reading starts after the longest run of done items at the start of
+        the input; after that, each done item is skipped with one lookup,
+        and one whose input line changed since it ran is run again.
+
+        Yields:
+            Dict[str, Any]: Batch items, as from ``read_batch``
+        """
+        index, offset, line_number = self._resume_at
+        model = self.settings["model"]
+        max_tokens = self.settings["max_tokens"]
+        with open(self.input_path, "rb") as f:
+            f.seek(offset)
+            for raw in f:
+                start = offset
+                offset += len(raw)
+                if not raw.strip():
+                    line_number += 1
+                    continue
+                digest = item_hash(raw)
+                status, finished_digest = self._finished.get(index, (None, None))
+                if status == STATUS_DONE and finished_digest == digest:
+                    index += 1
+                    line_number += 1
+                    continue
+                if status == STATUS_DONE:
+                    logger.warning("Item %d of job '%s' changed since it ran; running it again",
+                                   index, self.name)
+                self._inputs[index] = (digest, line_number, start, len(raw))
+                yield parse_item(raw.decode("utf-8", "replace"), index, line_number,
+                                 model, max_tokens)
+                index += 1
+                line_number += 1
+
+    def record(self, result: Dict[str, Any]) -> None:
+        """
+        Checkpoint the result of an item from ``items``.
+
+        Args:
+            result (Dict[str, Any]): The item's result
+        """
+        if self._results_file is None:
+            self._results_file = open(self.results_path, "ab")
+            self._results_end = self._results_file.seek(0, os.SEEK_END)
+            self._manifest = open(self.manifest_path, "ab")
+
+        index = result["index"]
+        digest, line_number, offset, length = self._inputs.pop(index)
+        status = STATUS_FAILED if "error" in result else STATUS_DONE
+        line = (json.dumps(result, separators=(",", ":")) + "\n").encode("utf-8")
+        self._records.append(MANIFEST_RECORD.pack(index, status, digest, line_number, offset,
+                                                  length, self._results_end, len(line)))
+        self._results.append(line)
+        self._results_end += len(line)
+        self._finished[index] = (status, digest)
+
+        if len(self._records) >= FSYNC_EVERY or \
+                time.monotonic() - self._last_sync >= FSYNC_INTERVAL:
+            self.flush()
+
+    def checkpoint(self, results: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        Record each result as it passes through.
+
+        Args:
+            results (Iterable[Dict[str, Any]]): Results of items from ``items``
+
+        Yields:
+            Dict[str, Any]: The same results
+        """
+        for result in results:
+            self.record(result)
+            yield result
+
+    def flush(self) -> None:
+        """
+        Make the buffered results and manifest records durable.
+        """
+        self._last_sync = time.monotonic()
+        if not self._records:
+            return
+        for f, buffer in ((self._results_file, self._results), (self._manifest, self._records)):
+            f.write(b"".join(buffer))
+            f.flush()
+            os.fsync(f.fileno())
+            del buffer[:]
+
+    def close(self) -> None:
+        """
+        Flush the checkpoint and close the job's files.
+        """
+        if self._results_file is None:
+            return
+        try:
+            self.flush()
+        finally:
+            self._results_file.close()
+            self._manifest.close()
+            self._results_file = self._manifest = None
+
+    def results(self) -> Iterator[Dict[str, Any]]:
+        """
+        Read the last result of every finished item, in input order.
+
+        Yields:
+            Dict[str, Any]: The stored results
+        """
+        locations = {}
+        try:
+            with open(self.manifest_path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return
+        for index, _, _, _, _, _, offset, length in MANIFEST_RECORD.iter_unpack(
+                data[:len(data) - len(data) % MANIFEST_RECORD.size]):
+            locations[index] = (offset, length)
+
+        with open(self.results_path, "rb") as f:
+            for index in sorted(locations):
+                offset, length = locations[index]
+                f.seek(offset)
+                yield json.loads(f.read(length))
+
+
+class JobStore:
+    """
+    Directory of named batch jobs.
+
+    Args:
+        directory (Optional[Union[str, Path]]): Jobs directory; defaults to
+            ``jobs`` in the data directory
+    """
+
+    def __init__(self, directory: Optional[Union[str, Path]] = None) -> None:
+        if directory:
+            self.directory = Path(directory)
+        else:
+            self.directory = get_data_dir() / JOBS_DIRNAME
+        if not self.directory.exists():
+            self.directory.mkdir(parents=True, exist_ok=True)
+            os.chmod(self.directory, 0o700)
+
+    def _path(self, name: str) -> Path:
+        if not _NAME_PATTERN.match(name):
+            raise ValueError(f"Invalid job name '{name}'. Use letters, digits, '.', '_' and '-'.")
+        return self.directory / name
+
+    def create(self, name: str, source: str, model: str, max_tokens: int) -> BatchJob:
+        """
+        Start a new job.
+
+        Items read from stdin are copied into the job, so that it can be
+        resumed; an input file is read in place and must not be moved.
+
+        Args:
+            name (str): The job name
+            source (str): Input file, or '-' for stdin
+            model (str): Model for items that do not name one
+            max_tokens (int): Max tokens for items that do not set it
+
+        Returns:
+            BatchJob: The job
+
+        Raises:
+            ValueError: If the name is invalid or a job of that name exists
+        """
+        path = self._path(name)
+        if path.exists():
+            raise ValueError(f"Job '{name}' already exists. Use --resume {name} to continue it.")
+        path.mkdir()
+        if source == "-":
+            input_path = path / INPUT_FILENAME
+            with open(input_path, "wb") as f:
+                shutil.copyfileobj(sys.stdin.buffer, f)
+        else:
+            input_path = Path(source).resolve()
+        settings = {"input": str(input_path), "model": model, "max_tokens": max_tokens,
+                    "created": time.time()}
+        with open(path / JOB_FILENAME, "w", encoding="utf-8") as f:
+            json.dump(settings, f)
+        return BatchJob(path)
+
+    def open(self, name: str) -> BatchJob:
+        """
+        Get an existing job by name.
+
+        Args:
+            name (str): The job name
+
+        Returns:
+            BatchJob: The job
+
+        Raises:
+            ValueError: If the name is invalid or no such job exists
+        """
+        path = self._path(name)
+        if not (path / JOB_FILENAME).exists():
+            raise ValueError(f"No job named '{name}'")
+        return BatchJob(path)
+
+    def names(self) -> List[str]:
+        """
+        List the stored jobs.
+
+        Returns:
+            List[str]: Job names, sorted
+        """
+        return sorted(path.parent.name for path in self.directory.glob(f"*/{JOB_FILENAME}"))
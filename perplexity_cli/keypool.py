@@ -0,0 +1,328 @@
+"""
+Key pool module for Perplexity CLI.
+
+This module spreads requests over several API keys. Each key has its own
+rate limit budget; requests go to the healthy key with the most budget
+left, and keys that are rejected (401/403) or rate limited (429) are
+ejected for a while, with the request moving on to another key.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, TypeVar
+
+from perplexity_cli.config import get_data_dir
+from perplexity_cli.exceptions import AuthenticationError, RateLimitError
+from perplexity_cli.ratelimit import RateLimiter
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Constants
+RATE_LIMIT_FILENAME = "ratelimit-{}.json"
+AUTH_EJECT_SECONDS = 15 * 60
+RATE_LIMIT_EJECT_SECONDS = 30.0
+MAX_EJECT_SECONDS = 10 * 60
+
+T = TypeVar("T")
+
+
+def key_fingerprint(api_key: str) -> str:
+    """
+    Identify an API key without revealing it.
+
+    Args:
+        api_key (str): The API key
+
+    Returns:
+        str: A short hash of the key
+    """
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+
+
+def key_label(api_key: str) -> str:
+    """
+    Name an API key in logs and reports by its last characters.
+
+    Args:
+        api_key (str): The API key
+
+    Returns:
+        str: The masked key
+    """
+    return f"...{api_key[-4:]}"
+
+
+class _KeyState:
+    """
+    Budget, health and usage of one key.
+
+    Args:
+        api_key (str): The API key
+        limiter (Optional[RateLimiter]): The key's own rate limiter
+    """
+
+    def __init__(self, api_key: str, limiter: Optional[RateLimiter]) -> None:
+        self.api_key = api_key
+        self.limiter = limiter
+        self.in_flight = 0
+        self.requests = 0
+        self.tokens = 0
+        self.rejected = 0
+        self.rate_limited = 0
+        self.strikes = 0
+        self.ejected_until = 0.0
+
+
+class KeyPool:
+    """
+    Health-aware load balancing over several API keys.
+
+    The request and token limits apply to each key separately, so the pool's
+    throughput grows with the number of keys. Budgets live in per-key files
+    in the data directory and are shared by every process on the host.
+
+    Args:
+        api_keys (List[str]): The keys to use; duplicates are dropped
+        requests_per_minute (Optional[float]): Request budget of each key
+        tokens_per_minute (Optional[float]): Token budget of each key
+        data_dir (Optional[Path]): Where the budgets are kept; defaults to the data directory
+
+    Raises:
+        ValueError: If no key is given
+    """
+
+    def __init__(self, api_keys: List[str], requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None,
+                 data_dir: Optional[Path] = None) -> None:
+        keys = list(dict.fromkeys(key for key in api_keys if key))
+        if not keys:
+            raise ValueError("A key pool needs at least one API key")
+        limited = requests_per_minute is not None or tokens_per_minute is not None
+        if limited and data_dir is None:
+            data_dir = get_data_dir()
+        self._states = {
+            key: _KeyState(key, RateLimiter(
+                requests_per_minute, tokens_per_minute,
+                data_dir / RATE_LIMIT_FILENAME.format(key_fingerprint(key))) if limited else None)
+            for key in keys
+        }
+        self._lock = threading.Lock()
+
+    @property
+    def keys(self) -> List[str]:
+        """
+        List[str]: The keys in the pool.
+        """
+        return list(self._states)
+
+    def _pick(self, exclude: Set[str]) -> _KeyState:
+        """
+        Choose the key for the next request.
+
+        Healthy keys are preferred, by most budget left, then fewest
+        requests in flight and fewest requests sent. If every key is ejected,
+        the one whose ejection ends first is used.
+
+        Args:
+            exclude (Set[str]): Keys already tried for this request
+
+        Returns:
+            _KeyState: The chosen key
+        """
+        now = time.monotonic()
+        with self._lock:
+            candidates = [state for key, state in self._states.items() if key not in exclude]
+            candidates = candidates or list(self._states.values())
+            healthy = [state for state in candidates if state.ejected_until <= now]
+        if not healthy:
+            return min(candidates, key=lambda state: state.ejected_until)
+        if len(healthy) == 1:
+            return healthy[0]
+        budgets = {state.api_key: state.limiter.available() if state.limiter else 1.0
+                   for state in healthy}
+        with self._lock:
+            return max(healthy, key=lambda state: (budgets[state.api_key], -state.in_flight,
+                                                   -state.requests))
+
+    def _start(self, state: _KeyState) -> str:
+        with self._lock:
+            state.in_flight += 1
+            state.requests += 1
+        return state.api_key
+
+    def acquire(self, tokens: int = 0, exclude: Optional[Set[str]] = None) -> str:
+        """
+        Choose a key and wait until its budget covers one request.
+
+        Args:
+            tokens (int): Estimated tokens for the request
+            exclude (Optional[Set[str]]): Keys not to use unless no other is left
+
+        Returns:
+            str: The key to send the request with
+        """
+        state = self._pick(exclude or set())
+        if state.limiter is not None:
+            state.limiter.acquire(tokens)
+        return self._start(state)
+
+    async def acquire_async(self, tokens: int = 0, exclude: Optional[Set[str]] = None) -> str:
+        """
+        Choose a key and wait, without blocking the event loop, for its budget.
+
+        Args:
+            tokens (int): Estimated tokens for the request
+            exclude (Optional[Set[str]]): Keys not to use unless no other is left
+
+        Returns:
+            str: The key to send the request with
+        """
+        state = self._pick(exclude or set())
+        if state.limiter is not None:
+            await state.limiter.acquire_async(tokens)
+        return self._start(state)
+
+    def release(self, api_key: str, error: Optional[BaseException] = None) -> None:
+        """
+        Record the outcome of a request sent with a key.
+
+        A rejected key is ejected for ``AUTH_EJECT_SECONDS``; a rate limited
+        key for its ``Retry-After``, or for a backoff that doubles with every
+        consecutive 429.
+
+        Args:
+            api_key (str): The key the request was sent with
+            error (Optional[BaseException]): The error the request failed with, if any
+        """
+        with self._lock:
+            state = self._states[api_key]
+            state.in_flight -= 1
+            if isinstance(error, AuthenticationError):
+                state.rejected += 1
+                eject_for = AUTH_EJECT_SECONDS
+            elif isinstance(error, RateLimitError):
+                state.rate_limited += 1
+                state.strikes += 1
+                eject_for = error.retry_after or min(
+                    MAX_EJECT_SECONDS, RATE_LIMIT_EJECT_SECONDS * 2 ** (state.strikes - 1))
+            else:
+                if error is None:
+                    state.strikes = 0
+                return
+            state.ejected_until = time.monotonic() + eject_for
+        logger.warning("Ejecting API key %s for %.0fs: %s", key_label(api_key), eject_for, error)
+
+    def record_usage(self, api_key: str, estimated: int, actual: Optional[int]) -> None:
+        """
+        Correct a key's token budget once the real usage of a request is known.
+
+        Args:
+            api_key (str): The key the request was sent with
+            estimated (int): Tokens taken by ``acquire``
+            actual (Optional[int]): ``total_tokens`` reported by the API
+        """
+        state = self._states[api_key]
+        if actual is not None:
+            with self._lock:
+                state.tokens += actual
+        if state.limiter is not None:
+            state.limiter.record_usage(estimated, actual)
+
+    def _healthy_left(self, exclude: Set[str]) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            return any(state.ejected_until <= now for key, state in self._states.items()
+                       if key not in exclude)
+
+    def call(self, send: Callable[[str], T], tokens: int = 0) -> T:
+        """
+        Send a request, moving on to another key if one is rejected or rate limited.
+
+        Args:
+            send (Callable[[str], T]): Sends the request with the given key
+            tokens (int): Estimated tokens for the request
+
+        Returns:
+            T: The result of ``send``
+
+        Raises:
+            PerplexityError: The last error, once no healthy key is left to try
+        """
+        tried: Set[str] = set()
+        while True:
+            api_key = self.acquire(tokens, tried)
+            try:
+                result = send(api_key)
+            except (AuthenticationError, RateLimitError) as e:
+                self.release(api_key, e)
+                tried.add(api_key)
+                if not self._healthy_left(tried):
+                    raise
+                continue
+            except BaseException as e:
+                self.release(api_key, e)
+                raise
+            self.release(api_key)
+            return result
+
+    async def call_async(self, send: Callable[[str], Awaitable[T]], tokens: int = 0) -> T:
+        """
+        Send a request on the event loop, moving on to another key if one fails.
+
+        Args:
+            send (Callable[[str], Awaitable[T]]): Sends the request with the given key
+            tokens (int): Estimated tokens for the request
+
+        Returns:
+            T: The result of ``send``
+
+        Raises:
+            PerplexityError: The last error, once no healthy key is left to try
+        """
+        tried: Set[str] = set()
+        while True:
+            api_key = await self.acquire_async(tokens, tried)
+            try:
+                result = await send(api_key)
+            except (AuthenticationError, RateLimitError) as e:
+                self.release(api_key, e)
+                tried.add(api_key)
+                if not self._healthy_left(tried):
+                    raise
+                continue
+            except BaseException as e:
+                self.release(api_key, e)
+                raise
+            self.release(api_key)
+            return result
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Report the utilization and health of every key.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Per masked key: requests sent, share of
+            all requests, tokens used, requests in flight, rejections, 429s,
+            seconds until an ejection ends and the budget available
+        """
+        now = time.monotonic()
+        with self._lock:
+            states = list(self._states.values())
+            total = sum(state.requests for state in states)
+        stats = {}
+        for state in states:
+            stats[key_label(state.api_key)] = {
+                "requests": state.requests,
+                "share": round(state.requests / total, 3) if total else 0.0,
+                "tokens": state.tokens,
+                "in_flight": state.in_flight,
+                "rejected": state.rejected,
+                "rate_limited": state.rate_limited,
+                "ejected_for": round(max(0.0, state.ejected_until - now), 1),
+                "available": round(state.limiter.available(), 3) if state.limiter else 1.0,
+            }
+        return stats
@@ -0,0 +1,276 @@
+"""
+Map-reduce module for Perplexity CLI.
+
+This module answers a question about a document larger than one context
+window. The document is streamed into overlapping chunks sized by token
+estimate; each chunk is asked the question concurrently ("map"), and the
+partial answers are combined in a tree of "reduce" requests until one
+answer is left.
+"""
+
+import logging
+import mmap
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import (TYPE_CHECKING, Any, Callable, Deque, Dict, Iterable, Iterator, List,
+                    Set, Tuple, TypeVar)
+
+from perplexity_cli.config import DEFAULT_CHUNK_OVERLAP, DEFAULT_CHUNK_TOKENS, DEFAULT_CONCURRENCY
+from perplexity_cli.output import response_content
+from perplexity_cli.tokens import estimate_text_tokens
+
+if TYPE_CHECKING:
+    from perplexity_cli.client import PerplexityClient
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Constants
+NO_ANSWER = "NONE"
+MAP_PROMPT = (
+    "Below is excerpt {index} of a longer document. Using only this excerpt, answer "
+    "the question or extract everything relevant to it. If the excerpt contains nothing "
+    "relevant, reply with exactly {none}.\n\nQuestion: {query}\n\nExcerpt:\n{chunk}"
+)
+REDUCE_PROMPT = (
+    "Below are partial answers to a question, each drawn from a different part of a "
+    "longer document, in document order. Combine them into one answer to the question, "
+    "merging repeated points and keeping every relevant detail.\n\n"
+    "Question: {query}\n\n{partials}"
+)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def read_lines(source: str) -> Iterator[str]:
+    """
+    Read a document line by line without loading it into memory.
+
+    Files are memory-mapped, so the operating system pages them in as they
+    are read; stdin is streamed.
+
+    Args:
+        source (str): Path of the document, or '-' for stdin
+
+    Yields:
+        str: Each line, with its line ending
+    """
+    if source == "-":
+        for line in sys.stdin.buffer:
+            yield line.decode("utf-8", "replace")
+        return
+    with open(source, "rb") as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # an empty file cannot be mapped
+            return
+        with mapped:
+            for line in iter(mapped.readline, b""):
+                yield line.decode("utf-8", "replace")
+
+
+def _split_long(line: str, max_tokens: int) -> Iterator[str]:
+    """
+    Split a line that is too long for one chunk, preferably at spaces.
+
+    Args:
+        line (str): The line
+        max_tokens (int): Estimated tokens each piece may have
+
+    Yields:
+        str: The pieces of the line
+    """
+    tokens = estimate_text_tokens(line)
+    if tokens <= max_tokens:
+        yield line
+        return
+    size = max(1, int(len(line) * max_tokens / tokens))
+    start = 0
+    while start < len(line):
+        end = min(len(line), start + size)
+        if end < len(line):
+            space = line.rfind(" ", start + size // 2, end)
+            if space > start:
+                end = space + 1
+        yield line[start:end]
+        start = end
+
+
+def chunk_text(lines: Iterable[str], chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+               overlap_tokens: int = DEFAULT_CHUNK_OVERLAP) -> Iterator[str]:
+    """
+    Group lines into chunks of about ``chunk_tokens`` estimated tokens.
+
+    Each chunk starts with the last lines of the previous one, up to
+    ``overlap_tokens``, so that a passage cut at a chunk boundary is seen
+    whole at least once. Only the chunk being built is held in memory.
+
+    Args:
+        lines (Iterable[str]): The document's lines, e.g. from ``read_lines``
+        chunk_tokens (int): Estimated tokens per chunk
+        overlap_tokens (int): Estimated tokens repeated from the previous chunk
+
+    Returns:
+        Iterator[str]: The chunks
+
+    Raises:
+        ValueError: If the sizes are not positive or the overlap is not
+            less than half the chunk
+    """
+    if chunk_tokens <= 0 or overlap_tokens < 0 or overlap_tokens * 2 >= chunk_tokens:
+        raise ValueError("Chunks must be positive and overlap by less than half their size")
+    return _chunks(lines, chunk_tokens, overlap_tokens)
+
+
+def _chunks(lines: Iterable[str], chunk_tokens: int, overlap_tokens: int) -> Iterator[str]:
+    pieces: Deque[Tuple[str, float]] = deque()
+    used = 0.0
+    fresh = False
+    for line in lines:
+        for piece in _split_long(line, chunk_tokens - overlap_tokens):
+            tokens = estimate_text_tokens(piece)
+            if fresh and used + tokens > chunk_tokens:
+                yield "".join(text for text, _ in pieces)
+                overlap: Deque[Tuple[str, float]] = deque()
+                used = 0.0
+                while pieces and used + pieces[-1][1] <= overlap_tokens:
+                    overlap.appendleft(pieces.pop())
+                    used += overlap[0][1]
+                pieces, fresh = overlap, False
+            pieces.append((piece, tokens))
+            used += tokens
+            fresh = fresh or bool(piece.strip())
+    if fresh:
+        yield "".join(text for text, _ in pieces)
+
+
+def _run_ordered(executor: ThreadPoolExecutor, fn: Callable[[T], R], args: Iterable[T],
+                 concurrency: int) -> Iterator[R]:
+    """
+    Run ``fn`` over ``args`` with up to ``concurrency`` calls in flight.
+
+    Arguments are drawn only as calls finish, so a long document is never
+    read far ahead of the requests.
+
+    Args:
+        executor (ThreadPoolExecutor): The worker pool
+        fn (Callable[[T], R]): The call to make
+        args (Iterable[T]): One argument per call
+        concurrency (int): Maximum calls in flight
+
+    Yields:
+        R: The results, in the order of ``args``
+    """
+    running: Set[Future] = set()
+    positions: Dict[Future, int] = {}
+    held: Dict[int, R] = {}
+    next_position = 0
+
+    def collect() -> Iterator[R]:
+        nonlocal running, next_position
+        done, running = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            held[positions.pop(future)] = future.result()
+        while next_position in held:
+            yield held.pop(next_position)
+            next_position += 1
+
+    for position, arg in enumerate(args):
+        future = executor.submit(fn, arg)
+        positions[future] = position
+        running.add(future)
+        if len(running) >= concurrency:
+            yield from collect()
+    while running:
+        yield from collect()
+
+
+def _group(responses: List[Dict[str, Any]], budget: int) -> List[List[Dict[str, Any]]]:
+    """
+    Group consecutive partial answers for one reduce request each.
+
+    A group holds answers until their estimated tokens pass the budget, but
+    always at least two, so that every round of the tree shrinks it.
+
+    Args:
+        responses (List[Dict[str, Any]]): The partial answers, in document order
+        budget (int): Estimated tokens of the answers combined by one request
+
+    Returns:
+        List[List[Dict[str, Any]]]: The groups
+    """
+    groups: List[List[Dict[str, Any]]] = [[]]
+    used = 0.0
+    for response in responses:
+        tokens = estimate_text_tokens(response_content(response))
+        if len(groups[-1]) >= 2 and used + tokens > budget:
+            groups.append([])
+            used = 0.0
+        groups[-1].append(response)
+        used += tokens
+    return groups
+
+
+def map_reduce(client: "PerplexityClient", model: str, max_tokens: int, query: str,
+               chunks: Iterable[str], concurrency: int = DEFAULT_CONCURRENCY,
+               reduce_tokens: int = DEFAULT_CHUNK_TOKENS) -> Dict[str, Any]:
+    """
+    Answer a question about a document split into chunks.
+
+    Every chunk is asked the question, with up to ``concurrency`` requests
+    in flight. Chunks that hold nothing relevant are dropped, and the other
+    partial answers are combined, a group at a time, in rounds of reduce
+    requests that also run concurrently, so the wall-clock time grows with
+    the depth of the tree rather than with the length of the document.
+
+    Args:
+        client (PerplexityClient): The client to send the requests with
+        model (str): The model to use
+        max_tokens (int): Maximum number of tokens of each answer
+        query (str): The question
+        chunks (Iterable[str]): The document's chunks, e.g. from ``chunk_text``
+        concurrency (int): Maximum requests in flight
+        reduce_tokens (int): Estimated tokens of the partial answers
+            combined by one reduce request
+
+    Returns:
+        Dict[str, Any]: The response holding the final answer
+
+    Raises:
+        ValueError: If the document is empty
+        PerplexityError: If a request fails
+    """
+    concurrency = max(1, concurrency)
+
+    def ask(content: str) -> Dict[str, Any]:
+        return client.complete(model, max_tokens, content)
+
+    def combine(group: List[Dict[str, Any]]) -> Dict[str, Any]:
+        if len(group) == 1:
+            return group[0]
+        partials = "\n\n".join(f"Part {i}:\n{response_content(response)}"
+                               for i, response in enumerate(group, 1))
+        return ask(REDUCE_PROMPT.format(query=query, partials=partials))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        prompts = (MAP_PROMPT.format(index=index, none=NO_ANSWER, query=query, chunk=chunk)
+                   for index, chunk in enumerate(chunks, 1))
+        responses = list(_run_ordered(executor, ask, prompts, concurrency))
+        if not responses:
+            raise ValueError("The input is empty")
+        mapped = len(responses)
+        relevant = [response for response in responses
+                    if response_content(response).strip() != NO_ANSWER]
+        responses = relevant or responses[:1]
+
+        rounds = 0
+        while len(responses) > 1:
+            responses = list(_run_ordered(executor, combine, _group(responses, reduce_tokens),
+                                          concurrency))
+            rounds += 1
+
+    logger.info("Answered from %d chunks (%d relevant) in %d reduce rounds",
+                mapped, len(relevant), rounds)
+    return responses[0]
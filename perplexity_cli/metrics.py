@@ -0,0 +1,424 @@
+"""
+Metrics module for Perplexity CLI.
+
+This module records what each API request cost: per-phase timings (DNS,
+TCP connect, TLS, server time, body download), bytes sent and received,
+status, retries and token usage. The measurements can be printed, emitted
+as a JSON log line, or aggregated into a Prometheus textfile.
+"""
+
+import contextlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, IO, Iterator, List, Optional, Tuple, Union
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Constants
+PHASES = ["dns", "connect", "tls", "server", "download"]
+DURATION_BUCKETS = [0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0]
+METRIC_PREFIX = "perplexity_cli"
+
+
+class RequestMetrics:
+    """
+    Measurements of one API call, including all of its attempts.
+
+    Connection phases (DNS, connect, TLS) are those of the last attempt and
+    stay at zero when a pooled connection was reused. Server time runs from
+    the start of the last attempt to the response headers, minus the
+    connection phases; download time runs from the headers to the end of
+    the body.
+
+    Args:
+        model (str): The model the request is for
+        stream (bool): Whether the response is streamed
+    """
+
+    def __init__(self, model: str, stream: bool = False) -> None:
+        self.model = model
+        self.stream = stream
+        self.status: Optional[int] = None
+        self.error: Optional[str] = None
+        self.cached = False
+        self.attempts = 0
+        self.connection_reused = True
+        self.dns_ms = 0.0
+        self.connect_ms = 0.0
+        self.tls_ms = 0.0
+        self.server_ms = 0.0
+        self.download_ms = 0.0
+        self.ttft_ms: Optional[float] = None
+        self.total_ms = 0.0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.prompt_tokens: Optional[int] = None
+        self.completion_tokens: Optional[int] = None
+        self.total_tokens: Optional[int] = None
+        self.concurrency_limit: Optional[int] = None
+        self._start = time.perf_counter()
+        self._attempt_start = self._start
+
+    @property
+    def retries(self) -> int:
+        """
+        int: Attempts made after the first.
+        """
+        return max(0, self.attempts - 1)
+
+    def start_attempt(self) -> None:
+        """
+        Reset the per-attempt measurements before a new attempt.
+        """
+        self.attempts += 1
+        self.connection_reused = True
+        self.dns_ms = self.connect_ms = self.tls_ms = 0.0
+        self._attempt_start = time.perf_counter()
+
+    def headers_received(self, elapsed: Optional[float] = None) -> None:
+        """
+        Record when the response headers of the current attempt arrived.
+
+        Args:
+            elapsed (Optional[float]): Seconds from the start of the attempt to
+                the headers; defaults to now
+        """
+        if elapsed is None:
+            elapsed = time.perf_counter() - self._attempt_start
+        connection_ms = self.dns_ms + self.connect_ms + self.tls_ms
+        self.server_ms = max(0.0, elapsed * 1000 - connection_ms)
+        self._headers_at = self._attempt_start + elapsed
+
+    def first_token(self) -> None:
+        """
+        Record that the first streamed chunk arrived.
+        """
+        if self.ttft_ms is None:
+            self.ttft_ms = (time.perf_counter() - self._start) * 1000
+
+    def set_usage(self, usage: Optional[Dict[str, Any]]) -> None:
+        """
+        Record the token usage reported by the API.
+
+        Args:
+            usage (Optional[Dict[str, Any]]): The response's ``usage`` block
+        """
+        usage = usage or {}
+        self.prompt_tokens = usage.get("prompt_tokens")
+        self.completion_tokens = usage.get("completion_tokens")
+        self.total_tokens = usage.get("total_tokens")
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        """
+        Record the end of the call.
+
+        Args:
+            error (Optional[BaseException]): The error the call failed with, if any
+        """
+        end = time.perf_counter()
+        self.total_ms = (end - self._start) * 1000
+        headers_at = getattr(self, "_headers_at", None)
+        if headers_at is not None:
+            self.download_ms = max(0.0, (end - headers_at) * 1000)
+        if error is not None:
+            self.error = type(error).__name__
+            self.status = self.status or getattr(error, "status_code", None)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Convert the measurements to a JSON-serializable dictionary.
+
+        Returns:
+            Dict[str, Any]: The measurements, with durations in milliseconds
+        """
+        return {
+            "model": self.model,
+            "stream": self.stream,
+            "status": self.status,
+            "error": self.error,
+            "cached": self.cached,
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "connection_reused": self.connection_reused,
+            "dns_ms": round(self.dns_ms, 3),
+            "connect_ms": round(self.connect_ms, 3),
+            "tls_ms": round(self.tls_ms, 3),
+            "server_ms": round(self.server_ms, 3),
+            "download_ms": round(self.download_ms, 3),
+            "ttft_ms": None if self.ttft_ms is None else round(self.ttft_ms, 3),
+            "total_ms": round(self.total_ms, 3),
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.total_tokens,
+            "concurrency_limit": self.concurrency_limit,
+        }
+
+    def format(self) -> str:
+        """
+        Format the measurements as a short human-readable breakdown.
+
+        Returns:
+            str: One line per phase followed by a summary line
+        """
+        lines = ["--- Timings ---"]
+        if self.cached:
+            lines.append(f"cache hit: {self.total_ms:.1f} ms")
+            return "\n".join(lines)
+        for phase in PHASES:
+            lines.append(f"{phase + ':':<10}{getattr(self, phase + '_ms'):9.1f} ms")
+        if self.ttft_ms is not None:
+            lines.append(f"{'ttft:':<10}{self.ttft_ms:9.1f} ms")
+        lines.append(f"{'total:':<10}{self.total_ms:9.1f} ms")
+        reused = "reused" if self.connection_reused else "new"
+        lines.append(f"status {self.status or self.error}, {self.attempts} attempt(s), "
+                     f"{reused} connection, {self.bytes_sent} B sent, "
+                     f"{self.bytes_received} B received")
+        return "\n".join(lines)
+
+
+# Measurements of the request being made on this thread, filled in by the transport
+_local = threading.local()
+
+
+def current_metrics() -> Optional[RequestMetrics]:
+    """
+    Get the measurements of the request being made on this thread.
+
+    Returns:
+        Optional[RequestMetrics]: The active measurements, if any
+    """
+    return getattr(_local, "metrics", None)
+
+
+@contextlib.contextmanager
+def recording(metrics: Optional[RequestMetrics]) -> Iterator[Optional[RequestMetrics]]:
+    """
+    Make measurements the active ones for this thread.
+
+    Args:
+        metrics (Optional[RequestMetrics]): The measurements to fill in; None
+            records nothing
+    """
+    previous = current_metrics()
+    _local.metrics = metrics
+    try:
+        yield metrics
+    finally:
+        _local.metrics = previous
+
+
+class MetricsRegistry:
+    """
+    Aggregate request measurements into Prometheus metrics.
+
+    Counters are accumulated in a JSON state file next to the textfile, so
+    that short-lived CLI processes together produce monotonically increasing
+    counters, as Prometheus expects.
+
+    Args:
+        path (Union[str, Path]): Prometheus textfile to write
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+        self.state_path = self.path.with_name(self.path.name + ".state.json")
+        self._pending: List[RequestMetrics] = []
+        self._lock = threading.Lock()
+
+    def observe(self, metrics: RequestMetrics) -> None:
+        """
+        Queue a request's measurements for the next ``flush``.
+
+        Args:
+            metrics (RequestMetrics): The measurements of a finished request
+        """
+        with self._lock:
+            self._pending.append(metrics)
+
+    @staticmethod
+    def _set(state: Dict[str, Dict[str, float]], name: str, labels: Tuple[Tuple[str, str], ...],
+             value: float) -> None:
+        """
+        Replace one sample of the state, for gauges.
+
+        Args:
+            state (Dict[str, Dict[str, float]]): Samples per metric name
+            name (str): The metric name
+            labels (Tuple[Tuple[str, str], ...]): Label names and values
+            value (float): The new value
+        """
+        state.setdefault(name, {})[json.dumps(labels)] = value
+
+    @staticmethod
+    def _add(state: Dict[str, Dict[str, float]], name: str, labels: Tuple[Tuple[str, str], ...],
+             value: float) -> None:
+        """
+        Add to one sample of the state.
+
+        Args:
+            state (Dict[str, Dict[str, float]]): Samples per metric name
+            name (str): The metric name
+            labels (Tuple[Tuple[str, str], ...]): Label names and values
+            value (float): Amount to add
+        """
+        key = json.dumps(labels)
+        samples = state.setdefault(name, {})
+        samples[key] = samples.get(key, 0) + value
+
+    def _merge(self, state: Dict[str, Dict[str, float]], metrics: RequestMetrics) -> None:
+        """
+        Add one request's measurements to the state.
+
+        Args:
+            state (Dict[str, Dict[str, float]]): Samples per metric name
+            metrics (RequestMetrics): The measurements to add
+        """
+        model = (("model", metrics.model),)
+        status = "cached" if metrics.cached else str(metrics.status or metrics.error or "unknown")
+        self._add(state, "requests_total", model + (("status", status),), 1)
+        self._add(state, "retries_total", model, metrics.retries)
+        seconds = metrics.total_ms / 1000
+        for bucket in DURATION_BUCKETS:
+            if seconds <= bucket:
+                self._add(state, "request_duration_seconds_bucket", model + (("le", f"{bucket:g}"),), 1)
+        self._add(state, "request_duration_seconds_bucket", model + (("le", "+Inf"),), 1)
+        self._add(state, "request_duration_seconds_sum", model, seconds)
+        self._add(state, "request_duration_seconds_count", model, 1)
+        for phase in PHASES:
+            self._add(state, "phase_seconds_total", (("phase", phase),),
+                      getattr(metrics, phase + "_ms") / 1000)
+        self._add(state, "bytes_total", (("direction", "sent"),), metrics.bytes_sent)
+        self._add(state, "bytes_total", (("direction", "received"),), metrics.bytes_received)
+        for kind in ("prompt", "completion"):
+            tokens = getattr(metrics, kind + "_tokens")
+            if tokens:
+                self._add(state, "tokens_total", model + (("kind", kind),), tokens)
+        if metrics.concurrency_limit is not None:
+            self._set(state, "concurrency_limit", (), metrics.concurrency_limit)
+
+    def render(self, state: Dict[str, Dict[str, float]]) -> str:
+        """
+        Render a state in the Prometheus text exposition format.
+
+        Args:
+            state (Dict[str, Dict[str, float]]): Samples per metric name
+
+        Returns:
+            str: The exposition text
+        """
+        families = [
+            ("requests_total", "counter", "API requests by model and final status"),
+            ("retries_total", "counter", "Retried attempts"),
+            ("request_duration_seconds", "histogram", "End-to-end request duration"),
+            ("phase_seconds_total", "counter", "Time spent per request phase"),
+            ("bytes_total", "counter", "Request and response body bytes"),
+            ("tokens_total", "counter", "Tokens reported by the API"),
+            ("concurrency_limit", "gauge", "Adaptive limit on requests in flight"),
+        ]
+        lines = []
+        for family, kind, help_text in families:
+            names = ([family + "_bucket", family + "_sum", family + "_count"]
+                     if kind == "histogram" else [family])
+            if not any(name in state for name in names):
+                continue
+            lines.append(f"# HELP {METRIC_PREFIX}_{family} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{family} {kind}")
+            for name in names:
+                for key, value in state.get(name, {}).items():
+                    labels = ",".join(f'{label}="{val}"' for label, val in json.loads(key))
+                    value = int(value) if float(value).is_integer() else value
+                    lines.append(f"{METRIC_PREFIX}_{name}{{{labels}}} {value!r}")
+        return "\n".join(lines) + "\n"
+
+    def flush(self) -> None:
+        """
+        Merge the queued measurements into the state and rewrite the textfile.
+
+        The textfile is replaced atomically, so a collector never reads a
+        partial file.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+        with open(self.state_path, "a+", encoding="utf-8") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                try:
+                    state = json.loads(f.read() or "{}")
+                except ValueError:
+                    state = {}
+                for metrics in pending:
+                    self._merge(state, metrics)
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(state))
+                f.flush()
+
+                tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+                with open(tmp_path, "w", encoding="utf-8") as out:
+                    out.write(self.render(state))
+                os.replace(tmp_path, self.path)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class MetricsReporter:
+    """
+    Report each finished request; pass an instance as a client's ``on_metrics``.
+
+    Args:
+        timings (Optional[str]): "text" to print a breakdown, "json" to print a
+            JSON log line per request, or None
+        registry (Optional[MetricsRegistry]): Registry to aggregate requests into
+        out (Optional[IO[str]]): Where timings are printed; defaults to stderr
+    """
+
+    def __init__(self, timings: Optional[str] = None,
+                 registry: Optional[MetricsRegistry] = None,
+                 out: Optional[IO[str]] = None) -> None:
+        self.timings = timings
+        self.registry = registry
+        self.out = out
+        self._lock = threading.Lock()
+
+    def __call__(self, metrics: RequestMetrics) -> None:
+        logger.debug("Request metrics: %s", json.dumps(metrics.to_dict()))
+        out = self.out or sys.stderr
+        if self.timings == "json":
+            line = json.dumps(dict(metrics.to_dict(), event="request", time=time.time()))
+            with self._lock:
+                out.write(line + "\n")
+                out.flush()
+        elif self.timings:
+            with self._lock:
+                out.write(metrics.format() + "\n")
+                out.flush()
+        if self.registry is not None:
+            self.registry.observe(metrics)
+
+    def flush(self) -> None:
+        """
+        Write the aggregated metrics, if a registry is configured.
+        """
+        if self.registry is not None:
+            try:
+                self.registry.flush()
+            except OSError as e:
+                logger.warning("Failed to write metrics to %s: %s", self.registry.path, e)
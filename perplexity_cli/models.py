@@ -4,26 +4,83 @@ Models module for Perplexity CLI.
 This module contains information about available Perplexity AI models.
 """
 
-# List of available models (as of May 2025)
+from typing import Dict, NamedTuple
+
+# Constants
+AUTO_MODEL = "auto"
+TIER_BASIC = 1
+TIER_STANDARD = 2
+TIER_ADVANCED = 3
+TIERS = {"basic": TIER_BASIC, "standard": TIER_STANDARD, "advanced": TIER_ADVANCED}
+
+
+class ModelInfo(NamedTuple):
+    """
+    What the CLI knows about a model.
+
+    Attributes:
+        name (str): The model name sent to the API
+        context_window (int): Maximum tokens of prompt and completion combined
+        cost (float): Relative cost, in USD per million output tokens
+        kind (str): "search" or "reasoning"
+        tier (int): Answer quality, from ``TIER_BASIC`` to ``TIER_ADVANCED``
+        streaming (bool): Whether the model can stream its answer
+        latency (float): Typical seconds for a full answer, used until
+            latencies have been measured
+    """
+
+    name: str
+    context_window: int
+    cost: float
+    kind: str
+    tier: int
+    streaming: bool
+    latency: float
+
+
+# Catalog of available models (as of May 2025)
 # Reference: https://docs.perplexity.ai/guides/model-cards
-AVAILABLE_MODELS = [
-    "sonar-reasoning-pro",
-    "sonar-reasoning",
-    "sonar-pro", 
-    "sonar",
-    "llama-3.1-sonar-small-128k-online",
-    "llama-3.1-sonar-large-128k-online",
-    "llama-3.1-sonar-huge-128k-online"
-]
+MODEL_CATALOG: Dict[str, ModelInfo] = {info.name: info for info in [
+    ModelInfo("sonar-reasoning-pro", 128000, 8.0, "reasoning", TIER_ADVANCED, True, 12.0),
+    ModelInfo("sonar-reasoning", 128000, 5.0, "reasoning", TIER_STANDARD, True, 8.0),
+    ModelInfo("sonar-pro", 200000, 15.0, "search", TIER_ADVANCED, True, 5.0),
+    ModelInfo("sonar", 128000, 1.0, "search", TIER_STANDARD, True, 2.5),
+    ModelInfo("llama-3.1-sonar-small-128k-online", 127072, 0.2, "search", TIER_BASIC, True, 1.5),
+    ModelInfo("llama-3.1-sonar-large-128k-online", 127072, 1.0, "search", TIER_STANDARD, True, 2.5),
+    ModelInfo("llama-3.1-sonar-huge-128k-online", 127072, 5.0, "search", TIER_ADVANCED, True, 4.0),
+]}
+
+# List of available models
+AVAILABLE_MODELS = list(MODEL_CATALOG)
+
+# Context window of each model in tokens
+DEFAULT_CONTEXT_WINDOW = 127072
+MODEL_CONTEXT_WINDOWS = {name: info.context_window for name, info in MODEL_CATALOG.items()}
+
+
+def context_window(model: str) -> int:
+    """
+    Get the context window of a model.
+    
+    Args:
+        model (str): The model name
+        
+    Returns:
+        int: Maximum tokens of prompt and completion combined
+    """
+    return MODEL_CONTEXT_WINDOWS.get(model, DEFAULT_CONTEXT_WINDOW)
 
 
 def list_models() -> None:
     """
     Display a list of the available models.
     """
+    tier_names = {tier: name for name, tier in TIERS.items()}
     print("\nAvailable Perplexity AI models:")
     print("-------------------------------")
-    for model in AVAILABLE_MODELS:
-        print(f"- {model}")
+    for info in MODEL_CATALOG.values():
+        print(f"- {info.name:<36} {info.kind:<10} {tier_names[info.tier]:<9} "
+              f"context {info.context_window:>6}  cost {info.cost:g}")
+    print(f"\nUse -m {AUTO_MODEL} to pick a model by measured latency, cost and quality tier.")
     print("\nNote: This list is maintained within the script and not dynamically retrieved from Perplexity AI.")
     print("For the most up-to-date list, visit: https://docs.perplexity.ai/guides/model-cards")
@@ -0,0 +1,128 @@
+"""
+Output module for Perplexity CLI.
+
+This module writes responses in the machine-readable output formats. JSON
+responses are written as the bytes the API sent, without decoding and
+re-encoding them.
+"""
+
+import json
+import logging
+import sys
+from typing import Dict, Any, BinaryIO, Iterable, List, Optional, TextIO
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Constants
+OUTPUT_TEXT = "text"
+OUTPUT_JSON = "json"
+OUTPUT_JSONL = "jsonl"
+OUTPUT_CONTENT = "content-only"
+OUTPUT_FORMATS = [OUTPUT_TEXT, OUTPUT_JSON, OUTPUT_JSONL, OUTPUT_CONTENT]
+RAW_OUTPUTS = (OUTPUT_JSON, OUTPUT_JSONL)
+
+
+def _binary_stdout() -> BinaryIO:
+    """
+    Get the binary stream under stdout, after flushing pending text.
+
+    Returns:
+        BinaryIO: The stream to write encoded output to
+    """
+    sys.stdout.flush()
+    return getattr(sys.stdout, "buffer", None) or _TextWriter(sys.stdout)
+
+
+class _TextWriter:
+    """
+    Binary facade for a text stream without a ``buffer``, such as a StringIO.
+
+    Args:
+        stream (TextIO): The text stream to write to
+    """
+
+    def __init__(self, stream: TextIO) -> None:
+        self.stream = stream
+
+    def write(self, data: bytes) -> int:
+        return self.stream.write(data.decode("utf-8"))
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+
+def write_raw(body: bytes, output: str = OUTPUT_JSON, out: Optional[BinaryIO] = None) -> None:
+    """
+    Write a JSON response body as the API sent it.
+
+    For JSONL, a body that spans several lines is compacted onto one line;
+    API responses normally already are.
+
+    Args:
+        body (bytes): The raw response body
+        output (str): ``"json"`` or ``"jsonl"``
+        out (Optional[BinaryIO]): Where to write; defaults to stdout
+    """
+    body = body.strip()
+    if output == OUTPUT_JSONL and b"\n" in body:
+        body = json.dumps(json.loads(body), separators=(",", ":")).encode("utf-8")
+    out = out or _binary_stdout()
+    out.write(body + b"\n")
+    out.flush()
+
+
+def write_json(response: Dict[str, Any], output: str = OUTPUT_JSON,
+               out: Optional[BinaryIO] = None) -> None:
+    """
+    Write a decoded response, e.g. one answered by the daemon, as one JSON line.
+
+    Args:
+        response (Dict[str, Any]): The response dictionary
+        output (str): ``"json"`` or ``"jsonl"``
+        out (Optional[BinaryIO]): Where to write; defaults to stdout
+    """
+    write_raw(json.dumps(response, separators=(",", ":")).encode("utf-8"), output, out)
+
+
+def response_content(response: Dict[str, Any]) -> str:
+    """
+    Extract the answer text of a response.
+
+    Args:
+        response (Dict[str, Any]): The response dictionary
+
+    Returns:
+        str: The content of every choice, one per line
+    """
+    contents: List[str] = []
+    for choice in response.get("choices", []):
+        contents.append(choice.get("message", {}).get("content") or "")
+    return "\n".join(contents)
+
+
+def print_content(response: Dict[str, Any], out: Optional[TextIO] = None) -> None:
+    """
+    Print only the answer text of a response.
+
+    Args:
+        response (Dict[str, Any]): The response dictionary
+        out (Optional[TextIO]): Where to write; defaults to stdout
+    """
+    out = out or sys.stdout
+    out.write(response_content(response) + "\n")
+    out.flush()
+
+
+def write_chunks(chunks: Iterable[Dict[str, Any]], out: Optional[BinaryIO] = None) -> None:
+    """
+    Write streamed chunks as JSONL, one line per chunk as it arrives.
+
+    Args:
+        chunks (Iterable[Dict[str, Any]]): Chunks yielded by ``stream_api``
+        out (Optional[BinaryIO]): Where to write; defaults to stdout
+    """
+    out = out or _binary_stdout()
+    for chunk in chunks:
+        out.write(json.dumps(chunk, separators=(",", ":")).encode("utf-8") + b"\n")
+        out.flush()
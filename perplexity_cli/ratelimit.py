@@ -0,0 +1,242 @@
+"""
+Rate limit module for Perplexity CLI.
+
+This module provides a client-side token-bucket rate limiter for requests
+per minute and tokens per minute. Its state lives in a small file-locked
+JSON file, so every process on the host draws from the same budget.
+"""
+
+import contextlib
+import json
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional, Union
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+from perplexity_cli.config import get_data_dir
+from perplexity_cli.tokens import estimate_prompt_tokens
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Constants
+RATE_LIMIT_FILENAME = "ratelimit.json"
+
+
+def estimate_request_tokens(messages: List[Dict[str, str]], max_tokens: int) -> int:
+    """
+    Estimate the tokens a request will use against the tokens-per-minute budget.
+
+    The estimate counts the prompt plus the full completion allowance; the
+    difference is refunded with ``RateLimiter.record_usage`` once the real
+    usage is known. The clients use the calibrated estimate from
+    ``TokenCalibrator.size_request`` instead.
+
+    Args:
+        messages (List[Dict[str, str]]): The chat messages to send
+        max_tokens (int): Maximum number of tokens for the response
+
+    Returns:
+        int: Estimated total tokens
+    """
+    return estimate_prompt_tokens(messages) + max_tokens
+
+
+class RateLimiter:
+    """
+    Token-bucket limiter shared by all processes on the host.
+
+    Each bucket holds up to one minute's allowance and refills continuously.
+    A request waits until both buckets can cover it, which is far cheaper
+    than being rejected by the API with a 429.
+
+    Args:
+        requests_per_minute (Optional[float]): Request budget; None for unlimited
+        tokens_per_minute (Optional[float]): Token budget; None for unlimited
+        path (Optional[Union[str, Path]]): State file; defaults to the data directory
+    """
+
+    def __init__(self, requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None,
+                 path: Optional[Union[str, Path]] = None) -> None:
+        self.limits = {"requests": requests_per_minute, "tokens": tokens_per_minute}
+        self.path = Path(path) if path else get_data_dir() / RATE_LIMIT_FILENAME
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def _state(self) -> Iterator[Dict[str, Any]]:
+        """
+        Lock, load and (on exit) save the shared bucket state.
+
+        Yields:
+            Dict[str, Any]: The bucket state, refilled to the current time
+        """
+        with self._lock, open(self.path, "a+", encoding="utf-8") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                try:
+                    state = json.loads(f.read() or "{}")
+                except ValueError:
+                    state = {}
+                self._refill(state, time.time())
+                yield state
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(state))
+                f.flush()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _refill(self, state: Dict[str, Any], now: float) -> None:
+        """
+        Add the allowance earned since the last update to each bucket.
+
+        Args:
+            state (Dict[str, Any]): The bucket state to update in place
+            now (float): The current time
+        """
+        for name, limit in self.limits.items():
+            if limit is None:
+                continue
+            bucket = state.setdefault(name, {"level": float(limit), "updated": now})
+            elapsed = max(0.0, now - bucket["updated"])
+            bucket["level"] = min(float(limit), bucket["level"] + elapsed * limit / 60.0)
+            bucket["updated"] = now
+
+    def _needs(self, tokens: int) -> Dict[str, float]:
+        """
+        Amount to take from each limited bucket for one request.
+
+        Args:
+            tokens (int): Estimated tokens for the request
+
+        Returns:
+            Dict[str, float]: Amount per bucket, capped at the bucket size
+        """
+        needs = {}
+        if self.limits["requests"] is not None:
+            needs["requests"] = 1.0
+        if self.limits["tokens"] is not None:
+            needs["tokens"] = float(min(tokens, self.limits["tokens"]))
+        return needs
+
+    def try_acquire(self, tokens: int = 0) -> float:
+        """
+        Take budget for one request if it is available.
+
+        Args:
+            tokens (int): Estimated tokens for the request
+
+        Returns:
+            float: 0 if the request may go ahead, otherwise seconds to wait before retrying
+        """
+        needs = self._needs(tokens)
+        if not needs:
+            return 0.0
+        with self._state() as state:
+            wait = 0.0
+            for name, amount in needs.items():
+                deficit = amount - state[name]["level"]
+                if deficit > 0:
+                    wait = max(wait, deficit * 60.0 / self.limits[name])
+            if wait == 0.0:
+                for name, amount in needs.items():
+                    state[name]["level"] -= amount
+        return wait
+
+    def acquire(self, tokens: int = 0) -> float:
+        """
+        Block until budget for one request is available, then take it.
+
+        Args:
+            tokens (int): Estimated tokens for the request
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0.0:
+                if waited:
+                    logger.debug("Rate limiter delayed request by %.2fs", waited)
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    async def acquire_async(self, tokens: int = 0) -> float:
+        """
+        Wait without blocking the event loop until budget is available, then take it.
+
+        The state file is locked and read on a worker thread, so a lock held
+        by another process never stalls the loop.
+
+        Args:
+            tokens (int): Estimated tokens for the request
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        waited = 0.0
+        while True:
+            wait = await loop.run_in_executor(None, self.try_acquire, tokens)
+            if wait == 0.0:
+                return waited
+            await asyncio.sleep(wait)
+            waited += wait
+
+    def record_usage(self, estimated: int, actual: Optional[int]) -> None:
+        """
+        Correct the token bucket once the real usage of a request is known.
+
+        Args:
+            estimated (int): Tokens taken by ``acquire``
+            actual (Optional[int]): ``total_tokens`` reported by the API
+        """
+        if self.limits["tokens"] is None or actual is None:
+            return
+        taken = self._needs(estimated)["tokens"]
+        with self._state() as state:
+            bucket = state["tokens"]
+            bucket["level"] = min(float(self.limits["tokens"]), bucket["level"] + taken - actual)
+
+    def available(self) -> float:
+        """
+        Report the share of the tightest budget that is currently available.
+
+        Returns:
+            float: Between 0 (exhausted) and 1 (full, or unlimited)
+        """
+        if all(limit is None for limit in self.limits.values()):
+            return 1.0
+        with self._state() as state:
+            return min(max(0.0, state[name]["level"]) / limit
+                       for name, limit in self.limits.items() if limit is not None)
+
+    def headroom(self) -> Dict[str, Any]:
+        """
+        Report how much of each budget is currently available.
+
+        Returns:
+            Dict[str, Any]: Available amount and limit per bucket
+        """
+        report: Dict[str, Any] = {"path": str(self.path)}
+        with self._state() as state:
+            for name, limit in self.limits.items():
+                if limit is None:
+                    report[name] = "unlimited"
+                else:
+                    report[name] = f"{state[name]['level']:.1f}/{limit:g} per minute"
+        return report
@@ -0,0 +1,121 @@
+"""
+REPL module for Perplexity CLI.
+
+This module implements the interactive mode: a prompt loop that keeps one
+warm client and a multi-turn conversation, and streams each answer.
+"""
+
+import logging
+import sys
+from typing import Any, Callable, Dict, IO, Optional, Tuple
+
+from perplexity_cli.conversation import Conversation
+from perplexity_cli.exceptions import PerplexityError
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Constants
+PROMPT = ">>> "
+HELP_TEXT = """Commands:
+  /help     Show this help
+  /reset    Start a new conversation
+  /history  Show the size of the conversation history
+  /exit     Leave interactive mode (or press Ctrl-D)"""
+
+
+def stream_answer(client: Any, model: str, max_tokens: int, conversation: Conversation,
+                  out: IO[str]) -> Tuple[str, Dict[str, Any]]:
+    """
+    Stream the answer to the conversation's latest question.
+
+    Args:
+        client (Any): The ``PerplexityClient`` to send the request with
+        model (str): The model to use
+        max_tokens (int): Maximum number of tokens for the response
+        conversation (Conversation): The conversation, ending with the question
+        out (IO[str]): Where to write the answer as it arrives
+
+    Returns:
+        Tuple[str, Dict[str, Any]]: The full answer and the reported usage
+    """
+    content = []
+    usage: Dict[str, Any] = {}
+    messages = conversation.request_messages(model, max_tokens)
+    for chunk in client.stream(model, max_tokens, messages=messages):
+        usage = chunk.get("usage") or usage
+        for choice in chunk.get("choices", []):
+            delta = choice.get("delta", {}).get("content")
+            if delta:
+                content.append(delta)
+                out.write(delta)
+                out.flush()
+    out.write("\n")
+    return "".join(content), usage
+
+
+def run_repl(client: Any, model: str, max_tokens: int,
+             conversation: Optional[Conversation] = None, verbose: bool = False,
+             input_fn: Callable[[str], str] = input, out: Optional[IO[str]] = None,
+             on_answer: Optional[Callable[[str, str], None]] = None) -> int:
+    """
+    Run the interactive prompt loop until the user exits.
+
+    Args:
+        client (Any): The ``PerplexityClient`` used for every question
+        model (str): The model to use
+        max_tokens (int): Maximum number of tokens per answer
+        conversation (Optional[Conversation]): History to continue; a new one by default
+        verbose (bool): Whether to print token usage after each answer
+        input_fn (Callable[[str], str]): Reads a line from the user
+        out (Optional[IO[str]]): Output stream; defaults to stdout
+        on_answer (Optional[Callable[[str, str], None]]): Called with each question
+            and its answer, e.g. to save them to a session
+
+    Returns:
+        int: Exit code
+    """
+    out = out or sys.stdout
+    conversation = conversation if conversation is not None else Conversation()
+    out.write(f"Interactive mode with {model}. Type /help for commands, /exit to quit.\n")
+
+    while True:
+        try:
+            line = input_fn(PROMPT).strip()
+        except (EOFError, KeyboardInterrupt):
+            out.write("\n")
+            return 0
+
+        if not line:
+            continue
+        if line in ("/exit", "/quit"):
+            return 0
+        if line == "/help":
+            out.write(HELP_TEXT + "\n")
+            continue
+        if line == "/reset":
+            conversation.reset()
+            out.write("Started a new conversation.\n")
+            continue
+        if line == "/history":
+            out.write(f"{len(conversation)} turns, about {conversation.tokens} tokens, "
+                      f"{conversation.trimmed} turns trimmed\n")
+            continue
+
+        conversation.add("user", line)
+        try:
+            answer, usage = stream_answer(client, model, max_tokens, conversation, out)
+        except KeyboardInterrupt:
+            out.write("\n[interrupted]\n")
+            conversation.pop()
+            continue
+        except PerplexityError as e:
+            logger.error(str(e))
+            conversation.pop()
+            continue
+
+        conversation.add("assistant", answer)
+        if on_answer is not None:
+            on_answer(line, answer)
+        if verbose and usage:
+            out.write(", ".join(f"{key}: {value}" for key, value in usage.items()) + "\n")
@@ -0,0 +1,330 @@
+"""
+Retry module for Perplexity CLI.
+
+This module implements the retry policy used by the API clients: separate
+connect and read timeouts, exponential backoff with full jitter, honoring of
+``Retry-After``, a deadline shared by all attempts (and by every read within
+them), and a retry budget that stops retries from amplifying an outage.
+"""
+
+import logging
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+from perplexity_cli.exceptions import (
+    PerplexityError, RateLimitError, DeadlineExceededError
+)
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_BASE_DELAY = 0.5
+DEFAULT_MAX_DELAY = 20.0
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_READ_TIMEOUT = 30.0
+DEFAULT_BUDGET_RATIO = 0.2
+DEFAULT_BUDGET_MIN_TOKENS = 10.0
+DEFAULT_BUDGET_CAPACITY = 100.0
+
+T = TypeVar("T")
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a ``Retry-After`` header value.
+
+    Args:
+        value (Optional[str]): Delay in seconds or an HTTP date
+
+    Returns:
+        Optional[float]: Seconds to wait, or None if the value is missing or invalid
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    import email.utils
+
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if when is None:
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class Timeouts(tuple):
+    """
+    The ``(connect, read)`` timeouts of one attempt, and the deadline of its call.
+
+    The pair is passed to the HTTP library as is. The read timeout only bounds
+    the wait for each read, so a response that trickles in can outlast it; the
+    clients call ``check`` while reading the body to end the call on time.
+
+    Args:
+        connect (float): Timeout for establishing a connection
+        read (float): Timeout between bytes of the response
+        deadline_at (Optional[float]): ``time.monotonic()`` value of the deadline
+        deadline (Optional[float]): The deadline in seconds, for the error message
+    """
+
+    deadline_at: Optional[float]
+    deadline: Optional[float]
+
+    def __new__(cls, connect: float, read: float, deadline_at: Optional[float] = None,
+                deadline: Optional[float] = None) -> "Timeouts":
+        timeouts = super().__new__(cls, (connect, read))
+        timeouts.deadline_at = deadline_at
+        timeouts.deadline = deadline
+        return timeouts
+
+    def remaining(self) -> Optional[float]:
+        """
+        Compute the time left before the deadline.
+
+        Returns:
+            Optional[float]: Seconds left, or None if the call has no deadline
+        """
+        if self.deadline_at is None:
+            return None
+        return max(0.0, self.deadline_at - time.monotonic())
+
+    def check(self) -> None:
+        """
+        Fail if the deadline has passed.
+
+        Raises:
+            DeadlineExceededError: If the deadline has passed
+        """
+        if self.deadline_at is not None and time.monotonic() >= self.deadline_at:
+            raise DeadlineExceededError(f"Deadline of {self.deadline}s exceeded")
+
+
+class RetryBudget:
+    """
+    Limit retries to a fraction of the requests being made.
+
+    Every request deposits ``ratio`` tokens and every retry spends one. While
+    the API is healthy the budget fills up; during an outage it drains, after
+    which failures are returned at once instead of multiplying the load.
+
+    Args:
+        ratio (float): Retries allowed per request, on average
+        min_tokens (float): Starting balance, so a quiet client can still retry
+        capacity (float): Maximum balance
+    """
+
+    def __init__(self, ratio: float = DEFAULT_BUDGET_RATIO,
+                 min_tokens: float = DEFAULT_BUDGET_MIN_TOKENS,
+                 capacity: float = DEFAULT_BUDGET_CAPACITY) -> None:
+        self.ratio = ratio
+        self.capacity = max(capacity, min_tokens)
+        self._tokens = min_tokens
+        self._lock = threading.Lock()
+
+    @property
+    def tokens(self) -> float:
+        """
+        float: The current balance.
+        """
+        return self._tokens
+
+    def record_request(self) -> None:
+        """
+        Deposit the tokens earned by a new request.
+        """
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        """
+        Spend a token for a retry if one is available.
+
+        Returns:
+            bool: Whether the retry is allowed
+        """
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+
+class RetryPolicy:
+    """
+    How the clients time out and retry failed requests.
+
+    Args:
+        max_attempts (int): Maximum attempts per call, including the first
+        base_delay (float): Backoff base in seconds
+        max_delay (float): Maximum wait between attempts in seconds; a 429
+            whose ``Retry-After`` asks for longer is not retried
+        connect_timeout (float): Timeout for establishing a connection
+        read_timeout (float): Timeout between bytes of the response
+        deadline (Optional[float]): Seconds all attempts of one call, reading
+            their responses included, may take in total
+        budget (Optional[RetryBudget]): Shared retry budget; None disables it
+    """
+
+    def __init__(self, max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                 base_delay: float = DEFAULT_BASE_DELAY,
+                 max_delay: float = DEFAULT_MAX_DELAY,
+                 connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout: float = DEFAULT_READ_TIMEOUT,
+                 deadline: Optional[float] = None,
+                 budget: Optional[RetryBudget] = None) -> None:
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.deadline = deadline
+        self.budget = budget if budget is not None else RetryBudget()
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Compute the delay before a retry, using full jitter.
+
+        Args:
+            attempt (int): Number of attempts made so far, starting at 1
+
+        Returns:
+            float: Seconds to wait
+        """
+        cap = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return random.uniform(0, cap)
+
+    def timeouts(self, deadline_at: Optional[float]) -> Timeouts:
+        """
+        Compute the connect and read timeouts for the next attempt.
+
+        Args:
+            deadline_at (Optional[float]): ``time.monotonic()`` value of the deadline
+
+        Returns:
+            Timeouts: Connect and read timeouts in seconds, and the deadline
+
+        Raises:
+            DeadlineExceededError: If the deadline has already passed
+        """
+        if deadline_at is None:
+            return Timeouts(self.connect_timeout, self.read_timeout)
+        remaining = deadline_at - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceededError(f"Deadline of {self.deadline}s exceeded")
+        return Timeouts(min(self.connect_timeout, remaining), min(self.read_timeout, remaining),
+                        deadline_at, self.deadline)
+
+    def _next_delay(self, error: PerplexityError, attempt: int,
+                    deadline_at: Optional[float]) -> Optional[float]:
+        """
+        Decide whether to retry after an error and how long to wait first.
+
+        Args:
+            error (PerplexityError): The error from the last attempt
+            attempt (int): Number of attempts made so far
+            deadline_at (Optional[float]): ``time.monotonic()`` value of the deadline
+
+        Returns:
+            Optional[float]: Seconds to wait, or None to give up
+
+        Raises:
+            DeadlineExceededError: If waiting would run past the deadline
+        """
+        if not error.retryable or attempt >= self.max_attempts:
+            return None
+
+        delay = None
+        if isinstance(error, RateLimitError):
+            delay = error.retry_after
+            if delay is not None and delay > self.max_delay:
+                logger.warning("Rate limited for %.0fs, longer than the %.0fs retry cap; "
+                               "not retrying", delay, self.max_delay)
+                return None
+        if delay is None:
+            delay = self.backoff(attempt)
+
+        if deadline_at is not None and time.monotonic() + delay >= deadline_at:
+            raise DeadlineExceededError(
+                f"Deadline of {self.deadline}s exceeded after {attempt} attempt(s): {error}"
+            ) from error
+        if self.budget is not None and not self.budget.try_spend():
+            logger.debug("Retry budget exhausted, not retrying")
+            return None
+
+        logger.warning("Attempt %d failed (%s), retrying in %.2fs", attempt, error, delay)
+        return delay
+
+    def _deadline_at(self) -> Optional[float]:
+        """
+        Start the clock for a new call.
+
+        Returns:
+            Optional[float]: ``time.monotonic()`` value of the deadline, if any
+        """
+        if self.budget is not None:
+            self.budget.record_request()
+        if self.deadline is None:
+            return None
+        return time.monotonic() + self.deadline
+
+    def call(self, attempt_fn: Callable[[Timeouts], T]) -> T:
+        """
+        Run a request, retrying retryable errors.
+
+        Args:
+            attempt_fn (Callable[[Timeouts], T]): Makes one attempt, given its
+                (connect, read) timeouts
+
+        Returns:
+            T: The result of the first successful attempt
+
+        Raises:
+            PerplexityError: The last error, if the call did not succeed
+        """
+        deadline_at = self._deadline_at()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return attempt_fn(self.timeouts(deadline_at))
+            except PerplexityError as e:
+                delay = self._next_delay(e, attempt, deadline_at)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+
+    async def call_async(self, attempt_fn: Callable[[Timeouts], Awaitable[Any]]) -> Any:
+        """
+        Run an asynchronous request, retrying retryable errors.
+
+        Args:
+            attempt_fn (Callable[[Timeouts], Awaitable[Any]]): Makes one attempt,
+                given its (connect, read) timeouts
+
+        Returns:
+            Any: The result of the first successful attempt
+
+        Raises:
+            PerplexityError: The last error, if the call did not succeed
+        """
+        import asyncio
+
+        deadline_at = self._deadline_at()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return await attempt_fn(self.timeouts(deadline_at))
+            except PerplexityError as e:
+                delay = self._next_delay(e, attempt, deadline_at)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
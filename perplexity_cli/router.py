@@ -0,0 +1,265 @@
+"""
+Router module for Perplexity CLI.
+
+This module picks a model for ``--model auto``. It keeps an exponentially
+weighted average of each model's latency and error rate, measured from the
+requests the client sends and kept in the data directory, and chooses the
+cheapest (or fastest) model that meets a latency SLO and a quality tier.
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Union
+
+from perplexity_cli.config import get_data_dir
+from perplexity_cli.models import MODEL_CATALOG, TIER_BASIC, ModelInfo
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Constants
+ROUTER_FILENAME = "router.json"
+LATENCY_ALPHA = 0.2
+MAX_ERROR_RATE = 0.5
+STALE_AFTER = 7 * 24 * 3600
+TTFT_PRIOR_FRACTION = 0.3
+SAVE_INTERVAL = 5.0
+PREFER_COST = "cost"
+PREFER_LATENCY = "latency"
+
+
+class ModelRouter:
+    """
+    Latency- and error-aware model selection.
+
+    For each model the router keeps an exponentially weighted average of
+    the full-answer latency, of the time to the first streamed chunk, and of
+    the error rate. Models without recent measurements are assumed to take
+    their catalog latency. The state file is rewritten at most every
+    ``SAVE_INTERVAL`` seconds; ``flush`` writes what is left, and the shared
+    router from ``get_router`` is flushed when the process exits.
+
+    Args:
+        path (Optional[Union[str, Path]]): State file; defaults to the data directory
+        persist (bool): Whether to load and save the state file
+    """
+
+    def __init__(self, path: Optional[Union[str, Path]] = None, persist: bool = True) -> None:
+        self._path = Path(path) if path else None
+        self.persist = persist
+        self._models: Optional[Dict[str, Dict[str, float]]] = None
+        self._dirty = False
+        self._saved_at = float("-inf")
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> Path:
+        """
+        Path: The state file.
+        """
+        if self._path is None:
+            self._path = get_data_dir() / ROUTER_FILENAME
+        return self._path
+
+    def _state(self) -> Dict[str, Dict[str, float]]:
+        """
+        Return the router state, loading it on first use.
+
+        Returns:
+            Dict[str, Dict[str, float]]: Measurements per model
+        """
+        if self._models is None:
+            self._models = {}
+            if self.persist:
+                try:
+                    with open(self.path, encoding="utf-8") as f:
+                        self._models = json.load(f)
+                except (OSError, ValueError):
+                    pass
+        return self._models
+
+    def record(self, model: str, latency: Optional[float], ok: bool, stream: bool = False) -> None:
+        """
+        Update a model's measurements with the outcome of a request.
+
+        Args:
+            model (str): The model the request was for
+            latency (Optional[float]): Seconds to the full answer, or to the
+                first chunk of a stream; None if the request failed
+            ok (bool): Whether the request succeeded
+            stream (bool): Whether ``latency`` is a time to first chunk
+        """
+        if model not in MODEL_CATALOG:
+            return
+        field = "ttft" if stream else "latency"
+        with self._lock:
+            entry = self._state().setdefault(model, {"error": 0.0, "samples": 0})
+            if time.time() - entry.get("updated", 0) > STALE_AFTER:
+                entry.clear()
+                entry.update(error=0.0, samples=0)
+            alpha = max(LATENCY_ALPHA, 1.0 / (entry["samples"] + 1))
+            entry["error"] += alpha * ((0.0 if ok else 1.0) - entry["error"])
+            if ok and latency is not None:
+                previous = entry.get(field)
+                entry[field] = latency if previous is None else previous + alpha * (latency - previous)
+            entry["samples"] += 1
+            entry["updated"] = time.time()
+            self._dirty = True
+            if self.persist and time.monotonic() - self._saved_at >= SAVE_INTERVAL:
+                self._save()
+
+    def flush(self) -> None:
+        """
+        Write any measurements not yet saved to the state file.
+        """
+        with self._lock:
+            if self.persist and self._dirty:
+                self._save()
+
+    def _save(self) -> None:
+        """
+        Write the state file atomically.
+        """
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._models, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.debug("Failed to save router state: %s", e)
+
+    def estimate(self, model: str, stream: bool = False) -> Dict[str, float]:
+        """
+        Estimate a model's latency and error rate.
+
+        Args:
+            model (str): The model name
+            stream (bool): Estimate the time to the first chunk instead of
+                the full answer
+
+        Returns:
+            Dict[str, float]: ``latency`` in seconds, ``error`` rate and ``samples``
+        """
+        info = MODEL_CATALOG[model]
+        prior = info.latency * TTFT_PRIOR_FRACTION if stream else info.latency
+        with self._lock:
+            entry = dict(self._state().get(model, {}))
+        if time.time() - entry.get("updated", 0) > STALE_AFTER:
+            entry = {}
+        return {
+            "latency": entry.get("ttft" if stream else "latency", prior),
+            "error": entry.get("error", 0.0),
+            "samples": entry.get("samples", 0),
+        }
+
+    def candidates(self, tier: int = TIER_BASIC, stream: bool = False,
+                   prompt_tokens: int = 0) -> List[ModelInfo]:
+        """
+        List the models that can serve a request at all.
+
+        Args:
+            tier (int): Minimum quality tier
+            stream (bool): Whether the answer will be streamed
+            prompt_tokens (int): Estimated prompt size, which must fit the context window
+
+        Returns:
+            List[ModelInfo]: The eligible models
+        """
+        return [info for info in MODEL_CATALOG.values()
+                if info.tier >= tier and (info.streaming or not stream)
+                and info.context_window > prompt_tokens]
+
+    def choose(self, latency_slo: Optional[float] = None, tier: int = TIER_BASIC,
+               prefer: str = PREFER_COST, stream: bool = False, prompt_tokens: int = 0) -> str:
+        """
+        Pick a model for a request.
+
+        Among the models of at least ``tier`` whose expected latency meets the
+        SLO and whose error rate is acceptable, the cheapest is chosen (or the
+        fastest, with ``prefer="latency"``). If no model meets the SLO, the
+        fastest eligible model is chosen.
+
+        Args:
+            latency_slo (Optional[float]): Seconds the answer (or, when
+                streaming, its first chunk) should take at most
+            tier (int): Minimum quality tier
+            prefer (str): ``"cost"`` or ``"latency"``
+            stream (bool): Whether the answer will be streamed
+            prompt_tokens (int): Estimated prompt size
+
+        Returns:
+            str: The chosen model name
+
+        Raises:
+            ValueError: If no model offers the requested tier and context window
+        """
+        candidates = self.candidates(tier, stream, prompt_tokens)
+        if not candidates:
+            raise ValueError(f"No model offers quality tier {tier} for a prompt of "
+                             f"{prompt_tokens} tokens")
+
+        scored = []
+        for info in candidates:
+            estimate = self.estimate(info.name, stream)
+            # Failed attempts are retried, so errors stretch the expected latency
+            expected = estimate["latency"] / max(0.1, 1.0 - estimate["error"])
+            scored.append((info, expected, estimate["error"]))
+
+        eligible = [(info, expected) for info, expected, error in scored
+                    if error <= MAX_ERROR_RATE and (latency_slo is None or expected <= latency_slo)]
+        if not eligible:
+            info, expected, _ = min(scored, key=lambda item: item[1])
+            logger.info("No model meets the %ss latency SLO; using the fastest, %s (~%.1fs)",
+                        latency_slo, info.name, expected)
+            return info.name
+
+        if prefer == PREFER_LATENCY:
+            info, expected = min(eligible, key=lambda item: (item[1], item[0].cost))
+        else:
+            info, expected = min(eligible, key=lambda item: (item[0].cost, item[1]))
+        logger.debug("Routing to %s (expected %.2fs, cost %g)", info.name, expected, info.cost)
+        return info.name
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report the estimates of every model.
+
+        Returns:
+            Dict[str, Any]: Latency, time to first chunk, error rate and
+            sample count per model
+        """
+        stats = {}
+        for model in MODEL_CATALOG:
+            estimate = self.estimate(model)
+            stats[model] = {"latency": round(estimate["latency"], 3),
+                            "ttft": round(self.estimate(model, stream=True)["latency"], 3),
+                            "error": round(estimate["error"], 3),
+                            "samples": estimate["samples"]}
+        return stats
+
+
+# Router shared by the clients of this process
+_router: Optional[ModelRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> ModelRouter:
+    """
+    Return the process-wide router, creating it on first use.
+
+    Returns:
+        ModelRouter: The shared router
+    """
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = ModelRouter()
+            atexit.register(_router.flush)
+        return _router
@@ -0,0 +1,402 @@
+"""
+Sessions module for Perplexity CLI.
+
+This module stores named conversations on disk so that a thread can be
+continued across invocations. Each session is an append-only JSONL log of
+turns plus a fixed-size binary index of (offset, length, tokens) records,
+so resuming reads only the tail of the log that fits in the context budget.
+"""
+
+import contextlib
+import json
+import logging
+import os
+import re
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+from perplexity_cli.config import get_data_dir, DEFAULT_HISTORY_TOKENS
+from perplexity_cli.conversation import Conversation, estimate_message_tokens
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Constants
+SESSIONS_DIRNAME = "sessions"
+INDEX_RECORD = struct.Struct("<QII")
+INDEX_READ_RECORDS = 256
+COMPACT_MIN_BYTES = 1024 * 1024
+COMPACT_KEEP_TOKENS = 4 * DEFAULT_HISTORY_TOKENS
+_NAME_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,127}$")
+
+
+class SessionLog:
+    """
+    Append-only log of the turns of one session.
+
+    ``NAME.log`` holds one JSON object per turn and ``NAME.idx`` one
+    ``INDEX_RECORD`` per turn. Appends write the log before the index, so
+    the index never points past the data; an index left behind by a crash
+    is rebuilt from the log. A lock file serializes writers across processes.
+
+    Args:
+        directory (Union[str, Path]): Directory holding the session files
+        name (str): The session name
+    """
+
+    def __init__(self, directory: Union[str, Path], name: str) -> None:
+        if not _NAME_PATTERN.match(name):
+            raise ValueError(f"Invalid session name '{name}'. Use letters, digits, '.', '_' and '-'.")
+        self.name = name
+        directory = Path(directory)
+        self.log_path = directory / f"{name}.log"
+        self.index_path = directory / f"{name}.idx"
+        self.lock_path = directory / f"{name}.lock"
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def _locked(self, exclusive: bool = True) -> Iterator[None]:
+        """
+        Hold the session's file lock.
+
+        Args:
+            exclusive (bool): Take an exclusive (writer) lock instead of a shared one
+        """
+        with self._lock, open(self.lock_path, "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def __len__(self) -> int:
+        try:
+            return self.index_path.stat().st_size // INDEX_RECORD.size
+        except OSError:
+            return 0
+
+    @property
+    def size(self) -> int:
+        """
+        int: Size of the log file in bytes.
+        """
+        try:
+            return self.log_path.stat().st_size
+        except OSError:
+            return 0
+
+    def _repair(self) -> None:
+        """
+        Rebuild the index from the log if they disagree, e.g. after a crash.
+
+        A partially written last line is dropped from the log.
+        """
+        log_size = self.size
+        end = 0
+        try:
+            with open(self.index_path, "rb") as f:
+                f.seek(0, os.SEEK_END)
+                index_size = f.tell()
+                if index_size % INDEX_RECORD.size == 0 and index_size:
+                    f.seek(index_size - INDEX_RECORD.size)
+                    offset, length, _ = INDEX_RECORD.unpack(f.read(INDEX_RECORD.size))
+                    end = offset + length
+        except OSError:
+            index_size = 0
+        if end == log_size and index_size % INDEX_RECORD.size == 0:
+            return
+
+        logger.warning("Rebuilding index of session '%s'", self.name)
+        records = []
+        offset = 0
+        if log_size:
+            with open(self.log_path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    turn = json.loads(line)
+                    records.append(INDEX_RECORD.pack(offset, len(line), turn["tokens"]))
+                    offset += len(line)
+            if offset != log_size:
+                with open(self.log_path, "r+b") as f:
+                    f.truncate(offset)
+        with open(self.index_path, "wb") as f:
+            f.write(b"".join(records))
+
+    def append(self, turns: List[Tuple[str, str]]) -> None:
+        """
+        Append turns to the session.
+
+        Args:
+            turns (List[Tuple[str, str]]): Role and content of each turn
+        """
+        lines = []
+        for role, content in turns:
+            turn = {"role": role, "content": content,
+                    "tokens": estimate_message_tokens(content), "time": time.time()}
+            line = (json.dumps(turn, separators=(",", ":")) + "\n").encode("utf-8")
+            lines.append((line, turn["tokens"]))
+
+        with self._locked():
+            self._repair()
+            with open(self.log_path, "ab") as log:
+                offset = log.tell()
+                log.write(b"".join(line for line, _ in lines))
+                log.flush()
+                os.fsync(log.fileno())
+            records = []
+            for line, tokens in lines:
+                records.append(INDEX_RECORD.pack(offset, len(line), tokens))
+                offset += len(line)
+            with open(self.index_path, "ab") as index:
+                index.write(b"".join(records))
+
+    def _tail_span(self, budget: int) -> Optional[Tuple[int, int]]:
+        """
+        Find where the tail of turns that fits in the budget lies in the log.
+
+        The index is read backwards in blocks, so the cost depends on the
+        length of the tail rather than of the whole session. A partial
+        record at the end of the index is ignored.
+
+        Args:
+            budget (int): Token budget for the tail
+
+        Returns:
+            Optional[Tuple[int, int]]: Log offsets of the start of the first
+            turn to load and of the end of the last indexed turn, or None if empty
+        """
+        start = None
+        end = None
+        used = 0
+        with open(self.index_path, "rb") as f:
+            position = f.seek(0, os.SEEK_END)
+            position -= position % INDEX_RECORD.size
+            while position > 0:
+                block_start = max(0, position - INDEX_READ_RECORDS * INDEX_RECORD.size)
+                f.seek(block_start)
+                block = f.read(position - block_start)
+                position = block_start
+                for i in range(len(block) - INDEX_RECORD.size, -1, -INDEX_RECORD.size):
+                    offset, length, tokens = INDEX_RECORD.unpack_from(block, i)
+                    if end is None:
+                        end = offset + length
+                    if start is not None and used + tokens > budget:
+                        return start, end
+                    used += tokens
+                    start = offset
+        return None if start is None else (start, end)
+
+    def tail(self, budget: int) -> List[Tuple[str, str]]:
+        """
+        Read the most recent turns that fit in a token budget.
+
+        The most recent turn is always returned, and the tail never starts
+        with an assistant turn. Only indexed turns are read, so a partial
+        line left by a crashed append is never parsed.
+
+        Args:
+            budget (int): Token budget for the turns
+
+        Returns:
+            List[Tuple[str, str]]: Role and content of each turn, oldest first
+        """
+        if not self.index_path.exists():
+            return []
+        with self._locked(exclusive=False):
+            span = self._tail_span(budget)
+            if span is None:
+                return []
+            start, end = span
+            with open(self.log_path, "rb") as f:
+                f.seek(start)
+                data = f.read(end - start)
+
+        turns = []
+        for line in data.splitlines():
+            turn = json.loads(line)
+            turns.append((turn["role"], turn["content"]))
+        while turns and turns[0][0] == "assistant":
+            turns.pop(0)
+        return turns
+
+    def load(self, conversation: Optional[Conversation] = None,
+             budget: Optional[int] = None) -> Conversation:
+        """
+        Load the tail of the session into a conversation.
+
+        Args:
+            conversation (Optional[Conversation]): Conversation to fill; a new one by default
+            budget (Optional[int]): Token budget; defaults to the conversation's history budget
+
+        Returns:
+            Conversation: The conversation holding the session's recent turns
+        """
+        conversation = conversation if conversation is not None else Conversation()
+        budget = conversation.max_history_tokens if budget is None else budget
+        for role, content in self.tail(budget):
+            conversation.add(role, content)
+        return conversation
+
+    def compact(self, keep_tokens: int = COMPACT_KEEP_TOKENS) -> int:
+        """
+        Rewrite the session keeping only its most recent turns.
+
+        Args:
+            keep_tokens (int): Token budget of the turns to keep
+
+        Returns:
+            int: Number of turns dropped
+        """
+        with self._locked():
+            self._repair()
+            total = len(self)
+            span = self._tail_span(keep_tokens) if total else None
+            start = span[0] if span else None
+            if not start:
+                return 0
+            with open(self.log_path, "rb") as f:
+                f.seek(start)
+                data = f.read()
+            with open(self.index_path, "rb") as f:
+                records = f.read()
+
+            kept = []
+            dropped = 0
+            for i in range(0, len(records), INDEX_RECORD.size):
+                offset, length, tokens = INDEX_RECORD.unpack_from(records, i)
+                if offset < start:
+                    dropped += 1
+                else:
+                    kept.append(INDEX_RECORD.pack(offset - start, length, tokens))
+
+            for path, payload in ((self.log_path, data), (self.index_path, b"".join(kept))):
+                tmp_path = path.with_name(path.name + ".tmp")
+                with open(tmp_path, "wb") as f:
+                    f.write(payload)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, path)
+
+        logger.debug("Compacted session '%s': dropped %d of %d turns", self.name, dropped, total)
+        return dropped
+
+    def delete(self) -> None:
+        """
+        Remove the session's files.
+        """
+        with self._locked():
+            for path in (self.log_path, self.index_path):
+                if path.exists():
+                    path.unlink()
+        if self.lock_path.exists():
+            self.lock_path.unlink()
+
+
+class SessionStore:
+    """
+    Directory of named sessions.
+
+    Args:
+        directory (Optional[Union[str, Path]]): Sessions directory; defaults to
+            ``sessions`` in the data directory
+    """
+
+    def __init__(self, directory: Optional[Union[str, Path]] = None) -> None:
+        if directory:
+            self.directory = Path(directory)
+        else:
+            self.directory = get_data_dir() / SESSIONS_DIRNAME
+        if not self.directory.exists():
+            self.directory.mkdir(parents=True, exist_ok=True)
+            os.chmod(self.directory, 0o700)
+
+    def open(self, name: str) -> SessionLog:
+        """
+        Get a session by name; it is created by the first append.
+
+        Args:
+            name (str): The session name
+
+        Returns:
+            SessionLog: The session
+
+        Raises:
+            ValueError: If the name is not a valid session name
+        """
+        return SessionLog(self.directory, name)
+
+    def names(self) -> List[str]:
+        """
+        List the stored sessions.
+
+        Returns:
+            List[str]: Session names, sorted
+        """
+        return sorted(path.stem for path in self.directory.glob("*.log"))
+
+    def info(self) -> Dict[str, Dict[str, float]]:
+        """
+        Describe the stored sessions.
+
+        Returns:
+            Dict[str, Dict[str, float]]: Turn count, size and last update per session
+        """
+        report = {}
+        for name in self.names():
+            session = self.open(name)
+            report[name] = {"turns": len(session), "bytes": session.size,
+                            "updated": session.log_path.stat().st_mtime}
+        return report
+
+    def compact(self, min_bytes: int = COMPACT_MIN_BYTES,
+                keep_tokens: int = COMPACT_KEEP_TOKENS) -> Dict[str, int]:
+        """
+        Compact every session whose log has grown past a size.
+
+        Args:
+            min_bytes (int): Only compact logs at least this large
+            keep_tokens (int): Token budget of the turns each session keeps
+
+        Returns:
+            Dict[str, int]: Turns dropped per compacted session
+        """
+        dropped = {}
+        for name in self.names():
+            session = self.open(name)
+            if session.size >= min_bytes:
+                try:
+                    dropped[name] = session.compact(keep_tokens)
+                except (OSError, ValueError) as e:
+                    logger.warning("Failed to compact session '%s': %s", name, e)
+        return dropped
+
+    def compact_in_background(self, min_bytes: int = COMPACT_MIN_BYTES,
+                              keep_tokens: int = COMPACT_KEEP_TOKENS) -> threading.Thread:
+        """
+        Compact large sessions in a background thread.
+
+        The thread is not a daemon thread, so the process finishes the
+        compaction before exiting instead of abandoning it halfway.
+
+        Args:
+            min_bytes (int): Only compact logs at least this large
+            keep_tokens (int): Token budget of the turns each session keeps
+
+        Returns:
+            threading.Thread: The started thread
+        """
+        thread = threading.Thread(target=self.compact, args=(min_bytes, keep_tokens),
+                                  name="session-compaction")
+        thread.start()
+        return thread
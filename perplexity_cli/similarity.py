@@ -0,0 +1,222 @@
+"""
+Similarity module for Perplexity CLI.
+
+This module finds near-duplicate queries for the fuzzy cache tier. Queries
+are normalized into a set of content words, summarized by a MinHash
+signature, and the signature is cut into locality-sensitive hashing bands,
+so that similar queries land in a shared bucket with high probability.
+Word order is ignored, except around comparisons: "Is Python faster than
+Rust?" never answers "Is Rust faster than Python?". Question words do not
+count towards the similarity, but two queries asking different ones, such as
+"When was X born?" and "Where was X born?", never match.
+"""
+
+import hashlib
+import random
+import re
+import unicodedata
+from typing import FrozenSet, List, Sequence
+
+# Constants
+NUM_PERMUTATIONS = 32
+BANDS = 8
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 64) - 1
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+# Words that change little about what is asked. Negations are kept on purpose.
+STOPWORDS = frozenset("""
+a about an and are as at be between by can could did do does for from i in is it
+me much many of on or please say tell that the there this to was were will with
+would you your
+""".split())
+
+# Kept in the normalized words so that different questions can be told apart,
+# but left out of the similarity, so that "distance sun earth" still matches
+# "What is the distance between the Sun and Earth?"
+QUESTION_WORDS = frozenset("how what when where which who whom why".split())
+
+# Words that make a question asymmetric: their operands must keep their order
+COMPARATIVE_WORDS = frozenset("than versus vs".split())
+
+# Fixed permutations, so signatures stay comparable across processes
+_rng = random.Random(0x5EED)
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+                 for _ in range(NUM_PERMUTATIONS)]
+
+
+def _stem(word: str) -> str:
+    """
+    Strip a plural "s", so that "planets" and "planet" match.
+
+    Args:
+        word (str): A lowercase word
+
+    Returns:
+        str: The word without a plural ending
+    """
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def query_words(query: str) -> List[str]:
+    """
+    Normalize a query into the words that carry its meaning, in order.
+
+    Casing, punctuation, whitespace, stopwords, plural endings and repeated
+    words are ignored. Question words are kept. A query made only of
+    stopwords and question words keeps them all.
+
+    Args:
+        query (str): The query text
+
+    Returns:
+        List[str]: The normalized words, in the order they first appear
+    """
+    words = _WORD.findall(unicodedata.normalize("NFKC", query).casefold())
+    terms = [_stem(word) for word in words if word not in STOPWORDS]
+    if all(term in QUESTION_WORDS for term in terms):
+        terms = words
+    return list(dict.fromkeys(terms))
+
+
+def content_terms(words: Sequence[str]) -> FrozenSet[str]:
+    """
+    Reduce normalized words to the set compared for similarity.
+
+    Question words are left out, unless the query has nothing but them and
+    stopwords.
+
+    Args:
+        words (Sequence[str]): The words of a query, from ``query_words``
+
+    Returns:
+        FrozenSet[str]: The words that count towards the similarity
+    """
+    terms = frozenset(word for word in words
+                      if word not in QUESTION_WORDS and word not in STOPWORDS)
+    return terms or frozenset(words)
+
+
+def query_terms(query: str) -> FrozenSet[str]:
+    """
+    Normalize a query into the set of words that carry its meaning.
+
+    Like ``query_words``, but word order and question words are ignored too.
+
+    Args:
+        query (str): The query text
+
+    Returns:
+        FrozenSet[str]: The normalized words
+    """
+    return content_terms(query_words(query))
+
+
+def compatible(first: Sequence[str], second: Sequence[str]) -> bool:
+    """
+    Check that two similar queries can share an answer.
+
+    They must not ask different question words, and if either compares
+    things ("X than Y", "X vs Y"), both must name them in the same order.
+
+    Args:
+        first (Sequence[str]): The words of one query, from ``query_words``
+        second (Sequence[str]): The words of the other query
+
+    Returns:
+        bool: Whether the answer to one query also answers the other
+    """
+    first_questions = QUESTION_WORDS.intersection(first)
+    second_questions = QUESTION_WORDS.intersection(second)
+    if first_questions and second_questions and first_questions != second_questions:
+        return False
+    if COMPARATIVE_WORDS.intersection(first) or COMPARATIVE_WORDS.intersection(second):
+        return same_order(first, second)
+    return True
+
+
+def same_order(first: Sequence[str], second: Sequence[str]) -> bool:
+    """
+    Check that two queries use the words they share in the same order.
+
+    Args:
+        first (Sequence[str]): The words of one query, from ``query_words``
+        second (Sequence[str]): The words of the other query
+
+    Returns:
+        bool: Whether the shared words appear in the same order in both
+    """
+    shared = set(first) & set(second)
+    return [word for word in first if word in shared] == [word for word in second if word in shared]
+
+
+def _hash64(data: str) -> int:
+    """
+    Hash a string to an unsigned 64-bit integer.
+
+    Args:
+        data (str): The string to hash
+
+    Returns:
+        int: The hash
+    """
+    return int.from_bytes(hashlib.blake2b(data.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def minhash(terms: FrozenSet[str]) -> List[int]:
+    """
+    Compute the MinHash signature of a set of words.
+
+    The share of equal positions in two signatures estimates the Jaccard
+    similarity of the two sets.
+
+    Args:
+        terms (FrozenSet[str]): The normalized words
+
+    Returns:
+        List[int]: ``NUM_PERMUTATIONS`` minimum hash values
+    """
+    hashes = [_hash64(term) for term in terms] or [0]
+    return [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def lsh_buckets(signature: List[int], scope: str) -> List[int]:
+    """
+    Cut a signature into bands and hash each band into a bucket.
+
+    Queries whose signatures agree on every row of any band share a bucket.
+    The scope (model and conversation) is part of each bucket, so only
+    requests that could share an answer ever meet.
+
+    Args:
+        signature (List[int]): The MinHash signature
+        scope (str): Identifies requests whose answers are interchangeable
+
+    Returns:
+        List[int]: One signed 64-bit bucket per band, as SQLite integers
+    """
+    buckets = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        bucket = _hash64(f"{scope}:{band}:{','.join(map(str, rows))}")
+        buckets.append(bucket - (1 << 64) if bucket > _MAX_HASH >> 1 else bucket)
+    return buckets
+
+
+def jaccard(first: FrozenSet[str], second: FrozenSet[str]) -> float:
+    """
+    Compute the Jaccard similarity of two sets of words.
+
+    Args:
+        first (FrozenSet[str]): One set of words
+        second (FrozenSet[str]): The other set of words
+
+    Returns:
+        float: Shared words divided by all words, between 0 and 1
+    """
+    if not first and not second:
+        return 1.0
+    return len(first & second) / len(first | second)
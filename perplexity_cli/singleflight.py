@@ -0,0 +1,422 @@
+"""
+Single-flight module for Perplexity CLI.
+
+This module coalesces identical concurrent requests: while a request for a
+key is in flight, later requests for the same key wait for it and share its
+result instead of calling the API again. Streams are shared too, by both
+the threaded and the asyncio clients, with late consumers replaying the
+chunks they missed.
+"""
+
+import copy
+import json
+import logging
+import threading
+from typing import (
+    TYPE_CHECKING, Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, TypeVar
+)
+
+if TYPE_CHECKING:
+    import asyncio
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Returned by ``_AsyncSharedStream.chunk`` past the end of the stream
+_END = object()
+
+
+def request_key(kind: str, model: str, max_tokens: int, messages: List[Dict[str, str]]) -> str:
+    """
+    Build the key under which identical requests are coalesced.
+
+    Args:
+        kind (str): What the caller gets back, e.g. decoded, raw or streamed
+        model (str): The model the request is for
+        max_tokens (int): Maximum number of tokens for the response
+        messages (List[Dict[str, str]]): The chat messages to send
+
+    Returns:
+        str: The key
+    """
+    return json.dumps([kind, model, max_tokens, messages], sort_keys=True,
+                      separators=(",", ":"))
+
+
+class _Call:
+    """
+    A call in flight, and its outcome once it has finished.
+    """
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.shared = False
+
+
+class _AsyncCall:
+    """
+    A call in flight on an event loop, run as a task.
+
+    Args:
+        task (asyncio.Future): The task making the call
+    """
+
+    def __init__(self, task: "asyncio.Future[Any]") -> None:
+        self.task = task
+        self.shared = False
+
+
+class _SharedStream:
+    """
+    One upstream stream consumed by several iterators.
+
+    Chunks are buffered until the stream ends, so every consumer sees the
+    whole stream. Whichever consumer runs out of buffered chunks pulls the
+    next one from upstream, so the stream keeps going as long as anyone is
+    reading, whoever started it.
+
+    Args:
+        open_stream (Callable[[], Iterator[Any]]): Opens the upstream stream;
+            called by the first consumer to read
+    """
+
+    def __init__(self, open_stream: Callable[[], Iterator[Any]]) -> None:
+        self.source: Optional[Iterator[Any]] = None
+        self._open = open_stream
+        self.consumers = 0
+        self.finished = False
+        self._chunks: List[Any] = []
+        self._error: Optional[BaseException] = None
+        self._pulling = False
+        self._cond = threading.Condition()
+
+    def _pull(self) -> None:
+        """
+        Fetch the next chunk from upstream into the buffer.
+        """
+        chunk, finished, error = None, False, None
+        try:
+            if self.source is None:
+                self.source = iter(self._open())
+            chunk = next(self.source)
+        except StopIteration:
+            finished = True
+        except BaseException as e:
+            finished, error = True, e
+        with self._cond:
+            if finished:
+                self.finished = True
+                self._error = error
+            else:
+                self._chunks.append(chunk)
+            self._pulling = False
+            self._cond.notify_all()
+
+    def iterate(self) -> Iterator[Any]:
+        """
+        Iterate over the stream from its first chunk.
+
+        Yields:
+            Any: A copy of each chunk of the stream, so that the buffered
+            chunks stay intact for consumers that have yet to read them
+        """
+        index = 0
+        while True:
+            pull = False
+            with self._cond:
+                while index >= len(self._chunks) and not self.finished and self._pulling:
+                    self._cond.wait()
+                if index < len(self._chunks):
+                    chunk = self._chunks[index]
+                elif self.finished:
+                    if self._error is not None:
+                        raise self._error
+                    return
+                else:
+                    self._pulling = pull = True
+            if pull:
+                self._pull()
+                continue
+            index += 1
+            yield copy.deepcopy(chunk)
+
+
+class SingleFlight:
+    """
+    Coalesce identical concurrent calls within a process.
+
+    Only calls that overlap in time are merged; once a call has finished,
+    the next call for its key runs again. When a call was shared, every
+    caller, the first one included, gets a deep copy of the result, so they
+    may modify it freely. Stream consumers always get copies of the chunks,
+    since a later consumer may still replay them.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self._streams: Dict[str, _SharedStream] = {}
+        self._counts = {"calls": 0, "coalesced": 0, "streams": 0, "streams_coalesced": 0}
+
+    def do(self, key: str, fn: Callable[[], T]) -> T:
+        """
+        Run ``fn``, or wait for the identical call already in flight.
+
+        Args:
+            key (str): Identifies identical calls
+            fn (Callable[[], T]): Makes the call
+
+        Returns:
+            T: The result of the call
+
+        Raises:
+            Exception: Whatever the shared call raised
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self._counts["calls"] += 1
+                leader = True
+            else:
+                call.shared = True
+                self._counts["coalesced"] += 1
+                leader = False
+
+        if not leader:
+            logger.debug("Joining in-flight request %.80s", key)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        try:
+            result = call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        # The others copy the result as they wake, so it must not be handed out
+        return copy.deepcopy(result) if call.shared else result
+
+    def stream(self, key: str, fn: Callable[[], Iterator[T]]) -> Iterator[T]:
+        """
+        Iterate over the stream ``fn`` opens, or join the identical stream in flight.
+
+        The upstream stream is closed once every consumer has finished or
+        stopped reading.
+
+        Args:
+            key (str): Identifies identical streams
+            fn (Callable[[], Iterator[T]]): Opens the stream
+
+        Yields:
+            T: Each chunk of the stream
+        """
+        with self._lock:
+            shared = self._streams.get(key)
+            share = shared is not None and not shared.finished
+            if not share:
+                shared = self._streams[key] = _SharedStream(fn)
+                self._counts["streams"] += 1
+            else:
+                self._counts["streams_coalesced"] += 1
+            shared.consumers += 1
+
+        if share:
+            logger.debug("Joining in-flight stream %.80s", key)
+        try:
+            yield from shared.iterate()
+        finally:
+            with self._lock:
+                shared.consumers -= 1
+                idle = shared.consumers == 0
+                if idle and self._streams.get(key) is shared:
+                    del self._streams[key]
+            if idle and not shared.finished:
+                close = getattr(shared.source, "close", None)
+                if close is not None:
+                    close()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Report how many calls were made and how many were saved.
+
+        Returns:
+            Dict[str, int]: Calls and streams started, and duplicates coalesced
+        """
+        with self._lock:
+            return dict(self._counts, in_flight=len(self._calls) + len(self._streams))
+
+
+class _AsyncSharedStream:
+    """
+    One upstream async stream consumed by several async iterators.
+
+    The asyncio counterpart of ``_SharedStream``. Each upstream chunk is
+    fetched by a task that every waiting consumer shields, so a consumer
+    that is cancelled never breaks the stream for the others.
+
+    Args:
+        open_stream (Callable[[], AsyncIterator[Any]]): Opens the upstream
+            stream; called by the first consumer to read
+    """
+
+    def __init__(self, open_stream: Callable[[], AsyncIterator[Any]]) -> None:
+        self.source: Optional[AsyncIterator[Any]] = None
+        self._open = open_stream
+        self.consumers = 0
+        self.finished = False
+        self._chunks: List[Any] = []
+        self._error: Optional[BaseException] = None
+        self._pulling: Optional["asyncio.Future[None]"] = None
+
+    async def _pull(self) -> None:
+        """
+        Fetch the next chunk from upstream into the buffer.
+        """
+        try:
+            if self.source is None:
+                self.source = self._open()
+            self._chunks.append(await self.source.__anext__())
+        except StopAsyncIteration:
+            self.finished = True
+        except BaseException as e:
+            self.finished = True
+            self._error = e
+        finally:
+            self._pulling = None
+
+    async def chunk(self, index: int) -> Any:
+        """
+        Get a chunk of the stream, waiting for upstream if it has not arrived.
+
+        Args:
+            index (int): Position of the chunk in the stream
+
+        Returns:
+            Any: The chunk, or ``_END`` once the stream has ended
+
+        Raises:
+            Exception: Whatever the upstream stream raised
+        """
+        import asyncio
+
+        while index >= len(self._chunks):
+            if self.finished:
+                if self._error is not None:
+                    raise self._error
+                return _END
+            if self._pulling is None:
+                self._pulling = asyncio.ensure_future(self._pull())
+            await asyncio.shield(self._pulling)
+        return self._chunks[index]
+
+    async def close(self) -> None:
+        """
+        Stop the upstream stream once no one reads it any more.
+        """
+        if self._pulling is not None:
+            self._pulling.cancel()
+        elif self.source is not None:
+            await self.source.aclose()
+
+
+class AsyncSingleFlight:
+    """
+    Coalesce identical concurrent calls on one event loop.
+
+    The shared call runs as a task, so it completes even if the caller that
+    started it is cancelled while others still wait for it. Results and
+    chunks are copied as by ``SingleFlight``.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[str, _AsyncCall] = {}
+        self._streams: Dict[str, _AsyncSharedStream] = {}
+        self._counts = {"calls": 0, "coalesced": 0, "streams": 0, "streams_coalesced": 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Await ``fn()``, or the identical call already in flight.
+
+        Args:
+            key (str): Identifies identical calls
+            fn (Callable[[], Awaitable[T]]): Makes the call
+
+        Returns:
+            T: The result of the call
+
+        Raises:
+            Exception: Whatever the shared call raised
+        """
+        import asyncio
+
+        call = self._calls.get(key)
+        if call is None:
+            call = self._calls[key] = _AsyncCall(asyncio.ensure_future(fn()))
+            call.task.add_done_callback(lambda _: self._calls.pop(key, None))
+            self._counts["calls"] += 1
+            result = await asyncio.shield(call.task)
+            # No one can join once the task is done, and the others copy the result
+            return copy.deepcopy(result) if call.shared else result
+        call.shared = True
+        self._counts["coalesced"] += 1
+        logger.debug("Joining in-flight request %.80s", key)
+        return copy.deepcopy(await asyncio.shield(call.task))
+
+    async def stream(self, key: str, fn: Callable[[], AsyncIterator[T]]) -> AsyncIterator[T]:
+        """
+        Iterate over the stream ``fn`` opens, or join the identical stream in flight.
+
+        The upstream stream is closed once every consumer has finished or
+        stopped reading.
+
+        Args:
+            key (str): Identifies identical streams
+            fn (Callable[[], AsyncIterator[T]]): Opens the stream
+
+        Yields:
+            T: Each chunk of the stream
+        """
+        shared = self._streams.get(key)
+        share = shared is not None and not shared.finished
+        if not share:
+            shared = self._streams[key] = _AsyncSharedStream(fn)
+            self._counts["streams"] += 1
+        else:
+            self._counts["streams_coalesced"] += 1
+            logger.debug("Joining in-flight stream %.80s", key)
+        shared.consumers += 1
+
+        try:
+            index = 0
+            while True:
+                chunk = await shared.chunk(index)
+                if chunk is _END:
+                    return
+                index += 1
+                yield copy.deepcopy(chunk)
+        finally:
+            shared.consumers -= 1
+            if shared.consumers == 0:
+                if self._streams.get(key) is shared:
+                    del self._streams[key]
+                if not shared.finished:
+                    await shared.close()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Report how many calls were made and how many were saved.
+
+        Returns:
+            Dict[str, int]: Calls and streams started, and duplicates coalesced
+        """
+        return dict(self._counts, in_flight=len(self._calls) + len(self._streams))
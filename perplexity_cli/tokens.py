@@ -0,0 +1,301 @@
+"""
+Tokens module for Perplexity CLI.
+
+This module estimates how many tokens a request will use before it is
+sent. The estimate is a cheap byte/word heuristic, scaled per model by a
+ratio that is calibrated against the ``usage`` block the API returns. The
+calibration is kept in the data directory, so it improves across runs.
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, List, NamedTuple, Optional, Union
+
+from perplexity_cli.config import get_data_dir
+from perplexity_cli.exceptions import PromptTooLargeError
+from perplexity_cli.models import context_window
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Constants
+CALIBRATION_FILENAME = "tokens.json"
+CHARS_PER_TOKEN = 4
+TOKENS_PER_WORD = 1.3
+MESSAGE_OVERHEAD_TOKENS = 4
+CALIBRATION_ALPHA = 0.2
+MIN_RATIO = 0.25
+MAX_RATIO = 4.0
+SAVE_INTERVAL = 5.0
+
+
+def estimate_text_tokens(text: str) -> float:
+    """
+    Estimate the tokens in a piece of text, before calibration.
+
+    The estimate averages a characters-per-token and a tokens-per-word rule,
+    and counts each extra UTF-8 byte of non-ASCII text as half a token, which
+    keeps scripts without spaces (such as CJK) from being underestimated.
+    Every feature is computed by a single C-level string operation.
+
+    Args:
+        text (str): The text to estimate
+
+    Returns:
+        float: Estimated tokens
+    """
+    if not text:
+        return 0.0
+    chars = len(text)
+    words = len(text.split())
+    extra_bytes = len(text.encode("utf-8")) - chars
+    return (chars / CHARS_PER_TOKEN + words * TOKENS_PER_WORD) / 2 + extra_bytes / 2
+
+
+def estimate_message_tokens(content: str) -> int:
+    """
+    Estimate the tokens one message adds to a request, before calibration.
+
+    Args:
+        content (str): The message content
+
+    Returns:
+        int: Estimated tokens, including per-message overhead
+    """
+    return int(estimate_text_tokens(content)) + MESSAGE_OVERHEAD_TOKENS
+
+
+def estimate_prompt_tokens(messages: List[Dict[str, str]]) -> int:
+    """
+    Estimate the prompt tokens of a message list, before calibration.
+
+    The message contents are joined and measured in one pass rather than
+    one message at a time.
+
+    Args:
+        messages (List[Dict[str, str]]): The chat messages to send
+
+    Returns:
+        int: Estimated prompt tokens
+    """
+    text = "\n".join(message.get("content", "") for message in messages)
+    return int(estimate_text_tokens(text)) + MESSAGE_OVERHEAD_TOKENS * len(messages)
+
+
+class RequestSize(NamedTuple):
+    """
+    Pre-flight size of a request.
+
+    Attributes:
+        raw_prompt_tokens (int): Uncalibrated prompt estimate, used for calibration
+        prompt_tokens (int): Calibrated prompt estimate
+        max_tokens (int): Completion allowance, clamped to the context window
+    """
+
+    raw_prompt_tokens: int
+    prompt_tokens: int
+    max_tokens: int
+
+    @property
+    def total(self) -> int:
+        """
+        int: Prompt plus the full completion allowance.
+        """
+        return self.prompt_tokens + self.max_tokens
+
+
+def fit_max_tokens(model: str, prompt_tokens: int, max_tokens: int) -> int:
+    """
+    Clamp ``max_tokens`` so that prompt and completion fit the model's context window.
+
+    Args:
+        model (str): The model the request is for
+        prompt_tokens (int): Estimated prompt tokens
+        max_tokens (int): Requested maximum tokens for the response
+
+    Returns:
+        int: The completion allowance to send
+
+    Raises:
+        PromptTooLargeError: If the prompt alone fills the context window
+    """
+    window = context_window(model)
+    available = window - prompt_tokens
+    if available <= 0:
+        raise PromptTooLargeError(
+            f"Prompt of about {prompt_tokens} tokens does not fit in the "
+            f"{window}-token context window of {model}"
+        )
+    if max_tokens > available:
+        logger.warning("Reducing max_tokens from %d to %d to fit the context window of %s",
+                       max_tokens, available, model)
+        return available
+    return max_tokens
+
+
+class TokenCalibrator:
+    """
+    Per-model correction of the token estimate, learned from actual usage.
+
+    For each model the calibrator keeps an exponentially weighted average of
+    actual/estimated prompt tokens, and of the relative error of the
+    calibrated estimate, so its accuracy can be reported. The state file is
+    rewritten at most every ``SAVE_INTERVAL`` seconds; ``flush`` writes what
+    is left, and the shared calibrator from ``get_calibrator`` is flushed
+    when the process exits.
+
+    Args:
+        path (Optional[Union[str, Path]]): State file; defaults to the data directory
+        persist (bool): Whether to load and save the state file
+    """
+
+    def __init__(self, path: Optional[Union[str, Path]] = None, persist: bool = True) -> None:
+        self._path = Path(path) if path else None
+        self.persist = persist
+        self._models: Optional[Dict[str, Dict[str, float]]] = None
+        self._dirty = False
+        self._saved_at = float("-inf")
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> Path:
+        """
+        Path: The state file.
+        """
+        if self._path is None:
+            self._path = get_data_dir() / CALIBRATION_FILENAME
+        return self._path
+
+    def _state(self) -> Dict[str, Dict[str, float]]:
+        """
+        Return the calibration state, loading it on first use.
+
+        Returns:
+            Dict[str, Dict[str, float]]: Calibration per model
+        """
+        if self._models is None:
+            self._models = {}
+            if self.persist:
+                try:
+                    with open(self.path, encoding="utf-8") as f:
+                        self._models = json.load(f)
+                except (OSError, ValueError):
+                    pass
+        return self._models
+
+    def ratio(self, model: str) -> float:
+        """
+        Get the calibration ratio of a model.
+
+        Args:
+            model (str): The model name
+
+        Returns:
+            float: Multiplier for the raw estimate
+        """
+        with self._lock:
+            return self._state().get(model, {}).get("ratio", 1.0)
+
+    def size_request(self, model: str, messages: List[Dict[str, str]],
+                     max_tokens: int) -> RequestSize:
+        """
+        Estimate the size of a request and clamp its completion allowance.
+
+        Args:
+            model (str): The model the request is for
+            messages (List[Dict[str, str]]): The chat messages to send
+            max_tokens (int): Requested maximum tokens for the response
+
+        Returns:
+            RequestSize: The estimated request size
+
+        Raises:
+            PromptTooLargeError: If the prompt alone fills the context window
+        """
+        raw = estimate_prompt_tokens(messages)
+        prompt = int(round(raw * self.ratio(model)))
+        return RequestSize(raw, prompt, fit_max_tokens(model, prompt, max_tokens))
+
+    def record(self, model: str, raw_estimate: int, actual: Optional[int]) -> None:
+        """
+        Update a model's calibration with the prompt tokens the API reported.
+
+        Args:
+            model (str): The model the request was for
+            raw_estimate (int): Uncalibrated prompt estimate of the request
+            actual (Optional[int]): ``prompt_tokens`` reported by the API
+        """
+        if not actual or raw_estimate <= 0:
+            return
+        with self._lock:
+            entry = self._state().setdefault(model, {"ratio": 1.0, "error": 0.0, "samples": 0})
+            estimate = raw_estimate * entry["ratio"]
+            error = abs(estimate - actual) / actual
+            observed = min(MAX_RATIO, max(MIN_RATIO, actual / raw_estimate))
+            alpha = max(CALIBRATION_ALPHA, 1.0 / (entry["samples"] + 1))
+            entry["ratio"] += alpha * (observed - entry["ratio"])
+            entry["error"] += alpha * (error - entry["error"])
+            entry["samples"] += 1
+            self._dirty = True
+            if self.persist and time.monotonic() - self._saved_at >= SAVE_INTERVAL:
+                self._save()
+
+    def flush(self) -> None:
+        """
+        Write any calibration not yet saved to the state file.
+        """
+        with self._lock:
+            if self.persist and self._dirty:
+                self._save()
+
+    def _save(self) -> None:
+        """
+        Write the state file atomically.
+        """
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._models, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.debug("Failed to save token calibration: %s", e)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report the calibration of each model.
+
+        Returns:
+            Dict[str, Any]: Ratio, mean relative error and sample count per model
+        """
+        with self._lock:
+            return {model: {"ratio": round(entry["ratio"], 3),
+                            "error": round(entry["error"], 3),
+                            "samples": entry["samples"]}
+                    for model, entry in sorted(self._state().items())}
+
+
+# Calibrator shared by the clients of this process
+_calibrator: Optional[TokenCalibrator] = None
+_calibrator_lock = threading.Lock()
+
+
+def get_calibrator() -> TokenCalibrator:
+    """
+    Return the process-wide calibrator, creating it on first use.
+
+    Returns:
+        TokenCalibrator: The shared calibrator
+    """
+    global _calibrator
+    with _calibrator_lock:
+        if _calibrator is None:
+            _calibrator = TokenCalibrator()
+            atexit.register(_calibrator.flush)
+        return _calibrator
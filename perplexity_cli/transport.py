@@ -0,0 +1,108 @@
+"""
+Transport module for Perplexity CLI.
+
+This module provides a ``requests`` adapter whose connections time the DNS
+lookup, TCP connect and TLS handshake separately and report them to the
+request measurements active on the current thread. It imports ``requests``
+and ``urllib3``, so it is only imported once a client is created.
+"""
+
+import logging
+import socket
+import time
+from typing import Any
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import NewConnectionError
+from urllib3.util.connection import allowed_gai_family
+
+from perplexity_cli.metrics import current_metrics
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class _TimedConnectionMixin:
+    """
+    Split connection setup into DNS, TCP connect and TLS phases.
+
+    The host is resolved up front and the connection is then made to the
+    resolved address, so the lookup and the connect can be timed apart. TLS
+    server name and certificate checks still use the original host name.
+    """
+
+    def _new_conn(self) -> socket.socket:
+        metrics = current_metrics()
+        if metrics is None:
+            return super()._new_conn()
+
+        host = self._dns_host
+        start = time.perf_counter()
+        try:
+            address = socket.getaddrinfo(host.strip("[]"), self.port, allowed_gai_family(),
+                                         socket.SOCK_STREAM)[0][4][0]
+        except (OSError, UnicodeError, IndexError):
+            # Let urllib3 resolve again and report the failure the usual way
+            address = None
+        resolved = time.perf_counter()
+        metrics.dns_ms = (resolved - start) * 1000
+        metrics.connection_reused = False
+
+        try:
+            if address is not None:
+                self._dns_host = address
+            conn = super()._new_conn()
+        except NewConnectionError:
+            if address is None:
+                raise
+            # The first address failed; fall back to trying every address
+            logger.debug("Connecting to %s failed, retrying with %s", address, host)
+            self._dns_host = host
+            conn = super()._new_conn()
+        finally:
+            self._dns_host = host
+        metrics.connect_ms = (time.perf_counter() - resolved) * 1000
+        return conn
+
+    def connect(self) -> None:
+        start = time.perf_counter()
+        super().connect()
+        metrics = current_metrics()
+        if metrics is not None and isinstance(self, HTTPSConnection):
+            setup_ms = (time.perf_counter() - start) * 1000
+            metrics.tls_ms = max(0.0, setup_ms - metrics.dns_ms - metrics.connect_ms)
+
+
+class TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    """
+    Plain HTTP connection reporting its setup phases.
+    """
+
+
+class TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    """
+    HTTPS connection reporting its setup phases.
+    """
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """
+    ``HTTPAdapter`` whose pooled connections report their setup phases.
+    """
+
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool,
+        }
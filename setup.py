@@ -43,6 +43,9 @@ setup(
         "requests>=2.25.0",
         "urllib3>=1.26.20,<2.0",
     ],
+    extras_require={
+        "async": ["aiohttp>=3.8.0"],
+    },
     entry_points={
         "console_scripts": [
             "perplexity-cli=perplexity_cli.cli:main",
@@ -0,0 +1,17 @@
+"""
+Shared fixtures for the tests.
+"""
+
+import pytest
+
+from perplexity_cli import router, tokens
+
+
+@pytest.fixture(autouse=True)
+def isolated_data_dir(tmp_path, monkeypatch):
+    """Keep local state (cache, calibration, routing, sessions) out of the real home directory."""
+    data_dir = tmp_path / "data"
+    monkeypatch.setattr("perplexity_cli.config.DATA_DIR", data_dir)
+    monkeypatch.setattr(tokens, "_calibrator", None)
+    monkeypatch.setattr(router, "_router", None)
+    return data_dir
@@ -8,11 +8,24 @@ from unittest import mock
 import pytest
 import requests
 
-from perplexity_cli.api import call_api, parse_response
+from perplexity_cli import api
+from perplexity_cli.retry import RetryPolicy
+
+from perplexity_cli.api import (
+    call_api, parse_response, iter_sse_events, stream_api, print_stream
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_clients():
+    """Drop shared clients between tests."""
+    api._clients.clear()
+    yield
+    api._clients.clear()
 
 
 @mock.patch('perplexity_cli.api.get_api_key')
-@mock.patch('requests.post')
+@mock.patch('requests.Session.post')
 def test_call_api_success(mock_post, mock_get_api_key):
     """Test successful API call."""
     # Set up mocks
@@ -41,7 +54,7 @@ def test_call_api_success(mock_post, mock_get_api_key):
 
 
 @mock.patch('perplexity_cli.api.get_api_key')
-@mock.patch('requests.post')
+@mock.patch('requests.Session.post')
 def test_call_api_error(mock_post, mock_get_api_key):
     """Test API call with error."""
     # Set up mocks
@@ -131,3 +144,152 @@ def test_parse_response_verbose(mock_print):
     assert any("test_function" in args[0] for args, _ in mock_print.call_args_list)
     # Check that the full response was printed
     assert any("Full Response" in args[0] for args, _ in mock_print.call_args_list)
+
+
+def test_iter_sse_events():
+    """Test decoding server-sent event lines."""
+    lines = [
+        b": keep-alive",
+        b'data: {"choices": [{"delta": {"content": "Hel"}}]}',
+        b"",
+        b'data: {"choices": [{"delta": {"content": "lo"}}],',
+        b'data:  "usage": {"total_tokens": 3}}',
+        b"",
+        b"data: [DONE]",
+        b"",
+        b'data: {"ignored": true}',
+        b"",
+    ]
+    
+    # Call the function
+    events = list(iter_sse_events(lines))
+    
+    # Check that both events were decoded and the stream stopped at [DONE]
+    assert len(events) == 2
+    assert events[0]["choices"][0]["delta"]["content"] == "Hel"
+    assert events[1]["usage"] == {"total_tokens": 3}
+
+
+@mock.patch('perplexity_cli.api.get_api_key')
+@mock.patch('requests.Session.post')
+def test_stream_api(mock_post, mock_get_api_key):
+    """Test streaming API call."""
+    # Set up mocks
+    mock_get_api_key.return_value = "test_key"
+    mock_response = mock.MagicMock()
+    mock_response.iter_lines.return_value = [
+        b'data: {"model": "sonar", "choices": [{"delta": {"content": "Hi"}}]}',
+        b"",
+    ]
+    mock_post.return_value = mock_response
+    
+    # Call the function
+    chunks = list(stream_api("sonar", 100, "test query"))
+    
+    # Check that the request asked for a stream
+    args, kwargs = mock_post.call_args
+    assert kwargs["json"]["stream"] is True
+    assert kwargs["stream"] is True
+    # Check that the chunks were yielded and the response closed
+    assert chunks[0]["choices"][0]["delta"]["content"] == "Hi"
+    mock_response.close.assert_called_once()
+
+
+def test_print_stream(capsys):
+    """Test printing a streamed response."""
+    chunks = [
+        {"model": "sonar", "choices": [{"delta": {"content": "Hello "}}]},
+        {"model": "sonar", "choices": [{"delta": {"content": "world"}}],
+         "usage": {"prompt_tokens": 1, "completion_tokens": 2, "total_tokens": 3}},
+    ]
+    
+    # Call the function
+    response = print_stream(iter(chunks))
+    
+    # Check the printed output and the assembled response
+    out = capsys.readouterr().out
+    assert "sonar" in out
+    assert "Hello world" in out
+    assert "total_tokens: 3" in out
+    assert response["choices"][0]["message"]["content"] == "Hello world"
+
+
+@mock.patch('perplexity_cli.api.get_api_key')
+@mock.patch('requests.Session.post')
+def test_call_api_reuses_client(mock_post, mock_get_api_key):
+    """Test that repeated calls share one pooled client."""
+    # Set up mocks
+    mock_get_api_key.return_value = "test_key"
+    mock_post.return_value.json.return_value = {"test": "response"}
+    
+    # Call the function twice
+    call_api("sonar", 100, "first")
+    call_api("sonar", 100, "second")
+    
+    # Check that a single client was created for the key
+    assert list(api._clients) == [("test_key", ())]
+    assert mock_post.call_count == 2
+
+
+@mock.patch('perplexity_cli.api.get_api_key')
+@mock.patch('requests.Session.post')
+def test_call_api_bounds_clients(mock_post, mock_get_api_key):
+    """Test that new option objects on every call do not pile up open clients."""
+    # Set up mocks
+    mock_get_api_key.return_value = "test_key"
+    mock_post.return_value.json.return_value = {"test": "response"}
+    policy = RetryPolicy()
+    
+    # Call the function with the same and with fresh option objects
+    call_api("sonar", 100, "first", retry_policy=policy)
+    call_api("sonar", 100, "second", retry_policy=policy)
+    assert len(api._clients) == 1
+    first = next(iter(api._clients.values()))
+    with mock.patch.object(first, "close") as mock_close:
+        for _ in range(api.MAX_SHARED_CLIENTS):
+            call_api("sonar", 100, "query", retry_policy=RetryPolicy())
+    
+    # Check the bound, that the evicted client was closed, and unhashable options
+    assert len(api._clients) == api.MAX_SHARED_CLIENTS
+    mock_close.assert_called_once()
+    assert api._option_key({"a": 1})[0] == "dict"
+
+
+def test_parse_response_single_write():
+    """Test that the text output is written in one piece."""
+    out = mock.MagicMock()
+    response = {"model": "sonar", "choices": [{"message": {"content": "Test content"}}],
+                "usage": {"total_tokens": 3}}
+    
+    # Call the function
+    parse_response(response, out=out)
+    
+    # Check that everything went out in a single write
+    out.write.assert_called_once()
+    text = out.write.call_args[0][0]
+    assert "--- Model Used ---\nsonar" in text
+    assert "Test content" in text
+    assert "total_tokens: 3" in text
+
+
+def test_print_stream_output_formats(capsys):
+    """Test printing a streamed response as content only and as JSON."""
+    chunks = [
+        {"model": "sonar", "choices": [{"delta": {"content": "Hello "}}]},
+        {"model": "sonar", "choices": [{"delta": {"content": "world"}}],
+         "usage": {"total_tokens": 3}},
+    ]
+    
+    # Call the function for each format
+    print_stream(iter(chunks), output="content-only")
+    content = capsys.readouterr().out
+    print_stream(iter(chunks), output="json")
+    response = json.loads(capsys.readouterr().out)
+    print_stream(iter(chunks), output="jsonl")
+    lines = capsys.readouterr().out.splitlines()
+    
+    # Check the output
+    assert content == "Hello world\n"
+    assert response["choices"][0]["message"]["content"] == "Hello world"
+    assert response["usage"] == {"total_tokens": 3}
+    assert [json.loads(line) for line in lines] == chunks
@@ -0,0 +1,165 @@
+"""
+Tests for the async client module.
+"""
+
+import asyncio
+import json
+import threading
+
+import pytest
+
+aiohttp = pytest.importorskip("aiohttp")
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from perplexity_cli.async_client import AsyncPerplexityClient
+from perplexity_cli.exceptions import DeadlineExceededError
+from perplexity_cli.retry import RetryPolicy
+from perplexity_cli.router import ModelRouter
+from perplexity_cli.tokens import TokenCalibrator
+
+
+async def _completions(request):
+    """Answer like the chat completions endpoint."""
+    body = await request.json()
+    if body["model"] == "bad":
+        return web.json_response({"error": {"message": "Invalid model"}}, status=400)
+    if body["model"] == "slow":
+        # Send a byte at a time, each well within the read timeout
+        response = web.StreamResponse(headers={"Content-Type": "application/json"})
+        await response.prepare(request)
+        for byte in json.dumps({"choices": []}):
+            await response.write(byte.encode())
+            await asyncio.sleep(0.05)
+        return response
+    if body.get("stream"):
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for word in ("Hello", " world"):
+            chunk = {"model": body["model"], "choices": [{"delta": {"content": word}}]}
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        await response.write(b"data: [DONE]\n\n")
+        return response
+    await asyncio.sleep(0.05)
+    return web.json_response({
+        "model": body["model"],
+        "auth": request.headers["Authorization"],
+        "choices": [{"message": {"content": body["messages"][-1]["content"]}}],
+    })
+
+
+def _run(test):
+    """Run a test coroutine against a local server."""
+    async def runner():
+        app = web.Application()
+        app.router.add_post("/chat/completions", _completions)
+        server = TestServer(app)
+        await server.start_server()
+        try:
+            await test(str(server.make_url("/chat/completions")))
+        finally:
+            await server.close()
+
+    asyncio.run(runner())
+
+
+def test_async_complete():
+    """Test an async completion request."""
+    async def test(url):
+        async with AsyncPerplexityClient(api_key="test_key", base_url=url) as client:
+            response = await client.complete("sonar", 100, "test query")
+        assert response["auth"] == "Bearer test_key"
+        assert response["choices"][0]["message"]["content"] == "test query"
+
+    _run(test)
+
+
+def test_async_concurrency_limit():
+    """Test that many requests run concurrently on one loop."""
+    async def test(url):
+        async with AsyncPerplexityClient(api_key="test_key", base_url=url,
+                                         max_concurrency=50) as client:
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            responses = await asyncio.gather(
+                *(client.complete("sonar", 100, str(i)) for i in range(50))
+            )
+            elapsed = loop.time() - start
+        assert [r["choices"][0]["message"]["content"] for r in responses] == \
+            [str(i) for i in range(50)]
+        # 50 requests of 50ms each must overlap rather than run in sequence
+        assert elapsed < 1.0
+
+    _run(test)
+
+
+def test_async_stream():
+    """Test an async streaming request."""
+    async def test(url):
+        async with AsyncPerplexityClient(api_key="test_key", base_url=url) as client:
+            chunks = [chunk async for chunk in client.stream("sonar", 100, "test query")]
+        assert "".join(c["choices"][0]["delta"]["content"] for c in chunks) == "Hello world"
+
+    _run(test)
+
+
+def test_async_error():
+    """Test that API errors use the same message as the sync client."""
+    async def test(url):
+        async with AsyncPerplexityClient(api_key="test_key", base_url=url) as client:
+            with pytest.raises(Exception) as excinfo:
+                await client.complete("bad", 100, "test query")
+        assert "API call failed with status code 400: Invalid model" in str(excinfo.value)
+
+    _run(test)
+
+
+def test_async_deadline_covers_body():
+    """Test that a response body trickling in cannot run past the deadline."""
+    async def test(url):
+        policy = RetryPolicy(deadline=0.2, read_timeout=1)
+        async with AsyncPerplexityClient(api_key="test_key", base_url=url,
+                                         retry_policy=policy) as client:
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            with pytest.raises(DeadlineExceededError):
+                await client.complete("slow", 100, "test query")
+            elapsed = loop.time() - start
+        assert elapsed < 0.5
+
+    _run(test)
+
+
+def test_async_state_io_off_loop(tmp_path):
+    """Test that routing and calibration state is recorded and saved off the event loop."""
+    threads = []
+
+    class Router(ModelRouter):
+        def record(self, *args, **kwargs):
+            threads.append(threading.current_thread())
+            super().record(*args, **kwargs)
+
+        def flush(self):
+            threads.append(threading.current_thread())
+            super().flush()
+
+    class Calibrator(TokenCalibrator):
+        def record(self, *args, **kwargs):
+            threads.append(threading.current_thread())
+            super().record(*args, **kwargs)
+
+        def flush(self):
+            threads.append(threading.current_thread())
+            super().flush()
+
+    async def test(url):
+        async with AsyncPerplexityClient(api_key="test_key", base_url=url,
+                                         router=Router(tmp_path / "router.json"),
+                                         calibrator=Calibrator(tmp_path / "tokens.json")) as client:
+            await client.complete("sonar", 100, "test query")
+            [chunk async for chunk in client.stream("sonar", 100, "test query")]
+
+    _run(test)
+    # Router and calibrator record for the completion, calibrator for the stream, and both flush
+    assert len(threads) == 5
+    assert threading.main_thread() not in threads
@@ -0,0 +1,126 @@
+"""
+Tests for the batch module.
+"""
+
+import io
+import json
+import threading
+import time
+from unittest import mock
+
+import pytest
+
+from perplexity_cli.batch import read_batch, run_batch, write_results
+
+
+def test_read_batch_plain_and_jsonl():
+    """Test reading plain lines and JSONL items."""
+    lines = [
+        "first query\n",
+        "\n",
+        '{"id": "q2", "query": "second query", "model": "sonar", "max_tokens": 50}\n',
+        '{"model": "sonar"}\n',
+        "{not json\n",
+    ]
+
+    # Call the function
+    items = list(read_batch(lines, "sonar-pro", 4000))
+
+    # Check the items
+    assert len(items) == 4
+    assert items[0] == {"index": 0, "id": 0, "query": "first query",
+                        "model": "sonar-pro", "max_tokens": 4000}
+    assert items[1]["id"] == "q2"
+    assert items[1]["model"] == "sonar"
+    assert items[1]["max_tokens"] == 50
+    assert "Missing 'query'" in items[2]["error"]
+    assert "Invalid item" in items[3]["error"]
+
+
+def _delayed_client():
+    """Create a client mock whose answers take longer for earlier queries."""
+    client = mock.MagicMock()
+
+    def complete(model, max_tokens, query):
+        time.sleep(0.05 * (3 - int(query)))
+        return {"answer": query}
+
+    client.complete.side_effect = complete
+    return client
+
+
+def test_run_batch_input_order():
+    """Test that results keep input order."""
+    items = read_batch(["0", "1", "2"], "sonar", 100)
+
+    # Call the function
+    results = list(run_batch(_delayed_client(), items, concurrency=3, order="input"))
+
+    # Check the order and responses
+    assert [r["index"] for r in results] == [0, 1, 2]
+    assert results[2]["response"] == {"answer": "2"}
+
+
+def test_run_batch_completion_order():
+    """Test that results are yielded as they complete."""
+    items = read_batch(["0", "1", "2"], "sonar", 100)
+
+    # Call the function
+    results = list(run_batch(_delayed_client(), items, concurrency=3, order="completion"))
+
+    # Check that the fastest item came first
+    assert [r["index"] for r in results] == [2, 1, 0]
+
+
+def test_run_batch_bounded_concurrency():
+    """Test that no more than the configured number of requests run at once."""
+    lock = threading.Lock()
+    state = {"running": 0, "peak": 0}
+    client = mock.MagicMock()
+
+    def complete(model, max_tokens, query):
+        with lock:
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+        time.sleep(0.01)
+        with lock:
+            state["running"] -= 1
+        return {}
+
+    client.complete.side_effect = complete
+
+    # Call the function
+    results = list(run_batch(client, read_batch([str(i) for i in range(20)], "sonar", 100),
+                             concurrency=4))
+
+    # Check the concurrency limit
+    assert len(results) == 20
+    assert state["peak"] <= 4
+
+
+def test_run_batch_item_errors():
+    """Test that failures are recorded per item."""
+    client = mock.MagicMock()
+    client.complete.side_effect = Exception("API error")
+    items = read_batch(["query", '{"query": "q", "model": "bogus"}'], "sonar", 100)
+
+    # Call the function
+    results = list(run_batch(client, items))
+
+    # Check the errors
+    assert results[0]["error"] == "API error"
+    assert "Invalid model" in results[1]["error"]
+    assert client.complete.call_count == 1
+
+
+def test_write_results():
+    """Test writing results as JSONL."""
+    out = io.StringIO()
+
+    # Call the function
+    counts = write_results([{"index": 0, "response": {}}, {"index": 1, "error": "x"}], out)
+
+    # Check the output and counts
+    lines = out.getvalue().splitlines()
+    assert json.loads(lines[1]) == {"index": 1, "error": "x"}
+    assert counts == (1, 1)
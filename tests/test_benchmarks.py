@@ -0,0 +1,32 @@
+"""
+Tests for the benchmark harness.
+"""
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+BENCHMARKS = Path(__file__).resolve().parent.parent / "benchmarks"
+
+
+def test_benchmark_run_report(tmp_path):
+    """Test that the runner drives every scenario against the mock server."""
+    output = tmp_path / "results.json"
+
+    # Run a tiny benchmark with some failed requests to retry
+    subprocess.run([sys.executable, str(BENCHMARKS / "run.py"), "--requests", "5",
+                    "--cli-requests", "1", "--latency", "0", "--chunks", "3",
+                    "--error-rate", "0.1", "--output", str(output)],
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True, timeout=120)
+    report = json.loads(output.read_text())
+
+    # Check the report
+    assert report["server"]["chunks"] == 3
+    assert set(report["scenarios"]) == {"call_api", "stream", "batch", "cli"}
+    for result in report["scenarios"].values():
+        assert result["requests"] >= 1
+        assert {"p50", "p95", "p99"} <= set(result["latency_ms"])
+        assert "cpu_ms_per_request" in result
+    assert report["scenarios"]["call_api"]["requests"] == 5
+    assert "ttft_ms" in report["scenarios"]["stream"]
@@ -0,0 +1,218 @@
+"""
+Tests for the cache module.
+"""
+
+import multiprocessing
+import time
+from unittest import mock
+
+import pytest
+
+from perplexity_cli.cache import ResponseCache, cache_key
+from perplexity_cli.client import build_messages
+
+
+MESSAGES = [{"role": "user", "content": "test query"}]
+
+
+def test_cache_key():
+    """Test that the key depends on every request parameter."""
+    key = cache_key("sonar", 100, MESSAGES)
+
+    # Check stability and sensitivity
+    assert key == cache_key("sonar", 100, [{"content": "test query", "role": "user"}])
+    assert key != cache_key("sonar-pro", 100, MESSAGES)
+    assert key != cache_key("sonar", 200, MESSAGES)
+    assert key != cache_key("sonar", 100, [{"role": "user", "content": "other"}])
+
+
+def test_cache_raw_payload(tmp_path):
+    """Test storing a response body as is and reading it back undecoded."""
+    cache = ResponseCache(tmp_path / "cache.db")
+    body = b'{"test": "response"}'
+
+    # Store the entry with its original body
+    cache.set("key", {"test": "response"}, payload=body)
+
+    # Check both ways of reading it
+    assert cache.get_raw("key") == body
+    assert cache.get("key") == {"test": "response"}
+    assert cache.get_raw("other") is None
+
+
+def test_cache_set_get(tmp_path):
+    """Test storing and reading a response."""
+    cache = ResponseCache(tmp_path / "cache.db")
+
+    # Store and read an entry
+    cache.set("key", {"test": "response"})
+
+    # Check the hit, the miss and the counters
+    assert cache.get("key") == {"test": "response"}
+    assert cache.get("other") is None
+    stats = cache.stats()
+    assert stats["entries"] == 1
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+
+
+def test_cache_ttl(tmp_path):
+    """Test that expired entries are not returned."""
+    cache = ResponseCache(tmp_path / "cache.db")
+
+    # Store an entry that expires immediately
+    cache.set("key", {"test": "response"}, ttl=0)
+
+    # Check that it is a miss and has been removed
+    assert cache.get("key") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_cache_lru_eviction(tmp_path):
+    """Test that the least recently used entries are evicted first."""
+    cache = ResponseCache(tmp_path / "cache.db", max_bytes=10 ** 6)
+    for key in ("a", "b", "c"):
+        cache.set(key, {"content": key})
+        time.sleep(0.01)
+    entry_size = cache.stats()["bytes"] // 3
+
+    # Touch "a" so that "b" becomes the oldest, then shrink the cache
+    cache.get("a")
+    cache.max_bytes = entry_size * 3
+    cache.set("d", {"content": "d"})
+
+    # Check that only "b" was evicted
+    assert cache.get("b") is None
+    assert cache.get("a") == {"content": "a"}
+    assert cache.get("c") == {"content": "c"}
+    assert cache.get("d") == {"content": "d"}
+
+
+def test_cache_size_total(tmp_path):
+    """Test that the running size total tracks every write without scanning the entries."""
+    cache = ResponseCache(tmp_path / "cache.db")
+    statements = []
+    cache._conn.set_trace_callback(statements.append)
+
+    # Insert, replace, expire and evict entries
+    cache.set("a", {"content": "a"})
+    cache.set("b", {"content": "b" * 100})
+    cache.set("a", {"content": "a" * 50})
+    cache.set("c", {"content": "c"}, ttl=0)
+    cache.max_bytes = cache.stats()["bytes"] - 1
+    cache.set("d", {"content": "d"})
+
+    # Check the total matches the entries and no write summed them
+    cache._conn.set_trace_callback(None)
+    actual = cache._conn.execute("SELECT SUM(size) FROM entries").fetchone()[0]
+    assert cache.stats()["bytes"] == actual
+    assert cache.stats()["entries"] == 2
+    assert not any("SUM(" in statement for statement in statements)
+
+    # Check that clearing resets the total and a reopened cache picks it up
+    cache.clear()
+    assert cache.stats()["bytes"] == 0
+    cache.set("e", {"content": "e"})
+    cache.close()
+    assert ResponseCache(tmp_path / "cache.db").stats()["bytes"] > 0
+
+
+def _write_entries(path, prefix):
+    """Write entries from a separate process."""
+    cache = ResponseCache(path)
+    for i in range(20):
+        cache.set(f"{prefix}{i}", {"n": i})
+
+
+def test_cache_concurrent_processes(tmp_path):
+    """Test that several processes can share one cache."""
+    path = tmp_path / "cache.db"
+    ResponseCache(path).close()
+
+    # Write from several processes at once
+    processes = [multiprocessing.Process(target=_write_entries, args=(path, p))
+                 for p in "abc"]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    # Check that every entry landed
+    assert all(process.exitcode == 0 for process in processes)
+    assert ResponseCache(path).stats()["entries"] == 60
+
+
+def store_query(cache, query, model="sonar", response=None):
+    """Store a response for a query and index it for similar lookups."""
+    messages = build_messages(query)
+    key = cache_key(model, 100, messages)
+    cache.set(key, response or {"answer": query})
+    cache.index_similar(key, model, 100, messages)
+    return key
+
+
+def test_cache_similar_hit(tmp_path):
+    """Test that a rephrased query is answered from the fuzzy tier."""
+    cache = ResponseCache(tmp_path / "cache.db", similarity=0.8)
+    store_query(cache, "What is the distance between the Sun and Earth?")
+
+    # Call the function with near-duplicates and unrelated queries
+    hit = cache.get_similar("sonar", 100, build_messages("distance  sun, earth"))
+    reordered = cache.get_similar("sonar", 100, build_messages("EARTH sun distance?"))
+    other_model = cache.get_similar("sonar-pro", 100, build_messages("distance sun earth"))
+    unrelated = cache.get_similar("sonar", 100, build_messages("distance between Mars and Earth"))
+
+    # Check only near-duplicates for the same model hit
+    assert hit == b'{"answer":"What is the distance between the Sun and Earth?"}'
+    assert reordered == hit
+    assert other_model is None
+    assert unrelated is None
+    stats = cache.stats()
+    assert stats["similar_entries"] == 1
+    assert stats["similar_hits"] == 2
+    assert stats["similar_hit_rate"] == 0.5
+
+
+def test_cache_similar_different_questions(tmp_path):
+    """Test that different question words and swapped comparisons never match."""
+    cache = ResponseCache(tmp_path / "cache.db", similarity=0.5)
+    store_query(cache, "When was Einstein born?")
+    store_query(cache, "Is Python faster than Rust?")
+
+    # Call the function with the other question of each pair
+    where = cache.get_similar("sonar", 100, build_messages("Where was Einstein born?"))
+    swapped = cache.get_similar("sonar", 100, build_messages("Is Rust faster than Python?"))
+
+    # Check that neither is answered from the cache
+    assert where is None
+    assert swapped is None
+    assert cache.get_similar("sonar", 100, build_messages("when was einstein born")) == \
+        b'{"answer":"When was Einstein born?"}'
+
+
+def test_cache_similar_disabled(tmp_path):
+    """Test that nothing is indexed or found without a threshold."""
+    cache = ResponseCache(tmp_path / "cache.db")
+    store_query(cache, "What is the distance between the Sun and Earth?")
+
+    # Call the function
+    result = cache.get_similar("sonar", 100, build_messages("distance sun earth"))
+
+    # Check the fuzzy tier was not used
+    assert result is None
+    assert cache.stats()["similar_entries"] == 0
+
+
+def test_cache_similar_expired(tmp_path):
+    """Test that expired entries leave the fuzzy index too."""
+    cache = ResponseCache(tmp_path / "cache.db", ttl=0.01, similarity=0.8)
+    store_query(cache, "What is the distance between the Sun and Earth?")
+    time.sleep(0.02)
+
+    # Call the function
+    result = cache.get_similar("sonar", 100, build_messages("distance sun earth"))
+
+    # Check the entry and its index rows are gone
+    assert result is None
+    assert cache.stats()["similar_entries"] == 0
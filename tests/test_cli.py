@@ -2,12 +2,14 @@
 Tests for the CLI module.
 """
 
+import json
 import sys
 from unittest import mock
 
 import pytest
 
 from perplexity_cli.cli import parse_args, main
+from perplexity_cli.config import DEFAULT_CACHE_TTL
 
 
 def test_parse_args_defaults():
@@ -93,8 +95,8 @@ def test_main_list_models(mock_list_models):
     assert result == 0
 
 
-@mock.patch('perplexity_cli.cli.call_api')
-@mock.patch('perplexity_cli.cli.parse_response')
+@mock.patch('perplexity_cli.api.call_api')
+@mock.patch('perplexity_cli.api.parse_response')
 def test_main_query(mock_parse_response, mock_call_api):
     """Test main function with query argument."""
     # Set up mocks
@@ -129,7 +131,23 @@ def test_main_invalid_model():
     assert result == 1
 
 
-@mock.patch('perplexity_cli.cli.call_api')
+@mock.patch('perplexity_cli.api.stream_api')
+@mock.patch('perplexity_cli.api.print_stream')
+def test_main_stream(mock_print_stream, mock_stream_api):
+    """Test main function with stream argument."""
+    # Set up mocks
+    mock_stream_api.return_value = iter([])
+    
+    # Call the function with stream argument
+    result = main(["--stream", "-q", "test query"])
+    
+    # Check that the stream was requested and printed
+    mock_stream_api.assert_called_once_with("sonar-pro", 4000, "test query")
+    mock_print_stream.assert_called_once_with(mock_stream_api.return_value, False)
+    assert result == 0
+
+
+@mock.patch('perplexity_cli.api.call_api')
 def test_main_api_error(mock_call_api):
     """Test main function with API error."""
     # Set up mocks
@@ -140,3 +158,365 @@ def test_main_api_error(mock_call_api):
     
     # Check that the function returned 1
     assert result == 1
+
+
+@mock.patch('perplexity_cli.client.PerplexityClient')
+def test_main_batch(mock_client_class, tmp_path):
+    """Test main function with batch argument."""
+    # Set up mocks and input file
+    client = mock_client_class.return_value.__enter__.return_value
+    client.complete.return_value = {"test": "response"}
+    batch_file = tmp_path / "queries.txt"
+    batch_file.write_text("first\nsecond\n")
+    output_file = tmp_path / "results.jsonl"
+    
+    # Call the function with batch arguments
+    result = main(["--batch", str(batch_file), "--batch-output", str(output_file),
+                   "--concurrency", "2"])
+    
+    # Check that both queries were sent and written
+    assert client.complete.call_count == 2
+    assert len(output_file.read_text().splitlines()) == 2
+    mock_client_class.assert_called_once_with(pool_maxsize=2)
+    assert result == 0
+
+
+@mock.patch('perplexity_cli.client.PerplexityClient')
+def test_main_batch_job_resume(mock_client_class, tmp_path, capsys):
+    """Test that a resumed batch job runs only the items that failed."""
+    # Set up mocks and input file
+    client = mock_client_class.return_value.__enter__.return_value
+    client.complete.side_effect = [{"test": "first"}, RuntimeError("boom")]
+    batch_file = tmp_path / "queries.txt"
+    batch_file.write_text("first\nsecond\n")
+    output_file = tmp_path / "results.jsonl"
+    
+    # Call the function with a job, then resume it
+    assert main(["--batch", str(batch_file), "--job", "work", "--concurrency", "1",
+                 "--batch-output", str(output_file)]) == 1
+    client.complete.side_effect = [{"test": "second"}]
+    assert main(["--resume", "work", "--batch-output", str(output_file)]) == 0
+    
+    # Check that only the failed query was sent again
+    assert client.complete.call_count == 3
+    assert client.complete.call_args[0][2] == "second"
+    assert len(output_file.read_text().splitlines()) == 1
+    
+    # Check the job listing and its combined results
+    assert main(["--list-jobs"]) == 0
+    assert "work: 2 done, 0 failed" in capsys.readouterr().out
+    assert main(["--job-results", "work", "--batch-output", str(output_file)]) == 0
+    assert [json.loads(line)["response"]["test"] for line in
+            output_file.read_text().splitlines()] == ["first", "second"]
+
+
+@mock.patch('perplexity_cli.client.PerplexityClient')
+def test_main_input(mock_client_class, tmp_path, capsys):
+    """Test main function answering a query about a document."""
+    # Set up mocks and input file
+    client = mock_client_class.return_value.__enter__.return_value
+    client.complete.return_value = {"choices": [{"message": {"content": "answer"}}]}
+    document = tmp_path / "doc.txt"
+    document.write_text("line of text\n" * 100)
+    
+    # Call the function with input arguments
+    result = main(["--input", str(document), "--chunk-tokens", "100", "--chunk-overlap", "10",
+                   "-q", "summarize", "-o", "content-only"])
+    
+    # Check that several chunks were asked and the answer printed
+    assert client.complete.call_count > 3
+    assert capsys.readouterr().out == "answer\n"
+    mock_client_class.assert_called_once_with(pool_maxsize=4)
+    assert result == 0
+
+
+@mock.patch('perplexity_cli.client.PerplexityClient')
+def test_main_fanout_compare(mock_client_class, capsys):
+    """Test main function comparing several models."""
+    # Set up mocks
+    def stream(model, max_tokens, messages=None):
+        yield {"choices": [{"delta": {"content": f"{model} says hi"}}],
+               "usage": {"total_tokens": 7}}
+    
+    client = mock_client_class.return_value.__enter__.return_value
+    client.stream.side_effect = stream
+    
+    # Call the function with two models
+    result = main(["-m", "sonar,sonar-pro", "--compare", "-o", "jsonl", "-q", "test query"])
+    
+    # Check that both models answered, in the order given
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [line["content"] for line in lines] == ["sonar says hi", "sonar-pro says hi"]
+    assert lines[0]["usage"] == {"total_tokens": 7}
+    mock_client_class.assert_called_once_with(pool_maxsize=2)
+    assert result == 0
+    
+    # Check that an unknown model is rejected before anything is sent
+    assert main(["-m", "sonar,nonexistent", "-q", "test query"]) == 1
+    assert client.stream.call_count == 2
+    
+    # Check that a list without any model is rejected the same way
+    assert main(["-m", ",", "-q", "test query"]) == 1
+    assert "Invalid model ','" in capsys.readouterr().out
+    assert client.stream.call_count == 2
+    mock_client_class.assert_called_once_with(pool_maxsize=2)
+
+
+@mock.patch('perplexity_cli.cache.ResponseCache')
+@mock.patch('perplexity_cli.api.call_api')
+def test_main_query_cache(mock_call_api, mock_cache_class):
+    """Test main function with the cache enabled."""
+    # Call the function with cache arguments
+    result = main(["--cache", "--cache-ttl", "60", "-q", "test query"])
+    
+    # Check that the client was given the cache
+    mock_cache_class.assert_called_once_with(ttl=60.0)
+    mock_call_api.assert_called_once_with("sonar-pro", 4000, "test query",
+                                          cache=mock_cache_class.return_value)
+    assert result == 0
+
+
+@mock.patch('perplexity_cli.cache.ResponseCache')
+@mock.patch('perplexity_cli.api.call_api')
+def test_main_query_fuzzy_cache(mock_call_api, mock_cache_class):
+    """Test main function with the fuzzy cache tier enabled."""
+    # Call the function with a similarity threshold
+    result = main(["--fuzzy-cache", "0.7", "-q", "test query"])
+
+    # Check that the cache was created with the threshold
+    mock_cache_class.assert_called_once_with(ttl=DEFAULT_CACHE_TTL, similarity=0.7)
+    mock_call_api.assert_called_once_with("sonar-pro", 4000, "test query",
+                                          cache=mock_cache_class.return_value)
+    assert result == 0
+    
+    # Check that a threshold of 0 is honored and one outside 0-1 is rejected
+    main(["--fuzzy-cache", "0", "-q", "test query"])
+    mock_cache_class.assert_called_with(ttl=DEFAULT_CACHE_TTL, similarity=0.0)
+    with pytest.raises(SystemExit):
+        main(["--fuzzy-cache", "1.5", "-q", "test query"])
+
+
+@mock.patch('perplexity_cli.cache.ResponseCache')
+def test_main_cache_stats(mock_cache_class, capsys):
+    """Test main function with cache stats argument."""
+    # Set up mocks
+    mock_cache_class.return_value.stats.return_value = {"entries": 3, "hits": 2}
+    
+    # Call the function with cache stats argument
+    result = main(["--cache-stats"])
+    
+    # Check that the stats were printed
+    out = capsys.readouterr().out
+    assert "entries: 3" in out
+    assert "hits: 2" in out
+    assert result == 0
+
+
+@mock.patch('perplexity_cli.api.call_api')
+def test_main_retry_options(mock_call_api):
+    """Test main function with timeout and retry arguments."""
+    # Call the function with retry arguments
+    result = main(["--read-timeout", "5", "--retries", "0", "--deadline", "20",
+                   "-q", "test query"])
+    
+    # Check the retry policy given to the client
+    policy = mock_call_api.call_args[1]["retry_policy"]
+    assert policy.read_timeout == 5
+    assert policy.connect_timeout == 10
+    assert policy.max_attempts == 1
+    assert policy.deadline == 20
+    assert result == 0
+
+
+@mock.patch('perplexity_cli.cli.RateLimiter')
+@mock.patch('perplexity_cli.api.call_api')
+def test_main_rate_limit(mock_call_api, mock_limiter_class):
+    """Test main function with rate limit arguments."""
+    # Call the function with rate limit arguments
+    result = main(["--rpm", "50", "--tpm", "40000", "-q", "test query"])
+    
+    # Check that the client was given the limiter
+    mock_limiter_class.assert_called_once_with(50.0, 40000.0)
+    assert mock_call_api.call_args[1]["rate_limiter"] is mock_limiter_class.return_value
+    assert result == 0
+
+
+@mock.patch('perplexity_cli.api.call_api')
+@mock.patch('perplexity_cli.api.parse_response')
+@mock.patch('perplexity_cli.daemon.complete_via_daemon')
+def test_main_query_daemon(mock_complete_via_daemon, mock_parse_response, mock_call_api):
+    """Test main function forwarding a query to a running daemon."""
+    # Set up mocks
+    mock_complete_via_daemon.return_value = {"test": "response"}
+    
+    # Call the function with query argument
+    result = main(["-q", "test query"])
+    
+    # Check that the daemon answered and the API was not called directly
+    mock_complete_via_daemon.assert_called_once_with("sonar-pro", 4000, "test query")
+    mock_parse_response.assert_called_once_with({"test": "response"}, False)
+    mock_call_api.assert_not_called()
+    assert result == 0
+    
+    # Check that --no-daemon skips the daemon
+    main(["--no-daemon", "-q", "test query"])
+    mock_complete_via_daemon.assert_called_once()
+    mock_call_api.assert_called_once()
+    
+    # Check that options the daemon's client would ignore skip it too
+    for option in (["--fuzzy-cache"], ["--rpm", "10"], ["--retries", "0"], ["--deadline", "5"]):
+        main(option + ["-q", "test query"])
+    mock_complete_via_daemon.assert_called_once()
+    assert mock_call_api.call_count == 5
+
+
+@mock.patch('perplexity_cli.client.PerplexityClient')
+@mock.patch('perplexity_cli.daemon.run_daemon')
+def test_main_daemon(mock_run_daemon, mock_client_class):
+    """Test main function starting the daemon."""
+    # Call the function with the daemon command
+    result = main(["daemon", "--rpm", "10"])
+    
+    # Check that the daemon was started with a configured client
+    assert "rate_limiter" in mock_client_class.call_args[1]
+    mock_run_daemon.assert_called_once_with(mock_client_class.return_value.__enter__.return_value)
+    assert result == 0
+
+
+@mock.patch('perplexity_cli.async_client.AsyncPerplexityClient')
+@mock.patch('perplexity_cli.gateway.run_gateway')
+def test_main_serve(mock_run_gateway, mock_client_class):
+    """Test main function starting the gateway."""
+    pytest.importorskip("aiohttp")
+    
+    # Call the function with the serve command
+    result = main(["serve", "--port", "9000", "--rpm", "10", "-m", "sonar"])
+    
+    # Check that the gateway was started with a configured async client
+    assert "rate_limiter" in mock_client_class.call_args[1]
+    mock_run_gateway.assert_called_once_with(mock_client_class.return_value, "sonar", 4000,
+                                             "127.0.0.1", 9000)
+    assert result == 0
+
+
+@mock.patch('perplexity_cli.client.PerplexityClient')
+@mock.patch('perplexity_cli.repl.run_repl')
+def test_main_interactive(mock_run_repl, mock_client_class):
+    """Test main function starting interactive mode."""
+    # Set up mocks
+    mock_run_repl.return_value = 0
+    
+    # Call the function with the interactive argument
+    result = main(["-i", "-m", "sonar", "--history-tokens", "500"])
+    
+    # Check that the REPL was started with the client and a conversation budget
+    args = mock_run_repl.call_args[0]
+    assert args[0] is mock_client_class.return_value.__enter__.return_value
+    assert args[1:3] == ("sonar", 4000)
+    assert args[3].max_history_tokens == 500
+    assert result == 0
+
+
+@mock.patch('perplexity_cli.api.call_api')
+@mock.patch('perplexity_cli.api.parse_response')
+def test_main_session(mock_parse_response, mock_call_api, tmp_path):
+    """Test main function continuing a saved session."""
+    # Set up mocks
+    mock_call_api.return_value = {"choices": [{"message": {"content": "first answer"}}]}
+    
+    with mock.patch('perplexity_cli.config.DATA_DIR', tmp_path):
+        # Call the function twice with the same session
+        assert main(["--session", "s1", "-q", "first question"]) == 0
+        mock_call_api.return_value = {"choices": [{"message": {"content": "second answer"}}]}
+        assert main(["--session", "s1", "-q", "second question"]) == 0
+        
+        # Check that the second call carried the history
+        messages = mock_call_api.call_args[0][3]
+        assert [m["content"] for m in messages[1:]] == [
+            "first question", "first answer", "second question"
+        ]
+        
+        # Check that the session lists four turns
+        with mock.patch('builtins.print') as mock_print:
+            main(["--list-sessions"])
+        assert "s1: 4 turns" in mock_print.call_args[0][0]
+
+
+@mock.patch('perplexity_cli.api.call_api')
+def test_main_estimate(mock_call_api, capsys):
+    """Test main function estimating a query without sending it."""
+    # Call the function with the estimate argument
+    result = main(["--estimate", "-m", "sonar", "-t", "1000000", "-q", "test query"])
+    
+    # Check that the clamped size was printed and no request was made
+    captured = capsys.readouterr()
+    assert "prompt_tokens:" in captured.out
+    assert "max_tokens: 127" in captured.out
+    mock_call_api.assert_not_called()
+    assert result == 0
+
+
+@mock.patch('perplexity_cli.api.call_api')
+@mock.patch('perplexity_cli.api.parse_response')
+@mock.patch('perplexity_cli.daemon.complete_via_daemon')
+def test_main_timings(mock_complete_via_daemon, mock_parse_response, mock_call_api, tmp_path):
+    """Test main function with timings and a metrics file."""
+    from perplexity_cli.metrics import MetricsReporter
+    
+    # Call the function with metrics arguments
+    result = main(["--timings", "json", "--metrics-file", str(tmp_path / "cli.prom"),
+                   "-q", "test query"])
+    
+    # Check that the API was called directly with a reporter
+    mock_complete_via_daemon.assert_not_called()
+    reporter = mock_call_api.call_args[1]["on_metrics"]
+    assert isinstance(reporter, MetricsReporter)
+    assert reporter.timings == "json"
+    assert reporter.registry.path == tmp_path / "cli.prom"
+    assert result == 0
+
+
+@mock.patch('perplexity_cli.api.call_api')
+@mock.patch('perplexity_cli.api.parse_response')
+def test_main_hedge(mock_parse_response, mock_call_api):
+    """Test main function with request hedging."""
+    from perplexity_cli.hedging import HedgePolicy
+
+    # Call the function with hedging arguments
+    result = main(["--no-daemon", "--hedge", "0.9", "--hedge-max-ratio", "0.05",
+                   "-q", "test query"])
+
+    # Check that the API was called with a hedging policy
+    policy = mock_call_api.call_args[1]["hedge"]
+    assert isinstance(policy, HedgePolicy)
+    assert policy.percentile == 0.9
+    assert policy.max_ratio == 0.05
+    assert result == 0
+
+
+@mock.patch('perplexity_cli.output.write_raw')
+@mock.patch('perplexity_cli.api.call_api_raw')
+def test_main_output_json(mock_call_api_raw, mock_write_raw):
+    """Test main function passing the raw API response through."""
+    # Set up mocks
+    mock_call_api_raw.return_value = b'{"test": "response"}'
+    
+    # Call the function with an output format
+    result = main(["--no-daemon", "-o", "jsonl", "-q", "test query"])
+    
+    # Check that the body was written without decoding
+    mock_call_api_raw.assert_called_once_with("sonar-pro", 4000, "test query")
+    mock_write_raw.assert_called_once_with(b'{"test": "response"}', "jsonl")
+    assert result == 0
+
+
+@mock.patch('perplexity_cli.api.call_api')
+@mock.patch('perplexity_cli.api.parse_response')
+def test_main_auto_model(mock_parse_response, mock_call_api):
+    """Test main function routing -m auto to a model."""
+    # Call the function with automatic model selection
+    result = main(["--no-daemon", "-m", "auto", "--tier", "basic", "-q", "test query"])
+    
+    # Check that a concrete model was sent
+    assert mock_call_api.call_args[0][0] == "llama-3.1-sonar-small-128k-online"
+    assert result == 0
@@ -0,0 +1,280 @@
+"""
+Tests for the client module.
+"""
+
+import time
+from unittest import mock
+
+import pytest
+import requests
+
+from perplexity_cli.cache import ResponseCache
+from perplexity_cli.client import (
+    PerplexityClient, build_messages, build_payload, BASE_URL
+)
+from perplexity_cli.exceptions import (
+    APIConnectionError, AuthenticationError, DeadlineExceededError, PromptTooLargeError
+)
+from perplexity_cli.retry import RetryPolicy
+from perplexity_cli.tokens import TokenCalibrator
+
+
+def test_build_payload():
+    """Test building a request body."""
+    # Call the function
+    data = build_payload("sonar", 100, build_messages("test query"), stream=True)
+
+    # Check the body
+    assert data["model"] == "sonar"
+    assert data["max_tokens"] == 100
+    assert data["messages"][0]["role"] == "system"
+    assert data["messages"][1] == {"role": "user", "content": "test query"}
+    assert data["stream"] is True
+
+
+def test_client_pool_settings():
+    """Test that the client mounts a pooled adapter."""
+    # Create the client
+    client = PerplexityClient(api_key="test_key", pool_connections=2, pool_maxsize=7,
+                              pool_block=True)
+
+    # Check the adapter configuration and cached headers
+    adapter = client.session.get_adapter(BASE_URL)
+    assert adapter._pool_connections == 2
+    assert adapter._pool_maxsize == 7
+    assert adapter._pool_block is True
+    assert client.headers["Authorization"] == "Bearer test_key"
+    client.close()
+
+
+def test_client_no_keep_alive():
+    """Test disabling keep-alive."""
+    with PerplexityClient(api_key="test_key", keep_alive=False) as client:
+        assert client.headers["Connection"] == "close"
+
+
+@mock.patch('perplexity_cli.client.get_api_key')
+def test_client_resolves_api_key_once(mock_get_api_key):
+    """Test that the API key is looked up once when not given."""
+    # Set up mocks
+    mock_get_api_key.return_value = "test_key"
+
+    # Create the client
+    client = PerplexityClient()
+
+    # Check that the key was resolved once
+    mock_get_api_key.assert_called_once()
+    assert client.api_key == "test_key"
+
+
+@mock.patch('requests.Session.post')
+def test_client_complete_messages(mock_post):
+    """Test sending an explicit message list."""
+    # Set up mocks
+    mock_post.return_value.json.return_value = {"test": "response"}
+    messages = [{"role": "user", "content": "hello"}]
+
+    # Call the method
+    client = PerplexityClient(api_key="test_key")
+    response = client.complete("sonar", 100, messages=messages)
+
+    # Check the request and response
+    args, kwargs = mock_post.call_args
+    assert kwargs["json"]["messages"] == messages
+    assert response == {"test": "response"}
+
+
+@mock.patch('requests.Session.post')
+def test_client_complete_error(mock_post):
+    """Test that connection errors are reported."""
+    # Set up mocks
+    mock_post.side_effect = requests.exceptions.ConnectionError("connection reset")
+
+    # Call the method and check that it raises an exception
+    client = PerplexityClient(api_key="test_key", retry_policy=RetryPolicy(base_delay=0))
+    with pytest.raises(APIConnectionError) as excinfo:
+        client.complete("sonar", 100, "test query")
+
+    # Check the exception message and that the request was retried
+    assert "API call failed: connection reset" in str(excinfo.value)
+    assert mock_post.call_count == 3
+
+
+def _http_error(status_code, headers=None):
+    """Create an HTTPError carrying a real, falsy error response."""
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = b'{"error": {"message": "Slow down"}}'
+    response.headers.update(headers or {})
+    return requests.exceptions.HTTPError(response=response)
+
+
+@mock.patch('perplexity_cli.retry.time.sleep')
+@mock.patch('requests.Session.post')
+def test_client_retries_rate_limit(mock_post, mock_sleep):
+    """Test that 429s are retried after the Retry-After delay."""
+    # Set up mocks
+    ok = mock.MagicMock()
+    ok.json.return_value = {"test": "response"}
+    mock_post.side_effect = [_http_error(429, {"Retry-After": "2"}), ok]
+
+    # Call the method
+    client = PerplexityClient(api_key="test_key")
+    response = client.complete("sonar", 100, "test query")
+
+    # Check the retry and its delay
+    assert response == {"test": "response"}
+    mock_sleep.assert_called_once_with(2.0)
+    args, kwargs = mock_post.call_args
+    assert kwargs["timeout"] == (10.0, 30.0)
+
+
+def _trickle(*chunks):
+    """Yield chunks of a body, pausing before each one like a slow server."""
+    for chunk in chunks:
+        time.sleep(0.1)
+        yield chunk
+
+
+@mock.patch('requests.Session.post')
+def test_client_deadline_covers_body(mock_post):
+    """Test that a response body trickling in cannot run past the deadline."""
+    # Set up mocks
+    mock_post.return_value.iter_content.return_value = _trickle(b'{"test"', b': "response"}')
+    mock_post.return_value.iter_lines.return_value = _trickle(b'data: {"test": 1}', b"", b"")
+
+    # Call the method with a deadline the whole body does not fit in
+    client = PerplexityClient(api_key="test_key",
+                              retry_policy=RetryPolicy(deadline=0.15, read_timeout=1))
+    with pytest.raises(DeadlineExceededError):
+        client.complete("sonar", 100, "test query")
+
+    # Check that the body was read in chunks rather than by one blocking read
+    args, kwargs = mock_post.call_args
+    assert kwargs["stream"] is True
+    mock_post.return_value.close.assert_called()
+
+    # Check that a stream is ended by the deadline too
+    with pytest.raises(DeadlineExceededError):
+        list(client.stream("sonar", 100, "test query"))
+
+    # Check that a body read in time is returned
+    mock_post.return_value.iter_content.return_value = _trickle(b'{"test"', b': "response"}')
+    client.retry_policy.deadline = 1
+    assert client.complete("sonar", 100, "another query") == {"test": "response"}
+
+
+@mock.patch('requests.Session.post')
+def test_client_fatal_error_not_retried(mock_post):
+    """Test that client errors fail at once with a typed error."""
+    # Set up mocks
+    mock_post.side_effect = _http_error(401)
+
+    # Call the method and check that it raises an exception
+    client = PerplexityClient(api_key="test_key")
+    with pytest.raises(AuthenticationError) as excinfo:
+        client.complete("sonar", 100, "test query")
+
+    # Check the exception and that no retry was made
+    assert str(excinfo.value) == "API call failed with status code 401: Slow down"
+    assert mock_post.call_count == 1
+
+
+@mock.patch('requests.Session.post')
+def test_client_cache(mock_post, tmp_path):
+    """Test that cached responses skip the API."""
+    # Set up mocks
+    mock_post.return_value.json.return_value = {"test": "response"}
+    cache = ResponseCache(tmp_path / "cache.db")
+    client = PerplexityClient(api_key="test_key", cache=cache)
+
+    # Call the method twice
+    first = client.complete("sonar", 100, "test query")
+    second = client.complete("sonar", 100, "test query")
+
+    # Check that only the first call reached the API
+    assert first == second == {"test": "response"}
+    assert mock_post.call_count == 1
+
+    # Check that a refreshing client goes to the API but still stores
+    mock_post.return_value.json.return_value = {"test": "new"}
+    refresher = PerplexityClient(api_key="test_key", cache=cache, refresh_cache=True)
+    assert refresher.complete("sonar", 100, "test query") == {"test": "new"}
+    assert client.complete("sonar", 100, "test query") == {"test": "new"}
+    assert mock_post.call_count == 2
+
+
+@mock.patch('requests.Session.post')
+def test_client_fuzzy_cache(mock_post, tmp_path):
+    """Test that a rephrased query is answered from the fuzzy cache tier."""
+    # Set up mocks
+    mock_post.return_value.json.return_value = {"test": "response"}
+    cache = ResponseCache(tmp_path / "cache.db", similarity=0.8)
+    client = PerplexityClient(api_key="test_key", cache=cache)
+
+    # Call the method with two phrasings of the same question
+    first = client.complete("sonar", 100, "What is the distance between the Sun and Earth?")
+    second = client.complete("sonar", 100, "distance sun earth")
+    raw = client.complete_raw("sonar", 100, "Sun-Earth distance")
+
+    # Check that only the first call reached the API
+    assert first == second == {"test": "response"}
+    assert raw == b'{"test":"response"}'
+    assert mock_post.call_count == 1
+
+
+@mock.patch('requests.Session.post')
+def test_client_complete_raw(mock_post, tmp_path):
+    """Test that raw responses are passed through and cached as sent."""
+    # Set up mocks
+    body = b'{"test": "response", "usage": {"prompt_tokens": 5}}'
+    mock_post.return_value.content = body
+    cache = ResponseCache(tmp_path / "cache.db")
+    client = PerplexityClient(api_key="test_key", cache=cache)
+
+    # Call the method twice
+    first = client.complete_raw("sonar", 100, "test query")
+    second = client.complete_raw("sonar", 100, "test query")
+
+    # Check that the body came back byte for byte, the second time from the cache
+    assert first == second == body
+    assert mock_post.call_count == 1
+    assert client.complete("sonar", 100, "test query")["test"] == "response"
+
+
+@mock.patch('requests.Session.post')
+def test_client_sizes_request(mock_post):
+    """Test that max_tokens is clamped and actual usage calibrates the estimate."""
+    # Set up mocks
+    mock_post.return_value.json.return_value = {"usage": {"prompt_tokens": 50}}
+    calibrator = TokenCalibrator(persist=False)
+
+    # Call the method with a max_tokens larger than the context window
+    client = PerplexityClient(api_key="test_key", calibrator=calibrator)
+    client.complete("sonar", 10 ** 6, "test query")
+
+    # Check the clamped request and the recorded usage
+    max_tokens = mock_post.call_args[1]["json"]["max_tokens"]
+    assert 127000 < max_tokens < 128000
+    assert calibrator.stats()["sonar"]["samples"] == 1
+    assert calibrator.ratio("sonar") > 1
+
+
+@mock.patch('requests.Session.post')
+def test_client_rejects_oversized_prompt(mock_post):
+    """Test that a prompt larger than the context window is not sent."""
+    client = PerplexityClient(api_key="test_key")
+
+    # Call the method and check that it raises an exception
+    with pytest.raises(PromptTooLargeError):
+        client.complete("sonar", 100, "word " * 200000)
+    mock_post.assert_not_called()
+
+
+def test_client_base_url_from_environment():
+    """Test that PERPLEXITY_BASE_URL overrides the default endpoint."""
+    with mock.patch.dict('os.environ', {"PERPLEXITY_BASE_URL": "http://127.0.0.1:8808/chat/completions"}):
+        with PerplexityClient(api_key="test_key") as client:
+            assert client.base_url == "http://127.0.0.1:8808/chat/completions"
+        with PerplexityClient(api_key="test_key", base_url="http://other/") as client:
+            assert client.base_url == "http://other/"
@@ -0,0 +1,173 @@
+"""
+Tests for the concurrency module.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+from perplexity_cli.batch import read_batch, run_batch
+from perplexity_cli.client import PerplexityClient
+from perplexity_cli.concurrency import AdaptiveLimit, MIN_LATENCY_SAMPLES
+from perplexity_cli.exceptions import AuthenticationError, RateLimitError, ServerError
+from perplexity_cli.retry import RetryPolicy
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "benchmarks"))
+
+from mock_server import MockPerplexityServer  # noqa: E402
+
+
+def _fill(limit, latency=0.0):
+    """Run one full round of requests at the limit, each taking ``latency``."""
+    slots = [limit.acquire() for _ in range(limit.limit)]
+    for started in slots:
+        limit.release(started - latency)
+
+
+def test_limit_grows_additively():
+    """Test that the limit grows by about one per round of successful requests."""
+    limit = AdaptiveLimit(initial=4, max_limit=6)
+
+    # Run rounds of requests at the limit until it reaches the ceiling
+    rounds = 0
+    while limit.limit < 6 and rounds < 10:
+        _fill(limit)
+        rounds += 1
+
+    # Check the pace of the growth and the ceiling
+    assert 2 <= rounds <= 6
+    _fill(limit)
+    assert limit.limit == 6
+    assert limit.stats()["increases"] == 2
+
+
+def test_limit_not_raised_when_unused():
+    """Test that successes below the limit do not raise it."""
+    limit = AdaptiveLimit(initial=4)
+    for _ in range(20):
+        limit.release(limit.acquire())
+    assert limit.limit == 4
+
+
+def test_limit_cut_once_per_burst():
+    """Test that overload errors halve the limit, once per burst."""
+    limit = AdaptiveLimit(initial=16)
+
+    # Fail several requests that were all in flight together
+    slots = [limit.acquire() for _ in range(4)]
+    for started in slots:
+        limit.release(started, RateLimitError(429, "Slow down"))
+
+    # Check a single cut, then a second one for a request started after it
+    assert limit.limit == 8
+    limit.release(limit.acquire(), ServerError(503, "Unavailable"))
+    assert limit.limit == 4
+
+    # Check that errors unrelated to load leave the limit alone
+    limit.release(limit.acquire(), AuthenticationError(401, "Bad key"))
+    assert limit.limit == 4
+    assert limit.stats()["decreases"] == 2
+
+
+def test_limit_cut_on_latency_spike():
+    """Test that latency well above its baseline cuts the limit."""
+    limit = AdaptiveLimit(initial=10, max_limit=10)
+    for _ in range(MIN_LATENCY_SAMPLES):
+        limit.release(limit.acquire() - 0.1)
+    assert limit.limit == 10
+
+    # Report much slower requests
+    for _ in range(5):
+        limit.release(limit.acquire() - 1.0)
+
+    # Check the cut
+    assert limit.limit < 10
+
+
+def test_limit_bounds_in_flight():
+    """Test that blocked callers never exceed the limit."""
+    limit = AdaptiveLimit(initial=3, max_limit=3)
+    peak = []
+
+    def work():
+        limit.call(lambda: (peak.append(limit.in_flight), time.sleep(0.01)))
+
+    # Run more callers than the limit allows
+    threads = [threading.Thread(target=work) for _ in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Check the peak
+    assert max(peak) == 3
+    assert limit.in_flight == 0
+    with pytest.raises(ValueError):
+        AdaptiveLimit(min_limit=4, max_limit=2)
+
+
+def test_limit_settles_at_server_capacity():
+    """Test that a batch against a server with a concurrency cap settles near the cap."""
+    server = MockPerplexityServer(latency=0.02, jitter=0.0, capacity=8).start()
+    limit = AdaptiveLimit(initial=2, max_limit=32)
+    items = read_batch((f"query {i}" for i in range(300)), "sonar", 100)
+
+    # Run the batch with more workers than the server allows
+    try:
+        with PerplexityClient(api_key="test_key", base_url=server.url, pool_maxsize=32,
+                              retry_policy=RetryPolicy(max_attempts=10, base_delay=0.001),
+                              concurrency_limit=limit, coalesce=False) as client:
+            results = list(run_batch(client, items, concurrency=32))
+    finally:
+        server.stop()
+
+    # Check that every item succeeded and the limit found the cap
+    assert all("response" in result for result in results)
+    stats = limit.stats()
+    assert stats["decreases"] > 0
+    assert 2 <= stats["limit"] <= 10
+    assert server.rejected < len(results) // 2
+
+
+def test_limit_async_waiters_served_in_order():
+    """Test that async callers get freed slots in arrival order, without polling."""
+    limit = AdaptiveLimit(initial=1, max_limit=1)
+    order = []
+
+    async def work(index):
+        started = await limit.acquire_async()
+        order.append(index)
+        await asyncio.sleep(0)
+        limit.release(started)
+
+    async def run():
+        held = await limit.acquire_async()
+        tasks = []
+        for index in range(5):
+            tasks.append(asyncio.ensure_future(work(index)))
+            await asyncio.sleep(0)
+        # A cancelled waiter must neither take a slot nor block the queue
+        tasks[2].cancel()
+        # Free the slot from another thread, as the sync client does
+        threading.Timer(0.01, limit.release, (held,)).start()
+        await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), 1)
+
+        # A waiter cancelled right after being handed a slot gives it back
+        held = await limit.acquire_async()
+        task = asyncio.ensure_future(limit.acquire_async())
+        await asyncio.sleep(0)
+        limit.release(held)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    # Call the function
+    asyncio.run(run())
+
+    # Check the order and that every slot was returned
+    assert order == [0, 1, 3, 4]
+    assert limit.in_flight == 0
+    assert limit.try_acquire() is not None
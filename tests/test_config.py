@@ -2,6 +2,7 @@
 Tests for the config module.
 """
 
+import configparser
 import os
 import tempfile
 from unittest import mock
@@ -9,7 +10,7 @@ from pathlib import Path
 
 import pytest
 
-from perplexity_cli.config import load_config, get_api_key, save_config
+from perplexity_cli.config import load_config, get_api_key, get_api_keys, save_config
 
 
 @mock.patch('perplexity_cli.config.CONFIG_FILE')
@@ -25,8 +26,7 @@ def test_load_config_file_not_exists(mock_config_file):
     assert config == {}
 
 
-@mock.patch('perplexity_cli.config.CONFIG_FILE')
-def test_load_config_file_exists(mock_config_file, tmp_path):
+def test_load_config_file_exists(tmp_path):
     """Test loading config when file exists."""
     # Create a temporary config file
     config_file = tmp_path / "config"
@@ -36,25 +36,8 @@ def test_load_config_file_exists(mock_config_file, tmp_path):
         f.write("default_model = test_model\n")
         f.write("max_tokens = 1000\n")
     
-    # Set mock to use our temporary file
-    mock_config_file.exists.return_value = True
-    mock_config_file.return_value = config_file
-    
-    # Mock configparser to read our file
-    with mock.patch('configparser.ConfigParser.read') as mock_read:
-        def side_effect(file_path):
-            parser = mock.MagicMock()
-            parser.__contains__.return_value = True
-            parser.__getitem__.return_value = {
-                "api_key": "test_key",
-                "default_model": "test_model",
-                "max_tokens": "1000"
-            }
-            return parser
-        
-        mock_read.side_effect = side_effect
-        
-        # Call the function
+    # Call the function with the config file pointing at our temporary file
+    with mock.patch('perplexity_cli.config.CONFIG_FILE', config_file):
         config = load_config()
     
     # Check that the config is loaded correctly
@@ -65,6 +48,30 @@ def test_load_config_file_exists(mock_config_file, tmp_path):
     }
 
 
+def test_load_config_memoized(tmp_path):
+    """Test that an unchanged config file is only parsed once."""
+    # Create a temporary config file
+    config_file = tmp_path / "config"
+    config_file.write_text("[perplexity]\napi_key = test_key\n")
+    
+    with mock.patch('perplexity_cli.config.CONFIG_FILE', config_file):
+        first = load_config()
+        with mock.patch('configparser.ConfigParser.read') as mock_read:
+            second = load_config()
+        
+        # Check that the second load came from the memo
+        mock_read.assert_not_called()
+        assert second == first
+        
+        # Check that callers cannot modify the memoized config
+        second["api_key"] = "changed"
+        assert load_config()["api_key"] == "test_key"
+        
+        # Check that saving invalidates the memo
+        save_config(api_key="new_key")
+        assert load_config()["api_key"] == "new_key"
+
+
 @mock.patch('os.getenv')
 @mock.patch('perplexity_cli.config.load_config')
 def test_get_api_key_from_env(mock_load_config, mock_getenv):
@@ -111,17 +118,40 @@ def test_get_api_key_not_found(mock_load_config, mock_getenv):
         get_api_key()
 
 
-@mock.patch('perplexity_cli.config.CONFIG_FILE')
-def test_save_config(mock_config_file, tmp_path):
+@mock.patch.dict(os.environ, {"PERPLEXITY_API_KEYS": "key_one, key_two\nkey_three"})
+def test_get_api_keys_from_env():
+    """Test getting several API keys from the environment."""
+    # Call the function
+    api_keys = get_api_keys()
+    
+    # Check that every key was found
+    assert api_keys == ["key_one", "key_two", "key_three"]
+
+
+@mock.patch('perplexity_cli.config.get_api_key')
+@mock.patch('perplexity_cli.config.load_config')
+def test_get_api_keys_single(mock_load_config, mock_get_api_key, monkeypatch):
+    """Test falling back to the single API key."""
+    # Set up mocks
+    monkeypatch.delenv("PERPLEXITY_API_KEYS", raising=False)
+    mock_load_config.return_value = {}
+    mock_get_api_key.return_value = "test_key"
+    
+    # Call the function
+    api_keys = get_api_keys()
+    
+    # Check that the single key was used
+    assert api_keys == ["test_key"]
+
+
+def test_save_config(tmp_path):
     """Test saving config."""
     # Create a temporary config file
     config_file = tmp_path / "config"
     
-    # Set mock to use our temporary file
-    mock_config_file.return_value = config_file
-    
-    # Call the function
-    save_config(api_key="new_key", default_model="new_model", max_tokens=2000)
+    # Call the function with the config file pointing at our temporary file
+    with mock.patch('perplexity_cli.config.CONFIG_FILE', config_file):
+        save_config(api_key="new_key", default_model="new_model", max_tokens=2000)
     
     # Check that the config file was created
     assert config_file.exists()
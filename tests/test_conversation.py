@@ -0,0 +1,92 @@
+"""
+Tests for the conversation module.
+"""
+
+from perplexity_cli.conversation import Conversation, SUMMARY_PREFIX, estimate_message_tokens
+
+
+def test_conversation_messages():
+    """Test building the message list from the history."""
+    conversation = Conversation(system_prompt="Be brief.")
+    conversation.add("user", "first question")
+    conversation.add("assistant", "first answer")
+    conversation.add("user", "follow-up")
+
+    # Call the function
+    messages = conversation.messages()
+
+    # Check the messages
+    assert messages == [
+        {"role": "system", "content": "Be brief."},
+        {"role": "user", "content": "first question"},
+        {"role": "assistant", "content": "first answer"},
+        {"role": "user", "content": "follow-up"},
+    ]
+    assert len(conversation) == 3
+    assert conversation.tokens == sum(estimate_message_tokens(m["content"]) for m in messages)
+
+
+def test_conversation_pop_and_reset():
+    """Test removing a failed question and resetting the history."""
+    conversation = Conversation()
+    conversation.add("user", "question")
+    tokens = conversation.tokens
+
+    # Check that pop removes the turn and its tokens
+    assert conversation.pop() == ("user", "question")
+    assert conversation.tokens < tokens
+    assert conversation.pop() is None
+
+    conversation.add("user", "question")
+    conversation.reset()
+    assert len(conversation) == 0
+
+
+def test_conversation_trim():
+    """Test trimming the oldest turns into a summary."""
+    conversation = Conversation(system_prompt="S", max_history_tokens=120)
+    for i in range(10):
+        conversation.add("user", f"question {i} " + "x" * 100)
+        conversation.add("assistant", "y" * 100)
+    conversation.add("user", "latest question")
+
+    # Call the function
+    dropped = conversation.trim()
+
+    # Check that whole pairs were dropped and the budget is met
+    messages = conversation.messages()
+    assert dropped % 2 == 0 and dropped > 0
+    assert conversation.tokens <= 120
+    assert messages[1]["role"] == "user"
+    assert messages[-1]["content"] == "latest question"
+    assert conversation.trimmed == dropped
+
+    # Check that the dropped questions are summarized in the system prompt
+    assert messages[0]["content"].startswith("S\n\n" + SUMMARY_PREFIX)
+    assert "question 9" in messages[0]["content"]
+
+
+def test_conversation_trim_keeps_latest_question():
+    """Test that the latest question is kept even if it exceeds the budget."""
+    conversation = Conversation(max_history_tokens=10)
+    conversation.add("user", "z" * 1000)
+
+    # Call the function
+    conversation.trim()
+
+    # Check that the question is still there
+    assert conversation.messages()[-1]["content"] == "z" * 1000
+
+
+def test_conversation_request_messages_context_window():
+    """Test that the model's context window bounds the history."""
+    conversation = Conversation(max_history_tokens=10 ** 9)
+    conversation.add("user", "a" * 4000)
+    conversation.add("assistant", "b" * 4000)
+    conversation.add("user", "c")
+
+    # Call the function with max_tokens nearly filling the window
+    messages = conversation.request_messages("sonar", 128000 - 100)
+
+    # Check that the older pair was dropped
+    assert [m["content"] for m in messages[1:]] == ["c"]
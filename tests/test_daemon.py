@@ -0,0 +1,103 @@
+"""
+Tests for the daemon module.
+"""
+
+import socket
+import threading
+from unittest import mock
+
+import pytest
+
+from perplexity_cli.daemon import (
+    DaemonServer, complete_via_daemon, stream_via_daemon, forward, socket_path
+)
+from perplexity_cli.exceptions import (
+    APITimeoutError, PerplexityError, RateLimitError, ServerError
+)
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, "AF_UNIX"),
+                                reason="Unix domain sockets are not available")
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    """Run a daemon with a mock client on a temporary socket."""
+    path = tmp_path / "d.sock"
+    client = mock.MagicMock()
+    server = DaemonServer(str(path), client)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield path, client
+    server.shutdown()
+    server.server_close()
+
+
+def test_complete_via_daemon(daemon):
+    """Test forwarding a completion to the daemon."""
+    path, client = daemon
+    client.complete.return_value = {"test": "response"}
+
+    # Call the function
+    response = complete_via_daemon("sonar", 100, "test query", path)
+
+    # Check that the daemon's client answered
+    assert response == {"test": "response"}
+    client.complete.assert_called_once_with("sonar", 100, "test query")
+
+
+def test_stream_via_daemon(daemon):
+    """Test forwarding a streamed completion to the daemon."""
+    path, client = daemon
+    client.stream.return_value = iter([{"n": 1}, {"n": 2}])
+
+    # Call the function
+    chunks = list(stream_via_daemon("sonar", 100, "test query", path))
+
+    # Check the chunks
+    assert chunks == [{"n": 1}, {"n": 2}]
+
+
+def test_daemon_error(daemon):
+    """Test that errors from the daemon's client are raised."""
+    path, client = daemon
+    client.complete.side_effect = ServerError(503, "Unavailable")
+
+    # Call the function and check that it raises the same exception class
+    with pytest.raises(ServerError) as excinfo:
+        complete_via_daemon("sonar", 100, "test query", path)
+
+    assert "status code 503: Unavailable" in str(excinfo.value)
+    assert excinfo.value.status_code == 503
+
+    # Check the other error types, and the fallback for unknown ones
+    client.complete.side_effect = RateLimitError(429, "Slow down", retry_after=2.0)
+    with pytest.raises(RateLimitError) as excinfo:
+        complete_via_daemon("sonar", 100, "test query", path)
+    assert excinfo.value.retry_after == 2.0
+    client.complete.side_effect = APITimeoutError("timed out")
+    with pytest.raises(APITimeoutError):
+        complete_via_daemon("sonar", 100, "test query", path)
+    client.complete.side_effect = KeyError("model")
+    with pytest.raises(PerplexityError) as excinfo:
+        complete_via_daemon("sonar", 100, "test query", path)
+    assert type(excinfo.value) is PerplexityError
+
+
+def test_no_daemon(tmp_path):
+    """Test the fallback when no daemon is running."""
+    path = tmp_path / "d.sock"
+
+    # Missing socket
+    assert forward({}, path) is None
+
+    # Stale socket with nothing listening
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(str(path))
+    stale.close()
+    assert complete_via_daemon("sonar", 100, "test query", path) is None
+
+
+def test_socket_path_follows_data_dir(isolated_data_dir):
+    """Test that the socket lives in the data directory in effect, not the default one."""
+    assert socket_path() == isolated_data_dir / "daemon.sock"
+    assert isolated_data_dir.is_dir()
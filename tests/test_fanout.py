@@ -0,0 +1,110 @@
+"""
+Tests for the fanout module.
+"""
+
+import threading
+import time
+
+import pytest
+
+from perplexity_cli.exceptions import ServerError
+from perplexity_cli.fanout import (
+    FanoutResult, compare, first_wins, format_comparison, parse_models
+)
+
+
+class FakeClient:
+    """Stream a canned answer per model, a word per chunk, after a per-model delay."""
+
+    def __init__(self, delays, errors=()):
+        self.delays = delays
+        self.errors = errors
+        self.closed = set()
+        self.finished = threading.Event()
+
+    def stream(self, model, max_tokens, messages=None):
+        try:
+            time.sleep(self.delays[model])
+            if model in self.errors:
+                raise ServerError(503, f"{model} is down")
+            words = f"answer from {model}".split()
+            for i, word in enumerate(words):
+                chunk = {"model": model, "choices": [{"delta": {"content": word + " "}}]}
+                if i == len(words) - 1:
+                    chunk["usage"] = {"prompt_tokens": 5, "completion_tokens": 3,
+                                      "total_tokens": 8}
+                yield chunk
+                time.sleep(0.01)
+        except GeneratorExit:
+            self.closed.add(model)
+            self.finished.set()
+            raise
+
+
+def test_parse_models():
+    """Test splitting a model list."""
+    assert parse_models("sonar, sonar-pro,,sonar") == ["sonar", "sonar-pro"]
+
+
+def test_first_wins_stops_the_others():
+    """Test that the fastest complete answer wins and the slower stream is stopped."""
+    client = FakeClient({"sonar": 0.0, "sonar-pro": 0.02})
+
+    # Call the function
+    result = first_wins(client, ["sonar-pro", "sonar"], 100, "question")
+
+    # Check the winner and that the loser closed its stream
+    assert result.model == "sonar"
+    assert result.response["choices"][0]["message"]["content"] == "answer from sonar "
+    assert result.response["usage"]["total_tokens"] == 8
+    assert result.ttft <= result.latency
+    assert client.finished.wait(1)
+    assert client.closed == {"sonar-pro"}
+
+
+def test_first_wins_skips_failures():
+    """Test that a failed model does not win, and that all failing raises."""
+    client = FakeClient({"sonar": 0.0, "sonar-pro": 0.02}, errors={"sonar"})
+    assert first_wins(client, ["sonar", "sonar-pro"], 100, "question").model == "sonar-pro"
+
+    # Check that the last error is raised when no model answers
+    client = FakeClient({"sonar": 0.0, "sonar-pro": 0.0}, errors={"sonar", "sonar-pro"})
+    with pytest.raises(ServerError):
+        first_wins(client, ["sonar", "sonar-pro"], 100, "question")
+
+
+def test_compare_collects_every_model():
+    """Test that compare returns every answer, concurrently and in the order given."""
+    client = FakeClient({"sonar": 0.1, "sonar-pro": 0.1, "sonar-reasoning": 0.1},
+                        errors={"sonar-reasoning"})
+
+    # Call the function
+    start = time.perf_counter()
+    results = compare(client, ["sonar-pro", "sonar", "sonar-reasoning"], 100, "question")
+
+    # Check the results and that the requests overlapped
+    assert time.perf_counter() - start < 0.25
+    assert [result.model for result in results] == ["sonar-pro", "sonar", "sonar-reasoning"]
+    assert results[0].to_dict()["content"] == "answer from sonar-pro "
+    assert results[2].to_dict()["error_type"] == "ServerError"
+
+
+def test_format_comparison():
+    """Test the side-by-side and stacked layouts."""
+    response = {"choices": [{"message": {"content": "word " * 30}}],
+                "usage": {"prompt_tokens": 5, "completion_tokens": 30, "total_tokens": 35}}
+    results = [FanoutResult("sonar", response, None, 1.234, 0.2),
+               FanoutResult("sonar-pro", None, ServerError(503, "down"), None, None)]
+
+    # Call the function with a wide and a narrow terminal
+    wide = format_comparison(results, width=100).splitlines()
+    narrow = format_comparison(results, width=40).splitlines()
+
+    # Check the columns and the stacked fallback
+    assert wide[0].split() == ["model", "sonar", "sonar-pro"]
+    assert wide[1].split() == ["latency", "1.23s", "-"]
+    assert wide[5].split() == ["total", "tokens", "35", "-"]
+    assert "Error: API call failed" in wide[7]
+    assert all(len(line) <= 100 for line in wide)
+    assert narrow[0] == "--- sonar ---"
+    assert "--- sonar-pro ---" in narrow
@@ -0,0 +1,187 @@
+"""
+Tests for the gateway module.
+"""
+
+import asyncio
+import json
+
+import pytest
+
+aiohttp = pytest.importorskip("aiohttp")
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from perplexity_cli.async_client import AsyncPerplexityClient
+from perplexity_cli.cache import ResponseCache
+from perplexity_cli.exceptions import APIConnectionError, APITimeoutError, RateLimitError
+from perplexity_cli.gateway import create_app, error_status, parse_request
+
+
+def _upstream(calls):
+    """Build a handler that answers like the chat completions endpoint and counts calls."""
+    async def completions(request):
+        body = await request.json()
+        calls.append(body)
+        if body["model"] == "bad":
+            return web.json_response({"error": {"message": "Invalid model"}}, status=400)
+        if body.get("stream"):
+            response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+            await response.prepare(request)
+            for word in ("Hello", " world"):
+                chunk = {"model": body["model"], "choices": [{"delta": {"content": word}}]}
+                await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            await response.write(b"data: [DONE]\n\n")
+            return response
+        await asyncio.sleep(0.05)
+        return web.json_response({
+            "model": body["model"],
+            "max_tokens": body["max_tokens"],
+            "choices": [{"message": {"content": body["messages"][-1]["content"]}}],
+        })
+
+    return completions
+
+
+def _run(test, **client_args):
+    """Run a test coroutine against a gateway in front of a local upstream server."""
+    async def runner():
+        calls = []
+        upstream_app = web.Application()
+        upstream_app.router.add_post("/chat/completions", _upstream(calls))
+        upstream = TestServer(upstream_app)
+        await upstream.start_server()
+        client = AsyncPerplexityClient(api_key="test_key",
+                                       base_url=str(upstream.make_url("/chat/completions")),
+                                       **client_args)
+        gateway = TestServer(create_app(client, "sonar", 100))
+        await gateway.start_server()
+        try:
+            async with aiohttp.ClientSession() as session:
+                await test(session, str(gateway.make_url("")), calls)
+        finally:
+            await gateway.close()
+            await upstream.close()
+
+    asyncio.run(runner())
+
+
+def test_parse_request():
+    """Test validating request bodies and filling in the defaults."""
+    messages = [{"role": "user", "content": "hi", "name": "ignored"}]
+    assert parse_request({"messages": messages}, "sonar", 100) == \
+        ("sonar", 100, [{"role": "user", "content": "hi"}], False)
+    assert parse_request({"model": "sonar-pro", "max_tokens": 5, "messages": messages,
+                          "stream": True}, "sonar", 100)[::3] == ("sonar-pro", True)
+
+    # Check the rejected bodies
+    for body in ([], {"messages": []}, {"messages": [{"role": "tool", "content": "x"}]},
+                 {"messages": messages, "max_tokens": 0},
+                 {"messages": messages, "stream": "yes"}):
+        with pytest.raises(ValueError):
+            parse_request(body, "sonar", 100)
+
+
+def test_error_status():
+    """Test the HTTP status upstream failures are reported with."""
+    assert error_status(RateLimitError(429, "Slow down")) == 429
+    assert error_status(APITimeoutError("timed out")) == 504
+    assert error_status(APIConnectionError("refused")) == 502
+
+
+def test_gateway_coalesces_concurrent_requests():
+    """Test that identical concurrent requests from many callers share one upstream call."""
+    async def test(session, url, calls):
+        body = {"messages": [{"role": "user", "content": "question"}]}
+
+        async def ask():
+            async with session.post(url + "/v1/chat/completions", json=body) as response:
+                assert response.status == 200
+                return await response.json()
+
+        # Send the same request from several callers at once
+        responses = await asyncio.gather(*(ask() for _ in range(10)))
+
+        # Check the answers and the single upstream call
+        assert all(response["choices"][0]["message"]["content"] == "question"
+                   for response in responses)
+        assert responses[0]["model"] == "sonar"
+        assert len(calls) == 1
+
+    _run(test)
+
+
+def test_gateway_cache(tmp_path):
+    """Test that a repeated request is answered from the shared cache."""
+    cache = ResponseCache(tmp_path / "cache.db")
+
+    async def test(session, url, calls):
+        body = {"model": "sonar-pro", "max_tokens": 50,
+                "messages": [{"role": "user", "content": "question"}]}
+        for _ in range(3):
+            async with session.post(url + "/v1/chat/completions", json=body) as response:
+                assert (await response.json())["max_tokens"] == 50
+        assert len(calls) == 1
+
+    try:
+        _run(test, cache=cache)
+    finally:
+        cache.close()
+
+
+def test_gateway_stream():
+    """Test that streamed chunks are relayed as server-sent events."""
+    async def test(session, url, calls):
+        body = {"messages": [{"role": "user", "content": "question"}], "stream": True}
+        async with session.post(url + "/v1/chat/completions", json=body) as response:
+            assert response.headers["Content-Type"] == "text/event-stream"
+            events = [line.decode().strip() async for line in response.content
+                      if line.strip()]
+
+        # Check the chunks and the end marker
+        assert [json.loads(event[6:])["choices"][0]["delta"]["content"]
+                for event in events[:-1]] == ["Hello", " world"]
+        assert events[-1] == "data: [DONE]"
+        assert calls[0]["stream"] is True
+
+    _run(test)
+
+
+def test_gateway_coalesces_concurrent_streams():
+    """Test that identical concurrent streams from many callers share one upstream call."""
+    async def test(session, url, calls):
+        body = {"messages": [{"role": "user", "content": "question"}], "stream": True}
+
+        async def ask():
+            async with session.post(url + "/v1/chat/completions", json=body) as response:
+                return [line async for line in response.content if line.strip()]
+
+        # Send the same streaming request from several callers at once
+        streams = await asyncio.gather(*(ask() for _ in range(5)))
+
+        # Check every caller got the whole stream from one upstream call
+        assert all(len(events) == 3 and events == streams[0] for events in streams)
+        assert len(calls) == 1
+
+    _run(test)
+
+
+def test_gateway_errors():
+    """Test that invalid requests and upstream failures get OpenAI-style errors."""
+    async def test(session, url, calls):
+        async with session.post(url + "/v1/chat/completions", data=b"not json") as response:
+            assert response.status == 400
+            assert (await response.json())["error"]["type"] == "invalid_request_error"
+
+        # Check that the upstream status is passed on, for completions and streams
+        for stream in (False, True):
+            body = {"model": "bad", "messages": [{"role": "user", "content": "x"}],
+                    "stream": stream}
+            async with session.post(url + "/v1/chat/completions", json=body) as response:
+                assert response.status == 400
+                assert "Invalid model" in (await response.json())["error"]["message"]
+
+        # Check the model list
+        async with session.get(url + "/v1/models") as response:
+            assert "sonar" in [model["id"] for model in (await response.json())["data"]]
+
+    _run(test)
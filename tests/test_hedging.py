@@ -0,0 +1,305 @@
+"""
+Tests for the hedging module.
+"""
+
+import asyncio
+import json
+import multiprocessing
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from perplexity_cli.client import PerplexityClient
+from perplexity_cli.hedging import HedgePolicy
+from perplexity_cli.tokens import TokenCalibrator
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "benchmarks"))
+
+from mock_server import MockPerplexityServer  # noqa: E402
+
+
+def make_policy(samples=20, latency=0.01, **options):
+    """Create an in-memory policy that has seen ``samples`` latencies."""
+    options.setdefault("max_ratio", 1.0)
+    policy = HedgePolicy(persist=False, **options)
+    for _ in range(samples):
+        policy.observe("sonar", latency)
+        policy.observe("sonar", latency, stream=True)
+    return policy
+
+
+def speed_up_after_first_request(server):
+    """Make every request after the first one fast."""
+    def watch():
+        while server.requests < 1:
+            time.sleep(0.001)
+        server.latency = 0
+
+    threading.Thread(target=watch, daemon=True).start()
+
+
+def test_delay_percentile():
+    """Test the hedging delay is a percentile of recent latencies."""
+    policy = HedgePolicy(percentile=0.9, min_samples=10, min_delay=0, persist=False)
+
+    # Check nothing is hedged before enough latencies are known
+    for latency in range(1, 10):
+        policy.observe("sonar", latency / 10)
+    assert policy.delay("sonar") is None
+
+    # Check the percentile once they are
+    policy.observe("sonar", 1.0)
+    assert policy.delay("sonar") == 1.0
+    assert policy.delay("sonar", stream=True) is None
+
+
+def test_state_persisted(tmp_path):
+    """Test that latencies survive between policies sharing a state file."""
+    path = tmp_path / "hedge.json"
+    policy = HedgePolicy(min_samples=1, min_delay=0, path=path)
+
+    # Call the function
+    policy.observe("sonar", 0.25)
+
+    # Check a new policy starts from the saved latencies
+    assert HedgePolicy(min_samples=1, min_delay=0, path=path).delay("sonar") == 0.25
+
+
+def test_state_saves_throttled(tmp_path):
+    """Test that the state file is not rewritten for every latency."""
+    path = tmp_path / "hedge.json"
+    policy = HedgePolicy(min_samples=1, min_delay=0, path=path)
+
+    # Call the function several times
+    for latency in (0.1, 0.2, 0.3):
+        policy.observe("sonar", latency)
+
+    # Check only the first latency was written until the flush
+    assert json.loads(path.read_text())["latencies"]["sonar"] == [0.1]
+    policy.flush()
+    assert json.loads(path.read_text())["latencies"]["sonar"] == [0.1, 0.2, 0.3]
+
+
+def _run_requests(path):
+    """Send requests through a policy of its own from a separate process."""
+    policy = HedgePolicy(path=path)
+    for _ in range(20):
+        policy.run("sonar", lambda hedged: "ok")
+    policy.flush()
+
+
+def test_state_merged_across_processes(tmp_path):
+    """Test that concurrent processes never lose each other's request counts."""
+    path = tmp_path / "hedge.json"
+
+    # Send requests from several processes at once
+    processes = [multiprocessing.Process(target=_run_requests, args=(path,)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    # Check that every request and latency was counted
+    assert all(process.exitcode == 0 for process in processes)
+    state = json.loads(path.read_text())
+    assert state["requests"] == 80
+    assert len(state["latencies"]["sonar"]) == 80
+
+
+def test_run_hedge_wins():
+    """Test that a slow request is hedged and the faster duplicate is used."""
+    policy = make_policy()
+    discarded = []
+
+    def call(hedged):
+        if not hedged:
+            time.sleep(0.3)
+        return "hedge" if hedged else "primary"
+
+    # Call the function
+    result = policy.run("sonar", call, discard=discarded.append)
+
+    # Check the hedge won and the primary was released once it finished
+    assert result == "hedge"
+    time.sleep(0.4)
+    assert discarded == ["primary"]
+    stats = policy.stats()
+    assert stats["hedged"] == 1
+    assert stats["hedge_won"] == 1
+
+
+def test_run_fast_request_not_hedged():
+    """Test that a request answered before the delay is not hedged."""
+    policy = make_policy(latency=0.2)
+    calls = []
+
+    # Call the function
+    result = policy.run("sonar", lambda hedged: calls.append(hedged) or "ok")
+
+    # Check only the primary request was sent
+    assert result == "ok"
+    assert calls == [False]
+    assert policy.stats()["hedged"] == 0
+
+
+def test_run_ratio_cap():
+    """Test that no more than the allowed share of requests is hedged."""
+    policy = make_policy(max_ratio=0.0)
+    calls = []
+
+    def call(hedged):
+        calls.append(hedged)
+        time.sleep(0.1)
+        return "primary"
+
+    # Call the function
+    result = policy.run("sonar", call)
+
+    # Check the slow request waited for the primary
+    assert result == "primary"
+    assert calls == [False]
+    assert policy.stats()["capped"] == 1
+
+
+def test_run_ratio_cap_across_invocations(tmp_path):
+    """Test that the ratio cap holds across policies sharing a state file."""
+    path = tmp_path / "hedge.json"
+
+    def slow(hedged):
+        if not hedged:
+            time.sleep(0.05)
+        return "hedge" if hedged else "primary"
+
+    # Warm up the latencies with fast requests
+    policy = HedgePolicy(max_ratio=0.1, min_samples=10, min_delay=0, path=path)
+    for _ in range(10):
+        policy.run("sonar", lambda hedged: "ok")
+    policy.flush()
+
+    # Send one slow request per invocation, as one-shot CLI calls would
+    hedged = 0
+    for _ in range(10):
+        policy = HedgePolicy(max_ratio=0.1, min_samples=10, min_delay=0, path=path)
+        policy.run("sonar", slow)
+        policy.flush()
+        hedged += policy.stats()["hedged"]
+
+    # Check that at most a tenth of all requests were hedged
+    assert 1 <= hedged <= 2
+
+
+def test_run_records_abandoned_primary():
+    """Test that the latency of a primary that lost to its hedge is still recorded."""
+    policy = make_policy(percentile=0.99)
+
+    def call(hedged):
+        if not hedged:
+            time.sleep(0.2)
+        return "hedge" if hedged else "primary"
+
+    # Call the function
+    assert policy.run("sonar", call) == "hedge"
+
+    # Check the slow primary reached the window once it finished
+    assert policy.delay("sonar") < 0.2
+    time.sleep(0.3)
+    assert policy.delay("sonar") >= 0.2
+
+
+def test_run_primary_error_uses_hedge():
+    """Test that the hedge answers when the slow primary fails."""
+    policy = make_policy()
+
+    def call(hedged):
+        if hedged:
+            time.sleep(0.1)
+            return "hedge"
+        time.sleep(0.1)
+        raise ValueError("primary failed")
+
+    # Call the function
+    result = policy.run("sonar", call)
+
+    # Check the result
+    assert result == "hedge"
+
+
+def test_run_async_cancels_loser():
+    """Test that the losing request is cancelled on the event loop."""
+    policy = make_policy()
+    cancelled = []
+
+    async def call(hedged):
+        if hedged:
+            return "hedge"
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+        return "primary"
+
+    async def run():
+        result = await policy.run_async("sonar", call)
+        await asyncio.sleep(0)
+        return result
+
+    # Call the function
+    result = asyncio.run(run())
+
+    # Check the result
+    assert result == "hedge"
+    assert cancelled == [True]
+
+
+def test_invalid_percentile():
+    """Test that a percentile outside (0, 1) is rejected."""
+    with pytest.raises(ValueError):
+        HedgePolicy(percentile=95, persist=False)
+
+
+def test_client_complete_hedged():
+    """Test that the client answers a slow completion from the hedged request."""
+    server = MockPerplexityServer(latency=1.0, jitter=0, chunks=3, chunk_interval=0).start()
+    policy = make_policy()
+    speed_up_after_first_request(server)
+
+    # Call the function
+    try:
+        with PerplexityClient(api_key="test_key", base_url=server.url, hedge=policy,
+                              calibrator=TokenCalibrator(persist=False)) as client:
+            started = time.perf_counter()
+            response = client.complete("sonar", 100, "Test query")
+            elapsed = time.perf_counter() - started
+    finally:
+        server.stop()
+
+    # Check the hedged request answered first
+    assert response["usage"]["completion_tokens"] == 3
+    assert elapsed < 0.9
+    assert policy.stats()["hedge_won"] == 1
+
+
+def test_client_stream_hedged():
+    """Test that a stream whose first chunk is slow is hedged."""
+    server = MockPerplexityServer(latency=1.0, jitter=0, chunks=3, chunk_interval=0).start()
+    policy = make_policy()
+    speed_up_after_first_request(server)
+
+    # Call the function
+    try:
+        with PerplexityClient(api_key="test_key", base_url=server.url, hedge=policy,
+                              calibrator=TokenCalibrator(persist=False)) as client:
+            started = time.perf_counter()
+            chunks = list(client.stream("sonar", 100, "Test query"))
+            elapsed = time.perf_counter() - started
+    finally:
+        server.stop()
+
+    # Check every chunk came from the hedged stream
+    assert len(chunks) == 3
+    assert elapsed < 0.9
+    assert policy.stats()["hedge_won"] == 1
@@ -0,0 +1,103 @@
+"""
+Tests for the jobs module.
+"""
+
+import pytest
+
+from perplexity_cli.jobs import JobStore, MANIFEST_RECORD
+
+
+def _result(item, error=None):
+    """Build the result of a batch item."""
+    result = {"index": item["index"], "id": item["id"], "query": item["query"]}
+    if error:
+        result["error"] = error
+    else:
+        result["response"] = {"answer": item["query"].upper()}
+    return result
+
+
+def _job(tmp_path, lines):
+    """Create a job over an input file with the given lines."""
+    input_file = tmp_path / "queries.txt"
+    input_file.write_text("".join(line + "\n" for line in lines))
+    return JobStore(tmp_path / "jobs").create("work", str(input_file), "sonar", 100)
+
+
+def test_job_resume_skips_done_items(tmp_path):
+    """Test that a resumed job runs only its pending and failed items."""
+    job = _job(tmp_path, ["q0", "q1", "", "q2", "q3", "q4"])
+
+    # Run the first three items, one failing, then stop as if interrupted
+    items = job.items()
+    for item in (next(items), next(items), next(items)):
+        job.record(_result(item, error="boom" if item["index"] == 1 else None))
+    job.close()
+
+    # Check that resuming runs the failed item and the pending ones
+    resumed = JobStore(tmp_path / "jobs").open("work")
+    assert resumed.counts() == {"done": 2, "failed": 1}
+    items = list(resumed.items())
+    assert [item["query"] for item in items] == ["q1", "q3", "q4"]
+    assert items[1]["index"] == 3
+    for item in items:
+        resumed.record(_result(item))
+    resumed.close()
+
+    # Check that the latest result of every item is kept, in input order
+    results = list(JobStore(tmp_path / "jobs").open("work").results())
+    assert [result["response"]["answer"] for result in results] == ["Q0", "Q1", "Q2", "Q3", "Q4"]
+    assert list(JobStore(tmp_path / "jobs").open("work").items()) == []
+
+
+def test_job_flushes_in_groups(tmp_path, monkeypatch):
+    """Test that checkpoints reach the disk in groups and that a torn record is dropped."""
+    monkeypatch.setattr("perplexity_cli.jobs.FSYNC_EVERY", 2)
+    monkeypatch.setattr("perplexity_cli.jobs.FSYNC_INTERVAL", 3600)
+    job = _job(tmp_path, ["q0", "q1", "q2"])
+
+    # Record three results without closing, as if the process died
+    for item in job.checkpoint(_result(item) for item in job.items()):
+        pass
+
+    # Check that only the first group is durable
+    assert job.manifest_path.stat().st_size == 2 * MANIFEST_RECORD.size
+
+    # Check that a partial record is dropped and its item runs again
+    with open(job.manifest_path, "ab") as f:
+        f.write(b"\x02\x00")
+    resumed = JobStore(tmp_path / "jobs").open("work")
+    assert [item["query"] for item in resumed.items()] == ["q2"]
+    assert resumed.manifest_path.stat().st_size == 2 * MANIFEST_RECORD.size
+
+
+def test_job_reruns_changed_items(tmp_path):
+    """Test that an item whose input line changed is run again."""
+    job = _job(tmp_path, ["q0", "q1", "q2"])
+    items = list(job.items())
+    for item in (items[0], items[2]):
+        job.record(_result(item))
+    job.close()
+
+    # Change a finished item after the first unfinished one
+    job.input_path.write_text("q0\nq1\nchanged\n")
+
+    # Check that it runs again along with the pending item
+    resumed = JobStore(tmp_path / "jobs").open("work")
+    assert [item["query"] for item in resumed.items()] == ["q1", "changed"]
+
+
+def test_job_store_names(tmp_path):
+    """Test creating, listing and opening jobs."""
+    job = _job(tmp_path, ["q0"])
+    store = JobStore(tmp_path / "jobs")
+
+    # Check the stored job and the errors for bad names
+    assert store.names() == ["work"]
+    assert store.open("work").settings["model"] == "sonar"
+    with pytest.raises(ValueError):
+        store.create("work", str(job.input_path), "sonar", 100)
+    with pytest.raises(ValueError):
+        store.open("missing")
+    with pytest.raises(ValueError):
+        store.open("../escape")
@@ -0,0 +1,130 @@
+"""
+Tests for the keypool module.
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+from perplexity_cli.client import PerplexityClient
+from perplexity_cli.exceptions import AuthenticationError, RateLimitError, ServerError
+from perplexity_cli.keypool import KeyPool, key_label
+from perplexity_cli.tokens import TokenCalibrator
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "benchmarks"))
+
+from mock_server import MockPerplexityServer  # noqa: E402
+
+
+def test_requests_spread_over_keys():
+    """Test that requests are spread evenly over healthy keys."""
+    pool = KeyPool(["key_aaaa", "key_bbbb", "key_aaaa"])
+    used = []
+
+    # Call the function
+    for _ in range(4):
+        pool.call(lambda api_key: used.append(api_key))
+
+    # Check the keys took turns
+    assert pool.keys == ["key_aaaa", "key_bbbb"]
+    assert sorted(used) == ["key_aaaa", "key_aaaa", "key_bbbb", "key_bbbb"]
+    assert pool.stats()[key_label("key_aaaa")]["share"] == 0.5
+
+
+def test_rate_limited_key_ejected():
+    """Test that a rate limited key is ejected and the request moves on."""
+    pool = KeyPool(["key_aaaa", "key_bbbb"])
+    used = []
+
+    def send(api_key):
+        used.append(api_key)
+        if api_key == "key_aaaa":
+            raise RateLimitError(429, "Too many requests", 20.0)
+        return "ok"
+
+    # Call the function
+    results = [pool.call(send) for _ in range(3)]
+
+    # Check the ejected key was not used again
+    assert results == ["ok", "ok", "ok"]
+    assert used.count("key_aaaa") == 1
+    stats = pool.stats()[key_label("key_aaaa")]
+    assert stats["rate_limited"] == 1
+    assert 0 < stats["ejected_for"] <= 20
+
+
+def test_every_key_rejected():
+    """Test that the error is raised once every key was rejected."""
+    pool = KeyPool(["key_aaaa", "key_bbbb"])
+
+    def send(api_key):
+        raise AuthenticationError(401, "Invalid API key")
+
+    # Call the function and check the error
+    with pytest.raises(AuthenticationError):
+        pool.call(send)
+    assert all(stats["rejected"] == 1 for stats in pool.stats().values())
+
+
+def test_other_errors_do_not_eject():
+    """Test that server errors are left to the retry policy."""
+    pool = KeyPool(["key_aaaa", "key_bbbb"])
+
+    def send(api_key):
+        raise ServerError(500, "Internal error")
+
+    # Call the function and check the error
+    with pytest.raises(ServerError):
+        pool.call(send)
+    assert all(stats["ejected_for"] == 0 for stats in pool.stats().values())
+
+
+def test_key_with_most_budget_chosen(tmp_path):
+    """Test that the key with the most budget left is used."""
+    pool = KeyPool(["key_aaaa", "key_bbbb"], requests_per_minute=10, data_dir=tmp_path)
+
+    # Use up part of the first key's budget
+    for _ in range(3):
+        pool.acquire(exclude={"key_bbbb"})
+
+    # Check the next requests go to the other key
+    assert pool.acquire() == "key_bbbb"
+    assert pool.stats()[key_label("key_aaaa")]["available"] < 1
+
+
+def test_call_async_failover():
+    """Test that the async call moves on to another key."""
+    pool = KeyPool(["key_aaaa", "key_bbbb"])
+
+    async def send(api_key):
+        if api_key == "key_aaaa":
+            raise RateLimitError(429, "Too many requests")
+        return api_key
+
+    # Call the function
+    result = asyncio.run(pool.call_async(send))
+
+    # Check the other key answered
+    assert result == "key_bbbb"
+
+
+def test_client_with_key_pool():
+    """Test that the client sends requests with the pooled keys."""
+    server = MockPerplexityServer(latency=0, jitter=0, chunks=3, chunk_interval=0).start()
+    pool = KeyPool(["key_aaaa", "key_bbbb"])
+
+    # Call the function
+    try:
+        with PerplexityClient(base_url=server.url, key_pool=pool,
+                              calibrator=TokenCalibrator(persist=False)) as client:
+            client.complete("sonar", 100, "First query")
+            list(client.stream("sonar", 100, "Second query"))
+    finally:
+        server.stop()
+
+    # Check both keys were used and their usage recorded
+    stats = pool.stats()
+    assert [stats[key_label(key)]["requests"] for key in pool.keys] == [1, 1]
+    assert all(entry["tokens"] > 0 for entry in stats.values())
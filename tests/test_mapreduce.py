@@ -0,0 +1,113 @@
+"""
+Tests for the mapreduce module.
+"""
+
+import threading
+import time
+
+import pytest
+
+from perplexity_cli.mapreduce import chunk_text, map_reduce, read_lines, NO_ANSWER
+from perplexity_cli.tokens import estimate_text_tokens
+
+
+def _response(content):
+    """Build a response holding one answer."""
+    return {"choices": [{"message": {"content": content}}]}
+
+
+class FakeClient:
+    """Answer map prompts with the excerpt's first word and reduce prompts with a join."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.prompts = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def complete(self, model, max_tokens, query):
+        with self._lock:
+            self.prompts.append(query)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self._lock:
+            self.in_flight -= 1
+        if "Excerpt:\n" in query:
+            words = query.split("Excerpt:\n", 1)[1].split()
+            return _response(words[0] if words[0] != "noise" else NO_ANSWER)
+        parts = [line for line in query.splitlines()[4:] if line and not line.startswith("Part ")]
+        return _response("+".join(parts))
+
+
+def test_chunk_text_sizes_and_overlap():
+    """Test that chunks stay within budget and overlap their neighbours."""
+    lines = [f"line {i} " + "word " * 20 + "\n" for i in range(200)]
+
+    # Call the function
+    chunks = list(chunk_text(lines, chunk_tokens=300, overlap_tokens=40))
+
+    # Check the budget, the overlap and that every line is covered
+    assert len(chunks) > 5
+    assert all(estimate_text_tokens(chunk) <= 300 for chunk in chunks)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk.splitlines()[0] in previous
+    assert all(any(line in chunk for chunk in chunks) for line in lines)
+
+
+def test_chunk_text_splits_long_lines():
+    """Test that a line longer than a chunk is split."""
+    line = "word " * 5000
+
+    # Call the function
+    chunks = list(chunk_text([line], chunk_tokens=500, overlap_tokens=0))
+
+    # Check that the pieces add up to the line and fit the budget
+    assert "".join(chunks) == line
+    assert all(estimate_text_tokens(chunk) <= 500 for chunk in chunks)
+    with pytest.raises(ValueError):
+        chunk_text([line], chunk_tokens=100, overlap_tokens=50)
+
+
+def test_read_lines(tmp_path):
+    """Test reading a memory-mapped document, including an empty one."""
+    document = tmp_path / "doc.txt"
+    document.write_bytes("first\nsécond\n".encode("utf-8"))
+    empty = tmp_path / "empty.txt"
+    empty.write_bytes(b"")
+
+    # Check the lines
+    assert list(read_lines(str(document))) == ["first\n", "sécond\n"]
+    assert list(read_lines(str(empty))) == []
+
+
+def test_map_reduce_tree():
+    """Test that chunks are mapped concurrently and reduced in a tree, in document order."""
+    client = FakeClient(delay=0.02)
+    chunks = [f"c{i} text" if i % 3 else "noise text" for i in range(24)]
+
+    # Call the function with a reduce budget that pairs up the answers
+    response = map_reduce(client, "sonar", 100, "question", chunks, concurrency=8,
+                          reduce_tokens=1)
+
+    # Check the answer, the dropped chunks and the concurrency
+    answer = response["choices"][0]["message"]["content"]
+    assert answer.split("+") == [f"c{i}" for i in range(24) if i % 3]
+    assert len([prompt for prompt in client.prompts if "Excerpt:" in prompt]) == 24
+    assert len(client.prompts) == 24 + 8 + 4 + 2 + 1
+    assert client.max_in_flight == 8
+
+
+def test_map_reduce_single_chunk():
+    """Test that one chunk needs no reduce request, and that empty input fails."""
+    client = FakeClient()
+
+    # Call the function
+    response = map_reduce(client, "sonar", 100, "question", ["only chunk"])
+
+    # Check the answer
+    assert response["choices"][0]["message"]["content"] == "only"
+    assert len(client.prompts) == 1
+    with pytest.raises(ValueError):
+        map_reduce(client, "sonar", 100, "question", [])
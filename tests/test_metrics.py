@@ -0,0 +1,157 @@
+"""
+Tests for the metrics module.
+"""
+
+import io
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+from perplexity_cli.client import PerplexityClient
+from perplexity_cli.exceptions import ServerError
+from perplexity_cli.metrics import MetricsRegistry, MetricsReporter, RequestMetrics
+from perplexity_cli.retry import RetryPolicy
+from perplexity_cli.tokens import TokenCalibrator
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "benchmarks"))
+
+from mock_server import MockPerplexityServer  # noqa: E402
+
+
+@pytest.fixture
+def server():
+    """Serve the mock API for one test."""
+    server = MockPerplexityServer(latency=0.01, jitter=0, chunks=3, chunk_interval=0).start()
+    yield server
+    server.stop()
+
+
+def make_client(server, **options):
+    """Create a client for the mock server that collects measurements."""
+    collected = []
+    client = PerplexityClient(api_key="test_key", base_url=server.url,
+                              calibrator=TokenCalibrator(persist=False),
+                              on_metrics=collected.append, **options)
+    return client, collected
+
+
+def test_complete_metrics(server):
+    """Test the measurements of a completion over a new and a reused connection."""
+    client, collected = make_client(server)
+
+    # Call the function twice
+    with client:
+        client.complete("sonar", 100, "Test query")
+        client.complete("sonar", 100, "Test query")
+
+    # Check the first request opened a connection
+    first, second = collected
+    assert first.status == 200
+    assert first.attempts == 1
+    assert not first.connection_reused
+    assert first.connect_ms > 0
+    assert first.server_ms >= 5
+    assert first.bytes_sent > 0 and first.bytes_received > 0
+    assert first.prompt_tokens > 0 and first.completion_tokens == 3
+    assert first.total_ms >= first.dns_ms + first.connect_ms + first.server_ms
+
+    # Check the second request reused it
+    assert second.connection_reused
+    assert second.connect_ms == 0
+
+
+def test_stream_metrics(server):
+    """Test the measurements of a streamed completion."""
+    client, collected = make_client(server)
+
+    # Call the function
+    with client:
+        chunks = list(client.stream("sonar", 100, "Test query"))
+
+    # Check the measurements
+    metrics = collected[0]
+    assert len(chunks) == 3
+    assert metrics.stream
+    assert metrics.ttft_ms is not None and metrics.ttft_ms <= metrics.total_ms
+    assert metrics.bytes_received > 0
+    assert metrics.completion_tokens == 3
+
+
+def test_failed_request_metrics(server):
+    """Test that retries and the final error are recorded."""
+    server.error_rate = 1.0
+    client, collected = make_client(server, retry_policy=RetryPolicy(
+        max_attempts=2, base_delay=0, max_delay=0))
+
+    # Call the function
+    with client, pytest.raises(Exception):
+        client.complete("sonar", 100, "Test query")
+
+    # Check the measurements
+    metrics = collected[0]
+    assert metrics.attempts == 2
+    assert metrics.retries == 1
+    assert metrics.status in (429, 500)
+    assert metrics.error in ("RateLimitError", "ServerError")
+
+
+def test_metrics_off_by_default(server):
+    """Test that no measurements are made without a callback."""
+    # Call the function
+    with PerplexityClient(api_key="test_key", base_url=server.url,
+                          calibrator=TokenCalibrator(persist=False)) as client:
+        response = client.complete("sonar", 100, "Test query")
+
+    # Check the request still succeeded
+    assert response["usage"]["completion_tokens"] == 3
+
+
+def test_registry_textfile(tmp_path):
+    """Test that counters accumulate across registries sharing a textfile."""
+    path = tmp_path / "perplexity.prom"
+    ok = RequestMetrics("sonar")
+    ok.start_attempt()
+    ok.status = 200
+    ok.set_usage({"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15})
+    ok.finish()
+    failed = RequestMetrics("sonar")
+    failed.start_attempt()
+    failed.start_attempt()
+    failed.finish(ServerError(500, "Internal error"))
+
+    # Write from two "processes"
+    for metrics in (ok, failed):
+        registry = MetricsRegistry(path)
+        registry.observe(metrics)
+        registry.flush()
+
+    # Check the textfile
+    text = path.read_text()
+    assert '# TYPE perplexity_cli_requests_total counter' in text
+    assert 'perplexity_cli_requests_total{model="sonar",status="200"} 1' in text
+    assert 'perplexity_cli_requests_total{model="sonar",status="500"} 1' in text
+    assert 'perplexity_cli_retries_total{model="sonar"} 1' in text
+    assert 'perplexity_cli_request_duration_seconds_count{model="sonar"} 2' in text
+    assert 'perplexity_cli_request_duration_seconds_bucket{model="sonar",le="+Inf"} 2' in text
+    assert 'perplexity_cli_tokens_total{model="sonar",kind="prompt"} 10' in text
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_reporter_json_line():
+    """Test that the reporter prints one JSON object per request."""
+    out = io.StringIO()
+    reporter = MetricsReporter("json", out=out)
+    metrics = RequestMetrics("sonar")
+    metrics.cached = True
+    metrics.finish()
+
+    # Call the function
+    reporter(metrics)
+
+    # Check the output
+    line = json.loads(out.getvalue())
+    assert line["event"] == "request"
+    assert line["model"] == "sonar"
+    assert line["cached"] is True
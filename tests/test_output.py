@@ -0,0 +1,64 @@
+"""
+Tests for the output module.
+"""
+
+import io
+import json
+
+from perplexity_cli.output import print_content, write_chunks, write_json, write_raw
+
+
+RESPONSE = {
+    "model": "sonar",
+    "choices": [{"message": {"role": "assistant", "content": "Test content"}}],
+    "usage": {"total_tokens": 3},
+}
+
+
+def test_write_raw_json():
+    """Test that JSON output is the body exactly as received."""
+    out = io.BytesIO()
+    body = b'{"model": "sonar",  "choices": []}'
+
+    # Call the function
+    write_raw(body, "json", out)
+
+    # Check the output
+    assert out.getvalue() == body + b"\n"
+
+
+def test_write_raw_jsonl_compacts_multiline_body():
+    """Test that a pretty-printed body is put on one line for JSONL."""
+    out = io.BytesIO()
+
+    # Call the function with a multi-line body
+    write_raw(json.dumps(RESPONSE, indent=2).encode("utf-8"), "jsonl", out)
+
+    # Check the output
+    lines = out.getvalue().splitlines()
+    assert len(lines) == 1
+    assert json.loads(lines[0]) == RESPONSE
+
+
+def test_write_json_and_chunks():
+    """Test writing decoded responses and chunks as JSON lines."""
+    out = io.BytesIO()
+
+    # Call the functions
+    write_json(RESPONSE, "jsonl", out)
+    write_chunks([{"n": 1}, {"n": 2}], out)
+
+    # Check the output
+    assert [json.loads(line) for line in out.getvalue().splitlines()] == [
+        RESPONSE, {"n": 1}, {"n": 2}]
+
+
+def test_print_content():
+    """Test printing only the answer."""
+    out = io.StringIO()
+
+    # Call the function
+    print_content(RESPONSE, out)
+
+    # Check the output
+    assert out.getvalue() == "Test content\n"
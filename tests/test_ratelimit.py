@@ -0,0 +1,159 @@
+"""
+Tests for the rate limit module.
+"""
+
+import asyncio
+import multiprocessing
+import threading
+import time
+from unittest import mock
+
+import pytest
+
+from perplexity_cli.ratelimit import RateLimiter, estimate_request_tokens
+from perplexity_cli.tokens import estimate_prompt_tokens
+
+
+def test_estimate_request_tokens():
+    """Test estimating prompt plus completion tokens."""
+    messages = [{"role": "user", "content": "x" * 400}]
+
+    # Check the estimate
+    assert estimate_request_tokens(messages, 100) == estimate_prompt_tokens(messages) + 100
+
+
+def test_try_acquire_requests(tmp_path):
+    """Test the requests-per-minute bucket."""
+    limiter = RateLimiter(requests_per_minute=2, path=tmp_path / "state.json")
+
+    # The first two requests go ahead, the third must wait ~30s
+    assert limiter.try_acquire() == 0.0
+    assert limiter.try_acquire() == 0.0
+    wait = limiter.try_acquire()
+    assert 29 < wait <= 30
+
+
+def test_try_acquire_tokens(tmp_path):
+    """Test the tokens-per-minute bucket."""
+    limiter = RateLimiter(tokens_per_minute=600, path=tmp_path / "state.json")
+
+    # Take most of the bucket, then ask for more than is left
+    assert limiter.try_acquire(500) == 0.0
+    wait = limiter.try_acquire(200)
+    assert 9 < wait <= 10
+
+
+def test_record_usage_refunds(tmp_path):
+    """Test that overestimates are refunded."""
+    limiter = RateLimiter(tokens_per_minute=600, path=tmp_path / "state.json")
+    limiter.try_acquire(500)
+
+    # Refund the unused estimate
+    limiter.record_usage(500, 100)
+
+    # The bucket is nearly full again
+    assert limiter.try_acquire(450) == 0.0
+
+
+def test_acquire_waits(tmp_path):
+    """Test that acquire sleeps until budget is available."""
+    limiter = RateLimiter(requests_per_minute=60, path=tmp_path / "state.json")
+    drain(limiter)
+
+    # Call the function with sleep mocked
+    with mock.patch('perplexity_cli.ratelimit.time.sleep') as mock_sleep:
+        mock_sleep.side_effect = lambda seconds: time_travel(limiter, seconds)
+        waited = limiter.acquire()
+
+    assert waited > 0
+    mock_sleep.assert_called()
+
+
+def drain(limiter):
+    """Empty every bucket."""
+    with limiter._state() as state:
+        for bucket in state.values():
+            bucket["level"] = 0.0
+
+
+def time_travel(limiter, seconds):
+    """Age the shared state as if time had passed."""
+    with limiter._state() as state:
+        for bucket in state.values():
+            bucket["updated"] -= seconds
+
+
+def test_acquire_async(tmp_path):
+    """Test waiting for budget on an event loop."""
+    limiter = RateLimiter(requests_per_minute=6000, path=tmp_path / "state.json")
+    drain(limiter)
+
+    # The next request becomes available after ~10ms
+    waited = asyncio.run(limiter.acquire_async())
+    assert 0 < waited < 1
+
+
+def test_acquire_async_does_not_block_loop(tmp_path):
+    """Test that a state file locked by another process does not stall the event loop."""
+    fcntl = pytest.importorskip("fcntl")
+    path = tmp_path / "state.json"
+    limiter = RateLimiter(requests_per_minute=60, path=path)
+
+    async def run():
+        ticks = []
+
+        async def tick():
+            while True:
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.01)
+
+        ticker = asyncio.ensure_future(tick())
+        await limiter.acquire_async()
+        ticker.cancel()
+        return ticks
+
+    # Hold the lock, as another process would, for a while
+    with open(path, "a+") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        releaser = threading.Timer(0.2, fcntl.flock, (f, fcntl.LOCK_UN))
+        releaser.start()
+        ticks = asyncio.run(run())
+        releaser.join()
+
+    # Check that the loop kept running while the lock was held
+    assert len(ticks) >= 5
+
+
+def _take(path, count, results):
+    """Take requests from a separate process."""
+    limiter = RateLimiter(requests_per_minute=30, path=path)
+    results.put(sum(1 for _ in range(count) if limiter.try_acquire() == 0.0))
+
+
+def test_shared_across_processes(tmp_path):
+    """Test that processes draw from one budget."""
+    path = tmp_path / "state.json"
+    results = multiprocessing.Queue()
+
+    # Three processes each try to take 20 requests of a 30/minute budget
+    processes = [multiprocessing.Process(target=_take, args=(path, 20, results))
+                 for _ in range(3)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    # Check that the budget was not exceeded
+    granted = sum(results.get() for _ in processes)
+    assert 30 <= granted <= 31
+
+
+def test_headroom(tmp_path):
+    """Test reporting the remaining budget."""
+    limiter = RateLimiter(requests_per_minute=10, path=tmp_path / "state.json")
+    limiter.try_acquire()
+
+    # Check the report
+    report = limiter.headroom()
+    assert report["requests"].startswith("9.")
+    assert report["tokens"] == "unlimited"
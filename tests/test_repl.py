@@ -0,0 +1,71 @@
+"""
+Tests for the REPL module.
+"""
+
+import io
+from unittest import mock
+
+from perplexity_cli.conversation import Conversation
+from perplexity_cli.exceptions import APIError
+from perplexity_cli.repl import run_repl
+
+
+def _chunks(*deltas):
+    """Build streamed chunks carrying the given deltas, with usage on the last."""
+    chunks = [{"choices": [{"delta": {"content": delta}}]} for delta in deltas]
+    chunks[-1]["usage"] = {"total_tokens": 7}
+    return chunks
+
+
+def test_run_repl_multi_turn():
+    """Test that follow-up questions are sent with the conversation history."""
+    # Set up mocks
+    client = mock.MagicMock()
+    sent = []
+
+    def stream(model, max_tokens, messages):
+        sent.append([m["content"] for m in messages])
+        return iter(_chunks("Hel", "lo"))
+
+    client.stream.side_effect = stream
+    lines = iter(["hi", "", "again", "/exit"])
+    out = io.StringIO()
+    conversation = Conversation(system_prompt="S")
+
+    # Call the function
+    result = run_repl(client, "sonar", 100, conversation, verbose=True,
+                      input_fn=lambda prompt: next(lines), out=out)
+
+    # Check the requests and the output
+    assert result == 0
+    assert sent == [["S", "hi"], ["S", "hi", "Hello", "again"]]
+    assert out.getvalue().count("Hello\n") == 2
+    assert "total_tokens: 7" in out.getvalue()
+    assert len(conversation) == 4
+
+
+def test_run_repl_error_and_commands():
+    """Test that a failed answer is dropped and commands are handled."""
+    # Set up mocks
+    client = mock.MagicMock()
+    client.stream.side_effect = APIError(500, "API call failed: 500")
+    lines = iter(["question", "/history", "/reset", "/help"])
+
+    def read(prompt):
+        try:
+            return next(lines)
+        except StopIteration:
+            raise EOFError
+
+    out = io.StringIO()
+    conversation = Conversation()
+
+    # Call the function
+    result = run_repl(client, "sonar", 100, conversation, input_fn=read, out=out)
+
+    # Check that the failed question was removed from the history
+    assert result == 0
+    assert len(conversation) == 0
+    assert "0 turns" in out.getvalue()
+    assert "Started a new conversation." in out.getvalue()
+    assert "/exit" in out.getvalue()
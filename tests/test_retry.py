@@ -0,0 +1,126 @@
+"""
+Tests for the retry module.
+"""
+
+import email.utils
+import time
+from unittest import mock
+
+import pytest
+
+from perplexity_cli.exceptions import (
+    APIError, RateLimitError, ServerError, DeadlineExceededError
+)
+from perplexity_cli.retry import RetryPolicy, RetryBudget, parse_retry_after
+
+
+def test_parse_retry_after():
+    """Test parsing Retry-After values."""
+    future = email.utils.formatdate(time.time() + 30, usegmt=True)
+
+    # Check seconds, dates and invalid values
+    assert parse_retry_after("5") == 5.0
+    assert 25 < parse_retry_after(future) <= 30
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_backoff_full_jitter():
+    """Test that backoff is bounded by the exponential cap."""
+    policy = RetryPolicy(base_delay=1, max_delay=5)
+
+    # Check the bounds for several attempts
+    for attempt, cap in ((1, 1), (2, 2), (3, 4), (4, 5), (10, 5)):
+        delays = [policy.backoff(attempt) for _ in range(50)]
+        assert all(0 <= delay <= cap for delay in delays)
+
+
+@mock.patch('perplexity_cli.retry.time.sleep')
+def test_call_retries_retryable_errors(mock_sleep):
+    """Test that retryable errors are retried up to the attempt limit."""
+    attempt_fn = mock.MagicMock(side_effect=ServerError(503, "Unavailable"))
+    policy = RetryPolicy(max_attempts=4, base_delay=0.01)
+
+    # Call the function and check that it raises the last error
+    with pytest.raises(ServerError):
+        policy.call(attempt_fn)
+
+    # Check the attempts and the timeouts passed to each one
+    assert attempt_fn.call_count == 4
+    assert mock_sleep.call_count == 3
+    attempt_fn.assert_called_with((10.0, 30.0))
+
+
+def test_call_does_not_retry_fatal_errors():
+    """Test that non-retryable errors are raised at once."""
+    attempt_fn = mock.MagicMock(side_effect=APIError(400, "Bad request"))
+
+    # Call the function and check that it raises the error
+    with pytest.raises(APIError):
+        RetryPolicy().call(attempt_fn)
+
+    assert attempt_fn.call_count == 1
+
+
+def test_call_deadline():
+    """Test that a Retry-After past the deadline ends the call."""
+    attempt_fn = mock.MagicMock(side_effect=RateLimitError(429, "Too many", retry_after=10))
+
+    # Call the function and check that the deadline is enforced
+    with pytest.raises(DeadlineExceededError):
+        RetryPolicy(deadline=1).call(attempt_fn)
+
+    assert attempt_fn.call_count == 1
+    connect_timeout, read_timeout = attempt_fn.call_args[0][0]
+    assert read_timeout <= 1
+
+
+def test_timeouts_carry_deadline():
+    """Test that each attempt's timeouts carry the deadline of the whole call."""
+    timeouts = RetryPolicy(deadline=0.05).timeouts(time.monotonic() + 0.05)
+
+    # Check the remaining time and that the deadline is enforced once it passes
+    assert 0 < timeouts.remaining() <= 0.05
+    timeouts.check()
+    time.sleep(0.06)
+    assert timeouts.remaining() == 0
+    with pytest.raises(DeadlineExceededError):
+        timeouts.check()
+
+    # Check that without a deadline nothing is enforced
+    timeouts = RetryPolicy().timeouts(None)
+    assert timeouts == (10.0, 30.0)
+    assert timeouts.remaining() is None
+    timeouts.check()
+
+
+@mock.patch('perplexity_cli.retry.time.sleep')
+def test_call_retry_after_capped(mock_sleep):
+    """Test that a Retry-After longer than the maximum delay is not waited out."""
+    attempt_fn = mock.MagicMock(side_effect=[RateLimitError(429, "Too many", retry_after=3600),
+                                             RateLimitError(429, "Too many", retry_after=2),
+                                             "ok"])
+
+    # Call the function and check that the long wait ends the call
+    with pytest.raises(RateLimitError):
+        RetryPolicy(max_delay=20).call(attempt_fn)
+    mock_sleep.assert_not_called()
+
+    # Check that a Retry-After within the cap is honoured
+    assert RetryPolicy(max_delay=20).call(attempt_fn) == "ok"
+    mock_sleep.assert_called_once_with(2)
+
+
+@mock.patch('perplexity_cli.retry.time.sleep')
+def test_retry_budget(mock_sleep):
+    """Test that an empty budget stops retries."""
+    budget = RetryBudget(ratio=0.5, min_tokens=1)
+    policy = RetryPolicy(max_attempts=5, budget=budget)
+    attempt_fn = mock.MagicMock(side_effect=ServerError(500, "Error"))
+
+    # Call the function; the budget allows a single retry
+    with pytest.raises(ServerError):
+        policy.call(attempt_fn)
+
+    assert attempt_fn.call_count == 2
+    assert budget.tokens == 0.5
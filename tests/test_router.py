@@ -0,0 +1,95 @@
+"""
+Tests for the router module.
+"""
+
+import time
+from unittest import mock
+
+import pytest
+
+from perplexity_cli.client import PerplexityClient
+from perplexity_cli.exceptions import ServerError
+from perplexity_cli.models import TIER_ADVANCED, TIER_BASIC, TIER_STANDARD
+from perplexity_cli.retry import RetryPolicy
+from perplexity_cli.router import ModelRouter
+
+
+def test_choose_from_catalog_latencies():
+    """Test choosing by cost and by latency before anything was measured."""
+    router = ModelRouter(persist=False)
+
+    # Check the cheapest model of each tier
+    assert router.choose(tier=TIER_BASIC) == "llama-3.1-sonar-small-128k-online"
+    assert router.choose(tier=TIER_STANDARD) == "sonar"
+    assert router.choose(tier=TIER_ADVANCED) == "llama-3.1-sonar-huge-128k-online"
+
+    # Check that an SLO and a latency preference change the choice
+    assert router.choose(tier=TIER_ADVANCED, latency_slo=3.0) == "llama-3.1-sonar-huge-128k-online"
+    assert router.choose(tier=TIER_STANDARD, prefer="latency") in (
+        "sonar", "llama-3.1-sonar-large-128k-online")
+
+
+def test_measurements_change_the_choice(tmp_path):
+    """Test that measured latency and errors steer the router, and persist."""
+    path = tmp_path / "router.json"
+    router = ModelRouter(path)
+
+    # Make sonar slow and the large llama model fail
+    for _ in range(5):
+        router.record("sonar", 9.0, True)
+        router.record("llama-3.1-sonar-large-128k-online", None, False)
+
+    # Check the estimates and the choice within a 5 second SLO
+    assert router.estimate("sonar")["latency"] == pytest.approx(9.0)
+    assert router.estimate("llama-3.1-sonar-large-128k-online")["error"] > 0.5
+    assert router.choose(tier=TIER_STANDARD, latency_slo=5.0) == "llama-3.1-sonar-huge-128k-online"
+
+    # Check that saves are throttled, and that a new router reads the flushed state
+    assert ModelRouter(path).estimate("sonar")["samples"] == 1
+    router.flush()
+    assert ModelRouter(path).estimate("sonar")["samples"] == 5
+
+
+def test_stale_measurements_are_ignored():
+    """Test that old measurements fall back to the catalog latency."""
+    router = ModelRouter(persist=False)
+    router.record("sonar", 30.0, True)
+
+    # Age the measurement
+    with mock.patch("perplexity_cli.router.time.time", return_value=time.time() + 30 * 86400):
+        estimate = router.estimate("sonar")
+
+    # Check the estimate
+    assert estimate["latency"] == 2.5
+    assert estimate["samples"] == 0
+
+
+def test_choose_respects_context_window():
+    """Test that models whose context window is too small are skipped."""
+    router = ModelRouter(persist=False)
+
+    # Check the choice for a huge prompt
+    assert router.choose(tier=TIER_BASIC, prompt_tokens=150000) == "sonar-pro"
+    with pytest.raises(ValueError):
+        router.choose(prompt_tokens=500000)
+
+
+@mock.patch('requests.Session.post')
+def test_client_records_outcomes(mock_post):
+    """Test that the client reports latencies and server errors to the router."""
+    router = ModelRouter(persist=False)
+    client = PerplexityClient(api_key="test_key", router=router,
+                              retry_policy=RetryPolicy(max_attempts=1))
+
+    # Send a successful request, then one that fails with a server error
+    mock_post.return_value.json.return_value = {"usage": {}}
+    client.complete("sonar", 100, "test query")
+    with mock.patch.object(client.retry_policy, "call", side_effect=ServerError(500, "down")):
+        with pytest.raises(ServerError):
+            client.complete("sonar", 100, "another query")
+
+    # Check the measurements
+    estimate = router.estimate("sonar")
+    assert estimate["samples"] == 2
+    assert 0 < estimate["error"] < 1
+    assert estimate["latency"] < 1
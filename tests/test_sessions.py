@@ -0,0 +1,153 @@
+"""
+Tests for the sessions module.
+"""
+
+import threading
+
+import pytest
+
+from perplexity_cli.conversation import Conversation
+from perplexity_cli.sessions import SessionStore, INDEX_RECORD
+from perplexity_cli.tokens import estimate_message_tokens
+
+
+def _fill(session, pairs, size=40):
+    """Append question/answer pairs of roughly equal size to a session."""
+    for i in range(pairs):
+        session.append([("user", f"q{i} " + "x" * size), ("assistant", f"a{i} " + "y" * size)])
+
+
+def test_session_append_and_tail(tmp_path):
+    """Test that resuming reads only the most recent turns within the budget."""
+    store = SessionStore(tmp_path)
+    session = store.open("work")
+    _fill(session, 20)
+
+    # Call the function with a budget for two pairs
+    turns = session.tail(4 * estimate_message_tokens("q19 " + "x" * 40))
+
+    # Check the turns
+    assert len(session) == 40
+    assert turns[0] == ("user", "q18 " + "x" * 40)
+    assert turns[-1] == ("assistant", "a19 " + "y" * 40)
+    assert len(turns) == 4
+    assert store.names() == ["work"]
+
+
+def test_session_load_into_conversation(tmp_path):
+    """Test loading a session into a conversation."""
+    session = SessionStore(tmp_path).open("work")
+    session.append([("user", "hello"), ("assistant", "hi there")])
+
+    # Call the function
+    conversation = session.load(Conversation(system_prompt="S"))
+
+    # Check the messages
+    assert [m["content"] for m in conversation.messages()] == ["S", "hello", "hi there"]
+
+
+def test_session_tail_reads_index_backwards(tmp_path):
+    """Test a tail that spans several index blocks."""
+    session = SessionStore(tmp_path).open("long")
+    _fill(session, 300, size=0)
+
+    # Call the function with a budget larger than the session
+    turns = session.tail(10 ** 6)
+
+    # Check that every turn was read in order
+    assert len(turns) == 600
+    assert turns[0] == ("user", "q0 ")
+
+
+def test_session_repairs_torn_write(tmp_path):
+    """Test that an index left behind by a crash is rebuilt from the log."""
+    session = SessionStore(tmp_path).open("crash")
+    _fill(session, 2)
+
+    # Simulate a crash: a partial log line and a missing index record
+    with open(session.log_path, "ab") as f:
+        f.write(b'{"role": "user", "con')
+    with open(session.index_path, "r+b") as f:
+        f.truncate(INDEX_RECORD.size * 3)
+
+    # Call the function
+    session.append([("user", "after crash"), ("assistant", "ok")])
+
+    # Check that the session is consistent again
+    assert len(session) == 6
+    assert session.tail(10 ** 6)[-2:] == [("user", "after crash"), ("assistant", "ok")]
+
+
+def test_session_tail_after_torn_write(tmp_path):
+    """Test that a session left mid-append by a crash can still be resumed."""
+    session = SessionStore(tmp_path).open("crash")
+    _fill(session, 2)
+
+    # Simulate a crash in the middle of writing a record
+    with open(session.log_path, "ab") as f:
+        f.write(b'{"role": "user", "con')
+    with open(session.index_path, "ab") as f:
+        f.write(INDEX_RECORD.pack(session.size, 100, 5)[:6])
+
+    # Call the function
+    turns = session.tail(10 ** 6)
+
+    # Check that the indexed turns are read and the partial one is skipped
+    assert len(turns) == 4
+    assert turns[-1] == ("assistant", "a1 " + "y" * 40)
+
+
+def test_session_compact(tmp_path):
+    """Test compacting a session down to its most recent turns."""
+    store = SessionStore(tmp_path)
+    session = store.open("big")
+    _fill(session, 50)
+    size = session.size
+
+    # Call the function
+    dropped = store.compact(min_bytes=0, keep_tokens=100)
+
+    # Check that old turns were dropped and the tail is intact
+    assert dropped["big"] > 0
+    assert session.size < size
+    assert len(session) == 100 - dropped["big"]
+    assert session.tail(10 ** 6)[-1] == ("assistant", "a49 " + "y" * 40)
+
+    # Check that appends still work after compaction
+    session.append([("user", "next"), ("assistant", "answer")])
+    assert session.tail(10 ** 6)[-1] == ("assistant", "answer")
+
+
+def test_session_concurrent_appends(tmp_path):
+    """Test that appends from several threads are not interleaved."""
+    session = SessionStore(tmp_path).open("shared")
+    threads = [threading.Thread(target=_fill, args=(session, 10)) for _ in range(4)]
+
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Check that every turn was recorded
+    assert len(session) == 80
+    assert len(session.tail(10 ** 6)) == 80
+
+
+def test_session_invalid_name(tmp_path):
+    """Test that names that could escape the sessions directory are rejected."""
+    with pytest.raises(ValueError):
+        SessionStore(tmp_path).open("../etc")
+
+
+def test_session_delete(tmp_path):
+    """Test deleting a session."""
+    store = SessionStore(tmp_path)
+    session = store.open("gone")
+    _fill(session, 1)
+
+    # Call the function
+    session.delete()
+
+    # Check that the session no longer exists
+    assert store.names() == []
+    assert session.tail(100) == []
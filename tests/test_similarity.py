@@ -0,0 +1,66 @@
+"""
+Tests for the similarity module.
+"""
+
+from perplexity_cli.similarity import (
+    compatible, jaccard, lsh_buckets, minhash, query_terms, query_words, BANDS
+)
+
+
+def test_query_terms_normalized():
+    """Test that casing, punctuation, order, stopwords and plurals are ignored."""
+    # Call the function
+    terms = query_terms("What is the distance between the Sun and Earth?")
+
+    # Check the normalized words
+    assert terms == {"distance", "sun", "earth"}
+    assert query_terms("  EARTH,sun   distances ") == terms
+    assert query_terms("What is it?") == {"what", "is", "it"}
+    assert "not" in query_terms("Why is the sky not green")
+
+
+def test_compatible_questions():
+    """Test that different question words and swapped comparisons never match."""
+    # Call the function
+    when = query_words("When was Einstein born?")
+    where = query_words("Where was Einstein born?")
+
+    # Check the words and which pairs may share an answer
+    assert when == ["when", "einstein", "born"]
+    assert not compatible(when, where)
+    assert compatible(when, query_words("einstein born"))
+    assert compatible(query_words("EARTH sun distance?"),
+                      query_words("What is the distance between the Sun and Earth?"))
+    assert not compatible(query_words("Is Python faster than Rust?"),
+                          query_words("Is Rust faster than Python?"))
+    assert not compatible(query_words("Rust vs Python"), query_words("python versus rust"))
+    assert compatible(query_words("Is Python faster than Rust?"),
+                      query_words("python faster than rust"))
+
+
+def test_minhash_estimates_jaccard():
+    """Test that signatures agree in proportion to the words shared."""
+    first = frozenset(f"word{i}" for i in range(20))
+    second = frozenset(f"word{i}" for i in range(4, 24))
+
+    # Call the function
+    a, b = minhash(first), minhash(second)
+
+    # Check the estimate is close to the true similarity (16/24)
+    agreement = sum(x == y for x, y in zip(a, b)) / len(a)
+    assert abs(agreement - jaccard(first, second)) < 0.25
+    assert minhash(first) == a
+
+
+def test_lsh_buckets_scoped():
+    """Test that identical queries share every bucket only within a scope."""
+    signature = minhash(frozenset({"distance", "sun", "earth"}))
+
+    # Call the function
+    buckets = lsh_buckets(signature, "scope")
+
+    # Check the buckets
+    assert len(buckets) == BANDS
+    assert all(-(1 << 63) <= bucket < (1 << 63) for bucket in buckets)
+    assert lsh_buckets(signature, "scope") == buckets
+    assert not set(lsh_buckets(signature, "other")) & set(buckets)
@@ -0,0 +1,268 @@
+"""
+Tests for the single-flight module.
+"""
+
+import asyncio
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from perplexity_cli.client import PerplexityClient
+from perplexity_cli.singleflight import AsyncSingleFlight, SingleFlight, request_key
+from perplexity_cli.tokens import TokenCalibrator
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "benchmarks"))
+
+from mock_server import MockPerplexityServer  # noqa: E402
+
+
+def test_request_key():
+    """Test that the key depends on every request parameter."""
+    messages = [{"role": "user", "content": "test query"}]
+    key = request_key("json", "sonar", 100, messages)
+
+    # Check stability and sensitivity
+    assert key == request_key("json", "sonar", 100, [{"content": "test query", "role": "user"}])
+    assert key != request_key("stream", "sonar", 100, messages)
+    assert key != request_key("json", "sonar", 200, messages)
+
+
+def test_do_coalesces_concurrent_calls():
+    """Test that overlapping identical calls run once and share the result."""
+    flight = SingleFlight()
+    calls = []
+    release = threading.Event()
+    answer = {"answer": 42}
+
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        return answer
+
+    # Start one call, then four identical ones while it is in flight
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        futures = [executor.submit(flight.do, "key", fn)]
+        while not flight.stats()["in_flight"]:
+            time.sleep(0.001)
+        futures += [executor.submit(flight.do, "key", fn) for _ in range(4)]
+        while flight.stats()["coalesced"] < 4:
+            time.sleep(0.001)
+        release.set()
+        results = [future.result() for future in futures]
+
+    # Check that one call was made and every caller, the first included, got its own copy
+    assert len(calls) == 1
+    assert all(result == {"answer": 42} for result in results)
+    assert len({id(result) for result in results} - {id(answer)}) == 5
+    assert flight.stats() == {"calls": 1, "coalesced": 4, "streams": 0,
+                              "streams_coalesced": 0, "in_flight": 0}
+
+    # Check that a later call runs again, and returns the result as is when not shared
+    release.set()
+    assert flight.do("key", fn) is answer
+    assert len(calls) == 2
+
+
+def test_do_shares_errors():
+    """Test that waiting callers get the error of the shared call."""
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def fn():
+        started.set()
+        release.wait(5)
+        raise ValueError("failed")
+
+    # Run a failing call with a caller waiting on it
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        leader = executor.submit(flight.do, "key", fn)
+        started.wait(5)
+        follower = executor.submit(flight.do, "key", fn)
+        while not flight.stats()["coalesced"]:
+            time.sleep(0.001)
+        release.set()
+
+        # Check both callers failed
+        for future in (leader, follower):
+            with pytest.raises(ValueError):
+                future.result()
+
+
+def test_stream_shared_between_consumers():
+    """Test that a late consumer replays the chunks it missed."""
+    flight = SingleFlight()
+    opened = []
+
+    def open_stream():
+        opened.append(1)
+        yield from range(5)
+
+    # Read part of the stream, then join with a second consumer
+    first = flight.stream("key", open_stream)
+    head = [next(first), next(first)]
+    second = flight.stream("key", open_stream)
+
+    # Check both consumers see the whole stream from one upstream
+    assert list(second) == [0, 1, 2, 3, 4]
+    assert head + list(first) == [0, 1, 2, 3, 4]
+    assert len(opened) == 1
+    assert flight.stats()["streams_coalesced"] == 1
+
+
+def test_stream_chunks_copied():
+    """Test that a consumer changing its chunks does not change what a late consumer replays."""
+    flight = SingleFlight()
+
+    def open_stream():
+        yield from ({"index": i} for i in range(3))
+
+    # Read and change a chunk, then join with a second consumer
+    first = flight.stream("key", open_stream)
+    next(first)["index"] = None
+    second = flight.stream("key", open_stream)
+
+    # Check the second consumer sees the chunks as sent
+    assert [chunk["index"] for chunk in second] == [0, 1, 2]
+    assert [chunk["index"] for chunk in first] == [1, 2]
+
+
+def test_stream_continues_after_first_consumer_stops():
+    """Test that the upstream stays open while anyone is reading."""
+    flight = SingleFlight()
+    closed = []
+
+    def open_stream():
+        try:
+            yield from range(3)
+        finally:
+            closed.append(1)
+
+    # The starting consumer gives up early
+    first = flight.stream("key", open_stream)
+    second = flight.stream("key", open_stream)
+    assert next(first) == next(second) == 0
+    first.close()
+
+    # Check the second consumer still gets the rest, then the stream closes
+    assert not closed
+    assert list(second) == [1, 2]
+    assert closed == [1]
+
+
+def test_client_coalesces_identical_requests():
+    """Test that concurrent identical queries reach the API once."""
+    server = MockPerplexityServer(latency=0.2, jitter=0, chunks=2, chunk_interval=0).start()
+    try:
+        client = PerplexityClient(api_key="test_key", base_url=server.url,
+                                  calibrator=TokenCalibrator(persist=False))
+
+        # Send the same query five times at once
+        with client, ThreadPoolExecutor(max_workers=5) as executor:
+            results = list(executor.map(lambda _: client.complete("sonar", 100, "same query"),
+                                        range(5)))
+
+        # Check the server saw one request
+        assert server.requests == 1
+        assert all(result == results[0] for result in results)
+        assert client.singleflight.stats()["coalesced"] == 4
+    finally:
+        server.stop()
+
+
+def test_async_do_coalesces_concurrent_calls():
+    """Test that overlapping identical coroutines run once."""
+    flight = AsyncSingleFlight()
+    calls = []
+    answer = {"answer": 42}
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return answer
+
+    async def run():
+        return await asyncio.gather(*(flight.do("key", fn) for _ in range(3)))
+
+    # Call the function
+    results = asyncio.run(run())
+
+    # Check that one call was made and every caller got its own copy
+    assert len(calls) == 1
+    assert results == [{"answer": 42}] * 3
+    assert len({id(result) for result in results} - {id(answer)}) == 3
+    assert flight.stats() == {"calls": 1, "coalesced": 2, "streams": 0,
+                              "streams_coalesced": 0, "in_flight": 0}
+
+
+def test_async_stream_shared_between_consumers():
+    """Test that identical async streams share one upstream, which stays open while read."""
+    flight = AsyncSingleFlight()
+    opened = []
+    closed = []
+
+    async def open_stream():
+        opened.append(1)
+        try:
+            for i in range(4):
+                await asyncio.sleep(0.01)
+                yield {"index": i}
+        finally:
+            closed.append(1)
+
+    async def read(stream, count=None):
+        chunks = []
+        async for chunk in stream:
+            chunks.append(chunk["index"])
+            if len(chunks) == count:
+                break
+        await stream.aclose()
+        return chunks
+
+    async def run():
+        first = flight.stream("key", open_stream)
+        head = [(await first.__anext__())["index"]]
+        second = flight.stream("key", open_stream)
+        # The first consumer stops early; the second still reads everything
+        results = await asyncio.gather(read(first, 1), read(second))
+        return head + results[0], results[1]
+
+    # Call the function
+    first, second = asyncio.run(run())
+
+    # Check both consumers, the single upstream and that it was closed
+    assert first == [0, 1]
+    assert second == [0, 1, 2, 3]
+    assert opened == [1]
+    assert closed == [1]
+    assert flight.stats()["streams_coalesced"] == 1
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_async_stream_closed_when_abandoned():
+    """Test that the upstream is closed once every consumer has stopped reading."""
+    flight = AsyncSingleFlight()
+    closed = []
+
+    async def open_stream():
+        try:
+            for i in range(100):
+                await asyncio.sleep(0.01)
+                yield i
+        finally:
+            closed.append(1)
+
+    async def run():
+        stream = flight.stream("key", open_stream)
+        assert await stream.__anext__() == 0
+        await stream.aclose()
+
+    # Call the function
+    asyncio.run(run())
+
+    # Check the upstream was closed
+    assert closed == [1]
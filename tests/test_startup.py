@@ -0,0 +1,50 @@
+"""
+Tests for the CLI's startup behaviour.
+"""
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+BENCHMARK = Path(__file__).resolve().parent.parent / "benchmarks" / "startup.py"
+
+
+@pytest.mark.parametrize("module", ["requests", "sqlite3", "socket", "asyncio",
+                                    "perplexity_cli.api", "perplexity_cli.daemon"])
+def test_cli_import_is_lazy(module):
+    """Test that importing the CLI does not load modules only some commands need."""
+    # Import the CLI in a fresh interpreter
+    code = f"import sys, perplexity_cli.cli; print({module!r} in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], stdout=subprocess.PIPE,
+                            universal_newlines=True, check=True)
+
+    # Check that the module was not imported
+    assert result.stdout.strip() == "False"
+
+
+def test_startup_benchmark_report():
+    """Test that the startup benchmark runs and reports no heavy imports."""
+    # Run the benchmark once
+    result = subprocess.run([sys.executable, str(BENCHMARK), "--runs", "1", "--json"],
+                            stdout=subprocess.PIPE, universal_newlines=True, check=True)
+    report = json.loads(result.stdout)
+
+    # Check the report
+    assert report["forbidden_modules"] == []
+    assert report["import_ms"] > 0
+    assert set(report["commands_ms"]) == {"--version", "-l"}
+
+
+def test_client_options_without_cache_is_lazy():
+    """Test that building the client options only loads the cache when it is enabled."""
+    # Build the options in a fresh interpreter
+    code = ("import sys; from perplexity_cli.cli import parse_args, client_options; "
+            "client_options(parse_args(['-q', 'x'])); print('sqlite3' in sys.modules)")
+    result = subprocess.run([sys.executable, "-c", code], stdout=subprocess.PIPE,
+                            universal_newlines=True, check=True)
+
+    # Check that sqlite3 was not imported
+    assert result.stdout.strip() == "False"
@@ -0,0 +1,87 @@
+"""
+Tests for the tokens module.
+"""
+
+import json
+
+import pytest
+
+from perplexity_cli.exceptions import PromptTooLargeError
+from perplexity_cli.tokens import (
+    TokenCalibrator, estimate_prompt_tokens, estimate_text_tokens, fit_max_tokens,
+    MESSAGE_OVERHEAD_TOKENS
+)
+
+
+def test_estimate_text_tokens():
+    """Test the uncalibrated estimate for English and non-ASCII text."""
+    # Check English text: about 4 characters or 0.75 words per token
+    assert 20 <= estimate_text_tokens("The quick brown fox jumps over the lazy dog. " * 2) <= 25
+    assert estimate_text_tokens("") == 0
+
+    # Check that text without spaces is not underestimated
+    assert estimate_text_tokens("日本語のテキスト") >= 8
+
+
+def test_estimate_prompt_tokens():
+    """Test estimating a whole message list at once."""
+    messages = [{"role": "system", "content": "Be brief."},
+                {"role": "user", "content": "x" * 400}]
+
+    # Check that each message adds its overhead
+    estimate = estimate_prompt_tokens(messages)
+    assert estimate > 2 * MESSAGE_OVERHEAD_TOKENS
+    assert estimate_prompt_tokens(messages + [{"role": "user", "content": ""}]) == \
+        estimate + MESSAGE_OVERHEAD_TOKENS
+
+
+def test_fit_max_tokens(caplog):
+    """Test clamping max_tokens to the context window."""
+    # Check that a request that fits is unchanged
+    assert fit_max_tokens("sonar", 1000, 4000) == 4000
+
+    # Check that the completion allowance is reduced with a warning
+    assert fit_max_tokens("sonar", 127000, 4000) == 1000
+    assert "Reducing max_tokens" in caplog.text
+
+    # Check that a prompt that fills the window is rejected
+    with pytest.raises(PromptTooLargeError):
+        fit_max_tokens("sonar", 128000, 10)
+
+
+def test_calibrator_learns_ratio(tmp_path):
+    """Test that the calibrator converges on the observed ratio and persists it."""
+    path = tmp_path / "tokens.json"
+    calibrator = TokenCalibrator(path)
+    messages = [{"role": "user", "content": "word " * 100}]
+    raw = estimate_prompt_tokens(messages)
+
+    # Record usage that is consistently 1.5x the raw estimate
+    for _ in range(30):
+        size = calibrator.size_request("sonar", messages, 100)
+        calibrator.record("sonar", size.raw_prompt_tokens, int(raw * 1.5))
+
+    # Check the calibrated estimate and the reported accuracy
+    size = calibrator.size_request("sonar", messages, 100)
+    assert abs(size.prompt_tokens - raw * 1.5) <= 2
+    stats = calibrator.stats()["sonar"]
+    assert stats["samples"] == 30
+    assert stats["error"] < 0.05
+
+    # Check that saves are throttled, and that a new calibrator loads the flushed state
+    assert json.loads(path.read_text())["sonar"]["samples"] == 1
+    calibrator.flush()
+    assert json.loads(path.read_text())["sonar"]["samples"] == 30
+    assert TokenCalibrator(path).ratio("sonar") == pytest.approx(calibrator.ratio("sonar"))
+
+
+def test_calibrator_ignores_missing_usage(tmp_path):
+    """Test that responses without usage leave the calibration alone."""
+    calibrator = TokenCalibrator(tmp_path / "tokens.json")
+
+    # Call the function without an actual count
+    calibrator.record("sonar", 100, None)
+
+    # Check that nothing was recorded
+    assert calibrator.stats() == {}
+    assert not (tmp_path / "tokens.json").exists()